@@ -1,5 +1,3 @@
-import psycopg2
-from pymongo import MongoClient
 import argparse
 import os
 import sys
@@ -8,15 +6,26 @@ import json
 import bson
 from bson import json_util
 import datetime
+import math
+import statistics
+from concurrent.futures import ThreadPoolExecutor
 
 import functools
 print = functools.partial(print, flush=True)
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from db_config import PG_PARAMS, get_mongo_uri, DEFAULT_DB_NAME
+from db_config import DEFAULT_DB_NAME
+from db_pool import get_pg_connection, put_pg_connection, get_mongo_client, is_shared_mongo_client
+from param_generators import DISTRIBUTIONS, BUCKETS, load_param_generator, top_params
+from results_store import ResultsStore, DEFAULT_STORE_PATH, MIN_SAMPLES
+from index_registry import detect_index_config
+from snapshot import restore_snapshot, DEFAULT_JOBS
+from server_stats import DEFAULT_CURRENTOP_INTERVAL
+from plan_model import ESTIMATE_ERROR_THRESHOLD, parse_plan, parse_postgres_plan, parse_mongo_explain, node_label
+from engines import ENGINES, get_engine, available_engines, PostgresAdapter, MongoAdapter, ColumnarAdapter
 
-from queries.benchmark_queries import QUERIES, list_queries as list_available_queries
+from queries.benchmark_queries import QUERIES, QUERY_CLASSES, list_queries as list_available_queries
 
 class MongoEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -29,80 +38,217 @@ class MongoEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 def init_connections():
-    """Initialize connections to both databases"""
-    pg_conn = psycopg2.connect(**PG_PARAMS)
-    mongo_client = MongoClient(get_mongo_uri())
+    """Take a PostgreSQL connection from the shared pool and the shared MongoDB client"""
+    pg_conn = get_pg_connection()
+    mongo_client = get_mongo_client()
     mongo_db = mongo_client[DEFAULT_DB_NAME]
     return pg_conn, mongo_db, mongo_client
 
 def close_connections(pg_conn, mongo_client):
-    """Close database connections"""
+    """Return the PostgreSQL connection to the pool; close MongoDB clients other than the shared one"""
     if pg_conn:
-        pg_conn.close()
-    if mongo_client:
+        put_pg_connection(pg_conn)
+    if mongo_client and not is_shared_mongo_client(mongo_client):
         mongo_client.close()
 
-def run_postgres_explain(conn, query, params=None):
-    """Run a PostgreSQL query with EXPLAIN ANALYZE and get JSON output"""
-    cursor = conn.cursor()
-    explain_query = f"EXPLAIN (ANALYZE, FORMAT JSON) {query}"
-    
-    try:
-        cursor.execute(explain_query, params or [])
-        explain_results = cursor.fetchall()
-        
-        if explain_results and len(explain_results) > 0 and len(explain_results[0]) > 0:
-            json_result = explain_results[0][0]
+DEFAULT_ENGINES = [PostgresAdapter.name, MongoAdapter.name]
+
+def create_adapters(names, pg_conn, mongo_db):
+    """Build (unconnected) adapters for `names`, reusing the runner's PostgreSQL connection and MongoDB database"""
+    adapters = []
+    for name in names:
+        if name == PostgresAdapter.name:
+            adapters.append(PostgresAdapter(pg_conn))
+        elif name == MongoAdapter.name:
+            adapters.append(MongoAdapter(mongo_db))
         else:
-            print("  Warning: Empty explain results, query may have failed")
-            json_result = {"error": "Empty explain results"}
-    except Exception as e:
-        print(f"  Error executing explain query: {str(e)}")
-        # Return an error object instead of raising an exception
-        json_result = {"error": str(e)}
-    finally:
-        cursor.close()
-    
-    return json_result
+            adapters.append(get_engine(name)())
+    return adapters
 
-def run_benchmark(query_name, pg_conn, mongo_db):
-    """Run benchmark for a specific query on both databases using EXPLAIN ANALYZE"""
+def query_params(query_info, params=None):
+    """Merge sampled parameters over a query's default parameters"""
+    defaults = query_info.get('pg_params', [])
+    if isinstance(defaults, dict):
+        return {**defaults, **(params or {})}
+    return defaults
+
+_top_params = {}
+
+def resolve_params(pg_conn, query_info, params=None):
+    """Merge parameters over a query's defaults, filling defaults left as None from its param_source"""
+    params = query_params(query_info, params)
+    source = query_info.get('param_source')
+    if isinstance(params, dict) and source and any(value is None for value in params.values()):
+        if source not in _top_params:
+            _top_params[source] = top_params(pg_conn, source)
+        params = {**params, **{k: v for k, v in _top_params[source].items() if params.get(k) is None}}
+    return params
+
+def run_engine(adapter, query_info, params, server_stats=False):
+    """Run a query's explain on one engine; return (raw explain, server counter deltas or None)"""
+    print(f"  Running {adapter.title}...")
+    run = lambda: adapter.explain(query_info, params)
+    if server_stats:
+        return adapter.measure(run, query_info)
+    return run(), None
+
+def run_engines_benchmark(query_name, adapters, pg_conn, params=None, server_stats=False, parallel=False):
+    """Run a query on every engine adapter that implements it, one after another or concurrently.
+
+    `pg_conn` fills parameter defaults from the query's param_source. The result holds each
+    engine's raw explain output under its name and lists the engines that ran under 'engines'.
+    With `server_stats`, server-side counters are snapshotted around each query and their
+    deltas attached to the result.
+    """
     if query_name not in QUERIES:
         print(f"Query '{query_name}' not found in predefined queries")
         return None
-    
+
     query_info = QUERIES[query_name]
     print(f"\nRunning benchmark: {query_info['description']}")
-    
-    print("  Running PostgreSQL EXPLAIN ANALYZE...")
-    pg_explain = run_postgres_explain(
-        pg_conn, 
-        query_info['pg'], 
-        query_info.get('pg_params', [])
-    )
-    
-    print("  Running MongoDB explain()...")
-    
-    if 'mongo_explain' in query_info:
-        mongo_explain = query_info['mongo_explain'](mongo_db)
-    else:
-        print(f"  Warning: No mongo_explain function for query '{query_name}'")
-        mongo_explain = {"error": "No explain function defined for this query"}
-    
-    return {
+    params = resolve_params(pg_conn, query_info, params)
+
+    supported = [adapter for adapter in adapters if adapter.supports(query_info)]
+    for adapter in adapters:
+        if adapter not in supported:
+            print(f"  Skipping {adapter.title}: no implementation for query '{query_name}'")
+    # Peak memory is traced process-wide, so adapters reporting it run on their own afterwards
+    concurrent = [adapter for adapter in supported if not adapter.reports_memory] if parallel else []
+    outputs = {}
+    if len(concurrent) > 1:
+        with ThreadPoolExecutor(max_workers=len(concurrent)) as executor:
+            futures = {adapter.name: executor.submit(run_engine, adapter, query_info, params, server_stats)
+                       for adapter in concurrent}
+            outputs = {name: future.result() for name, future in futures.items()}
+    for adapter in supported:
+        if adapter.name not in outputs:
+            outputs[adapter.name] = run_engine(adapter, query_info, params, server_stats)
+    outputs = [outputs[adapter.name] for adapter in supported]
+
+    result = {
         'query_name': query_name,
         'description': query_info['description'],
-        'postgresql': pg_explain,
-        'mongodb': mongo_explain
+        'params': params,
+        'engines': [adapter.name for adapter in supported]
     }
+    stats = {}
+    for adapter, (explain, engine_stats) in zip(supported, outputs):
+        result[adapter.name] = explain
+        if engine_stats is not None:
+            stats[adapter.name] = engine_stats
+    if server_stats:
+        result['server_stats'] = stats
+    return result
+
+def run_benchmark(query_name, pg_conn, mongo_db, params=None, server_stats=None, columnar_store=None):
+    """Run benchmark for a specific query on both databases using EXPLAIN ANALYZE.
+
+    When `server_stats` is a dict of options ({'pg_stat_statements': bool}), server-side
+    counters are snapshotted around each query and their deltas attached to the result.
+    With a `columnar_store`, the query's vectorized implementation (if any) is timed too.
+    """
+    postgres = PostgresAdapter(pg_conn)
+    adapters = [postgres, MongoAdapter(mongo_db)]
+    if server_stats is not None:
+        postgres.use_pgss = server_stats.get('pg_stat_statements', False)
+    if columnar_store is not None:
+        adapters.append(ColumnarAdapter(columnar_store))
+    result = run_engines_benchmark(query_name, adapters, pg_conn, params, server_stats is not None)
+    if result:
+        for engine in DEFAULT_ENGINES:
+            result.setdefault(engine, {"error": "No explain function defined for this query"})
+    return result
+
+def run_parameterized_benchmark(query_name, adapters, pg_conn, generator, samples, parallel=False):
+    """Run a templated query with `samples` sampled parameter sets, tagging each run with its bucket"""
+    runs = []
+    for params, bucket in generator.samples(samples):
+        result = run_engines_benchmark(query_name, adapters, pg_conn, params, parallel=parallel)
+        runs.append({
+            'query_name': query_name,
+            'params': result['params'],
+            'bucket': bucket,
+            'times': {engine: get_execution_time(engine, result[engine]) for engine in result['engines']}
+        })
+    return runs
+
+def record_result(store, run_id, result, iteration):
+    """Append one iteration of a benchmark result to the results store"""
+    for engine in result.get('engines', DEFAULT_ENGINES):
+        plan = parse_plan(engine, result[engine])
+        store.record(run_id, result['query_name'], engine, iteration,
+                     plan.execution_time_ms,
+                     plan.planning_time_ms,
+                     result.get('params'))
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers, or None if it is empty"""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(values))))
+    return values[min(rank, len(values)) - 1]
+
+def print_bucket_summary(param_runs, adapters):
+    """Print latency per parameter bucket for parameterized runs"""
+    def fmt(value):
+        return "N/A" if value is None else f"{value:.2f}ms"
+
+    table_data = []
+    query_names = list(dict.fromkeys(run['query_name'] for run in param_runs))
+    for query_name in query_names:
+        for bucket in BUCKETS:
+            runs = [r for r in param_runs if r['query_name'] == query_name and r['bucket'] == bucket]
+            if not runs:
+                continue
+            row = [query_name, bucket, len(runs)]
+            for adapter in adapters:
+                times = [r['times'].get(adapter.name) for r in runs]
+                times = [t for t in times if t is not None]
+                row += [fmt(statistics.median(times) if times else None), fmt(percentile(times, 95))]
+            table_data.append(row)
+
+    headers = ["Query", "Bucket", "Samples"]
+    for adapter in adapters:
+        headers += [f"{adapter.label} Median", f"{adapter.label} p95"]
+    print("\n=== Latency by Parameter Bucket ===")
+    print(tabulate(table_data, headers=headers, tablefmt="grid"))
+
+def get_pg_execution_time(pg_explain):
+    """Return the execution time in ms from PostgreSQL EXPLAIN ANALYZE output, or None"""
+    return parse_postgres_plan(pg_explain).execution_time_ms
+
+def get_pg_planning_time(pg_explain):
+    """Return the planning time in ms from PostgreSQL EXPLAIN ANALYZE output, or None"""
+    return parse_postgres_plan(pg_explain).planning_time_ms
+
+def get_mongo_execution_time(mongo_explain):
+    """Return the execution time in ms from MongoDB explain output, or None"""
+    return parse_mongo_explain(mongo_explain).execution_time_ms
+
+def get_execution_time(engine, explain):
+    """Return the execution time in ms from any engine's raw explain output, or None"""
+    return parse_plan(engine, explain).execution_time_ms
 
 def get_timestamp_str():
     """Get a timestamp string for filenames"""
     now = datetime.datetime.now()
     return now.strftime("%Y%m%d_%H%M%S")
 
-def save_results_to_json_per_query(results):
-    base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+def result_document(result, engine):
+    """Build the saved JSON document for one engine's result: raw explain plus the normalized plan"""
+    plan = parse_plan(engine, result[engine])
+    return {
+        'description': result['description'],
+        'params': result.get('params'),
+        'plan': plan.to_dict(),
+        'server_stats': result.get('server_stats', {}).get(engine),
+        'explain_result': result[engine]
+    }
+
+def save_results_to_json_per_query(results, base_dir=None):
+    if base_dir is None:
+        base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
     timestamp = get_timestamp_str()
 
     for result in results:
@@ -110,194 +256,281 @@ def save_results_to_json_per_query(results):
         query_dir = os.path.join(base_dir, query_name)
         os.makedirs(query_dir, exist_ok=True)
 
-        pg_filename = f"postgres_explain_{timestamp}.json"
-        mongo_filename = f"mongo_explain_{timestamp}.json"
-
-        pg_path = os.path.join(query_dir, pg_filename)
-        mongo_path = os.path.join(query_dir, mongo_filename)
-
-        with open(pg_path, 'w') as f:
-            json.dump({
-                'description': result['description'],
-                'explain_result': result['postgresql']
-            }, f, indent=2)
+        for engine in result.get('engines', DEFAULT_ENGINES):
+            prefix = get_engine(engine).file_prefix
+            document = result_document(result, engine)
+            for filename in (f"{prefix}_explain_{timestamp}.json", f"latest_{prefix}_explain.json"):
+                with open(os.path.join(query_dir, filename), 'w') as f:
+                    json.dump(document, f, indent=2, cls=MongoEncoder)
 
-        with open(mongo_path, 'w') as f:
-            json.dump({
-                'description': result['description'],
-                'explain_result': result['mongodb']
-            }, f, indent=2, cls=MongoEncoder)
+    return base_dir, timestamp
 
-        with open(os.path.join(query_dir, "latest_postgres_explain.json"), 'w') as f:
-            json.dump({
-                'description': result['description'],
-                'explain_result': result['postgresql']
-            }, f, indent=2)
+def _fmt_ms(value):
+    return "N/A" if value is None else f"{value:.2f}ms"
 
-        with open(os.path.join(query_dir, "latest_mongo_explain.json"), 'w') as f:
-            json.dump({
-                'description': result['description'],
-                'explain_result': result['mongodb']
-            }, f, indent=2, cls=MongoEncoder)
+def _fmt_mb(value):
+    return "N/A" if value is None else f"{value / (1024 * 1024):.2f}MB"
 
-    return base_dir, timestamp
+def _fmt_count(value):
+    if value is None:
+        return "N/A"
+    return str(int(value)) if float(value).is_integer() else f"{value:.1f}"
 
-def print_results_summary(results):
+def print_results_summary(results, adapters):
     """Print a simple summary of benchmark results"""
     table_data = []
+    plans = []
     
     for result in results:
-        pg_data = result['postgresql']
-        pg_execution_time = "N/A"
-        pg_rows_returned = "N/A"
-        
-        try:
-            if isinstance(pg_data, list) and len(pg_data) > 0:
-                if 'Execution Time' in pg_data[0]:
-                    pg_execution_time = f"{pg_data[0]['Execution Time']:.2f}ms"
-                
-                if 'Plan' in pg_data[0]:
-                    plan = pg_data[0]['Plan']
-                    if 'Actual Rows' in plan:
-                        pg_rows_returned = plan['Actual Rows']
-        except (KeyError, TypeError, IndexError):
-            pass
+        query_plans = [parse_plan(adapter.name, result[adapter.name]) if adapter.name in result else None
+                       for adapter in adapters]
+        plans.append((result['query_name'], query_plans))
         
-        mongo_data = result['mongodb']
-        mongo_execution_time = "N/A"
-        mongo_rows_returned = "N/A"
-        mongo_docs_examined = "N/A"
-        
-        try:
-            if 'executionStats' in mongo_data:
-                stats = mongo_data['executionStats']
-                if 'executionTimeMillis' in stats:
-                    mongo_execution_time = f"{stats['executionTimeMillis']}ms"
-                if 'nReturned' in stats:
-                    mongo_rows_returned = stats['nReturned']
-                if 'totalDocsExamined' in stats:
-                    mongo_docs_examined = stats['totalDocsExamined']
-            
-            elif 'ok' in mongo_data and mongo_data.get('ok') == 1:
-                if 'stages' in mongo_data:
-                    final_stage = mongo_data['stages'][-1]
-                    if 'nReturned' in final_stage:
-                        mongo_rows_returned = final_stage['nReturned']
-                
-                if 'executionStats' in mongo_data:
-                    stats = mongo_data['executionStats']
-                    if 'executionTimeMillis' in stats:
-                        mongo_execution_time = f"{stats['executionTimeMillis']}ms"
-                    if 'nReturned' in stats:
-                        mongo_rows_returned = stats['nReturned']
-                    if 'totalDocsExamined' in stats:
-                        mongo_docs_examined = stats['totalDocsExamined']
-                
-                if 'explainVersion' in mongo_data:
-                    if 'stages' in mongo_data:
-                        for stage in mongo_data['stages']:
-                            if '$cursor' in stage and 'executionStats' in stage['$cursor']:
-                                stats = stage['$cursor']['executionStats']
-                                if 'executionTimeMillis' in stats:
-                                    mongo_execution_time = f"{stats['executionTimeMillis']}ms"
-                                if 'nReturned' in stats:
-                                    mongo_rows_returned = stats['nReturned']
-                                if 'totalDocsExamined' in stats:
-                                    mongo_docs_examined = stats['totalDocsExamined']
-                                break
-                        if len(mongo_data['stages']) > 0:
-                            final_stage = mongo_data['stages'][-1]
-                            if 'nReturned' in final_stage:
-                                mongo_rows_returned = final_stage['nReturned']
-        except (KeyError, TypeError):
-            pass
-        
-        table_data.append([
-            result['query_name'],
-            pg_execution_time,
-            str(pg_rows_returned),
-            mongo_execution_time,
-            str(mongo_rows_returned),
-            str(mongo_docs_examined)
-        ])
+        row = [result['query_name']]
+        for adapter, plan in zip(adapters, query_plans):
+            if plan is None:
+                row += ["N/A"] * (2 + adapter.reports_planning + adapter.reports_examined + adapter.reports_memory)
+                continue
+            if adapter.reports_planning:
+                row.append(_fmt_ms(plan.planning_time_ms))
+            row += [_fmt_ms(plan.execution_time_ms), _fmt_count(plan.rows_returned)]
+            if adapter.reports_examined:
+                row.append(_fmt_count(plan.rows_examined))
+            if adapter.reports_memory:
+                memory = plan.root.memory_kb if plan.root is not None else None
+                row.append(_fmt_mb(None if memory is None else memory * 1024))
+        table_data.append(row)
     
-    headers = ["Query", "PG Execution Time", "PG Rows", "Mongo Execution Time", "Mongo Rows", "Mongo Docs Examined"]
+    headers = ["Query"]
+    for adapter in adapters:
+        if adapter.reports_planning:
+            headers.append(f"{adapter.label} Planning Time")
+        headers += [f"{adapter.label} Execution Time", f"{adapter.label} Rows"]
+        if adapter.reports_examined:
+            headers.append(f"{adapter.label} Docs Examined")
+        if adapter.reports_memory:
+            headers.append(f"{adapter.label} Peak Mem")
     
     print("\n=== Benchmark Results Summary ===")
     print(tabulate(table_data, headers=headers, tablefmt="grid"))
     
-    for result in results:
-        query_name = result['query_name']
-        pg_data = result['postgresql']
-        mongo_data = result['mongodb']
-        
-        pg_rows = "N/A"
-        pg_examined = "N/A"
-        try:
-            if isinstance(pg_data, list) and len(pg_data) > 0:
-                if 'Plan' in pg_data[0]:
-                    plan = pg_data[0]['Plan']
-                    if 'Actual Rows' in plan:
-                        pg_rows = plan['Actual Rows']
-                    if 'Plans' in plan:
-                        rows_examined = 0
-                        scan_nodes = []
-                        
-                        def collect_scan_nodes(node):
-                            if 'Node Type' in node and ('Scan' in node['Node Type'] or 'Seq Scan' in node['Node Type']):
-                                scan_nodes.append(node)
-                            if 'Plans' in node:
-                                for child in node['Plans']:
-                                    collect_scan_nodes(child)
-                        
-                        collect_scan_nodes(plan)
-                        
-                        for node in scan_nodes:
-                            if 'Actual Rows' in node:
-                                rows_examined += node['Actual Rows']
-                        
-                        if rows_examined > 0:
-                            pg_examined = rows_examined
-        except (KeyError, TypeError, IndexError):
-            pass
-        
-        mongo_rows = "N/A"
-        mongo_examined = "N/A"
-        try:
-            if 'stages' in mongo_data:
-                final_stage = mongo_data['stages'][-1]
-                if 'nReturned' in final_stage:
-                    mongo_rows = final_stage['nReturned']
-                
-                for stage in mongo_data['stages']:
-                    if '$cursor' in stage and 'executionStats' in stage['$cursor']:
-                        stats = stage['$cursor']['executionStats']
-                        if 'totalDocsExamined' in stats:
-                            mongo_examined = stats['totalDocsExamined']
-                        break
-            elif 'executionStats' in mongo_data:
-                stats = mongo_data['executionStats']
-                if 'nReturned' in stats:
-                    mongo_rows = stats['nReturned']
-                if 'totalDocsExamined' in stats:
-                    mongo_examined = stats['totalDocsExamined']
-        except (KeyError, TypeError, IndexError):
-            pass
-            
+    for query_name, query_plans in plans:
         print(f"\nResults for {query_name}:")
-        print(f"  PostgreSQL: {pg_rows} rows returned, {pg_examined} rows examined")
-        print(f"  MongoDB: {mongo_rows} documents returned, {mongo_examined} documents examined")
-        
+        for adapter, plan in zip(adapters, query_plans):
+            if plan is None:
+                continue
+            if plan.error:
+                print(f"  {adapter.title}: error: {plan.error}")
+                continue
+            details = [f"{_fmt_count(plan.rows_returned)} rows returned"]
+            if plan.rows_examined is not None:
+                details.append(f"{_fmt_count(plan.rows_examined)} rows examined")
+            if plan.keys_examined is not None:
+                details.append(f"{_fmt_count(plan.keys_examined)} keys examined")
+            print(f"  {adapter.title}: {', '.join(details)}")
+
+    for adapter in adapters:
+        summary = adapter.summary()
+        if summary:
+            print(f"\n{summary}")
+
+# Smallest timing per engine used in geometric means (e.g. MongoDB reports whole milliseconds)
+GEOMEAN_FLOOR_MS = {name: engine.geomean_floor_ms for name, engine in ENGINES.items()}
+
+def geometric_mean(values, floor):
+    values = [max(v, floor) for v in values if v is not None]
+    if not values:
+        return None
+    return math.exp(sum(math.log(v) for v in values) / len(values))
+
+def print_class_summary(query_times, adapters):
+    """Print per-class geometric means of the median execution time of each query.
+
+    `query_times` maps query name to {engine: [ms, ...]} for the engines that ran it. Every
+    engine is compared with the first one over the queries both ran; engines that do not
+    implement every query (e.g. columnar) also show how many queries they ran.
+    """
+    base = adapters[0]
+    medians = {}
+    for name, times in query_times.items():
+        for engine, values in times.items():
+            values = [v for v in values if v is not None]
+            if values:
+                medians.setdefault(engine, {})[name] = statistics.median(values)
+    partial = {adapter.name for adapter in adapters[1:]
+               if any(name not in medians.get(adapter.name, {}) for name in query_times)}
 
+    def class_row(label, names):
+        row = [label, len(names)]
+        base_medians = medians.get(base.name, {})
+        row.append(_fmt_ms(geometric_mean([base_medians[n] for n in names if n in base_medians],
+                                          base.geomean_floor_ms)))
+        for adapter in adapters[1:]:
+            engine_medians = medians.get(adapter.name, {})
+            ran = [n for n in names if n in engine_medians]
+            if adapter.name in partial:
+                row.append(len(ran))
+            mean = geometric_mean([engine_medians[n] for n in ran], adapter.geomean_floor_ms)
+            shared = [n for n in ran if n in base_medians]
+            base_mean = geometric_mean([base_medians[n] for n in shared], base.geomean_floor_ms)
+            shared_mean = geometric_mean([engine_medians[n] for n in shared], adapter.geomean_floor_ms)
+            ratio = "N/A" if base_mean is None or shared_mean is None else f"{shared_mean / base_mean:.2f}x"
+            row += [_fmt_ms(mean), ratio]
+        return row
+
+    table_data = []
+    for query_class in list(QUERY_CLASSES) + [None]:
+        names = [name for name in query_times if QUERIES[name].get('class') == query_class]
+        if names:
+            table_data.append(class_row(query_class or "unclassified", names))
+    if len(table_data) > 1:
+        table_data.append(class_row("all", list(query_times)))
+
+    print("\n=== Geometric Mean Execution Time by Query Class ===")
+    headers = ["Class", "Queries", f"{base.label} Geo. Mean"]
+    for adapter in adapters[1:]:
+        if adapter.name in partial:
+            headers.append(f"{adapter.label} Queries")
+        headers += [f"{adapter.label} Geo. Mean", f"{adapter.label} / {base.label}"]
+    print(tabulate(table_data, headers=headers, tablefmt="grid"))
+
+SERVER_STAT_COLUMNS = [
+    ('postgresql', 'pg.statements.shared_blks_hit', 'Shared Hit'),
+    ('postgresql', 'pg.statements.shared_blks_read', 'Shared Read'),
+    ('postgresql', 'pg.statements.temp_blks_written', 'Temp Written'),
+    ('postgresql', 'pg.statements.wal_bytes', 'WAL Bytes'),
+    ('postgresql', 'pg.io.reads', 'IO Reads'),
+    ('mongodb', 'mongo.wt.cache.bytes read into cache', 'WT Cache Read Bytes'),
+    ('mongodb', 'mongo.wt.block-manager.blocks read', 'WT Blocks Read'),
+    ('mongodb', 'mongo.queryExecutor.scannedObjects', 'Docs Scanned'),
+    ('mongodb', 'mongo.explain.yields', 'Yields'),
+]
+
+def print_server_stats(results):
+    """Print the key server-side counter deltas captured for each query"""
+    table_data = []
+    for result in results:
+        stats = result.get('server_stats')
+        if not stats:
+            continue
+        row = [result['query_name']]
+        for engine, key, _ in SERVER_STAT_COLUMNS:
+            row.append(_fmt_count(stats.get(engine, {}).get(key, 0)))
+        table_data.append(row)
+    if table_data:
+        print("\n=== Server Resource Counters (per query) ===")
+        print(tabulate(table_data, headers=["Query"] + [label for _, _, label in SERVER_STAT_COLUMNS], tablefmt="grid"))
+
+def print_plan_profile(results, limit=5, error_threshold=ESTIMATE_ERROR_THRESHOLD):
+    """Rank the hottest plan nodes of each query by self time and flag large estimate errors"""
+    for result in results:
+        for engine in result.get('engines', DEFAULT_ENGINES):
+            label = get_engine(engine).title
+            plan = parse_plan(engine, result[engine])
+            if plan.root is None:
+                continue
+            rows = []
+            for node in plan.hot_nodes(limit):
+                error = node.estimate_error
+                memory = "N/A" if node.memory_kb is None else f"{node.memory_kb:.0f}kB"
+                if node.spilled:
+                    memory += f" (spilled{'' if node.spill_kb is None else f' {node.spill_kb:.0f}kB'})"
+                rows.append([
+                    node.operator,
+                    node.relation or "",
+                    _fmt_ms(node.self_time_ms),
+                    _fmt_count(node.actual_rows),
+                    _fmt_count(node.estimated_rows),
+                    node.loops,
+                    _fmt_count(node.rows_examined),
+                    memory,
+                    "N/A" if error is None else f"{error:.1f}x" + (" !" if error >= error_threshold else "")
+                ])
+            print(f"\n=== Hot nodes: {result['query_name']} ({label}) ===")
+            print(tabulate(rows, headers=["Operator", "Relation", "Self Time", "Actual Rows", "Est. Rows",
+                                          "Loops", "Examined", "Memory", "Est. Error"], tablefmt="grid"))
+            misestimates = plan.estimate_errors(error_threshold)
+            if misestimates:
+                print(f"  {len(misestimates)} node(s) misestimated by {error_threshold:.0f}x or more: "
+                      + ", ".join(f"{node.operator} ({node.estimate_error:.0f}x)" for node in misestimates))
+
+def print_estimate_errors(results, error_threshold=ESTIMATE_ERROR_THRESHOLD):
+    """Print the estimated vs actual rows of every plan node, flagging q-errors of `error_threshold` or more"""
+    summary = []
+    for result in results:
+        for engine in result.get('engines', DEFAULT_ENGINES):
+            plan = parse_plan(engine, result[engine])
+            estimated = [(depth, node) for depth, node in plan.root.walk()
+                         if node.estimate_error is not None] if plan.root else []
+            if not estimated:
+                continue
+            label = get_engine(engine).title
+            rows = []
+            for depth, node in estimated:
+                error = node.estimate_error
+                direction = "under" if node.estimated_rows < node.actual_rows else "over"
+                rows.append([
+                    node_label(depth, node),
+                    _fmt_count(node.estimated_rows),
+                    _fmt_count(node.actual_rows),
+                    f"{error:.1f}x {direction}" + (" !" if error >= error_threshold else "") if error > 1 else "exact",
+                ])
+            print(f"\n=== Row estimates: {result['query_name']} ({label}) ===")
+            print(tabulate(rows, headers=["Node", "Est. Rows", "Actual Rows", "Est. Error"], tablefmt="grid"))
+            stats = plan.estimate_summary(error_threshold)
+            summary.append([result['query_name'], label, stats['nodes'], f"{stats['max_error']:.1f}x",
+                            f"{stats['geomean_error']:.2f}x", stats['misestimated']])
+    if summary:
+        print(f"\n=== Row estimate error summary (misestimated: {error_threshold:.0f}x or more) ===")
+        print(tabulate(summary, headers=["Query", "Engine", "Nodes", "Max Error", "Geomean Error", "Misestimated"],
+                       tablefmt="grid"))
 
 def main():
-    parser = argparse.ArgumentParser(description='Benchmark PostgreSQL vs MongoDB for Yelp dataset using EXPLAIN ANALYZE')
+    parser = argparse.ArgumentParser(description='Benchmark PostgreSQL vs MongoDB (and other engines) for Yelp dataset using EXPLAIN ANALYZE')
     parser.add_argument('--queries', nargs='+', help='Specific queries to run (default: all)')
+    parser.add_argument('--classes', nargs='+', choices=list(QUERY_CLASSES), help='Only run queries of these classes')
     parser.add_argument('--list', action='store_true', help='List available queries')
     parser.add_argument('--pg-output', type=str, default='postgres_explain_results.json', help='Output file for PostgreSQL EXPLAIN results')
     parser.add_argument('--mongo-output', type=str, default='mongo_explain_results.json', help='Output file for MongoDB explain results')
     parser.add_argument('--results-dir', type=str, default=None, help='Directory to save results (default: ./results)')
     parser.add_argument('--no-timestamp', action='store_true', help='Disable timestamps in filenames')
+    parser.add_argument('--param-samples', type=int, default=0,
+                        help='Run templated queries with this many sampled parameter sets (default: 0, use defaults)')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='uniform',
+                        help='Parameter sampling distribution (default: uniform)')
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent for --distribution zipf (default: 1.0)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for parameter sampling (default: 42)')
+    parser.add_argument('--pool-size', type=int, default=1000,
+                        help='Number of distinct values sampled from the data per parameter source (default: 1000)')
+    parser.add_argument('--iterations', type=int, default=1, help='Times each query is run (default: 1)')
+    parser.add_argument('--index-config', type=str, default=None,
+                        help='Index configuration recorded with the run (default: detected from existing indexes)')
+    parser.add_argument('--scale', type=float, default=None,
+                        help='Dataset scale factor recorded with the run (default: the restored snapshot\'s, else 1.0)')
+    parser.add_argument('--label', type=str, default=None, help='Free-form label recorded with the run')
+    parser.add_argument('--store', type=str, default=DEFAULT_STORE_PATH, help='Results history database')
+    parser.add_argument('--no-store', action='store_true', help='Do not record this run in the results history')
+    parser.add_argument('--profile', action='store_true', help='Show the hottest plan nodes of each query and flag misestimates')
+    parser.add_argument('--profile-nodes', type=int, default=5, help='Number of hot nodes shown per plan (default: 5)')
+    parser.add_argument('--estimate-errors', action='store_true',
+                        help='Show the estimated vs actual rows of every plan node (see pg_statistics.py)')
+    parser.add_argument('--server-stats', action='store_true',
+                        help='Capture server-side counters (pg_stat_statements, pg_stat_io, serverStatus) around each query')
+    parser.add_argument('--currentop-interval', type=float, default=DEFAULT_CURRENTOP_INTERVAL * 1000,
+                        help='With --server-stats, milliseconds between MongoDB $currentOp samples (default: 50)')
+    parser.add_argument('--engines', nargs='+', choices=available_engines(), default=DEFAULT_ENGINES,
+                        help='Engines to benchmark; the first is the baseline of the class summary (default: postgresql mongodb)')
+    parser.add_argument('--columnar', action='store_true',
+                        help='Also time vectorized implementations on an in-process columnar copy of the data (adds columnar to --engines)')
+    parser.add_argument('--parallel-engines', action='store_true',
+                        help='Run each query on all engines concurrently instead of one after another '
+                             '(columnar still runs on its own so its peak memory is not mixed with the others)')
+    parser.add_argument('--load', nargs='+', choices=available_engines(), default=[], metavar='ENGINE',
+                        help='Load the dataset into these engines before benchmarking (e.g. sqlite copies it from PostgreSQL)')
+    parser.add_argument('--restore-snapshot', type=str, default=None, metavar='NAME',
+                        help='Restore this snapshot (see snapshot.py) before the run')
+    parser.add_argument('--snapshot-jobs', type=int, default=DEFAULT_JOBS,
+                        help='Parallel jobs used by --restore-snapshot (default: 4)')
     
     args = parser.parse_args()
     
@@ -305,23 +538,90 @@ def main():
         list_available_queries()
         return
     
+    if args.restore_snapshot:
+        manifest, _ = restore_snapshot(args.restore_snapshot, args.snapshot_jobs)
+        if args.scale is None:
+            args.scale = manifest['scale']
+    if args.scale is None:
+        args.scale = 1.0
+
+    engine_names = list(dict.fromkeys(args.engines + (['columnar'] if args.columnar else [])))
     pg_conn, mongo_db, mongo_client = init_connections()
+    adapters = create_adapters(engine_names, pg_conn, mongo_db)
+    for adapter in adapters:
+        if adapter.name == MongoAdapter.name:
+            adapter.currentop_interval = args.currentop_interval / 1000
+    store = None
     
     try:
+        for name in args.load:
+            matching = [adapter for adapter in adapters if adapter.name == name]
+            adapter = matching[0] if matching else create_adapters([name], pg_conn, mongo_db)[0]
+            print(f"Loading the dataset into {adapter.title}...")
+            adapter.load()
+        for adapter in adapters:
+            adapter.connect()
+
         query_names = args.queries if args.queries else list(QUERIES.keys())
-        
+        if args.classes:
+            query_names = [name for name in query_names if QUERIES.get(name, {}).get('class') in args.classes]
+
+        if not args.no_store:
+            store = ResultsStore(args.store)
+            index_config = args.index_config or detect_index_config(pg_conn, mongo_db)
+            run_id = store.start_run(index_config, args.scale, args.label)
+            print(f"Recording run {run_id} (index config: {index_config}) in {args.store}")
+            if args.iterations < MIN_SAMPLES:
+                print(f"Warning: with --iterations {args.iterations} this run cannot be gated by "
+                      f"results_store.py compare (needs {MIN_SAMPLES} or more)")
+
         results = []
+        query_times = {}
+        param_runs = []
+        generators = {}
         for query_name in query_names:
             if query_name in QUERIES:
                 print(f"Running benchmark for query: {query_name}")
-                result = run_benchmark(query_name, pg_conn, mongo_db)
-                if result:
-                    results.append(result)
+                for iteration in range(args.iterations):
+                    result = run_engines_benchmark(query_name, adapters, pg_conn, server_stats=args.server_stats,
+                                                   parallel=args.parallel_engines)
+                    if not result:
+                        break
+                    if store:
+                        record_result(store, run_id, result, iteration)
+                    times = query_times.setdefault(query_name, {})
+                    for engine in result['engines']:
+                        times.setdefault(engine, []).append(get_execution_time(engine, result[engine]))
+                    if iteration == 0:
+                        results.append(result)
+
+                source = QUERIES[query_name].get('param_source')
+                if args.param_samples > 0 and source:
+                    if source not in generators:
+                        generators[source] = load_param_generator(
+                            pg_conn, source, args.distribution, args.skew, args.seed, args.pool_size)
+                    runs = run_parameterized_benchmark(
+                        query_name, adapters, pg_conn, generators[source], args.param_samples, args.parallel_engines)
+                    if store:
+                        for iteration, run in enumerate(runs):
+                            bucket_name = f"{query_name}[{run['bucket']}]"
+                            for engine, time_ms in run['times'].items():
+                                store.record(run_id, bucket_name, engine, iteration, time_ms, params=run['params'])
+                    param_runs += runs
             else:
                 print(f"Warning: Query '{query_name}' not found, skipping")
         
         if results:
-            print_results_summary(results)
+            print_results_summary(results, adapters)
+            print_class_summary(query_times, adapters)
+            if args.server_stats:
+                print_server_stats(results)
+            if args.profile:
+                print_plan_profile(results, args.profile_nodes)
+            if args.estimate_errors:
+                print_estimate_errors(results)
+            if param_runs:
+                print_bucket_summary(param_runs, adapters)
             
             results_dir = args.results_dir
             if results_dir is None:
@@ -331,35 +631,31 @@ def main():
                 os.makedirs(results_dir)
             
             if args.no_timestamp:
-                pg_path = os.path.join(results_dir, args.pg_output)
-                mongo_path = os.path.join(results_dir, args.mongo_output)
-                
-                pg_results = {}
-                mongo_results = {}
-                for result in results:
-                    pg_results[result['query_name']] = {
-                        'description': result['description'],
-                        'explain_result': result['postgresql']
-                    }
-                    mongo_results[result['query_name']] = {
-                        'description': result['description'],
-                        'explain_result': result['mongodb']
-                    }
-                
-                with open(pg_path, 'w') as f:
-                    json.dump(pg_results, f, indent=2)
-                
-                with open(mongo_path, 'w') as f:
-                    json.dump(mongo_results, f, indent=2, cls=MongoEncoder)
+                outputs = {'postgresql': args.pg_output, 'mongodb': args.mongo_output}
+                paths = []
+                for adapter in adapters:
+                    path = os.path.join(results_dir, outputs.get(adapter.name, f"{adapter.file_prefix}_explain_results.json"))
+                    engine_results = {}
+                    for result in results:
+                        if adapter.name in result['engines']:
+                            engine_results[result['query_name']] = result_document(result, adapter.name)
+                    
+                    with open(path, 'w') as f:
+                        json.dump(engine_results, f, indent=2, cls=MongoEncoder)
+                    paths.append(path)
                 
-                print(f"\nResults saved to {pg_path} and {mongo_path}")
+                print(f"\nResults saved to {', '.join(paths)}")
             else:
-                save_results_to_json_per_query(results)
+                save_results_to_json_per_query(results, results_dir)
 
         else:
             print("No benchmark results to report")
             
     finally:
+        if store:
+            store.close()
+        for adapter in adapters:
+            adapter.close()
         close_connections(pg_conn, mongo_client)
 
 if __name__ == "__main__":
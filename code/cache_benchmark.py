@@ -0,0 +1,221 @@
+"""
+Read-through result cache benchmark.
+
+A request stream is generated once (seeded): reads are benchmark queries with
+parameters drawn from a Zipfian pool, so popular parameters repeat while the
+tail keeps varying; writes insert new reviews and update their businesses'
+aggregates. The same stream is replayed on each engine without and with an
+in-process result cache (result_cache.py). Every write invalidates the cached
+results that read reviews or businesses.
+
+Reported per engine: read hit ratio, p50/p99 read latency with and without
+the cache, reads and read time that reached the database, and the share of
+database load removed by the cache. Written reviews are removed and business
+aggregates restored after each replay, as in write_benchmark.py.
+"""
+import argparse
+import os
+import random
+import time
+import functools
+print = functools.partial(print, flush=True)
+
+from tabulate import tabulate
+
+from benchmark import init_connections, close_connections, query_params, resolve_params, percentile, QUERIES, QUERY_CLASSES
+from param_generators import DISTRIBUTIONS, ParamGenerator, load_param_pool
+from mixed_workload import WorkerStats, pg_write, mongo_write
+from result_cache import ResultCache, read_through
+from write_benchmark import (WriteGenerator, SNAPSHOT_PATH, transactions_supported, save_snapshot, load_snapshot,
+                             cleanup)
+
+ENGINES = ['postgresql', 'mongodb']
+DEFAULT_CLASSES = ['point_lookup', 'range_scan', 'join', 'top_n']
+
+# Tables/collections written by a write request
+WRITTEN_TABLES = ('reviews', 'businesses')
+
+
+def build_stream(pg_conn, read_queries, writer, args):
+    """The request stream: ('read', query name, params) and ('write', reviews) tuples"""
+    rng = random.Random(args.seed)
+    sources = {QUERIES[name]['param_source'] for name in read_queries if QUERIES[name].get('param_source')}
+    generators = {source: ParamGenerator(source, load_param_pool(pg_conn, source, args.pool_size),
+                                         args.distribution, args.skew, args.seed)
+                  for source in sources}
+    defaults = {name: resolve_params(pg_conn, QUERIES[name]) for name in read_queries}
+
+    stream = []
+    for _ in range(args.requests):
+        if rng.random() < args.write_ratio:
+            stream.append(('write', [writer.review() for _ in range(args.reviews_per_write)]))
+            continue
+        query_name = rng.choice(read_queries)
+        source = QUERIES[query_name].get('param_source')
+        if source in generators:
+            params = query_params(QUERIES[query_name], generators[source].sample()[0])
+        else:
+            params = defaults[query_name]
+        stream.append(('read', query_name, params))
+    return stream
+
+
+def run_read(engine, query_info, pg_conn, mongo_db, params):
+    if engine == 'postgresql':
+        cur = pg_conn.cursor()
+        try:
+            cur.execute(query_info['pg'], params)
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+        pg_conn.commit()
+        return rows
+    return query_info['mongo'](mongo_db, params)
+
+
+def replay(engine, stream, pg_conn, mongo_db, cache, max_retries, use_transactions):
+    """Replay the stream on one engine, reading through `cache` when it is not None"""
+    stats = WorkerStats()
+    latencies, db_reads, db_time = [], 0, 0.0
+    for request in stream:
+        if request[0] == 'write':
+            if engine == 'postgresql':
+                pg_write(pg_conn, request[1], stats, max_retries)
+            else:
+                mongo_write(mongo_db, request[1], stats, use_transactions)
+            if cache is not None:
+                cache.invalidate(WRITTEN_TABLES)
+            continue
+
+        _, query_name, params = request
+        query_info = QUERIES[query_name]
+        timing = {}
+
+        def run():
+            db_start = time.perf_counter()
+            try:
+                return run_read(engine, query_info, pg_conn, mongo_db, params)
+            finally:
+                timing['db'] = time.perf_counter() - db_start
+
+        start = time.perf_counter()
+        try:
+            read_through(cache, engine, query_name, query_info, params, run)
+        except Exception:
+            if engine == 'postgresql':
+                pg_conn.rollback()
+            stats.read_errors += 1
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+        if 'db' in timing:
+            db_reads += 1
+            db_time += timing['db']
+
+    return {
+        'latencies': latencies,
+        'db_reads': db_reads,
+        'db_time_s': db_time,
+        'writes': sum(1 for request in stream if request[0] == 'write'),
+        'write_aborts': stats.aborts,
+        'read_errors': stats.read_errors,
+        'cache': cache.stats() if cache is not None else None,
+    }
+
+
+def _fmt(value, fmt="{:.2f}ms"):
+    return "N/A" if value is None else fmt.format(value)
+
+
+def print_report(runs):
+    rows = []
+    for run in runs:
+        baseline = next((other for other in runs if other['engine'] == run['engine'] and other['cache'] is None), None)
+        cache = run['cache']
+        removed = None
+        if cache is not None and baseline and baseline['db_time_s']:
+            removed = 1 - run['db_time_s'] / baseline['db_time_s']
+        rows.append([
+            run['engine'],
+            'on' if cache is not None else 'off',
+            len(run['latencies']),
+            _fmt(cache['hit_ratio'] if cache else None, "{:.1%}"),
+            _fmt(percentile(run['latencies'], 50)),
+            _fmt(percentile(run['latencies'], 99)),
+            run['db_reads'],
+            f"{run['db_time_s']:.2f}s",
+            _fmt(removed, "{:.1%}"),
+            run['writes'],
+            cache['evictions'] if cache else "N/A",
+            cache['expirations'] if cache else "N/A",
+            cache['invalidations'] if cache else "N/A",
+            _fmt(cache['bytes'] / (1024 * 1024) if cache else None, "{:.1f}MB"),
+            run['read_errors'],
+        ])
+    print("\n=== Result Cache ===")
+    print(tabulate(rows, headers=["Engine", "Cache", "Reads", "Hit Ratio", "Read p50", "Read p99", "DB Reads",
+                                  "DB Read Time", "DB Load Removed", "Writes", "Evictions", "Expirations",
+                                  "Invalidations", "Cache Size", "Read Errors"], tablefmt="grid"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a request stream with and without an in-process result cache')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES, help='Engines to benchmark (default: both)')
+    parser.add_argument('--requests', type=int, default=5000, help='Requests in the replayed stream (default: 5000)')
+    parser.add_argument('--write-ratio', type=float, default=0.01, help='Fraction of requests that are writes (default: 0.01)')
+    parser.add_argument('--reviews-per-write', type=int, default=1, help='Reviews inserted per write request (default: 1)')
+    parser.add_argument('--queries', nargs='+', help='Read queries (default: all queries of --classes)')
+    parser.add_argument('--classes', nargs='+', choices=list(QUERY_CLASSES), default=DEFAULT_CLASSES,
+                        help=f"Query classes used for reads (default: {' '.join(DEFAULT_CLASSES)})")
+    parser.add_argument('--cache-entries', type=int, default=10000, help='Maximum cached results (default: 10000)')
+    parser.add_argument('--cache-mb', type=float, default=64, help='Maximum cache size in MB (default: 64)')
+    parser.add_argument('--ttl', type=float, default=60, help='Seconds a cached result stays valid; 0 disables (default: 60)')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='zipf', help='Read parameter distribution (default: zipf)')
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent for read parameters (default: 1.0)')
+    parser.add_argument('--pool-size', type=int, default=1000, help='Distinct values per read parameter source (default: 1000)')
+    parser.add_argument('--max-retries', type=int, default=3, help='PostgreSQL retries of a deadlocked write (default: 3)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    args = parser.parse_args()
+
+    if not 0 <= args.write_ratio <= 1:
+        parser.error("--write-ratio must be between 0 and 1")
+    read_queries = [name for name in (args.queries or list(QUERIES))
+                    if name in QUERIES and (args.queries or QUERIES[name].get('class') in args.classes)]
+    if not read_queries:
+        parser.error("No read queries selected")
+
+    pg_conn, mongo_db, mongo_client = init_connections()
+    try:
+        leftover = load_snapshot()
+        if leftover:
+            print("Cleaning up rows left by a previous run...")
+            cleanup(pg_conn, mongo_db, leftover)
+            os.remove(SNAPSHOT_PATH)
+
+        print("Building the request stream...")
+        writer = WriteGenerator(pg_conn, 'zipf', args.skew, args.seed, args.pool_size)
+        stream = build_stream(pg_conn, read_queries, writer, args)
+        use_transactions = 'mongodb' in args.engines and transactions_supported(mongo_client)
+
+        snapshot = save_snapshot(pg_conn, mongo_db, writer.business_ids())
+        runs = []
+        try:
+            for engine in args.engines:
+                for cached in (False, True):
+                    cache = ResultCache(args.cache_entries, int(args.cache_mb * 1024 * 1024), args.ttl) if cached else None
+                    print(f"{engine}: replaying {len(stream)} requests {'with' if cached else 'without'} the cache...")
+                    run = replay(engine, stream, pg_conn, mongo_db, cache, args.max_retries, use_transactions)
+                    run['engine'] = engine
+                    runs.append(run)
+                    # Replay every pass against the same data
+                    cleanup(pg_conn, mongo_db, snapshot)
+        finally:
+            cleanup(pg_conn, mongo_db, snapshot)
+            os.remove(SNAPSHOT_PATH)
+
+        print_report(runs)
+    finally:
+        close_connections(pg_conn, mongo_client)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+In-process vectorized columnar engine.
+
+The businesses, users and reviews tables are loaded from PostgreSQL into typed
+NumPy column arrays:
+
+- low-cardinality strings (city, state, string attributes) are dictionary
+  encoded: an int32 code column plus a dictionary of distinct values, so
+  predicates are evaluated once per distinct value and then matched on codes
+- categories are a dictionary-encoded list column (offsets + codes)
+- boolean attributes ('True'/'False') are packed bitmaps, one bit per business
+- reviews reference businesses and users by row position instead of id and are
+  clustered by business, so a business's reviews are one contiguous slice
+
+Queries in queries/benchmark_queries.py may define a `vectorized(store, params)`
+implementation over a ColumnarStore; benchmark.py --columnar times them next
+to PostgreSQL and MongoDB.
+"""
+import json
+import re
+import time
+import tracemalloc
+
+import numpy as np
+
+CHUNK_ROWS = 100000
+
+BUSINESS_COLUMNS = "business_id, name, city, state, stars, review_count, is_open, categories, attributes, hours"
+USER_COLUMNS = "user_id, name, review_count, fans, average_stars, yelping_since"
+REVIEW_COLUMNS = "review_id, business_id, user_id, stars, date, useful"
+
+
+class DictionaryColumn:
+    """Dictionary-encoded column: int32 codes into an array of distinct values (-1 for NULL)"""
+
+    def __init__(self, values):
+        index = {}
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if value is None:
+                codes[i] = -1
+            else:
+                codes[i] = index.setdefault(value, len(index))
+        self.codes = codes
+        self.dictionary = np.array(list(index), dtype=object)
+        self._index = index
+
+    def code(self, value):
+        return self._index.get(value, -2)
+
+    def eq(self, value):
+        return self.codes == self.code(value)
+
+    def matching(self, predicate):
+        """Rows whose value satisfies `predicate`, evaluated once per dictionary entry"""
+        codes = np.array([code for code, value in enumerate(self.dictionary) if predicate(value)], dtype=np.int32)
+        return np.isin(self.codes, codes)
+
+    def decode(self, rows):
+        codes = self.codes[rows]
+        return np.where(codes >= 0, self.dictionary[np.maximum(codes, 0)], None)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + sum(len(str(value)) for value in self.dictionary)
+
+
+class ListColumn:
+    """Dictionary-encoded multi-valued column: row i holds codes[offsets[i]:offsets[i + 1]]"""
+
+    def __init__(self, lists):
+        index = {}
+        offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+        codes = []
+        for i, values in enumerate(lists):
+            for value in values:
+                codes.append(index.setdefault(value, len(index)))
+            offsets[i + 1] = len(codes)
+        self.offsets = offsets
+        self.codes = np.array(codes, dtype=np.int32)
+        self.dictionary = np.array(list(index), dtype=object)
+        self.rows = np.repeat(np.arange(len(lists), dtype=np.int32), np.diff(offsets))
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.codes.nbytes + self.rows.nbytes + sum(len(v) for v in self.dictionary)
+
+
+class Bitmap:
+    """Packed boolean column"""
+
+    def __init__(self, mask):
+        self.size = len(mask)
+        self.bits = np.packbits(np.asarray(mask, dtype=bool))
+
+    def mask(self):
+        return np.unpackbits(self.bits, count=self.size).astype(bool)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+
+def _object_array(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _datetimes(values):
+    return np.array([np.datetime64(value, 's') if value is not None else np.datetime64('NaT') for value in values],
+                    dtype='datetime64[s]')
+
+
+def _numbers(values, dtype, missing=0):
+    return np.array([missing if value is None else value for value in values], dtype=dtype)
+
+
+def _open_hour(hours):
+    """Opening hour on Friday from a 'H:M-H:M' string, -1 when closed or unknown"""
+    friday = (hours or {}).get('Friday')
+    if not friday:
+        return -1
+    try:
+        return int(friday.split('-')[0].split(':')[0])
+    except ValueError:
+        return -1
+
+
+def datetime64(value):
+    return np.datetime64(str(value)[:19].replace(' ', 'T'), 's')
+
+
+class ColumnarStore:
+    """Typed, dictionary-encoded columns of the businesses, users and reviews tables"""
+
+    def __init__(self):
+        self.businesses = {}
+        self.users = {}
+        self.reviews = {}
+        self.business_index = {}
+        self.user_index = {}
+        self.review_offsets = None
+        self.load_times = {}
+
+    # --- Loading ------------------------------------------------------------
+
+    @classmethod
+    def load(cls, pg_conn, chunk_rows=CHUNK_ROWS):
+        store = cls()
+        for table, load in (('businesses', store._load_businesses), ('users', store._load_users),
+                            ('reviews', store._load_reviews)):
+            start = time.perf_counter()
+            load(pg_conn, chunk_rows)
+            store.load_times[table] = time.perf_counter() - start
+        pg_conn.commit()
+        return store
+
+    @staticmethod
+    def _fetch(pg_conn, sql, converters, chunk_rows):
+        """Column arrays of every row of `sql`, fetched through a server-side cursor and converted chunk by chunk"""
+        cur = pg_conn.cursor(name='columnar_load', withhold=pg_conn.autocommit)
+        cur.itersize = chunk_rows
+        try:
+            cur.execute(sql)
+            chunks = [[] for _ in converters]
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                for chunk, convert, values in zip(chunks, converters, zip(*rows)):
+                    chunk.append(convert(list(values)))
+            return [np.concatenate(chunk) if chunk else convert([]) for chunk, convert in zip(chunks, converters)]
+        finally:
+            cur.close()
+
+    def _load_businesses(self, pg_conn, chunk_rows):
+        (ids, names, cities, states, stars, review_counts, is_open, categories, attributes, hours) = self._fetch(
+            pg_conn, f"SELECT {BUSINESS_COLUMNS} FROM businesses",
+            [_object_array, _object_array, _object_array, _object_array, lambda v: _numbers(v, np.float32, np.nan),
+             lambda v: _numbers(v, np.int32), lambda v: _numbers(v, np.int8), _object_array, _object_array,
+             _object_array], chunk_rows)
+        self.business_index = {business_id: i for i, business_id in enumerate(ids)}
+        attributes = [value if isinstance(value, dict) else json.loads(value) if value else {} for value in attributes]
+        hours = [value if isinstance(value, dict) else json.loads(value) if value else {} for value in hours]
+
+        self.businesses = {
+            'business_id': ids,
+            'name': names,
+            'city': DictionaryColumn(cities),
+            'state': DictionaryColumn(states),
+            'stars': stars,
+            'review_count': review_counts,
+            'is_open': is_open,
+            'categories': ListColumn([[c.strip() for c in value.split(',') if c.strip()] if value else []
+                                      for value in categories]),
+            'friday_open_hour': np.array([_open_hour(value) for value in hours], dtype=np.int8),
+            'attributes': {},
+        }
+
+        keys = sorted({key for value in attributes for key in value})
+        for key in keys:
+            values = [value.get(key) for value in attributes]
+            present = {value for value in values if value is not None}
+            if present <= {'True', 'False'}:
+                self.businesses['attributes'][key] = Bitmap([value == 'True' for value in values])
+            else:
+                self.businesses['attributes'][key] = DictionaryColumn(
+                    [value if value is None or isinstance(value, str) else json.dumps(value) for value in values])
+
+    def _load_users(self, pg_conn, chunk_rows):
+        ids, names, review_counts, fans, average_stars, yelping_since = self._fetch(
+            pg_conn, f"SELECT {USER_COLUMNS} FROM users",
+            [_object_array, _object_array, lambda v: _numbers(v, np.int32), lambda v: _numbers(v, np.int32),
+             lambda v: _numbers(v, np.float32, np.nan), _datetimes], chunk_rows)
+        self.user_index = {user_id: i for i, user_id in enumerate(ids)}
+        self.users = {
+            'user_id': ids,
+            'name': names,
+            'review_count': review_counts,
+            'fans': fans,
+            'average_stars': average_stars,
+            'yelping_since': yelping_since,
+        }
+
+    def _load_reviews(self, pg_conn, chunk_rows):
+        # Ids are replaced by row positions while fetching, so only the encoded chunks are kept
+        review_ids, business_rows, user_rows, stars, dates, useful = self._fetch(
+            pg_conn, f"SELECT {REVIEW_COLUMNS} FROM reviews",
+            [lambda v: np.array(v, dtype='S22'),
+             lambda v: np.array([self.business_index.get(value, -1) for value in v], dtype=np.int32),
+             lambda v: np.array([self.user_index.get(value, -1) for value in v], dtype=np.int32),
+             lambda v: _numbers(v, np.int8), _datetimes, lambda v: _numbers(v, np.int32)], chunk_rows)
+        # Cluster by business so each business's reviews are one contiguous slice
+        order = np.argsort(business_rows, kind='stable')
+        self.reviews = {
+            'review_id': review_ids[order],
+            'business': business_rows[order],
+            'user': user_rows[order],
+            'stars': stars[order],
+            'date': dates[order],
+            'useful': useful[order],
+        }
+        self.review_offsets = np.searchsorted(self.reviews['business'],
+                                              np.arange(len(self.business_index) + 1, dtype=np.int32))
+
+    # --- Access helpers -----------------------------------------------------
+
+    def business_row(self, business_id):
+        return self.business_index.get(business_id)
+
+    def business_reviews(self, business_id):
+        """Slice of the review columns belonging to one business"""
+        row = self.business_row(business_id)
+        if row is None:
+            return slice(0, 0)
+        return slice(self.review_offsets[row], self.review_offsets[row + 1])
+
+    def city_mask(self, city, state):
+        return self.businesses['city'].eq(city) & self.businesses['state'].eq(state)
+
+    def attribute_true(self, name):
+        column = self.businesses['attributes'].get(name)
+        if isinstance(column, Bitmap):
+            return column.mask()
+        if isinstance(column, DictionaryColumn):
+            return column.eq('True')
+        return np.zeros(len(self.business_index), dtype=bool)
+
+    def attribute_matching(self, name, predicate):
+        column = self.businesses['attributes'].get(name)
+        if isinstance(column, DictionaryColumn):
+            return column.matching(predicate)
+        if isinstance(column, Bitmap):
+            mask = column.mask()
+            return np.where(mask, predicate('True'), predicate('False'))
+        return np.zeros(len(self.business_index), dtype=bool)
+
+    def category_mask(self, pattern):
+        """Businesses with a category matching a case-insensitive regular expression"""
+        categories = self.businesses['categories']
+        regex = re.compile(pattern, re.IGNORECASE)
+        codes = np.array([code for code, value in enumerate(categories.dictionary) if regex.search(value)],
+                         dtype=np.int32)
+        mask = np.zeros(len(self.business_index), dtype=bool)
+        mask[categories.rows[np.isin(categories.codes, codes)]] = True
+        return mask
+
+    # --- Footprint ----------------------------------------------------------
+
+    def memory_bytes(self):
+        """Bytes held by the column arrays (object columns count their pointers only)"""
+        def size(column):
+            if isinstance(column, dict):
+                return sum(size(value) for value in column.values())
+            return column.nbytes
+
+        total = size(self.businesses) + size(self.users) + size(self.reviews)
+        return total + (self.review_offsets.nbytes if self.review_offsets is not None else 0)
+
+
+def run_vectorized(store, query_info, params):
+    """Run a query's vectorized implementation; return its timing, row count and peak temporary memory.
+
+    The query runs once untimed under tracemalloc to measure memory, then once timed without it.
+    """
+    try:
+        tracemalloc.start()
+        try:
+            query_info['vectorized'](store, params)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        start = time.perf_counter()
+        rows = query_info['vectorized'](store, params)
+        elapsed = (time.perf_counter() - start) * 1000
+    except Exception as e:
+        return {'error': str(e)}
+    return {'execution_time_ms': elapsed, 'rows': len(rows), 'peak_memory_bytes': peak}
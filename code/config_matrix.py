@@ -0,0 +1,192 @@
+"""
+Benchmark every query under each named server configuration profile.
+
+For each profile in server_configs.yaml the PostgreSQL settings and MongoDB
+parameters are applied (restarting the PostgreSQL container for settings
+such as shared_buffers), warm-up runs refill the caches, and the selected
+queries are rerun. The result is each query's median latency per profile on
+both engines, the best profile per query, and the geometric mean per profile.
+The default profile is restored when done.
+"""
+import argparse
+import csv
+import os
+
+import functools
+print = functools.partial(print, flush=True)
+
+from tabulate import tabulate
+
+from benchmark import (init_connections, close_connections, run_benchmark, get_timestamp_str, geometric_mean,
+                       GEOMEAN_FLOOR_MS, QUERIES, QUERY_CLASSES)
+from db_pool import put_pg_connection, close_pg_pool, get_pg_connection
+from index_matrix import ENGINES, median_or_none, format_cell
+from server_config import (load_server_profiles, list_server_profiles, managed_settings, apply_postgres_profile,
+                           apply_mongo_profile, mongo_parameter_defaults, restart_postgres, describe_applied,
+                           DEFAULT_PROFILE)
+
+
+def apply_profile(profile, pg_conn, mongo_client, managed, mongo_defaults, allow_restart=True):
+    """Apply a profile to both engines, restarting PostgreSQL if needed.
+
+    Returns the (possibly new) PostgreSQL connection and how the profile was
+    applied, or None as the latter when it needs a restart that is not allowed.
+    """
+    applied = apply_postgres_profile(pg_conn, profile, managed['postgres'])
+    restart_s = None
+    if applied['pending_restart']:
+        if not allow_restart:
+            print(f"  Skipping: {', '.join(applied['pending_restart'])} need a server restart (--no-restart)")
+            return pg_conn, None
+        put_pg_connection(pg_conn, close=True)
+        close_pg_pool()
+        restart_s = restart_postgres()
+        pg_conn = get_pg_connection()
+        # Session settings were lost with the old connection
+        applied = apply_postgres_profile(pg_conn, profile, managed['postgres'])
+    mongo = apply_mongo_profile(mongo_client, profile, mongo_defaults)
+    print(describe_applied(applied, mongo))
+    return pg_conn, {'postgres': applied, 'mongo': mongo, 'restart_s': restart_s}
+
+
+def time_queries(query_names, pg_conn, mongo_db, iterations, warmup):
+    """Median execution time of each query per engine, after `warmup` discarded runs"""
+    timings = {}
+    for query_name in query_names:
+        for _ in range(warmup):
+            run_benchmark(query_name, pg_conn, mongo_db)
+        samples = {engine: [] for engine, _, _ in ENGINES}
+        for _ in range(iterations):
+            result = run_benchmark(query_name, pg_conn, mongo_db)
+            for engine, _, get_time in ENGINES:
+                samples[engine].append(get_time(result[engine]))
+        timings[query_name] = {engine: median_or_none(values) for engine, values in samples.items()}
+    return timings
+
+
+def best_profile(runs, query_name, engine):
+    timed = [(run['timings'][query_name][engine], run['profile']) for run in runs
+             if run['timings'][query_name][engine] is not None]
+    return min(timed) if timed else (None, None)
+
+
+def print_matrix(runs, query_names, baseline):
+    base_run = next((run for run in runs if run['profile'] == baseline), runs[0])
+
+    for engine, label, _ in ENGINES:
+        rows = []
+        for query_name in query_names:
+            baseline_ms = base_run['timings'][query_name][engine]
+            best_ms, best_name = best_profile(runs, query_name, engine)
+            rows.append([query_name] +
+                        [format_cell(run['timings'][query_name][engine], baseline_ms) for run in runs] +
+                        ["N/A" if best_name is None else f"{best_name}: {format_cell(best_ms, baseline_ms)}"])
+        print(f"\n=== {label} latency per server profile (speedup vs '{base_run['profile']}') ===")
+        print(tabulate(rows, headers=["Query"] + [run['profile'] for run in runs] + ["Best"], tablefmt="grid"))
+
+    rows = []
+    for run in runs:
+        row = [run['profile']]
+        for engine, _, _ in ENGINES:
+            times = [run['timings'][query_name][engine] for query_name in query_names]
+            geomean = geometric_mean(times, GEOMEAN_FLOOR_MS[engine])
+            wins = sum(1 for query_name in query_names if best_profile(runs, query_name, engine)[1] == run['profile'])
+            row += ["N/A" if geomean is None else f"{geomean:.2f}ms", wins]
+        restart_s = run['applied']['restart_s']
+        row.append("-" if restart_s is None else f"{restart_s:.1f}s")
+        rows.append(row)
+    headers = ["Profile"]
+    for _, label, _ in ENGINES:
+        headers += [f"{label} Geomean", f"{label} Best For"]
+    print("\n=== Server Profile Summary ===")
+    print(tabulate(rows, headers=headers + ["Restart"], tablefmt="grid"))
+
+
+def save_matrix_csv(runs, query_names, results_dir):
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"config_matrix_{get_timestamp_str()}.csv")
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Profile", "Engine", "Query", "Execution Time (ms)", "Settings"])
+        for run in runs:
+            for engine, label, _ in ENGINES:
+                if engine == 'postgresql':
+                    applied = {**run['applied']['postgres']['session'], **run['applied']['postgres']['system']}
+                else:
+                    applied = run['applied']['mongo']
+                settings = ";".join(f"{key}={value}" for key, value in applied.items())
+                for query_name in query_names:
+                    writer.writerow([run['profile'], label, query_name, run['timings'][query_name][engine], settings])
+    return path
+
+
+def main():
+    profiles = load_server_profiles()
+
+    parser = argparse.ArgumentParser(description='Benchmark queries under each server configuration profile')
+    parser.add_argument('--profiles', nargs='+', default=list(profiles),
+                        help='Server profiles to benchmark (default: all)')
+    parser.add_argument('--baseline', default=DEFAULT_PROFILE,
+                        help='Profile speedups are relative to (default: default)')
+    parser.add_argument('--list-profiles', action='store_true', help='List the server profiles and exit')
+    parser.add_argument('--queries', nargs='+', help='Specific queries to run (default: all)')
+    parser.add_argument('--classes', nargs='+', choices=list(QUERY_CLASSES), help='Only run queries of these classes')
+    parser.add_argument('--iterations', type=int, default=3, help='Runs per query; the median is reported (default: 3)')
+    parser.add_argument('--warmup', type=int, default=1,
+                        help='Discarded runs per query after applying a profile, to refill the caches (default: 1)')
+    parser.add_argument('--no-restart', action='store_true',
+                        help='Skip profiles whose PostgreSQL settings need a server restart')
+    parser.add_argument('--results-dir', type=str, default=None, help='Directory to save results (default: ./results)')
+    args = parser.parse_args()
+
+    if args.list_profiles:
+        list_server_profiles()
+        return
+
+    unknown = [name for name in args.profiles + [args.baseline] if name not in profiles]
+    if unknown:
+        parser.error(f"Unknown server profile(s): {', '.join(unknown)}")
+
+    profile_names = list(args.profiles)
+    if args.baseline not in profile_names:
+        profile_names.insert(0, args.baseline)
+
+    query_names = [name for name in (args.queries or list(QUERIES)) if name in QUERIES]
+    if args.classes:
+        query_names = [name for name in query_names if QUERIES[name].get('class') in args.classes]
+    if not query_names:
+        print("No benchmark queries to run")
+        return
+
+    # Settings of every profile, so that each one starts from the defaults of the others
+    managed = managed_settings(profiles)
+    pg_conn, mongo_db, mongo_client = init_connections()
+    mongo_defaults = mongo_parameter_defaults(mongo_client, managed['mongo'])
+    try:
+        runs = []
+        for name in profile_names:
+            print(f"\n=== Server profile: {name} ===")
+            pg_conn, applied = apply_profile(profiles[name], pg_conn, mongo_client, managed, mongo_defaults,
+                                             allow_restart=not args.no_restart)
+            if applied is None:
+                continue
+            runs.append({
+                'profile': name,
+                'applied': applied,
+                'timings': time_queries(query_names, pg_conn, mongo_db, args.iterations, args.warmup),
+            })
+
+        if runs:
+            print_matrix(runs, query_names, args.baseline)
+            results_dir = args.results_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+            path = save_matrix_csv(runs, query_names, results_dir)
+            print(f"\nConfiguration matrix saved to {path}")
+    finally:
+        print(f"\nRestoring server profile '{DEFAULT_PROFILE}'...")
+        pg_conn, _ = apply_profile(profiles[DEFAULT_PROFILE], pg_conn, mongo_client, managed, mongo_defaults,
+                                   allow_restart=not args.no_restart)
+        close_connections(pg_conn, mongo_client)
+
+
+if __name__ == "__main__":
+    main()
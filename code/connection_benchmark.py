@@ -0,0 +1,188 @@
+"""
+Connection cost benchmark: pooled vs unpooled connections.
+
+Two measurements per engine:
+
+- setup/teardown: opening and closing a fresh connection (psycopg2.connect +
+  close; a new MongoClient + ping + close) against taking one from the shared
+  pool and returning it (ThreadedConnectionPool getconn/putconn; ping on the
+  shared MongoClient).
+- per-query latency at several concurrency levels: each thread runs the
+  selected queries either on a connection opened just for that query
+  (unpooled) or on one borrowed from the shared pool (pooled). Latency
+  includes acquiring and releasing the connection.
+
+Pool sizes and MongoDB client options come from db_config (see db_pool.py).
+"""
+import argparse
+import statistics
+import threading
+import time
+import functools
+print = functools.partial(print, flush=True)
+
+import psycopg2
+from pymongo import MongoClient
+from tabulate import tabulate
+
+from db_config import PG_PARAMS, get_mongo_uri, DEFAULT_DB_NAME
+from db_pool import get_pg_pool, get_pg_connection, put_pg_connection, get_mongo_client, mongo_client_options
+from benchmark import init_connections, close_connections, resolve_params, percentile, QUERIES, QUERY_CLASSES
+
+ENGINES = ['postgresql', 'mongodb']
+MODES = ['unpooled', 'pooled']
+
+
+# --- Setup/teardown ---------------------------------------------------------
+
+def pg_connect_cost(pooled):
+    start = time.perf_counter()
+    if pooled:
+        put_pg_connection(get_pg_connection())
+    else:
+        psycopg2.connect(**PG_PARAMS).close()
+    return (time.perf_counter() - start) * 1000
+
+
+def mongo_connect_cost(pooled):
+    # A new MongoClient connects lazily, so ping to include the handshake
+    start = time.perf_counter()
+    if pooled:
+        get_mongo_client().admin.command('ping')
+    else:
+        client = MongoClient(get_mongo_uri(), **mongo_client_options())
+        client.admin.command('ping')
+        client.close()
+    return (time.perf_counter() - start) * 1000
+
+
+def measure_setup(engine, mode, iterations):
+    cost = pg_connect_cost if engine == 'postgresql' else mongo_connect_cost
+    cost(mode == 'pooled')
+    return [cost(mode == 'pooled') for _ in range(iterations)]
+
+
+# --- Per-query latency ------------------------------------------------------
+
+def run_pg_query(query_info, params, pooled):
+    conn = get_pg_connection() if pooled else psycopg2.connect(**PG_PARAMS)
+    try:
+        cur = conn.cursor()
+        cur.execute(query_info['pg'], params)
+        cur.fetchall()
+        cur.close()
+        conn.commit()
+    finally:
+        if pooled:
+            put_pg_connection(conn)
+        else:
+            conn.close()
+
+
+def run_mongo_query(query_info, params, pooled):
+    if pooled:
+        query_info['mongo'](get_mongo_client()[DEFAULT_DB_NAME], params)
+        return
+    client = MongoClient(get_mongo_uri(), **mongo_client_options())
+    try:
+        query_info['mongo'](client[DEFAULT_DB_NAME], params)
+    finally:
+        client.close()
+
+
+def query_worker(engine, mode, queries, count, latencies, errors):
+    run = run_pg_query if engine == 'postgresql' else run_mongo_query
+    for i in range(count):
+        query_info, params = queries[i % len(queries)]
+        start = time.perf_counter()
+        try:
+            run(query_info, params, mode == 'pooled')
+        except Exception:
+            errors.append(1)
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def measure_queries(engine, mode, queries, threads, per_thread):
+    """Run `per_thread` queries on each of `threads` threads; return (latencies, errors, elapsed seconds)"""
+    latencies, errors = [], []
+    workers = [threading.Thread(target=query_worker, args=(engine, mode, queries, per_thread, latencies, errors))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies, len(errors), time.perf_counter() - start
+
+
+# --- Reporting --------------------------------------------------------------
+
+def _fmt(value):
+    return "N/A" if value is None else f"{value:.2f}ms"
+
+
+def print_setup_results(rows):
+    print("\n=== Connection Setup/Teardown ===")
+    table = []
+    for engine, mode, costs in rows:
+        table.append([engine, mode, len(costs), _fmt(statistics.mean(costs) if costs else None),
+                      _fmt(percentile(costs, 50)), _fmt(percentile(costs, 99))])
+    print(tabulate(table, headers=["Engine", "Mode", "Samples", "Mean", "p50", "p99"], tablefmt="grid"))
+
+
+def print_query_results(rows):
+    print("\n=== Per-Query Latency ===")
+    table = []
+    for engine, mode, threads, latencies, errors, elapsed in rows:
+        table.append([engine, mode, threads, f"{len(latencies) / elapsed:.1f}" if elapsed else "N/A",
+                      _fmt(percentile(latencies, 50)), _fmt(percentile(latencies, 95)),
+                      _fmt(percentile(latencies, 99)), errors])
+    print(tabulate(table, headers=["Engine", "Mode", "Threads", "Queries/s", "p50", "p95", "p99", "Errors"],
+                   tablefmt="grid"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare pooled and unpooled connection costs on PostgreSQL and MongoDB')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES, help='Engines to benchmark (default: both)')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES, help='Connection modes (default: both)')
+    parser.add_argument('--setup-iterations', type=int, default=100,
+                        help='Connections opened and closed per engine and mode (default: 100)')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16],
+                        help='Concurrency levels for the per-query measurement (default: 1 4 16)')
+    parser.add_argument('--queries-per-thread', type=int, default=50, help='Queries run by each thread (default: 50)')
+    parser.add_argument('--queries', nargs='+', help='Queries to run (default: all queries of --classes)')
+    parser.add_argument('--classes', nargs='+', choices=list(QUERY_CLASSES), default=['point_lookup'],
+                        help='Query classes to run (default: point_lookup)')
+    args = parser.parse_args()
+
+    names = [name for name in (args.queries or list(QUERIES))
+             if name in QUERIES and (args.queries or QUERIES[name].get('class') in args.classes)]
+    if not names:
+        parser.error("No queries selected")
+
+    # The pool must hold a connection per thread plus the one used to resolve parameters
+    get_pg_pool(maxconn=max(args.threads) + 1)
+    pg_conn, _, mongo_client = init_connections()
+    try:
+        queries = [(QUERIES[name], resolve_params(pg_conn, QUERIES[name])) for name in names]
+    finally:
+        close_connections(pg_conn, mongo_client)
+    print(f"Queries: {', '.join(names)}")
+
+    setup_rows, query_rows = [], []
+    for engine in args.engines:
+        for mode in args.modes:
+            print(f"Measuring {engine} {mode} connection setup...")
+            setup_rows.append((engine, mode, measure_setup(engine, mode, args.setup_iterations)))
+            for threads in args.threads:
+                print(f"Running {engine} {mode} queries with {threads} thread(s)...")
+                query_rows.append((engine, mode, threads,
+                                   *measure_queries(engine, mode, queries, threads, args.queries_per_thread)))
+
+    print_setup_results(setup_rows)
+    print_query_results(query_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+Input layer for the dataset loaders.
+
+The Yelp dataset can be read from:
+
+- a directory of the extracted JSON files, each optionally compressed as
+  <name>.json.gz or <name>.json.zst (zst needs the zstandard package)
+- the Yelp download itself, yelp_dataset.tar, or a gzip-compressed .tar.gz/.tgz
+
+Given a line_index.ScaleSample, only the sampled lines of the plain .json
+files are read (see line_index.py).
+
+DatasetInput.open(table) returns a RecordStream, an iterable of the table's
+JSON lines as bytes. A reader thread reads and decompresses the input in
+chunks, one chunk ahead of the parser (zlib and zstd release the GIL while
+decompressing), and the stream tracks where the time went:
+
+- io_s: time spent reading the raw (compressed) bytes
+- decompress_s: time spent decompressing them
+- starved_s: time the loader waited for the reader thread
+- backpressure_s: time the reader thread waited for the loader
+- scan_s: for tarballs, time spent walking the archive to the table's member
+  before streaming it (counted as I/O, decompression and loader waiting time)
+
+A load that mostly waits for its input is input-bound (I/O- or
+decompression-bound, whichever dominates the reader's time); otherwise it is
+bound by parsing and inserting on the loader side.
+"""
+import gzip
+import os
+import queue
+import tarfile
+import threading
+import time
+
+DEFAULT_INPUT = './data/yelp_dataset/'
+DATASET_FILES = {
+    'businesses': 'yelp_academic_dataset_business.json',
+    'users': 'yelp_academic_dataset_user.json',
+    'reviews': 'yelp_academic_dataset_review.json',
+    'tips': 'yelp_academic_dataset_tip.json',
+    'checkins': 'yelp_academic_dataset_checkin.json',
+}
+COMPRESSED_FORMATS = ('json.gz', 'json.zst', 'tar.gz')
+CHUNK_SIZE = 1024 * 1024
+QUEUE_CHUNKS = 8
+# Fraction of the elapsed time the loader must spend waiting for input to call the load input-bound
+INPUT_BOUND_THRESHOLD = 0.25
+
+
+class TimedReader:
+    """File wrapper that counts the bytes read and the time spent reading them"""
+
+    def __init__(self, f):
+        self.f = f
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def read(self, size=-1):
+        start = time.perf_counter()
+        data = self.f.read(size)
+        self.seconds += time.perf_counter() - start
+        self.bytes += len(data)
+        return data
+
+    def readinto(self, buffer):
+        start = time.perf_counter()
+        count = self.f.readinto(buffer)
+        self.seconds += time.perf_counter() - start
+        self.bytes += count or 0
+        return count
+
+    def seek(self, *args):
+        return self.f.seek(*args)
+
+    def tell(self):
+        return self.f.tell()
+
+    def seekable(self):
+        return self.f.seekable()
+
+    def readable(self):
+        return True
+
+    def close(self):
+        self.f.close()
+
+
+class MemberInput:
+    """Raw-input counters of one tar member: member bytes for progress, archive reads for I/O time.
+
+    The archive counters start from before the walk to the member, whose
+    wall time is kept as scan_s.
+    """
+
+    def __init__(self, member_reader, archive, seconds_before=0.0, bytes_before=0, scan_s=0.0):
+        self.member_reader = member_reader
+        self.archive = archive
+        self._seconds_before = seconds_before
+        self._bytes_before = bytes_before
+        self.scan_s = scan_s
+
+    @property
+    def bytes(self):
+        return self.member_reader.bytes
+
+    @property
+    def seconds(self):
+        return self.archive.seconds - self._seconds_before
+
+    @property
+    def archive_bytes(self):
+        return self.archive.bytes - self._bytes_before
+
+
+def _zstd_reader(raw):
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Reading .zst input requires the zstandard package (pip install zstandard)")
+    return zstandard.ZstdDecompressor().stream_reader(raw, read_size=CHUNK_SIZE)
+
+
+class RecordStream:
+    """Lines of one dataset file, read and decompressed by a background thread"""
+
+    def __init__(self, table, source, fmt, total, raw, reader, closers=()):
+        self.table = table
+        self.source = source
+        self.format = fmt
+        # Progress is measured in bytes of `raw` (the file on disk, or the tar member)
+        self.total = total
+        self.raw = raw
+        self.reader = reader
+        self._closers = closers
+        self.decompressed_bytes = 0
+        self.read_s = 0.0
+        self.starved_s = 0.0
+        self.backpressure_s = 0.0
+        self._queue = queue.Queue(maxsize=QUEUE_CHUNKS)
+        self._stop = threading.Event()
+        self._start = time.perf_counter()
+        self._elapsed = None
+        self._thread = threading.Thread(target=self._produce, name=f"read-{table}", daemon=True)
+        self._thread.start()
+
+    @property
+    def position(self):
+        return self.raw.bytes
+
+    def _put(self, item):
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self.backpressure_s += time.perf_counter() - start
+
+    def _produce(self):
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                chunk = self.reader.read(CHUNK_SIZE)
+                self.read_s += time.perf_counter() - start
+                if not chunk:
+                    break
+                self.decompressed_bytes += len(chunk)
+                self._put(chunk)
+        except Exception as e:
+            self._put(e)
+        finally:
+            self._put(None)
+
+    def __iter__(self):
+        pending = b''
+        while True:
+            start = time.perf_counter()
+            chunk = self._queue.get()
+            self.starved_s += time.perf_counter() - start
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield line
+        if pending.strip():
+            yield pending
+        self._elapsed = time.perf_counter() - self._start
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        for close in self._closers:
+            close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def stats(self):
+        """Where the time went reading this input, and what bounds the load"""
+        # The walk to a tar member ran before streaming started, with the loader waiting on it
+        scan_s = getattr(self.raw, 'scan_s', 0.0)
+        elapsed = (self._elapsed if self._elapsed is not None else time.perf_counter() - self._start) + scan_s
+        starved_s = self.starved_s + scan_s
+        io_s = self.raw.seconds
+        decompress_s = max(self.read_s + scan_s - io_s, 0.0) if self.format in COMPRESSED_FORMATS else 0.0
+        input_bytes = getattr(self.raw, 'archive_bytes', self.raw.bytes)
+        if elapsed > 0 and starved_s / elapsed >= INPUT_BOUND_THRESHOLD:
+            bound = 'io' if io_s >= decompress_s else 'decompression'
+        else:
+            bound = 'loader'
+        return {
+            'source': self.source,
+            'format': self.format,
+            'input_bytes': input_bytes,
+            'decompressed_bytes': self.decompressed_bytes,
+            'compression_ratio': round(self.decompressed_bytes / input_bytes, 2) if input_bytes else None,
+            'elapsed_s': round(elapsed, 3),
+            'io_s': round(io_s, 3),
+            'decompress_s': round(decompress_s, 3),
+            'starved_s': round(starved_s, 3),
+            'backpressure_s': round(self.backpressure_s, 3),
+            'scan_s': round(scan_s, 3),
+            'bound': bound,
+        }
+
+
+class DatasetInput:
+    """The Yelp dataset as a directory of (optionally compressed) JSON files or a tarball"""
+
+    def __init__(self, path=DEFAULT_INPUT, sample=None):
+        self.path = path
+        # A line_index.ScaleSample restricts every table to its sampled lines
+        self.sample = sample
+        self._tar = None
+        self._tar_raw = None
+        # Tar members seen so far by basename, and whether the walk reached the end of the archive
+        self._members = {}
+        self._scanned = False
+        if os.path.isdir(path):
+            self.kind = 'directory'
+        elif path.endswith('.tar'):
+            self.kind = 'tar'
+        elif path.endswith(('.tar.gz', '.tgz')):
+            self.kind = 'tar.gz'
+        else:
+            raise ValueError(f"Unsupported dataset input '{path}': expected a directory, .tar, .tar.gz or .tgz")
+        if sample is not None and self.kind != 'directory':
+            raise ValueError("Sampling seeks into the extracted .json files; --input must be a directory")
+
+    def describe(self):
+        sample = "" if self.sample is None else f", sample of scale {self.sample.scale} seed {self.sample.seed}"
+        return f"{self.path} ({self.kind}{sample})"
+
+    def _find_file(self, table):
+        """Path and format of a table's file in an input directory"""
+        filename = DATASET_FILES[table]
+        for suffix, fmt in (('', 'json'), ('.gz', 'json.gz'), ('.zst', 'json.zst')):
+            path = os.path.join(self.path, filename + suffix)
+            if os.path.exists(path):
+                return path, fmt
+        raise FileNotFoundError(f"No {filename}[.gz|.zst] in {self.path}")
+
+    def _tarfile(self):
+        if self._tar is None:
+            self._tar_raw = TimedReader(open(self.path, 'rb'))
+            mode = 'r:' if self.kind == 'tar' else 'r:gz'
+            self._tar = tarfile.open(fileobj=self._tar_raw, mode=mode)
+        return self._tar
+
+    def _find_member(self, table):
+        """The table's tar member, walking the archive in order only as far as that member.
+
+        getmembers() would decompress a whole .tar.gz before the first table is
+        streamed; members passed on the way are remembered for later tables.
+        """
+        filename = DATASET_FILES[table]
+        tar = self._tarfile()
+        while filename not in self._members and not self._scanned:
+            member = tar.next()
+            if member is None:
+                self._scanned = True
+            elif member.isfile():
+                self._members.setdefault(os.path.basename(member.name), member)
+        if filename not in self._members:
+            raise FileNotFoundError(f"No {filename} in {self.path}")
+        return self._members[filename]
+
+    def exists(self, table):
+        try:
+            if self.kind == 'directory':
+                self._find_file(table)
+            else:
+                self._find_member(table)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def open(self, table):
+        """Stream the JSON lines of `table` ('businesses', 'users', 'reviews', 'tips' or 'checkins')"""
+        if self.kind == 'directory':
+            path, fmt = self._find_file(table)
+            if self.sample is not None:
+                if fmt != 'json':
+                    raise ValueError(f"Sampling needs the plain .json file, found {path}")
+                raw = TimedReader(self.sample.reader(table))
+                return RecordStream(table, path, 'json sample', self.sample.total_bytes(table), raw, raw,
+                                    closers=(raw.close,))
+            raw = TimedReader(open(path, 'rb'))
+            if fmt == 'json':
+                reader = raw
+            elif fmt == 'json.gz':
+                reader = gzip.GzipFile(fileobj=raw, mode='rb')
+            else:
+                reader = _zstd_reader(raw)
+            closers = (raw.close,) if reader is raw else (reader.close, raw.close)
+            return RecordStream(table, path, fmt, os.path.getsize(path), raw, reader, closers)
+
+        # Members of a .tar.gz are reached by decompressing from the start of the archive,
+        # so each table opened after the first costs another pass over the compressed bytes
+        seconds_before, bytes_before = (self._tar_raw.seconds, self._tar_raw.bytes) if self._tar_raw else (0.0, 0)
+        start = time.perf_counter()
+        member = self._find_member(table)
+        scan_s = time.perf_counter() - start
+        member_reader = TimedReader(self._tarfile().extractfile(member))
+        raw = MemberInput(member_reader, self._tar_raw, seconds_before, bytes_before, scan_s)
+        return RecordStream(table, f"{self.path}:{member.name}", self.kind, member.size, raw, member_reader)
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar_raw.close()
+            self._tar = None
+            self._members = {}
+            self._scanned = False
+
+
+def describe_input_stats(stats):
+    """One-line summary of RecordStream.stats()"""
+    ratio = "" if stats['compression_ratio'] is None else f", {stats['compression_ratio']}x"
+    scan = f", {stats['scan_s']:.1f}s walking the archive to it" if stats.get('scan_s', 0) >= 0.05 else ""
+    return (f"  Input {stats['format']}: {stats['input_bytes'] / (1024 * 1024):.1f}MB read"
+            f"{ratio}{scan}, I/O {stats['io_s']:.1f}s, decompression {stats['decompress_s']:.1f}s, "
+            f"loader waited {stats['starved_s']:.1f}s for input, reader waited {stats['backpressure_s']:.1f}s "
+            f"for the loader -> {stats['bound']}-bound")
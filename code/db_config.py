@@ -15,10 +15,32 @@ MONGO_PARAMS = {
     'password': os.environ.get('MONGO_PASSWORD', 'mongodb')
 }
 
+# Connection pool settings used by db_pool.py
+PG_POOL_PARAMS = {
+    'minconn': int(os.environ.get('PG_POOL_MIN', '1')),
+    'maxconn': int(os.environ.get('PG_POOL_MAX', '20'))
+}
+
+MONGO_CLIENT_OPTIONS = {
+    'maxPoolSize': int(os.environ.get('MONGO_MAX_POOL_SIZE', '50')),
+    'minPoolSize': int(os.environ.get('MONGO_MIN_POOL_SIZE', '2')),
+    'maxIdleTimeMS': int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000')),
+    # Comma-separated list, e.g. 'zstd,snappy,zlib'; empty disables wire compression
+    'compressors': os.environ.get('MONGO_COMPRESSORS', '')
+}
+
 def get_mongo_uri():
     return f"mongodb://{MONGO_PARAMS['username']}:{MONGO_PARAMS['password']}@{MONGO_PARAMS['host']}:{MONGO_PARAMS['port']}/"
 
 def get_pg_connection_string():
     return f"postgresql://{PG_PARAMS['user']}:{PG_PARAMS['password']}@{PG_PARAMS['host']}:{PG_PARAMS['port']}/{PG_PARAMS['dbname']}"
 
-DEFAULT_DB_NAME = 'yelp_db' 
\ No newline at end of file
+DEFAULT_DB_NAME = 'yelp_db'
+
+# Embedded SQLite reference engine (engines/sqlite.py)
+SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join('.', 'data', 'yelp.sqlite'))
+
+# Docker containers of the local servers (docker-compose.yml), restarted or
+# resized by the server configuration and scaling benchmarks
+PG_CONTAINER = os.environ.get('PG_CONTAINER', 'yelp_postgres')
+MONGO_CONTAINER = os.environ.get('MONGO_CONTAINER', 'yelp_mongodb')
@@ -0,0 +1,107 @@
+"""
+Shared connection pools for PostgreSQL and MongoDB.
+
+Scripts take PostgreSQL connections from one thread-safe psycopg2
+ThreadedConnectionPool and share a single MongoClient per process (which
+pools its own sockets). Pool sizes and MongoDB client options come from
+db_config (PG_POOL_MIN/PG_POOL_MAX, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE,
+MONGO_MAX_IDLE_TIME_MS, MONGO_COMPRESSORS).
+
+Connections are returned with their transaction rolled back and autocommit
+off; other session settings (SET ...) are kept, so reset them before
+returning a connection.
+"""
+import atexit
+import threading
+from contextlib import contextmanager
+
+from psycopg2.pool import ThreadedConnectionPool
+from pymongo import MongoClient
+
+from db_config import PG_PARAMS, PG_POOL_PARAMS, MONGO_CLIENT_OPTIONS, get_mongo_uri, DEFAULT_DB_NAME
+
+_lock = threading.Lock()
+_pg_pool = None
+_mongo_client = None
+
+
+def get_pg_pool(maxconn=None):
+    """The process-wide PostgreSQL pool, created on first use with at least `maxconn` connections"""
+    global _pg_pool
+    with _lock:
+        if _pg_pool is None:
+            size = max(PG_POOL_PARAMS['maxconn'], maxconn or 0)
+            _pg_pool = ThreadedConnectionPool(min(PG_POOL_PARAMS['minconn'], size), size, **PG_PARAMS)
+        return _pg_pool
+
+
+def get_pg_connection():
+    return get_pg_pool().getconn()
+
+
+def put_pg_connection(conn, close=False):
+    """Return a connection to the pool, rolling back any open transaction"""
+    if conn is None:
+        return
+    if not conn.closed and not close:
+        conn.rollback()
+        if conn.autocommit:
+            conn.autocommit = False
+    get_pg_pool().putconn(conn, close=close or bool(conn.closed))
+
+
+@contextmanager
+def pg_connection():
+    conn = get_pg_connection()
+    try:
+        yield conn
+    finally:
+        put_pg_connection(conn)
+
+
+def mongo_client_options():
+    options = dict(MONGO_CLIENT_OPTIONS)
+    if not options.get('compressors'):
+        options.pop('compressors', None)
+    return options
+
+
+def get_mongo_client():
+    """The process-wide MongoClient"""
+    global _mongo_client
+    with _lock:
+        if _mongo_client is None:
+            _mongo_client = MongoClient(get_mongo_uri(), **mongo_client_options())
+        return _mongo_client
+
+
+def get_mongo_db(name=DEFAULT_DB_NAME):
+    return get_mongo_client()[name]
+
+
+def is_shared_mongo_client(client):
+    return client is not None and client is _mongo_client
+
+
+def close_pg_pool():
+    """Close every pooled PostgreSQL connection, e.g. after the server restarted"""
+    global _pg_pool
+    with _lock:
+        if _pg_pool is not None:
+            _pg_pool.closeall()
+            _pg_pool = None
+
+
+def close_pools():
+    """Close every pooled PostgreSQL connection and the shared MongoClient"""
+    global _pg_pool, _mongo_client
+    with _lock:
+        if _pg_pool is not None:
+            _pg_pool.closeall()
+            _pg_pool = None
+        if _mongo_client is not None:
+            _mongo_client.close()
+            _mongo_client = None
+
+
+atexit.register(close_pools)
@@ -0,0 +1,28 @@
+"""
+Engine adapters used by benchmark.py.
+
+Each adapter implements engines.base.EngineAdapter; ENGINES maps the names
+accepted by benchmark.py --engines to their adapter classes.
+"""
+from engines.base import EngineAdapter
+from engines.postgres import PostgresAdapter, run_postgres_explain
+from engines.mongo import MongoAdapter, run_mongo_explain
+from engines.columnar import ColumnarAdapter
+from engines.sqlite import SqliteAdapter
+
+ENGINES = {
+    PostgresAdapter.name: PostgresAdapter,
+    MongoAdapter.name: MongoAdapter,
+    SqliteAdapter.name: SqliteAdapter,
+    ColumnarAdapter.name: ColumnarAdapter,
+}
+
+
+def get_engine(name):
+    if name not in ENGINES:
+        raise KeyError(f"Unknown engine '{name}'. Available: {', '.join(ENGINES)}")
+    return ENGINES[name]
+
+
+def available_engines():
+    return list(ENGINES)
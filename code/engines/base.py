@@ -0,0 +1,64 @@
+"""
+Engine adapter interface.
+
+An adapter wraps one database engine for the benchmark runner:
+
+- connect() / close(): acquire and release the engine's connection or in-process state
+- load(): (re)load the Yelp dataset into the engine
+- supports(query_info): whether a QUERIES entry has an implementation for this engine
+- explain(query_info, params): run the query and return its raw explain/timing document,
+  or {"error": ...}; parse(raw) turns it into a plan_model.Plan
+- execute(query_info, params): run the query and return its rows
+- measure(run, query_info): run `run()` and return (its result, server-side counter deltas)
+"""
+from plan_model import parse_plan
+
+
+class EngineAdapter:
+    name = None
+    # Short label used in table headers and the full name used in messages
+    label = None
+    title = None
+    # Prefix of the per-query result files (e.g. postgres_explain_<timestamp>.json)
+    file_prefix = None
+    # Smallest execution time used in geometric means (timer resolution)
+    geomean_floor_ms = 0.001
+    reports_planning = False
+    reports_memory = False
+    reports_examined = False
+
+    def connect(self):
+        return self
+
+    def close(self):
+        pass
+
+    def load(self, **options):
+        raise NotImplementedError(f"{self.name} does not support loading the dataset")
+
+    def supports(self, query_info):
+        return True
+
+    def explain(self, query_info, params):
+        raise NotImplementedError
+
+    def execute(self, query_info, params):
+        raise NotImplementedError
+
+    def parse(self, raw):
+        return parse_plan(self.name, raw)
+
+    def summary(self):
+        """One-line description printed after the results summary, or None"""
+        return None
+
+    def measure(self, run, query_info):
+        """Run `run()`; engines without server-side counters return no deltas"""
+        return run(), {}
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
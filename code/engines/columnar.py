@@ -0,0 +1,44 @@
+"""Columnar adapter: vectorized NumPy implementations over an in-process ColumnarStore."""
+from db_pool import pg_connection
+from columnar_engine import ColumnarStore, run_vectorized
+from engines.base import EngineAdapter
+
+
+class ColumnarAdapter(EngineAdapter):
+    name = 'columnar'
+    label = 'Columnar'
+    title = 'Columnar'
+    file_prefix = 'columnar'
+    reports_memory = True
+
+    def __init__(self, store=None):
+        self.store = store
+
+    def connect(self):
+        if self.store is None:
+            self.load()
+        return self
+
+    def close(self):
+        self.store = None
+
+    def load(self, **options):
+        """Load the column arrays from PostgreSQL"""
+        print("Loading the columnar store from PostgreSQL...")
+        with pg_connection() as conn:
+            self.store = ColumnarStore.load(conn)
+        print(f"Loaded {self.store.memory_bytes() / (1024 * 1024):.2f}MB of column arrays in "
+              f"{sum(self.store.load_times.values()):.1f}s")
+
+    def summary(self):
+        return (f"Columnar store: {self.store.memory_bytes() / (1024 * 1024):.2f}MB of column arrays, "
+                f"loaded in {sum(self.store.load_times.values()):.1f}s")
+
+    def supports(self, query_info):
+        return 'vectorized' in query_info
+
+    def explain(self, query_info, params):
+        return run_vectorized(self.store, query_info, params)
+
+    def execute(self, query_info, params):
+        return query_info['vectorized'](self.store, params)
@@ -0,0 +1,60 @@
+"""MongoDB adapter: explain (executionStats) on the shared MongoClient."""
+import os
+import subprocess
+import sys
+
+from db_config import DEFAULT_DB_NAME
+from db_pool import get_mongo_client
+from server_stats import calibrate_mongo, measure_mongo, DEFAULT_CURRENTOP_INTERVAL
+from engines.base import EngineAdapter
+
+LOADER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'reset_load_mongo.py')
+
+
+def run_mongo_explain(db, query_info, params=None):
+    """Run a query's MongoDB explain, returning an error object if it fails (e.g. $text without a text index)"""
+    try:
+        return query_info['mongo_explain'](db, params or None)
+    except Exception as e:
+        print(f"  Error executing MongoDB explain: {str(e)}")
+        return {"error": str(e)}
+
+
+class MongoAdapter(EngineAdapter):
+    name = 'mongodb'
+    label = 'Mongo'
+    title = 'MongoDB'
+    file_prefix = 'mongo'
+    # MongoDB reports whole milliseconds, so a 0ms timing is counted as half a millisecond
+    geomean_floor_ms = 0.5
+    reports_examined = True
+
+    def __init__(self, db=None):
+        self.db = db
+        self.currentop_interval = DEFAULT_CURRENTOP_INTERVAL
+        self.stats_overhead = None
+
+    def connect(self):
+        if self.db is None:
+            self.db = get_mongo_client()[DEFAULT_DB_NAME]
+        return self
+
+    def load(self, **options):
+        """Reload the dataset with reset_load_mongo.py; options become its command-line flags"""
+        flags = [f"--{key.replace('_', '-')}" for key, value in options.items() if value is True]
+        subprocess.run([sys.executable, LOADER] + flags, check=True)
+
+    def supports(self, query_info):
+        return 'mongo_explain' in query_info
+
+    def explain(self, query_info, params):
+        return run_mongo_explain(self.db, query_info, params)
+
+    def execute(self, query_info, params):
+        return query_info['mongo'](self.db, params)
+
+    def measure(self, run, query_info):
+        if self.stats_overhead is None:
+            self.stats_overhead = calibrate_mongo(self.db)
+        return measure_mongo(self.db, query_info.get('mongo_collection'), run, self.stats_overhead,
+                             self.currentop_interval)
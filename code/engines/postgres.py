@@ -0,0 +1,91 @@
+"""PostgreSQL adapter: EXPLAIN (ANALYZE, FORMAT JSON) on a pooled connection."""
+import subprocess
+import sys
+import os
+
+from db_pool import get_pg_connection, put_pg_connection
+from server_stats import ensure_pg_stat_statements, calibrate_pg, measure_pg
+from engines.base import EngineAdapter
+
+LOADER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'reset_load_postgres.py')
+
+
+def run_postgres_explain(conn, query, params=None):
+    """Run a PostgreSQL query with EXPLAIN ANALYZE and get JSON output"""
+    cursor = conn.cursor()
+    explain_query = f"EXPLAIN (ANALYZE, FORMAT JSON) {query}"
+
+    try:
+        cursor.execute(explain_query, params or [])
+        explain_results = cursor.fetchall()
+
+        if explain_results and len(explain_results) > 0 and len(explain_results[0]) > 0:
+            json_result = explain_results[0][0]
+        else:
+            print("  Warning: Empty explain results, query may have failed")
+            json_result = {"error": "Empty explain results"}
+    except Exception as e:
+        print(f"  Error executing explain query: {str(e)}")
+        # Roll back so the failed statement does not abort the following queries
+        conn.rollback()
+        # Return an error object instead of raising an exception
+        json_result = {"error": str(e)}
+    finally:
+        cursor.close()
+
+    return json_result
+
+
+class PostgresAdapter(EngineAdapter):
+    name = 'postgresql'
+    label = 'PG'
+    title = 'PostgreSQL'
+    file_prefix = 'postgres'
+    reports_planning = True
+
+    def __init__(self, conn=None):
+        # An existing connection is borrowed, not returned to the pool on close()
+        self.conn = conn
+        self._owned = conn is None
+        self.use_pgss = None
+        self.stats_overhead = None
+
+    def connect(self):
+        if self.conn is None:
+            self.conn = get_pg_connection()
+        return self
+
+    def close(self):
+        if self._owned and self.conn is not None:
+            put_pg_connection(self.conn)
+            self.conn = None
+
+    def load(self, **options):
+        """Reload the dataset with reset_load_postgres.py; options become its command-line flags"""
+        flags = [f"--{key.replace('_', '-')}" for key, value in options.items() if value is True]
+        subprocess.run([sys.executable, LOADER] + flags, check=True)
+
+    def supports(self, query_info):
+        return 'pg' in query_info
+
+    def explain(self, query_info, params):
+        return run_postgres_explain(self.conn, query_info['pg'], params)
+
+    def execute(self, query_info, params):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(query_info['pg'], params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        self.conn.commit()
+        return rows
+
+    def measure(self, run, query_info):
+        if self.use_pgss is None:
+            self.use_pgss = ensure_pg_stat_statements(self.conn)
+            if not self.use_pgss:
+                print("Warning: pg_stat_statements is not preloaded; statement-level counters will be missing")
+        if self.stats_overhead is None:
+            self.stats_overhead = calibrate_pg(self.conn, self.use_pgss)
+        return measure_pg(self.conn, run, self.use_pgss, self.stats_overhead)
@@ -0,0 +1,175 @@
+"""
+Embedded SQLite adapter.
+
+SQLite runs in-process, so it gives a reference point with no client/server
+round trip. load() copies the tables from PostgreSQL into SQLITE_PATH (JSONB
+and array columns are stored as JSON text and read with the JSON1 functions)
+and creates the plain-column indexes of an index configuration.
+
+Queries run the entry's 'sqlite' SQL when it has one, otherwise its PostgreSQL
+SQL with the placeholders rewritten; queries using PostgreSQL-only syntax and
+no 'sqlite' version are skipped. SQLite has no EXPLAIN ANALYZE, so explain()
+records the EXPLAIN QUERY PLAN rows and then times one execution of the query.
+"""
+import datetime
+import decimal
+import json
+import os
+import re
+import sqlite3
+import time
+
+from db_config import SQLITE_PATH
+from db_pool import pg_connection
+from index_registry import get_index_config
+from streaming import stream_pg
+from engines.base import EngineAdapter
+
+TABLES = ['businesses', 'users', 'reviews', 'tips', 'checkins']
+PRIMARY_KEYS = {'businesses': 'business_id', 'users': 'user_id', 'reviews': 'review_id',
+                'tips': 'tip_id', 'checkins': 'checkin_id'}
+BATCH_SIZE = 10000
+
+# PostgreSQL column types and the SQLite affinity their values are stored with
+SQLITE_TYPES = {
+    'integer': 'INTEGER', 'bigint': 'INTEGER', 'smallint': 'INTEGER',
+    'double precision': 'REAL', 'real': 'REAL', 'numeric': 'REAL',
+}
+SKIPPED_TYPES = ('tsvector', 'point')
+
+# Constructs with no SQLite equivalent under the same spelling
+PG_ONLY_SYNTAX = re.compile(r"->>|@@|::|<@|\bts_rank\b|\bUNNEST\b|\bEXTRACT\b|\bILIKE\b|\bSPLIT_PART\b|\bLL_TO_EARTH\b|\s~\s",
+                            re.IGNORECASE)
+PLAIN_COLUMN = re.compile(r"^\w+(\s+(ASC|DESC))?$", re.IGNORECASE)
+
+
+def sqlite_sql(query_info):
+    """SQLite SQL for a QUERIES entry, or None if it needs a 'sqlite' version it does not have"""
+    if 'sqlite' in query_info:
+        return query_info['sqlite']
+    sql = query_info.get('pg')
+    if sql is None or PG_ONLY_SYNTAX.search(sql):
+        return None
+    # psycopg2 placeholders: %(name)s -> :name, %s -> ?, and %% is a literal %
+    sql = re.sub(r"%\((\w+)\)s", r":\1", sql)
+    return sql.replace('%s', '?').replace('%%', '%')
+
+
+def sqlite_value(value):
+    """Convert a PostgreSQL value (or query parameter) to one sqlite3 can bind"""
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def sqlite_params(params):
+    if isinstance(params, dict):
+        return {key: sqlite_value(value) for key, value in params.items()}
+    return [sqlite_value(value) for value in params or []]
+
+
+def sqlite_index_sql(index):
+    """CREATE INDEX for a PostgreSQL index entry on plain columns, or None for expression/GIN/partial indexes"""
+    if index.get('using') or index.get('where') or not all(PLAIN_COLUMN.match(c) for c in index['columns']):
+        return None
+    return f"CREATE INDEX IF NOT EXISTS {index['name']} ON {index['table']} ({', '.join(index['columns'])})"
+
+
+class SqliteAdapter(EngineAdapter):
+    name = 'sqlite'
+    label = 'SQLite'
+    title = 'SQLite'
+    file_prefix = 'sqlite'
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self.conn = None
+
+    def connect(self):
+        if self.conn is None:
+            if not os.path.exists(self.path):
+                print(f"Warning: {self.path} does not exist; load it with --load sqlite")
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # The runner may call the adapter from a worker thread (--parallel-engines), one call at a time
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        return self
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def load(self, index_config='full', **options):
+        """Copy every table from PostgreSQL and create the index configuration's plain-column indexes"""
+        self.connect()
+        with pg_connection() as pg_conn:
+            for table in TABLES:
+                start = time.perf_counter()
+                rows = self._copy_table(pg_conn, table)
+                print(f"  Copied {rows} rows into {table} in {time.perf_counter() - start:.1f}s")
+            pg_conn.commit()
+
+        skipped = []
+        for index in get_index_config(index_config)['postgres']:
+            sql = sqlite_index_sql(index)
+            if sql is None:
+                skipped.append(index['name'])
+                continue
+            self.conn.execute(sql)
+        self.conn.execute("ANALYZE")
+        self.conn.commit()
+        if skipped:
+            print(f"  Skipped indexes SQLite cannot build: {', '.join(skipped)}")
+
+    def _copy_table(self, pg_conn, table):
+        cur = pg_conn.cursor()
+        cur.execute("SELECT column_name, data_type FROM information_schema.columns "
+                    "WHERE table_name = %s ORDER BY ordinal_position", [table])
+        columns = [(name, data_type) for name, data_type in cur.fetchall() if data_type not in SKIPPED_TYPES]
+        cur.close()
+
+        definitions = [f"{name} {SQLITE_TYPES.get(data_type, 'TEXT')}"
+                       + (" PRIMARY KEY" if name == PRIMARY_KEYS.get(table) else "")
+                       for name, data_type in columns]
+        names = [name for name, _ in columns]
+        self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+        self.conn.execute(f"CREATE TABLE {table} ({', '.join(definitions)})")
+
+        insert = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})"
+        batch, copied = [], 0
+        for row in stream_pg(pg_conn, f"SELECT {', '.join(names)} FROM {table}", itersize=BATCH_SIZE):
+            batch.append([sqlite_value(value) for value in row])
+            if len(batch) >= BATCH_SIZE:
+                self.conn.executemany(insert, batch)
+                copied += len(batch)
+                batch = []
+        if batch:
+            self.conn.executemany(insert, batch)
+            copied += len(batch)
+        self.conn.commit()
+        return copied
+
+    def supports(self, query_info):
+        return sqlite_sql(query_info) is not None
+
+    def explain(self, query_info, params):
+        sql = sqlite_sql(query_info)
+        params = sqlite_params(params)
+        try:
+            plan = self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            start = time.perf_counter()
+            rows = self.conn.execute(sql, params).fetchall()
+            elapsed = (time.perf_counter() - start) * 1000
+        except sqlite3.Error as e:
+            print(f"  Error executing SQLite query: {str(e)}")
+            return {"error": str(e)}
+        return {'plan': plan, 'execution_time_ms': elapsed, 'rows_returned': len(rows)}
+
+    def execute(self, query_info, params):
+        return self.conn.execute(sqlite_sql(query_info), sqlite_params(params)).fetchall()
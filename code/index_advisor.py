@@ -0,0 +1,444 @@
+"""
+Plan-driven index advisor for PostgreSQL and MongoDB.
+
+Walks the explain plans captured by benchmark.py (results/<query>/latest_*_explain.json)
+and proposes candidate indexes:
+
+- PostgreSQL: scans with a selective Filter and Sort nodes above a single-table
+  scan become composite (equality columns, then sort keys), partial (JSONB
+  equality predicates as the WHERE clause) and expression indexes.
+- MongoDB: COLLSCAN stages with a selective filter and in-memory SORT/$sort
+  stages become compound indexes ordered by the equality-sort-range rule, and
+  partial indexes for equality predicates on embedded fields.
+
+PostgreSQL candidates are checked with hypothetical indexes when the hypopg
+extension is available, otherwise (or with --measure) by building the index
+and rerunning the query. MongoDB candidates are always built and measured.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import statistics
+
+import functools
+print = functools.partial(print, flush=True)
+
+import yaml
+from tabulate import tabulate
+
+from benchmark import (init_connections, close_connections, run_postgres_explain, get_timestamp_str,
+                       get_pg_execution_time, get_mongo_execution_time, resolve_params, QUERIES)
+from index_registry import (postgres_index_sql, postgres_existing_indexes, create_postgres_indexes,
+                            drop_postgres_indexes, mongo_existing_indexes, create_mongo_indexes,
+                            drop_mongo_indexes, mongo_index_name)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+PG_SCAN_NODES = ('Seq Scan', 'Parallel Seq Scan', 'Bitmap Heap Scan', 'Index Scan')
+
+PG_EQ_COLUMN = re.compile(r"\(\(?(\w+)\)?(?:::[\w ]+)? = '((?:[^']|'')*)'(?:::[\w ]+)?\)")
+PG_EQ_NUMBER = re.compile(r"\((\w+) = (-?\d+(?:\.\d+)?)\)")
+PG_RANGE_COLUMN = re.compile(r"\(\(?(\w+)\)?(?:::[\w ]+)? (?:>=|<=|>|<) ")
+PG_JSONB_EQ = re.compile(r"\(\((\w+) ->> '(\w+)'::text\) = '((?:[^']|'')*)'::text\)")
+
+MAX_NAME_LENGTH = 63
+
+
+def load_captured_plans(results_dir, query_names=None):
+    """Load the latest captured explain output for each query"""
+    plans = {}
+    if not os.path.isdir(results_dir):
+        return plans
+    for query_name in sorted(os.listdir(results_dir)):
+        query_dir = os.path.join(results_dir, query_name)
+        if not os.path.isdir(query_dir) or (query_names and query_name not in query_names):
+            continue
+        plans[query_name] = {}
+        for engine, filename in (('postgresql', 'latest_postgres_explain.json'),
+                                 ('mongodb', 'latest_mongo_explain.json')):
+            path = os.path.join(query_dir, filename)
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    plans[query_name][engine] = json.load(f).get('explain_result')
+    return plans
+
+
+def _index_name(prefix, relation, parts):
+    name = f"{prefix}_{relation}_" + '_'.join(re.sub(r'\W+', '', part.lower()) for part in parts)
+    if len(name) > MAX_NAME_LENGTH:
+        digest = hashlib.md5(name.encode()).hexdigest()[:8]
+        name = f"{name[:MAX_NAME_LENGTH - 9]}_{digest}"
+    return name
+
+
+# --- PostgreSQL -------------------------------------------------------------
+
+def _walk_pg(node, parent_sorts=()):
+    yield node, parent_sorts
+    if node.get('Node Type') == 'Sort':
+        parent_sorts = parent_sorts + (node,)
+    for child in node.get('Plans', []):
+        yield from _walk_pg(child, parent_sorts)
+
+
+def _pg_selectivity(node):
+    actual = node.get('Actual Rows', 0)
+    removed = node.get('Rows Removed by Filter', 0)
+    if actual + removed == 0:
+        return None
+    return actual / (actual + removed)
+
+
+def _parse_pg_filter(filter_text):
+    equality = [m.group(1) for m in PG_EQ_COLUMN.finditer(filter_text)]
+    equality += [m.group(1) for m in PG_EQ_NUMBER.finditer(filter_text)]
+    ranges = [m.group(1) for m in PG_RANGE_COLUMN.finditer(filter_text) if m.group(1) not in equality]
+    jsonb = [(m.group(1), m.group(2), m.group(3)) for m in PG_JSONB_EQ.finditer(filter_text)]
+    return list(dict.fromkeys(equality)), list(dict.fromkeys(ranges)), jsonb
+
+
+def _pg_sort_keys(sort_node, relation):
+    keys = []
+    for key in sort_node.get('Sort Key', []):
+        column = re.sub(rf"^(?:{relation}|\w+)\.", '', key)
+        if not re.fullmatch(r"\w+(?: (?:ASC|DESC))?(?: NULLS (?:FIRST|LAST))?", column):
+            return []
+        keys.append(column)
+    return keys
+
+
+def pg_candidates(query_name, pg_explain, max_selectivity):
+    """Propose PostgreSQL indexes from one captured EXPLAIN ANALYZE plan"""
+    try:
+        root = pg_explain[0]['Plan']
+    except (KeyError, TypeError, IndexError):
+        return []
+
+    candidates = []
+    for node, sorts in _walk_pg(root):
+        if node.get('Node Type') not in PG_SCAN_NODES or 'Relation Name' not in node:
+            continue
+        relation = node['Relation Name']
+        selectivity = _pg_selectivity(node)
+        selective = 'Filter' in node and selectivity is not None and selectivity <= max_selectivity
+        sort_keys = _pg_sort_keys(sorts[-1], relation) if sorts else []
+        if not selective and not sort_keys:
+            continue
+
+        equality, ranges, jsonb = _parse_pg_filter(node.get('Filter', '')) if selective else ([], [], [])
+        reason = f"{node['Node Type']} on {relation}"
+        if selective:
+            reason += f" keeps {selectivity:.2%} of rows"
+        if sort_keys:
+            reason += f", sorted by {', '.join(sort_keys)}"
+
+        sort_columns = {key.split()[0] for key in sort_keys}
+        columns = equality + sort_keys + [c for c in ranges if c not in sort_columns][:1]
+        if columns:
+            candidates.append({
+                'engine': 'postgresql', 'query': query_name, 'kind': 'composite', 'reason': reason,
+                'name': _index_name('adv', relation, columns), 'table': relation, 'columns': columns,
+            })
+            if jsonb:
+                where = ' AND '.join(f"{col}->>'{key}' = '{value}'" for col, key, value in jsonb)
+                candidates.append({
+                    'engine': 'postgresql', 'query': query_name, 'kind': 'partial', 'reason': reason,
+                    'name': _index_name('adv_partial', relation, columns), 'table': relation,
+                    'columns': columns, 'where': where,
+                })
+        for col, key, _ in jsonb:
+            candidates.append({
+                'engine': 'postgresql', 'query': query_name, 'kind': 'expression', 'reason': reason,
+                'name': _index_name('adv', relation, [col, key]), 'table': relation,
+                'columns': [f"({col}->>'{key}')"],
+            })
+    return candidates
+
+
+def _pg_total_cost(conn, sql, params):
+    cur = conn.cursor()
+    try:
+        cur.execute(f"EXPLAIN (FORMAT JSON) {sql}", params or [])
+        return float(cur.fetchone()[0][0]['Plan']['Total Cost'])
+    finally:
+        cur.close()
+
+
+def hypopg_available(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'hypopg'")
+    available = cur.fetchone() is not None
+    if available:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS hypopg")
+        conn.commit()
+    cur.close()
+    return available
+
+
+def estimate_pg_candidate(conn, candidate, query_info):
+    """Estimated cost reduction of a candidate using a hypothetical index"""
+    sql, params = query_info['pg'], query_info.get('pg_params', [])
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT hypopg_reset()")
+        base_cost = _pg_total_cost(conn, sql, params)
+        cur.execute("SELECT * FROM hypopg_create_index(%s)", (postgres_index_sql(candidate, if_not_exists=False),))
+        new_cost = _pg_total_cost(conn, sql, params)
+        return 1 - new_cost / base_cost if base_cost else None
+    except Exception as e:
+        conn.rollback()
+        print(f"  Warning: could not estimate {candidate['name']}: {e}")
+        return None
+    finally:
+        cur.execute("SELECT hypopg_reset()")
+        cur.close()
+
+
+def _median_pg_time(conn, query_info, iterations):
+    times = [get_pg_execution_time(run_postgres_explain(conn, query_info['pg'], query_info.get('pg_params', [])))
+             for _ in range(iterations)]
+    times = [t for t in times if t is not None]
+    return statistics.median(times) if times else None
+
+
+def measure_pg_candidate(conn, candidate, query_info, iterations):
+    """Measured speedup of a candidate by building it and rerunning the query"""
+    if candidate['name'] in postgres_existing_indexes(conn):
+        return None
+    before = _median_pg_time(conn, query_info, iterations)
+    create_postgres_indexes(conn, [candidate])
+    try:
+        after = _median_pg_time(conn, query_info, iterations)
+    finally:
+        drop_postgres_indexes(conn, [candidate])
+    if not before or after is None:
+        return None
+    return 1 - after / before
+
+
+# --- MongoDB ----------------------------------------------------------------
+
+def _mongo_children(stage):
+    for key in ('inputStage', 'queryPlan', 'innerStage', 'outerStage'):
+        if isinstance(stage.get(key), dict):
+            yield stage[key]
+    for child in stage.get('inputStages', []):
+        yield child
+
+
+def _walk_mongo(stage):
+    yield stage
+    for child in _mongo_children(stage):
+        yield from _walk_mongo(child)
+
+
+def _mongo_cursor_sections(mongo_explain):
+    """Yield (queryPlanner, executionStats) for the query layer of an explain"""
+    if 'queryPlanner' in mongo_explain:
+        yield mongo_explain['queryPlanner'], mongo_explain.get('executionStats', {})
+    for stage in mongo_explain.get('stages', []):
+        if '$cursor' in stage:
+            cursor = stage['$cursor']
+            yield cursor.get('queryPlanner', {}), cursor.get('executionStats', {})
+
+
+def _parse_mongo_filter(expression, equality, ranges, embedded):
+    for field, condition in expression.items():
+        if field == '$and':
+            for sub in condition:
+                _parse_mongo_filter(sub, equality, ranges, embedded)
+        elif field.startswith('$'):
+            continue
+        elif isinstance(condition, dict):
+            if '$eq' in condition:
+                (embedded if '.' in field else equality)[field] = condition['$eq']
+            elif any(op in condition for op in ('$gt', '$gte', '$lt', '$lte')):
+                ranges.append(field)
+        else:
+            (embedded if '.' in field else equality)[field] = condition
+
+
+def mongo_candidates(query_name, mongo_explain, max_selectivity):
+    """Propose MongoDB indexes from one captured explain"""
+    if not isinstance(mongo_explain, dict):
+        return []
+
+    candidates = []
+    sort_pattern = {}
+    for stage in mongo_explain.get('stages', []):
+        if '$sort' in stage:
+            sort_pattern = stage['$sort'].get('sortKey', {})
+            break
+
+    for planner, stats in _mongo_cursor_sections(mongo_explain):
+        collection = planner.get('namespace', '').split('.', 1)[-1]
+        winning = planner.get('winningPlan', {})
+        stages = list(_walk_mongo(winning))
+        for stage in stages:
+            if stage.get('stage') == 'SORT' and not sort_pattern:
+                sort_pattern = stage.get('sortPattern', {})
+
+        collscan = next((s for s in stages if s.get('stage') == 'COLLSCAN'), None)
+        examined = stats.get('totalDocsExamined', 0)
+        selectivity = stats.get('nReturned', 0) / examined if examined else None
+        selective = collscan is not None and selectivity is not None and selectivity <= max_selectivity
+        if not collection or not (selective or sort_pattern):
+            continue
+
+        equality, ranges, embedded = {}, [], {}
+        if selective:
+            _parse_mongo_filter(collscan.get('filter', {}), equality, ranges, embedded)
+
+        keys = [[field, 1] for field in equality]
+        keys += [[field, direction] for field, direction in sort_pattern.items() if field not in equality]
+        keys += [[field, 1] for field in ranges if field not in equality and field not in sort_pattern][:1]
+        if not keys:
+            continue
+
+        reason = f"{'COLLSCAN' if collscan else 'IXSCAN'} on {collection}"
+        if selective:
+            reason += f" keeps {selectivity:.2%} of documents"
+        if sort_pattern:
+            reason += f", in-memory sort on {', '.join(sort_pattern)}"
+
+        index = {'collection': collection, 'keys': keys}
+        candidates.append(dict(index, engine='mongodb', query=query_name, kind='compound', reason=reason,
+                               name=mongo_index_name(index)))
+        if embedded:
+            candidates.append(dict(index, engine='mongodb', query=query_name, kind='partial', reason=reason,
+                                   name=f"{mongo_index_name(index)}_partial",
+                                   options={'partialFilterExpression': {f: {'$eq': v} for f, v in embedded.items()}}))
+    return candidates
+
+
+def _median_mongo_time(db, query_info, iterations):
+    times = [get_mongo_execution_time(query_info['mongo_explain'](db, query_info.get('pg_params')))
+             for _ in range(iterations)]
+    times = [t for t in times if t is not None]
+    return statistics.median(times) if times else None
+
+
+def measure_mongo_candidate(db, candidate, query_info, iterations):
+    if candidate['name'] in mongo_existing_indexes(db, candidate['collection']):
+        return None
+    before = _median_mongo_time(db, query_info, iterations)
+    try:
+        create_mongo_indexes(db, [candidate])
+    except Exception as e:
+        print(f"  Warning: could not build {candidate['name']}: {e}")
+        return None
+    try:
+        after = _median_mongo_time(db, query_info, iterations)
+    finally:
+        drop_mongo_indexes(db, [candidate])
+    if not before or after is None:
+        return None
+    return 1 - after / before
+
+
+# --- Reporting --------------------------------------------------------------
+
+def _definition(candidate):
+    if candidate['engine'] == 'postgresql':
+        return postgres_index_sql(candidate, if_not_exists=False)
+    definition = f"{candidate['collection']}: {dict((f, d) for f, d in candidate['keys'])}"
+    if candidate.get('options'):
+        definition += f" {candidate['options']}"
+    return definition
+
+
+def _format_gain(gain):
+    return "N/A" if gain is None else f"{gain:+.1%}"
+
+
+def rank_candidates(candidates):
+    def score(candidate):
+        gain = candidate.get('measured_gain')
+        if gain is None:
+            gain = candidate.get('estimated_gain')
+        return gain if gain is not None else float('-inf')
+    return sorted(candidates, key=score, reverse=True)
+
+
+def print_advice(candidates):
+    rows = [[i + 1, c['query'], c['engine'], c['kind'], _definition(c),
+             _format_gain(c.get('estimated_gain')), _format_gain(c.get('measured_gain'))]
+            for i, c in enumerate(candidates)]
+    print("\n=== Index Advisor Candidates ===")
+    print(tabulate(rows, headers=["Rank", "Query", "Engine", "Kind", "Index", "Estimated Gain", "Measured Gain"],
+                   tablefmt="grid"))
+
+
+def advisor_config(candidates, top):
+    """Render the top candidates as an index_configs.yaml entry"""
+    config = {'description': 'Indexes proposed by index_advisor.py', 'postgres': [], 'mongo': []}
+    for candidate in candidates[:top]:
+        if candidate['engine'] == 'postgresql':
+            entry = {k: candidate[k] for k in ('name', 'table', 'columns', 'using', 'where') if candidate.get(k)}
+            config['postgres'].append(entry)
+        else:
+            entry = {k: candidate[k] for k in ('name', 'collection', 'keys', 'options') if candidate.get(k)}
+            config['mongo'].append(entry)
+    return yaml.safe_dump(json.loads(json.dumps({'advisor': config})), sort_keys=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Propose indexes from captured PostgreSQL and MongoDB plans')
+    parser.add_argument('--queries', nargs='+', help='Queries whose captured plans to analyse (default: all)')
+    parser.add_argument('--results-dir', type=str, default=RESULTS_DIR, help='Directory with captured plans (default: ./results)')
+    parser.add_argument('--max-selectivity', type=float, default=0.05,
+                        help='Filters keeping at most this fraction of scanned rows are considered selective (default: 0.05)')
+    parser.add_argument('--measure', action='store_true', help='Build and measure PostgreSQL candidates even when hypopg is available')
+    parser.add_argument('--dry-run', action='store_true', help='Only list candidates; do not estimate or measure them')
+    parser.add_argument('--iterations', type=int, default=3, help='Runs per measurement; the median is used (default: 3)')
+    parser.add_argument('--top', type=int, default=5, help='Number of candidates to emit as an index configuration (default: 5)')
+    args = parser.parse_args()
+
+    plans = load_captured_plans(args.results_dir, args.queries)
+    candidates = []
+    for query_name, explains in plans.items():
+        candidates += pg_candidates(query_name, explains.get('postgresql'), args.max_selectivity)
+        candidates += mongo_candidates(query_name, explains.get('mongodb'), args.max_selectivity)
+
+    if not candidates:
+        print("No index candidates found in the captured plans. Run benchmark.py first.")
+        return
+
+    if not args.dry_run:
+        pg_conn, mongo_db, mongo_client = init_connections()
+        try:
+            use_hypopg = hypopg_available(pg_conn)
+            print(f"hypopg extension {'available' if use_hypopg else 'not available'}")
+            for candidate in candidates:
+                query_info = QUERIES.get(candidate['query'])
+                if query_info is None:
+                    continue
+                query_info = dict(query_info, pg_params=resolve_params(pg_conn, query_info))
+                print(f"Evaluating {candidate['name']} for {candidate['query']}...")
+                if candidate['engine'] == 'postgresql':
+                    if use_hypopg:
+                        candidate['estimated_gain'] = estimate_pg_candidate(pg_conn, candidate, query_info)
+                    if args.measure or not use_hypopg:
+                        candidate['measured_gain'] = measure_pg_candidate(pg_conn, candidate, query_info, args.iterations)
+                elif 'mongo_explain' in query_info:
+                    candidate['measured_gain'] = measure_mongo_candidate(mongo_db, candidate, query_info, args.iterations)
+        finally:
+            close_connections(pg_conn, mongo_client)
+
+    candidates = rank_candidates(candidates)
+    print_advice(candidates)
+
+    path = os.path.join(args.results_dir, f"index_advice_{get_timestamp_str()}.json")
+    os.makedirs(args.results_dir, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(candidates, f, indent=2, default=str)
+    print(f"\nCandidates saved to {path}")
+
+    print("\nTop candidates as an index configuration (add to index_configs.yaml):\n")
+    print(advisor_config(candidates, args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmark every query under each named index configuration.
+
+For each configuration in index_configs.yaml the managed indexes are rebuilt
+from scratch on both engines, the build time and on-disk size are recorded,
+and the selected queries are rerun. The result is a query x index-config
+speedup matrix relative to a baseline configuration.
+"""
+import argparse
+import csv
+import os
+import statistics
+
+import functools
+print = functools.partial(print, flush=True)
+
+from tabulate import tabulate
+
+from benchmark import (init_connections, close_connections, run_benchmark, get_timestamp_str,
+                       get_pg_execution_time, get_mongo_execution_time, QUERIES, QUERY_CLASSES)
+from index_registry import load_index_configs, apply_postgres_config, apply_mongo_config
+
+ENGINES = [
+    ('postgresql', 'PostgreSQL', get_pg_execution_time),
+    ('mongodb', 'MongoDB', get_mongo_execution_time),
+]
+
+def median_or_none(values):
+    values = [v for v in values if v is not None]
+    return statistics.median(values) if values else None
+
+def run_config(config, query_names, pg_conn, mongo_db, iterations):
+    """Apply one index configuration and time every query against it"""
+    print(f"\n=== Index configuration: {config['name']} ===")
+    print("  Building PostgreSQL indexes...")
+    pg_build = apply_postgres_config(pg_conn, config, rebuild=True)
+    print("  Building MongoDB indexes...")
+    mongo_build = apply_mongo_config(mongo_db, config, rebuild=True)
+
+    timings = {}
+    for query_name in query_names:
+        samples = {engine: [] for engine, _, _ in ENGINES}
+        for _ in range(iterations):
+            result = run_benchmark(query_name, pg_conn, mongo_db)
+            for engine, _, get_time in ENGINES:
+                samples[engine].append(get_time(result[engine]))
+        timings[query_name] = {engine: median_or_none(values) for engine, values in samples.items()}
+
+    return {
+        'config': config['name'],
+        'build': {'postgresql': pg_build, 'mongodb': mongo_build},
+        'timings': timings,
+    }
+
+def format_cell(time_ms, baseline_ms):
+    if time_ms is None:
+        return "N/A"
+    if not baseline_ms or not time_ms:
+        return f"{time_ms:.2f}ms"
+    return f"{time_ms:.2f}ms ({baseline_ms / time_ms:.2f}x)"
+
+def print_matrix(runs, query_names, baseline):
+    base_run = next((run for run in runs if run['config'] == baseline), runs[0])
+
+    build_rows = []
+    for run in runs:
+        for engine, label, _ in ENGINES:
+            build = run['build'][engine]
+            build_rows.append([
+                run['config'],
+                label,
+                len(build['sizes']),
+                f"{sum(build['build_times'].values()):.2f}s",
+                f"{sum(build['sizes'].values()) / (1024 * 1024):.1f}MB",
+            ])
+    print("\n=== Index Build Cost ===")
+    print(tabulate(build_rows, headers=["Config", "Engine", "Indexes", "Build Time", "Size"], tablefmt="grid"))
+
+    for engine, label, _ in ENGINES:
+        rows = []
+        for query_name in query_names:
+            baseline_ms = base_run['timings'][query_name][engine]
+            rows.append([query_name] + [format_cell(run['timings'][query_name][engine], baseline_ms) for run in runs])
+        print(f"\n=== {label} speedup vs '{base_run['config']}' ===")
+        print(tabulate(rows, headers=["Query"] + [run['config'] for run in runs], tablefmt="grid"))
+
+def print_index_details(runs):
+    """Print the build time and size of every index built for each configuration"""
+    rows = []
+    for run in runs:
+        for engine, label, _ in ENGINES:
+            build = run['build'][engine]
+            for name in sorted(set(build['build_times']) | set(build['sizes'])):
+                build_time, size = build['build_times'].get(name), build['sizes'].get(name)
+                rows.append([
+                    run['config'],
+                    label,
+                    name,
+                    "N/A" if build_time is None else f"{build_time:.2f}s",
+                    "N/A" if size is None else f"{size / (1024 * 1024):.1f}MB",
+                ])
+    print("\n=== Index Build Cost per Index ===")
+    print(tabulate(rows, headers=["Config", "Engine", "Index", "Build Time", "Size"], tablefmt="grid"))
+
+def save_matrix_csv(runs, query_names, results_dir):
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"index_matrix_{get_timestamp_str()}.csv")
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Config", "Engine", "Query", "Execution Time (ms)", "Index Build Time (s)", "Index Size (bytes)"])
+        for run in runs:
+            for engine, label, _ in ENGINES:
+                build = run['build'][engine]
+                for query_name in query_names:
+                    writer.writerow([
+                        run['config'],
+                        label,
+                        query_name,
+                        run['timings'][query_name][engine],
+                        round(sum(build['build_times'].values()), 3),
+                        sum(build['sizes'].values()),
+                    ])
+    return path
+
+def main():
+    configs = load_index_configs()
+
+    parser = argparse.ArgumentParser(description='Benchmark queries under each index configuration')
+    parser.add_argument('--configs', nargs='+', default=list(configs),
+                        help='Index configurations to benchmark (default: all)')
+    parser.add_argument('--baseline', default='none', help='Configuration speedups are relative to (default: none)')
+    parser.add_argument('--queries', nargs='+', help='Specific queries to run (default: all)')
+    parser.add_argument('--classes', nargs='+', choices=list(QUERY_CLASSES), help='Only run queries of these classes')
+    parser.add_argument('--index-details', action='store_true', help='Also report build time and size of every index')
+    parser.add_argument('--iterations', type=int, default=3, help='Runs per query; the median is reported (default: 3)')
+    parser.add_argument('--final-config', default=None, help='Configuration to leave applied when done (default: last one run)')
+    parser.add_argument('--results-dir', type=str, default=None, help='Directory to save results (default: ./results)')
+    args = parser.parse_args()
+
+    unknown = [name for name in args.configs + [args.baseline] + ([args.final_config] if args.final_config else [])
+               if name not in configs]
+    if unknown:
+        parser.error(f"Unknown index configuration(s): {', '.join(unknown)}")
+
+    config_names = list(args.configs)
+    if args.baseline not in config_names:
+        config_names.insert(0, args.baseline)
+
+    query_names = [name for name in (args.queries or list(QUERIES)) if name in QUERIES]
+    if args.classes:
+        query_names = [name for name in query_names if QUERIES[name].get('class') in args.classes]
+    if not query_names:
+        print("No benchmark queries to run")
+        return
+
+    pg_conn, mongo_db, mongo_client = init_connections()
+    try:
+        runs = [run_config(configs[name], query_names, pg_conn, mongo_db, args.iterations) for name in config_names]
+
+        print_matrix(runs, query_names, args.baseline)
+        if args.index_details:
+            print_index_details(runs)
+
+        results_dir = args.results_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+        path = save_matrix_csv(runs, query_names, results_dir)
+        print(f"\nIndex matrix saved to {path}")
+
+        if args.final_config:
+            print(f"\nRestoring index configuration '{args.final_config}'...")
+            apply_postgres_config(pg_conn, configs[args.final_config])
+            apply_mongo_config(mongo_db, configs[args.final_config])
+    finally:
+        close_connections(pg_conn, mongo_client)
+
+if __name__ == "__main__":
+    main()
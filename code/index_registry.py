@@ -0,0 +1,264 @@
+"""
+Declarative index configurations for PostgreSQL and MongoDB.
+
+Index sets are defined in index_configs.yaml as named configurations. This
+module loads them and applies a configuration to either engine, recording
+how long each index took to build and how much space it uses.
+"""
+import os
+import time
+
+import yaml
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index_configs.yaml')
+
+DEFAULT_INDEX_CONFIG = 'full'
+
+
+def _resolve_config(name, raw_configs, seen=()):
+    if name not in raw_configs:
+        raise KeyError(f"Unknown index configuration '{name}'")
+    if name in seen:
+        raise ValueError(f"Index configuration '{name}' extends itself")
+
+    raw = raw_configs[name] or {}
+    postgres, mongo = [], []
+
+    parents = raw.get('extends') or []
+    if isinstance(parents, str):
+        parents = [parents]
+    for parent in parents:
+        resolved = _resolve_config(parent, raw_configs, seen + (name,))
+        postgres.extend(resolved['postgres'])
+        mongo.extend(resolved['mongo'])
+
+    postgres.extend(raw.get('postgres') or [])
+    mongo.extend(dict(index, name=mongo_index_name(index)) for index in raw.get('mongo') or [])
+
+    return {
+        'name': name,
+        'description': raw.get('description', ''),
+        'postgres': _dedupe(postgres),
+        'mongo': _dedupe(mongo),
+    }
+
+
+def _dedupe(indexes):
+    by_key = {}
+    for index in indexes:
+        by_key[(index.get('table') or index.get('collection'), index['name'])] = index
+    return list(by_key.values())
+
+
+def load_index_configs(path=CONFIG_PATH):
+    """Load every named index configuration, resolving `extends`"""
+    with open(path, 'r') as f:
+        raw_configs = yaml.safe_load(f) or {}
+    return {name: _resolve_config(name, raw_configs) for name in raw_configs}
+
+
+def get_index_config(name, path=CONFIG_PATH):
+    configs = load_index_configs(path)
+    if name not in configs:
+        raise KeyError(f"Unknown index configuration '{name}'. Available: {', '.join(configs)}")
+    return configs[name]
+
+
+def list_index_configs(path=CONFIG_PATH):
+    print("\nAvailable index configurations:")
+    for name, config in load_index_configs(path).items():
+        print(f"  - {name}: {config['description']} "
+              f"({len(config['postgres'])} PostgreSQL, {len(config['mongo'])} MongoDB)")
+
+
+def managed_indexes(path=CONFIG_PATH):
+    """Return every index declared in any configuration, keyed by engine"""
+    postgres, mongo = [], []
+    for config in load_index_configs(path).values():
+        postgres.extend(config['postgres'])
+        mongo.extend(config['mongo'])
+    return {'postgres': _dedupe(postgres), 'mongo': _dedupe(mongo)}
+
+
+def mongo_index_name(index):
+    """Name of a MongoDB index entry, matching the name MongoDB generates"""
+    if index.get('name'):
+        return index['name']
+    return '_'.join(f"{field}_{direction}" for field, direction in index['keys'])
+
+
+def postgres_index_sql(index, if_not_exists=True):
+    """Build the CREATE INDEX statement for a PostgreSQL index entry"""
+    sql = "CREATE INDEX IF NOT EXISTS" if if_not_exists else "CREATE INDEX"
+    sql += f" {index['name']} ON {index['table']}"
+    if index.get('using'):
+        sql += f" USING {index['using']}"
+    sql += f" ({', '.join(index['columns'])})"
+    if index.get('where'):
+        sql += f" WHERE {index['where']}"
+    return sql
+
+
+def postgres_existing_indexes(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT indexname FROM pg_indexes WHERE schemaname = 'public'")
+    names = {row[0] for row in cur.fetchall()}
+    cur.close()
+    return names
+
+
+def drop_postgres_indexes(conn, indexes):
+    cur = conn.cursor()
+    for index in indexes:
+        cur.execute(f"DROP INDEX IF EXISTS {index['name']}")
+    conn.commit()
+    cur.close()
+
+
+def create_postgres_indexes(conn, indexes):
+    """Create PostgreSQL indexes, returning the build time of each one in seconds"""
+    existing = postgres_existing_indexes(conn)
+    cur = conn.cursor()
+    build_times = {}
+    for index in indexes:
+        if index['name'] in existing:
+            continue
+        start = time.perf_counter()
+        try:
+            cur.execute(postgres_index_sql(index))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"  Warning: could not build {index['name']}: {e}")
+            continue
+        build_times[index['name']] = time.perf_counter() - start
+    cur.close()
+    return build_times
+
+
+def postgres_index_sizes(conn, indexes):
+    """Return the on-disk size in bytes of each existing PostgreSQL index"""
+    names = [index['name'] for index in indexes]
+    if not names:
+        return {}
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT indexname, pg_relation_size(format('%%I.%%I', schemaname, indexname)::regclass)
+        FROM pg_indexes
+        WHERE schemaname = 'public' AND indexname = ANY(%s)
+    """, (names,))
+    sizes = dict(cur.fetchall())
+    cur.close()
+    return sizes
+
+
+def mongo_existing_indexes(db, collection):
+    return set(db[collection].index_information())
+
+
+def drop_mongo_indexes(db, indexes):
+    existing = {}
+    for index in indexes:
+        collection = index['collection']
+        if collection not in existing:
+            existing[collection] = mongo_existing_indexes(db, collection)
+        if index['name'] in existing[collection]:
+            db[collection].drop_index(index['name'])
+
+
+def create_mongo_indexes(db, indexes):
+    """Create MongoDB indexes, returning the build time of each one in seconds"""
+    existing = {}
+    build_times = {}
+    for index in indexes:
+        collection = index['collection']
+        if collection not in existing:
+            existing[collection] = mongo_existing_indexes(db, collection)
+        if index['name'] in existing[collection]:
+            continue
+        keys = [(field, direction) for field, direction in index['keys']]
+        start = time.perf_counter()
+        db[collection].create_index(keys, name=index['name'], **(index.get('options') or {}))
+        build_times[f"{collection}.{index['name']}"] = time.perf_counter() - start
+    return build_times
+
+
+def mongo_index_sizes(db, indexes):
+    """Return the on-disk size in bytes of each existing MongoDB index"""
+    sizes = {}
+    for collection in {index['collection'] for index in indexes}:
+        stats = next(db[collection].aggregate([{'$collStats': {'storageStats': {}}}]), {})
+        index_sizes = stats.get('storageStats', {}).get('indexSizes', {})
+        for index in indexes:
+            if index['collection'] == collection and index['name'] in index_sizes:
+                sizes[f"{collection}.{index['name']}"] = index_sizes[index['name']]
+    return sizes
+
+
+def apply_postgres_config(conn, config, rebuild=False):
+    """Make the managed PostgreSQL indexes match `config`.
+
+    Managed indexes that are not part of the configuration are dropped. With
+    rebuild=True every index in the configuration is dropped and rebuilt so
+    that build times are measured from scratch.
+    """
+    wanted = {index['name'] for index in config['postgres']}
+    to_drop = [index for index in managed_indexes()['postgres']
+               if rebuild or index['name'] not in wanted]
+    drop_postgres_indexes(conn, to_drop)
+    build_times = create_postgres_indexes(conn, config['postgres'])
+    return {
+        'build_times': build_times,
+        'sizes': postgres_index_sizes(conn, config['postgres']),
+    }
+
+
+def apply_mongo_config(db, config, rebuild=False):
+    """Make the managed MongoDB indexes match `config` (see apply_postgres_config)"""
+    wanted = {(index['collection'], index['name']) for index in config['mongo']}
+    to_drop = [index for index in managed_indexes()['mongo']
+               if rebuild or (index['collection'], index['name']) not in wanted]
+    drop_mongo_indexes(db, to_drop)
+    build_times = create_mongo_indexes(db, config['mongo'])
+    return {
+        'build_times': build_times,
+        'sizes': mongo_index_sizes(db, config['mongo']),
+    }
+
+
+def detect_index_config(conn, db, path=CONFIG_PATH):
+    """Name of the configuration whose managed indexes exactly match what exists, or 'custom'"""
+    managed = managed_indexes(path)
+    pg_existing = postgres_existing_indexes(conn)
+    pg_present = {index['name'] for index in managed['postgres'] if index['name'] in pg_existing}
+
+    mongo_existing = {}
+    mongo_present = set()
+    for index in managed['mongo']:
+        collection = index['collection']
+        if collection not in mongo_existing:
+            mongo_existing[collection] = mongo_existing_indexes(db, collection)
+        if index['name'] in mongo_existing[collection]:
+            mongo_present.add((collection, index['name']))
+
+    for name, config in load_index_configs(path).items():
+        if ({index['name'] for index in config['postgres']} == pg_present and
+                {(index['collection'], index['name']) for index in config['mongo']} == mongo_present):
+            return name
+    return 'custom'
+
+
+def config_applied(conn, db, name, path=CONFIG_PATH):
+    """Whether every index of configuration `name` exists on both engines"""
+    config = get_index_config(name, path)
+    pg_existing = postgres_existing_indexes(conn)
+    if any(index['name'] not in pg_existing for index in config['postgres']):
+        return False
+    existing = {}
+    for index in config['mongo']:
+        collection = index['collection']
+        if collection not in existing:
+            existing[collection] = mongo_existing_indexes(db, collection)
+        if index['name'] not in existing[collection]:
+            return False
+    return True
@@ -0,0 +1,228 @@
+"""
+Line-offset index of the dataset files, and reproducible scaled-down samples.
+
+One pass over a dataset file records the byte offset of every line as a
+uint64 array, saved next to the file as <name>.json.idx.npz. For the files
+keyed by an id (business_id for businesses and checkins, user_id for users)
+the pass also records each line's id, so the lines of a set of ids can be
+found without parsing the file again.
+
+ScaleSample draws a seeded random sample of the reviews and tips, then takes
+the businesses and users those records reference and the checkins of those
+businesses, so a --scale load is a consistent subset: every review and tip
+still points at a loaded business and user. The loaders seek straight to the
+sampled lines, so a 1% load reads about 1% of the reviews file.
+
+Offsets index the uncompressed bytes, so sampling needs a directory of plain
+.json files (not .gz/.zst files or a tarball).
+
+Build or refresh the indexes (the loaders also build missing ones):
+    python line_index.py --input ./data/yelp_dataset/
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from dataset_input import DATASET_FILES, DEFAULT_INPUT
+
+INDEX_SUFFIX = '.idx.npz'
+# Id stored per line for the files that other records reference
+INDEX_KEYS = {
+    'businesses': 'business_id',
+    'users': 'user_id',
+    'checkins': 'business_id',
+}
+# Tables sampled at the scale factor; the rest follow from their references
+SAMPLED_TABLES = ('reviews', 'tips')
+CHUNK_SIZE = 16 * 1024 * 1024
+DEFAULT_SEED = 42
+NEWLINE = ord('\n')
+
+
+def index_path(path):
+    return path + INDEX_SUFFIX
+
+
+def _line_key(buf, needle, start, end):
+    """String value of the first "<key>": in buf[start:end], as bytes"""
+    pos = buf.find(needle, start, end)
+    if pos < 0:
+        return b''
+    pos = buf.find(b'"', pos + len(needle), end) + 1
+    return buf[pos:buf.find(b'"', pos, end)]
+
+
+class LineIndex:
+    """Byte offsets (and optionally ids) of the lines of one JSON-lines file"""
+
+    def __init__(self, path, offsets, keys=None):
+        self.path = path
+        # offsets[i] is the start of line i and offsets[i + 1] its end, so there is one more offset than lines
+        self.offsets = offsets
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def size(self):
+        return int(self.offsets[-1])
+
+    @classmethod
+    def build(cls, path, key=None):
+        """Scan the file once, recording where every line starts (and its `key` value)"""
+        needle = f'"{key}":'.encode() if key else None
+        offsets = [np.zeros(1, dtype=np.uint64)]
+        keys = []
+        base = 0  # file offset of buf[0]
+        carry = b''
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                buf = carry + chunk
+                ends = np.flatnonzero(np.frombuffer(buf, dtype=np.uint8) == NEWLINE) + 1
+                if len(ends) == 0:
+                    carry = buf
+                    continue
+                offsets.append(ends.astype(np.uint64) + np.uint64(base))
+                if needle:
+                    start = 0
+                    for end in ends.tolist():
+                        keys.append(_line_key(buf, needle, start, end))
+                        start = end
+                cut = int(ends[-1])
+                carry = buf[cut:]
+                base += cut
+        if carry:
+            # Last line without a trailing newline
+            offsets.append(np.array([base + len(carry)], dtype=np.uint64))
+            if needle:
+                keys.append(_line_key(carry, needle, 0, len(carry)))
+        return cls(path, np.concatenate(offsets), np.array(keys) if needle else None)
+
+    def save(self):
+        arrays = {'offsets': self.offsets}
+        if self.keys is not None:
+            arrays['keys'] = self.keys
+        np.savez(index_path(self.path), **arrays)
+
+    @classmethod
+    def load(cls, path, key=None, build=True):
+        """The saved index of `path`, rebuilt (if `build`) when missing or stale"""
+        saved = index_path(path)
+        if os.path.exists(saved):
+            with np.load(saved) as data:
+                index = cls(path, data['offsets'], data['keys'] if 'keys' in data.files else None)
+            if index.size == os.path.getsize(path) and (key is None or index.keys is not None):
+                return index
+        if not build:
+            raise FileNotFoundError(f"No up-to-date line index for {path}; run line_index.py")
+        start = time.perf_counter()
+        print(f"Building line index of {path}...")
+        index = cls.build(path, key)
+        index.save()
+        elapsed = time.perf_counter() - start
+        print(f"  {len(index)} lines, {index.size / (1024 * 1024) / max(elapsed, 1e-9):.0f} MB/s, {elapsed:.1f}s")
+        return index
+
+    def find(self, ids):
+        """Sorted line numbers whose key is one of `ids`"""
+        wanted = np.array(sorted(i.encode() for i in ids), dtype=self.keys.dtype)
+        return np.flatnonzero(np.isin(self.keys, wanted))
+
+    def total_bytes(self, lines):
+        return int((self.offsets[lines + 1] - self.offsets[lines]).sum())
+
+    def read(self, lines):
+        """Yield the given lines (sorted, so the seeks only move forward)"""
+        with open(self.path, 'rb') as f:
+            for line in lines.tolist():
+                f.seek(int(self.offsets[line]))
+                yield f.read(int(self.offsets[line + 1] - self.offsets[line]))
+
+
+class SampledReader:
+    """Read-only file object over the sampled lines of a file, in file order"""
+
+    def __init__(self, index, lines):
+        self.index = index
+        self.lines = lines.tolist()
+        self._next = 0
+        self.f = open(index.path, 'rb')
+
+    def read(self, size=-1):
+        parts = []
+        total = 0
+        offsets = self.index.offsets
+        while self._next < len(self.lines) and (size < 0 or total < size):
+            line = self.lines[self._next]
+            self._next += 1
+            self.f.seek(int(offsets[line]))
+            data = self.f.read(int(offsets[line + 1] - offsets[line]))
+            if not data.endswith(b'\n'):
+                data += b'\n'
+            parts.append(data)
+            total += len(data)
+        return b''.join(parts)
+
+    def close(self):
+        self.f.close()
+
+
+class ScaleSample:
+    """A seeded sample of reviews and tips, with the businesses, users and checkins they reference"""
+
+    def __init__(self, input_dir, scale, seed=DEFAULT_SEED):
+        self.scale = scale
+        self.seed = seed
+        start = time.perf_counter()
+        self.indexes = {table: LineIndex.load(os.path.join(input_dir, filename), INDEX_KEYS.get(table))
+                        for table, filename in DATASET_FILES.items()}
+        rng = np.random.default_rng(seed)
+        self.lines = {}
+        business_ids, user_ids = set(), set()
+        for table in SAMPLED_TABLES:
+            index = self.indexes[table]
+            count = min(len(index), max(1, round(len(index) * scale)))
+            self.lines[table] = np.sort(rng.choice(len(index), size=count, replace=False))
+            for line in index.read(self.lines[table]):
+                data = json.loads(line)
+                business_ids.add(data['business_id'])
+                user_ids.add(data['user_id'])
+        self.lines['businesses'] = self.indexes['businesses'].find(business_ids)
+        self.lines['users'] = self.indexes['users'].find(user_ids)
+        self.lines['checkins'] = self.indexes['checkins'].find(business_ids)
+        print(f"Sampled scale {scale} (seed {seed}) in {time.perf_counter() - start:.1f}s: " +
+              ", ".join(f"{table} {len(self.lines[table])}/{len(self.indexes[table])}" for table in DATASET_FILES))
+
+    def reader(self, table):
+        return SampledReader(self.indexes[table], self.lines[table])
+
+    def total_bytes(self, table):
+        return self.indexes[table].total_bytes(self.lines[table])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the line-offset indexes of the Yelp dataset files')
+    parser.add_argument('--input', type=str, default=DEFAULT_INPUT,
+                        help='Directory of the plain .json dataset files (default: ./data/yelp_dataset/)')
+    parser.add_argument('--tables', nargs='+', default=list(DATASET_FILES), choices=list(DATASET_FILES),
+                        help='Files to index (default: all)')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild indexes that are already up to date')
+    args = parser.parse_args()
+
+    for table in args.tables:
+        path = os.path.join(args.input, DATASET_FILES[table])
+        if args.rebuild and os.path.exists(index_path(path)):
+            os.remove(index_path(path))
+        index = LineIndex.load(path, INDEX_KEYS.get(table))
+        print(f"{table}: {len(index)} lines indexed in {index_path(path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Load telemetry for reset_load_postgres.py and reset_load_mongo.py.
+
+A LoadMetrics object follows the load of one table/collection:
+
+- phase timers: read, parse (json.loads), transform, validate (id lookups),
+  insert (execute_values / insert_many) and commit. The loader calls
+  lap(phase) at the end of each phase, so the time since the previous lap is
+  charged to that phase with one clock read per boundary
+- throughput: rows loaded and skipped, rows/s, MB/s of input read, progress
+  and ETA from the input size, and the process's peak RSS. Reading a
+  dataset_input.RecordStream, progress follows the stream's position in its
+  raw (possibly compressed) input
+
+Every `interval` seconds a one-line progress summary is printed and a JSON
+object is appended to the metrics file (JSON lines); a final 'done' record
+holds the totals and the phase breakdown. profile_load() runs a table load
+under cProfile and tracemalloc and prints the top hotspots.
+"""
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import resource
+import time
+import tracemalloc
+
+from dataset_input import describe_input_stats
+
+PHASES = ('read', 'parse', 'transform', 'validate', 'insert', 'commit')
+DEFAULT_INTERVAL = 10.0
+DEFAULT_METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'load_metrics.jsonl')
+DEFAULT_PROFILE_TOP = 20
+# Lines between checks of the clock for a periodic report
+CHECK_EVERY = 1000
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is in kB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class LoadMetrics:
+    """Phase timers and throughput counters for loading one table or collection"""
+
+    def __init__(self, loader, table, total_bytes=None, metrics_path=DEFAULT_METRICS_PATH,
+                 interval=DEFAULT_INTERVAL):
+        self.loader = loader
+        self.table = table
+        self.total_bytes = total_bytes
+        self.metrics_path = metrics_path
+        self.interval = interval
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.lines_read = 0
+        self.bytes_read = 0
+        self.rows = 0
+        self.skipped = 0
+        self.errors = 0
+        self._source = None
+        self.input_stats = None
+        self.run_started = datetime.datetime.now().isoformat(timespec='seconds')
+        self.start = self._mark = self._last_report = time.perf_counter()
+
+    # --- Phase timing -------------------------------------------------------
+
+    def lap(self, phase):
+        """Charge the time since the previous lap to `phase`"""
+        now = time.perf_counter()
+        self.phases[phase] += now - self._mark
+        self._mark = now
+
+    def lines(self, f):
+        """Yield the lines of a binary file or RecordStream, timing the reads and reporting periodically"""
+        self._source = f
+        self._mark = time.perf_counter()
+        for line in f:
+            self.bytes_read += len(line)
+            self.lines_read += 1
+            self.lap('read')
+            yield line
+            if self.lines_read % CHECK_EVERY == 0 and time.perf_counter() - self._last_report >= self.interval:
+                self.report('progress')
+
+    # --- Counters -----------------------------------------------------------
+
+    def add_rows(self, count):
+        self.rows += count
+
+    def skip(self, count=1):
+        self.skipped += count
+
+    def error(self, count=1):
+        self.errors += count
+
+    # --- Reporting ----------------------------------------------------------
+
+    def snapshot(self, event):
+        elapsed = time.perf_counter() - self.start
+        progress = None
+        eta = None
+        if self.total_bytes:
+            position = getattr(self._source, 'position', self.bytes_read)
+            progress = min(position / self.total_bytes, 1.0)
+            if progress > 0:
+                eta = elapsed * (1 - progress) / progress
+        return {
+            'event': event,
+            'loader': self.loader,
+            'table': self.table,
+            'run_started': self.run_started,
+            'elapsed_s': round(elapsed, 3),
+            'lines_read': self.lines_read,
+            'rows': self.rows,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'bytes_read': self.bytes_read,
+            'rows_per_s': round(self.rows / elapsed, 1) if elapsed > 0 else None,
+            'mb_per_s': round(self.bytes_read / (1024 * 1024) / elapsed, 2) if elapsed > 0 else None,
+            'progress': None if progress is None else round(progress, 4),
+            'eta_s': None if eta is None else round(eta, 1),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'phases_s': {phase: round(seconds, 3) for phase, seconds in self.phases.items()},
+            'input': self.input_stats if event == 'done' else None,
+        }
+
+    def report(self, event='progress'):
+        """Print a progress line and append the snapshot to the metrics file"""
+        record = self.snapshot(event)
+        self._last_report = time.perf_counter()
+        progress = "" if record['progress'] is None else f", {record['progress'] * 100:.0f}%"
+        eta = "" if record['eta_s'] is None or event == 'done' else f", ETA {record['eta_s']:.0f}s"
+        print(f"  {self.table}: {record['rows']} rows loaded, {record['skipped']} skipped, "
+              f"{record['rows_per_s'] or 0:.0f} rows/s, {record['mb_per_s'] or 0:.1f} MB/s{progress}{eta}, "
+              f"peak RSS {record['peak_rss_mb']:.0f}MB")
+        if self.metrics_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.metrics_path)), exist_ok=True)
+            with open(self.metrics_path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+        return record
+
+    def finish(self, input_stats=None):
+        """Report the totals and print where the time went; input_stats is RecordStream.stats()"""
+        self.input_stats = input_stats
+        record = self.report('done')
+        total = sum(self.phases.values()) or 1.0
+        print("  Phases: " + ", ".join(f"{phase} {seconds:.1f}s ({seconds / total * 100:.0f}%)"
+                                       for phase, seconds in self.phases.items() if seconds > 0))
+        if input_stats:
+            print(describe_input_stats(input_stats))
+        return record
+
+
+def profile_load(label, func, *args, top=DEFAULT_PROFILE_TOP, output_dir=None):
+    """Run func(*args) under cProfile and tracemalloc, print the top functions and allocation sites"""
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    try:
+        result = profiler.runcall(func, *args)
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(top)
+    print(f"\n=== Profile: {label} (top {top} functions by cumulative time) ===")
+    print(stream.getvalue())
+    print(f"=== Allocations: {label} (top {top} lines, peak traced {peak / (1024 * 1024):.1f}MB) ===")
+    for stat in snapshot.statistics('lineno')[:top]:
+        print(f"  {stat}")
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"{label}.prof")
+        profiler.dump_stats(path)
+        print(f"Saved profile to {path}")
+    return result
@@ -0,0 +1,471 @@
+"""
+Mixed read/write workload under contention.
+
+Worker threads run for a fixed duration on one engine at a time. Each
+operation is either a read (a benchmark query from the registry with sampled
+parameters) or a write transaction that inserts new reviews and updates the
+review_count and stars of their businesses. Writes target a hotspot: the most
+reviewed businesses of one city, drawn from a Zipfian distribution, so workers
+contend for the same rows/documents.
+
+Each engine first runs a read-only phase for the same duration (unless
+--no-baseline) so read latency under write pressure can be compared with
+read latency in isolation. Reported per engine and phase:
+
+- read and write throughput and latency percentiles
+- write retries, deadlocks and aborted transactions
+- PostgreSQL: backends waiting on locks (sampled from pg_stat_activity) and
+  deadlocks from pg_stat_database
+- MongoDB: lock acquisitions that had to wait, write conflicts and aborted
+  transactions from serverStatus
+
+Written reviews are removed and business aggregates restored afterwards, as
+in write_benchmark.py.
+"""
+import argparse
+import os
+import random
+import statistics
+import threading
+import time
+
+import functools
+print = functools.partial(print, flush=True)
+
+from psycopg2 import errors
+from psycopg2.extras import execute_values
+from tabulate import tabulate
+
+from db_pool import get_pg_pool, get_pg_connection, put_pg_connection
+from benchmark import init_connections, close_connections, query_params, percentile, QUERIES, QUERY_CLASSES
+from param_generators import DISTRIBUTIONS, ParamGenerator, load_param_pool
+from index_registry import config_applied
+from write_benchmark import (WriteGenerator, PG_INSERT, PG_UPDATE_AGGREGATE, SNAPSHOT_PATH, pg_values,
+                             mongo_document, mongo_aggregate_update, transactions_supported,
+                             save_snapshot, load_snapshot, cleanup)
+
+ENGINES = ['postgresql', 'mongodb']
+
+# Review search needs the optional text_tsv columns and large scans return whole tables,
+# so neither is part of the default read mix; geo queries join it once the geo indexes exist
+DEFAULT_READ_CLASSES = [name for name in QUERY_CLASSES if name not in ('review_search', 'large_scan', 'geo')]
+GEO_INDEX_CONFIG = 'geo'
+
+RETRYABLE_PG_ERRORS = (errors.DeadlockDetected, errors.SerializationFailure)
+
+
+def load_hotspot_pool(conn, city, state, pool_size):
+    """Most reviewed businesses of a city as a (params, weight) pool"""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT business_id, review_count
+            FROM businesses
+            WHERE city = %s AND state = %s
+            ORDER BY review_count DESC
+            LIMIT %s
+        """, (city, state, pool_size))
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+    conn.commit()
+    return [({'business_id': business_id}, review_count or 0) for business_id, review_count in rows]
+
+
+class WorkerStats:
+    """Per-thread counters, merged once the phase ends"""
+
+    def __init__(self):
+        self.reads = {}
+        self.writes = []
+        self.read_errors = 0
+        self.retries = 0
+        self.deadlocks = 0
+        self.aborts = 0
+
+    def merge(self, other):
+        for name, latencies in other.reads.items():
+            self.reads.setdefault(name, []).extend(latencies)
+        self.writes += other.writes
+        self.read_errors += other.read_errors
+        self.retries += other.retries
+        self.deadlocks += other.deadlocks
+        self.aborts += other.aborts
+
+
+# --- PostgreSQL -------------------------------------------------------------
+
+def pg_read(conn, query_info, params):
+    cur = conn.cursor()
+    try:
+        cur.execute(query_info['pg'], params)
+        cur.fetchall()
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def pg_write(conn, reviews, stats, max_retries):
+    """Insert reviews and update their businesses in one transaction, retrying deadlocks and serialization failures"""
+    cur = conn.cursor()
+    try:
+        for attempt in range(max_retries + 1):
+            try:
+                execute_values(cur, PG_INSERT['reviews'], [pg_values('reviews', review) for review in reviews])
+                for review in reviews:
+                    cur.execute(PG_UPDATE_AGGREGATE, review)
+                conn.commit()
+                return True
+            except RETRYABLE_PG_ERRORS as e:
+                conn.rollback()
+                if isinstance(e, errors.DeadlockDetected):
+                    stats.deadlocks += 1
+                if attempt < max_retries:
+                    stats.retries += 1
+            except Exception:
+                conn.rollback()
+                break
+        stats.aborts += 1
+        return False
+    finally:
+        cur.close()
+
+
+class PgLockWaitSampler:
+    """Poll pg_stat_activity in a background thread and count backends waiting on locks"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.samples = 0
+        self.waiting_samples = 0
+        self.max_waiting = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        conn = get_pg_connection()
+        conn.autocommit = True
+        cur = conn.cursor()
+        try:
+            while not self._stop.is_set():
+                cur.execute("""
+                    SELECT COUNT(*) FROM pg_stat_activity
+                    WHERE datname = current_database() AND wait_event_type = 'Lock'
+                """)
+                waiting = cur.fetchone()[0]
+                self.samples += 1
+                self.waiting_samples += 1 if waiting else 0
+                self.max_waiting = max(self.max_waiting, waiting)
+                self._stop.wait(self.interval)
+        finally:
+            cur.close()
+            put_pg_connection(conn)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def pg_counters(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT pg_stat_clear_snapshot()")
+    cur.execute("SELECT deadlocks, xact_rollback FROM pg_stat_database WHERE datname = current_database()")
+    deadlocks, rollbacks = cur.fetchone()
+    cur.close()
+    conn.commit()
+    return {'deadlocks': deadlocks, 'rollbacks': rollbacks}
+
+
+# --- MongoDB ----------------------------------------------------------------
+
+def mongo_write(db, reviews, stats, use_transactions):
+    """Insert reviews and update their businesses, in a transaction when the server supports it"""
+    documents = [mongo_document('reviews', review) for review in reviews]
+    updates = [mongo_aggregate_update(review) for review in reviews]
+
+    if not use_transactions:
+        try:
+            db.reviews.insert_many(documents, ordered=False)
+            for query, update in updates:
+                db.businesses.update_one(query, update)
+            return True
+        except Exception:
+            stats.aborts += 1
+            return False
+
+    attempts = []
+
+    def transaction(session):
+        attempts.append(1)
+        db.reviews.insert_many(documents, session=session)
+        for query, update in updates:
+            db.businesses.update_one(query, update, session=session)
+
+    try:
+        with db.client.start_session() as session:
+            # with_transaction retries transient errors such as write conflicts
+            session.with_transaction(transaction)
+        return True
+    except Exception:
+        stats.aborts += 1
+        return False
+    finally:
+        stats.retries += max(len(attempts) - 1, 0)
+
+
+def mongo_counters(db):
+    status = db.client.admin.command('serverStatus')
+    lock_waits = 0
+    for lock in status.get('locks', {}).values():
+        lock_waits += sum(lock.get('acquireWaitCount', {}).values())
+    return {
+        'lock_waits': lock_waits,
+        'write_conflicts': status.get('metrics', {}).get('operation', {}).get('writeConflicts', 0),
+        'transactions_aborted': status.get('transactions', {}).get('totalAborted', 0),
+    }
+
+
+# --- Workers ----------------------------------------------------------------
+
+def worker(engine, ctx, worker_id, read_ratio, stop_at, stats):
+    """Run reads and writes until `stop_at`, recording latencies in `stats`"""
+    seed = ctx['seed'] + worker_id
+    rng = random.Random(seed)
+    writer = ctx['writer'].fork(seed)
+    params = {source: ParamGenerator(source, pool, ctx['distribution'], ctx['skew'], seed)
+              for source, pool in ctx['pools'].items()}
+    conn = get_pg_connection() if engine == 'postgresql' else None
+    db = ctx['mongo_db']
+
+    try:
+        while time.perf_counter() < stop_at:
+            if rng.random() < read_ratio:
+                query_name = rng.choice(ctx['read_queries'])
+                query_info = QUERIES[query_name]
+                source = query_info.get('param_source')
+                sampled = params[source].sample()[0] if source in params else None
+                query_arguments = query_params(query_info, sampled)
+                start = time.perf_counter()
+                try:
+                    if engine == 'postgresql':
+                        pg_read(conn, query_info, query_arguments)
+                    else:
+                        query_info['mongo'](db, query_arguments)
+                except Exception:
+                    if conn is not None:
+                        conn.rollback()
+                    stats.read_errors += 1
+                    continue
+                stats.reads.setdefault(query_name, []).append((time.perf_counter() - start) * 1000)
+            else:
+                reviews = writer.rows('reviews', ctx['reviews_per_txn'])
+                start = time.perf_counter()
+                if engine == 'postgresql':
+                    ok = pg_write(conn, reviews, stats, ctx['max_retries'])
+                else:
+                    ok = mongo_write(db, reviews, stats, ctx['use_transactions'])
+                if ok:
+                    stats.writes.append((time.perf_counter() - start) * 1000)
+    finally:
+        put_pg_connection(conn)
+
+
+def run_phase(engine, ctx, read_ratio, duration, workers):
+    """Run one phase on one engine, returning merged worker stats and contention counters"""
+    stop_at = time.perf_counter() + duration
+    per_worker = [WorkerStats() for _ in range(workers)]
+    threads = [threading.Thread(target=worker, args=(engine, ctx, i, read_ratio, stop_at, per_worker[i]))
+               for i in range(workers)]
+
+    if engine == 'postgresql':
+        before = pg_counters(ctx['pg_conn'])
+        with PgLockWaitSampler() as sampler:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        after = pg_counters(ctx['pg_conn'])
+        contention = {
+            'lock_waits': f"{sampler.waiting_samples}/{sampler.samples} samples (max {sampler.max_waiting})",
+            'server_deadlocks': after['deadlocks'] - before['deadlocks'],
+            'write_conflicts': "N/A",
+        }
+    else:
+        before = mongo_counters(ctx['mongo_db'])
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        after = mongo_counters(ctx['mongo_db'])
+        contention = {
+            'lock_waits': after['lock_waits'] - before['lock_waits'],
+            'server_deadlocks': "N/A",
+            'write_conflicts': after['write_conflicts'] - before['write_conflicts'],
+            'transactions_aborted': after['transactions_aborted'] - before['transactions_aborted'],
+        }
+
+    stats = WorkerStats()
+    for worker_stats in per_worker:
+        stats.merge(worker_stats)
+    return {'engine': engine, 'read_ratio': read_ratio, 'duration': duration, 'stats': stats, 'contention': contention}
+
+
+# --- Reporting --------------------------------------------------------------
+
+def _fmt(value):
+    return "N/A" if value is None else f"{value:.2f}ms"
+
+
+def print_report(phases):
+    rows = []
+    for phase in phases:
+        stats, contention = phase['stats'], phase['contention']
+        reads = [latency for latencies in stats.reads.values() for latency in latencies]
+        rows.append([
+            phase['engine'],
+            phase['name'],
+            f"{len(reads) / phase['duration']:.1f}",
+            _fmt(percentile(reads, 50)),
+            _fmt(percentile(reads, 99)),
+            f"{len(stats.writes) / phase['duration']:.1f}",
+            _fmt(percentile(stats.writes, 50)),
+            _fmt(percentile(stats.writes, 99)),
+            stats.retries,
+            stats.deadlocks,
+            contention['server_deadlocks'],
+            stats.aborts,
+            contention['lock_waits'],
+            contention['write_conflicts'],
+            stats.read_errors,
+        ])
+    print("\n=== Mixed Workload ===")
+    print(tabulate(rows, headers=["Engine", "Phase", "Reads/s", "Read p50", "Read p99", "Writes/s", "Write p50",
+                                  "Write p99", "Retries", "Deadlocks", "Server Deadlocks", "Aborts", "Lock Waits",
+                                  "Write Conflicts", "Read Errors"], tablefmt="grid"))
+
+    by_engine = {}
+    for phase in phases:
+        by_engine.setdefault(phase['engine'], {})[phase['name']] = phase['stats'].reads
+    rows = []
+    for engine, engine_phases in by_engine.items():
+        if 'read-only' not in engine_phases or 'mixed' not in engine_phases:
+            continue
+        for query_name in sorted(set(engine_phases['read-only']) | set(engine_phases['mixed'])):
+            alone = engine_phases['read-only'].get(query_name, [])
+            mixed = engine_phases['mixed'].get(query_name, [])
+            alone_p50 = statistics.median(alone) if alone else None
+            mixed_p50 = statistics.median(mixed) if mixed else None
+            rows.append([
+                engine, query_name, _fmt(alone_p50), _fmt(mixed_p50),
+                f"{mixed_p50 / alone_p50:.2f}x" if alone_p50 and mixed_p50 else "N/A",
+                _fmt(percentile(alone, 99)), _fmt(percentile(mixed, 99)),
+            ])
+    if rows:
+        print("\n=== Read Latency Under Write Pressure ===")
+        print(tabulate(rows, headers=["Engine", "Query", "Read-only p50", "Mixed p50", "Slowdown",
+                                      "Read-only p99", "Mixed p99"], tablefmt="grid"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a mixed read/write workload with write hotspots on both engines')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES, help='Engines to run (default: both)')
+    parser.add_argument('--read-ratio', type=float, default=0.9, help='Fraction of operations that are reads (default: 0.9)')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds per phase (default: 60)')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent worker threads (default: 8)')
+    parser.add_argument('--queries', nargs='+', help='Read queries (default: all queries of --classes)')
+    parser.add_argument('--classes', nargs='+', choices=list(QUERY_CLASSES),
+                        help='Query classes used for reads (default: all but review_search and large_scan, '
+                             'and geo unless the geo index configuration is applied)')
+    parser.add_argument('--hot-city', default='Philadelphia', help='City whose businesses receive the writes (default: Philadelphia)')
+    parser.add_argument('--hot-state', default='PA', help='State of --hot-city (default: PA)')
+    parser.add_argument('--hot-businesses', type=int, default=100, help='Size of the write hotspot (default: 100)')
+    parser.add_argument('--hot-skew', type=float, default=1.2,
+                        help='Zipf exponent over the hotspot businesses; higher means more contention (default: 1.2)')
+    parser.add_argument('--reviews-per-txn', type=int, default=2,
+                        help='Reviews (and business updates) per write transaction (default: 2)')
+    parser.add_argument('--max-retries', type=int, default=3, help='PostgreSQL retries of a deadlocked write transaction (default: 3)')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='zipf', help='Read parameter distribution (default: zipf)')
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent for read parameters (default: 1.0)')
+    parser.add_argument('--pool-size', type=int, default=1000, help='Distinct values per read parameter source (default: 1000)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    parser.add_argument('--no-baseline', action='store_true', help='Skip the read-only phase')
+    args = parser.parse_args()
+
+    if not 0 <= args.read_ratio <= 1:
+        parser.error("--read-ratio must be between 0 and 1")
+
+    # One pooled connection per worker, plus the main and lock-sampler connections
+    get_pg_pool(maxconn=args.workers + 2)
+    pg_conn, mongo_db, mongo_client = init_connections()
+    try:
+        if args.classes is None:
+            args.classes = list(DEFAULT_READ_CLASSES)
+            if config_applied(pg_conn, mongo_db, GEO_INDEX_CONFIG):
+                args.classes.append('geo')
+        read_queries = [name for name in (args.queries or list(QUERIES))
+                        if name in QUERIES and (args.queries or QUERIES[name].get('class') in args.classes)]
+        if args.read_ratio > 0 and not read_queries:
+            parser.error("No read queries selected")
+
+        leftover = load_snapshot()
+        if leftover:
+            print("Cleaning up rows left by a previous run...")
+            cleanup(pg_conn, mongo_db, leftover)
+            os.remove(SNAPSHOT_PATH)
+
+        print("Sampling read parameters, users, ratings and texts...")
+        sources = {QUERIES[name]['param_source'] for name in read_queries if QUERIES[name].get('param_source')}
+        pools = {source: load_param_pool(pg_conn, source, args.pool_size) for source in sources}
+
+        hot_pool = load_hotspot_pool(pg_conn, args.hot_city, args.hot_state, args.hot_businesses)
+        if not hot_pool:
+            parser.error(f"No businesses found in {args.hot_city}, {args.hot_state}")
+        writer = WriteGenerator(pg_conn, 'zipf', args.skew, args.seed, args.pool_size)
+        writer.businesses = ParamGenerator('business_id', hot_pool, 'zipf', args.hot_skew, args.seed)
+
+        use_transactions = 'mongodb' in args.engines and transactions_supported(mongo_client)
+        if 'mongodb' in args.engines and not use_transactions:
+            print("MongoDB is not a replica set; its writes run without a transaction")
+
+        ctx = {
+            'pg_conn': pg_conn,
+            'mongo_db': mongo_db,
+            'read_queries': read_queries,
+            'pools': pools,
+            'writer': writer,
+            'distribution': args.distribution,
+            'skew': args.skew,
+            'seed': args.seed,
+            'reviews_per_txn': args.reviews_per_txn,
+            'max_retries': args.max_retries,
+            'use_transactions': use_transactions,
+        }
+
+        snapshot = save_snapshot(pg_conn, mongo_db, writer.business_ids())
+        phases = []
+        try:
+            for engine in args.engines:
+                plan = [('mixed', args.read_ratio)]
+                if not args.no_baseline and args.read_ratio > 0:
+                    plan.insert(0, ('read-only', 1.0))
+                for name, ratio in plan:
+                    print(f"\n{engine}: {name} phase ({ratio:.0%} reads, {args.workers} workers, {args.duration:.0f}s)...")
+                    phase = run_phase(engine, ctx, ratio, args.duration, args.workers)
+                    phase['name'] = name
+                    phases.append(phase)
+        finally:
+            cleanup(pg_conn, mongo_db, snapshot)
+            os.remove(SNAPSHOT_PATH)
+
+        print_report(phases)
+    finally:
+        close_connections(pg_conn, mongo_client)
+
+
+if __name__ == "__main__":
+    main()
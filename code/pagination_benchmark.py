@@ -0,0 +1,185 @@
+"""
+Deep pagination benchmark: OFFSET/$skip vs keyset (seek) pagination.
+
+Every paginated listing in queries/benchmark_queries.py has an offset and a
+keyset query (see their `pagination` entries). For each requested page
+number both are timed on each engine; the keyset cursor for page N is the
+sort key of the last row of page N-1, looked up (untimed) with the offset
+query on the same engine. Reported per page: median latency of each strategy,
+the keyset speedup and whether both strategies returned the same rows.
+
+Run under the `pagination` index configuration for indexes covering the
+complete sort keys, or pass several --index-configs to compare.
+"""
+import argparse
+import csv
+import os
+import statistics
+import time
+import functools
+print = functools.partial(print, flush=True)
+
+from tabulate import tabulate
+
+from benchmark import init_connections, close_connections, resolve_params, get_timestamp_str, QUERIES
+from index_registry import load_index_configs, apply_postgres_config, apply_mongo_config, detect_index_config
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+ENGINES = ['postgresql', 'mongodb']
+
+
+def paginated_listings():
+    """Listing name -> {'offset': query name, 'keyset': query name}"""
+    listings = {}
+    for name, info in QUERIES.items():
+        if 'pagination' in info:
+            listings.setdefault(info['pagination']['listing'], {})[info['pagination']['strategy']] = name
+    return {listing: strategies for listing, strategies in listings.items()
+            if 'offset' in strategies and 'keyset' in strategies}
+
+
+def fetch_page(engine, query_info, target, params):
+    """Run a page query; PostgreSQL rows are returned as dicts keyed by column name"""
+    if engine == 'postgresql':
+        cur = target.cursor()
+        try:
+            cur.execute(query_info['pg'], params)
+            names = [column[0] for column in cur.description]
+            rows = [dict(zip(names, row)) for row in cur.fetchall()]
+        finally:
+            cur.close()
+        target.commit()
+        return rows
+    return query_info['mongo'](target, params)
+
+
+def row_id(engine, row):
+    return next(iter(row.values())) if engine == 'postgresql' else row['_id']
+
+
+def keyset_cursor(engine, offset_info, keyset_info, target, params, page, page_size):
+    """Cursor parameters positioned after the last row of page `page - 1`; None past the end of the listing"""
+    if page == 1:
+        return {}
+    rows = fetch_page(engine, offset_info, target, {**params, 'offset': (page - 1) * page_size - 1, 'page_size': 1})
+    if not rows:
+        return None
+    column = 0 if engine == 'postgresql' else 1
+    return {param: rows[0][fields[column]] for param, fields in keyset_info['pagination']['cursor'].items()}
+
+
+def time_page(engine, query_info, target, params, iterations):
+    """Median latency in ms over `iterations` runs after one warm-up run, and the rows of the page"""
+    rows = fetch_page(engine, query_info, target, params)
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fetch_page(engine, query_info, target, params)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies), rows
+
+
+def benchmark_listing(pg_conn, mongo_db, listing, strategies, engines, pages, page_size, iterations):
+    offset_info, keyset_info = QUERIES[strategies['offset']], QUERIES[strategies['keyset']]
+    offset_params = resolve_params(pg_conn, offset_info, {'page_size': page_size})
+    keyset_params = resolve_params(pg_conn, keyset_info, {'page_size': page_size})
+    results = []
+    for engine in engines:
+        target = pg_conn if engine == 'postgresql' else mongo_db
+        for page in pages:
+            cursor = keyset_cursor(engine, offset_info, keyset_info, target, offset_params, page, page_size)
+            if cursor is None:
+                print(f"  {engine}: page {page} is past the end of {listing}; skipping deeper pages")
+                break
+            print(f"  {engine}: page {page}...")
+            offset_ms, offset_rows = time_page(engine, offset_info, target,
+                                               {**offset_params, 'offset': (page - 1) * page_size}, iterations)
+            keyset_ms, keyset_rows = time_page(engine, keyset_info, target, {**keyset_params, **cursor}, iterations)
+            results.append({
+                'listing': listing,
+                'engine': engine,
+                'page': page,
+                'offset': (page - 1) * page_size,
+                'rows': len(offset_rows),
+                'offset_ms': offset_ms,
+                'keyset_ms': keyset_ms,
+                'same_rows': [row_id(engine, row) for row in offset_rows] == [row_id(engine, row) for row in keyset_rows],
+            })
+    return results
+
+
+HEADERS = ["Config", "Listing", "Engine", "Page", "Offset", "Rows", "OFFSET/$skip", "Keyset", "Speedup", "Same Rows"]
+
+
+def summary_row(config, result):
+    speedup = result['offset_ms'] / result['keyset_ms'] if result['keyset_ms'] else None
+    return [config, result['listing'], result['engine'], result['page'], result['offset'], result['rows'],
+            f"{result['offset_ms']:.2f}ms", f"{result['keyset_ms']:.2f}ms",
+            "N/A" if speedup is None else f"{speedup:.2f}x", "yes" if result['same_rows'] else "no"]
+
+
+def save_csv(rows, results_dir):
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"pagination_benchmark_{get_timestamp_str()}.csv")
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        writer.writerows(rows)
+    return path
+
+
+def main():
+    listings = paginated_listings()
+    parser = argparse.ArgumentParser(description='Compare OFFSET/$skip and keyset pagination latency by page depth')
+    parser.add_argument('--listings', nargs='+', choices=list(listings), default=list(listings),
+                        help='Paginated listings to benchmark (default: all)')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES, help='Engines to benchmark (default: both)')
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 50, 100, 500],
+                        help='Page numbers to fetch, starting at 1 (default: 1 10 50 100 500)')
+    parser.add_argument('--page-size', type=int, default=20, help='Rows per page (default: 20)')
+    parser.add_argument('--iterations', type=int, default=5, help='Timed runs per page and strategy (default: 5)')
+    parser.add_argument('--index-configs', nargs='+', default=None,
+                        help='Index configurations to benchmark under, applied in turn (default: current indexes)')
+    parser.add_argument('--final-config', default=None, help='Index configuration to leave applied when done')
+    parser.add_argument('--results-dir', type=str, default=RESULTS_DIR, help='Directory to save results (default: ./results)')
+    args = parser.parse_args()
+
+    if any(page < 1 for page in args.pages):
+        parser.error("--pages start at 1")
+    configs = load_index_configs()
+    unknown = [name for name in (args.index_configs or []) + ([args.final_config] if args.final_config else [])
+               if name not in configs]
+    if unknown:
+        parser.error(f"Unknown index configuration(s): {', '.join(unknown)}")
+
+    pg_conn, mongo_db, mongo_client = init_connections()
+    try:
+        rows = []
+        for config_name in args.index_configs or [None]:
+            if config_name:
+                print(f"\n=== Index configuration: {config_name} ===")
+                apply_postgres_config(pg_conn, configs[config_name])
+                apply_mongo_config(mongo_db, configs[config_name])
+            label = config_name or detect_index_config(pg_conn, mongo_db)
+
+            for listing in args.listings:
+                print(f"Paging through {listing}...")
+                for result in benchmark_listing(pg_conn, mongo_db, listing, listings[listing], args.engines,
+                                                sorted(set(args.pages)), args.page_size, args.iterations):
+                    rows.append(summary_row(label, result))
+
+        print(f"\n=== Pagination Latency by Page Depth (page size {args.page_size}) ===")
+        print(tabulate(rows, headers=HEADERS, tablefmt="grid"))
+        print(f"\nResults saved to {save_csv(rows, args.results_dir)}")
+
+        if args.final_config:
+            print(f"\nRestoring index configuration '{args.final_config}'...")
+            apply_postgres_config(pg_conn, configs[args.final_config])
+            apply_mongo_config(mongo_db, configs[args.final_config])
+    finally:
+        close_connections(pg_conn, mongo_client)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Parameter generators for templated benchmark queries.
+
+Each parameter source samples real values from the loaded data (both engines
+hold the same dataset, so values are read from PostgreSQL). Every value is
+ranked by how many rows it matches and the ranking is cut into pool_size
+equal strata; the most frequent value of each stratum makes up the pool, so
+it spans the whole distribution down to the rarest values. The pool is loaded
+once and parameters are then drawn uniformly or from a Zipfian distribution
+over its ranking. Every sample is tagged with a frequency bucket so latency
+can be reported separately for high- and low-cardinality keys.
+"""
+import bisect
+import datetime
+import random
+
+PARAM_SOURCES = {
+    'city_state': {
+        'description': 'City and state of businesses, weighted by number of businesses',
+        'sql': """
+            SELECT city, state, COUNT(*) AS weight
+            FROM businesses
+            GROUP BY city, state
+        """,
+        'fields': ['city', 'state'],
+    },
+    'business_id': {
+        'description': 'Business ids, weighted by review count',
+        'sql': """
+            SELECT business_id, review_count AS weight
+            FROM businesses
+        """,
+        'fields': ['business_id'],
+    },
+    'user_id': {
+        'description': 'User ids, weighted by review count',
+        'sql': """
+            SELECT user_id, review_count AS weight
+            FROM users
+        """,
+        'fields': ['user_id'],
+    },
+    'business_location': {
+        'description': 'Business locations, weighted by review count',
+        'sql': """
+            SELECT latitude, longitude, review_count AS weight
+            FROM businesses
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        """,
+        'fields': ['latitude', 'longitude'],
+    },
+    'date_window': {
+        'description': 'Month-long review date windows, weighted by number of reviews',
+        'sql': """
+            SELECT date_trunc('month', date)::date AS start_date, COUNT(*) AS weight
+            FROM reviews
+            GROUP BY 1
+        """,
+        'fields': ['start_date'],
+    },
+}
+
+# One value per rank stratum of a source's (fields..., weight) rows
+STRATIFIED_POOL_SQL = """
+    SELECT DISTINCT ON (stratum) {fields}, weight
+    FROM (
+        SELECT keys.*, NTILE(%(pool_size)s) OVER (ORDER BY weight DESC NULLS LAST, {fields}) AS stratum
+        FROM ({sql}) AS keys
+    ) AS ranked
+    ORDER BY stratum, weight DESC NULLS LAST, {fields}
+"""
+
+DISTRIBUTIONS = ['uniform', 'zipf']
+BUCKETS = ['high', 'mid', 'low']
+
+
+def _to_param(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def _date_window(params, days=31):
+    start = datetime.datetime.strptime(params['start_date'], '%Y-%m-%d')
+    params['end_date'] = (start + datetime.timedelta(days=days)).strftime('%Y-%m-%d')
+    return params
+
+
+class ParamGenerator:
+    """Seeded sampler over a pool of (params, weight) values ranked by weight"""
+
+    def __init__(self, source, pool, distribution='uniform', skew=1.0, seed=42):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution '{distribution}'. Choose from: {', '.join(DISTRIBUTIONS)}")
+        if not pool:
+            raise ValueError(f"No values available for parameter source '{source}'")
+
+        self.source = source
+        self.distribution = distribution
+        self.skew = skew
+        self.seed = seed
+        self.pool = sorted(pool, key=lambda item: item[1], reverse=True)
+        self.rng = random.Random(seed)
+
+        if distribution == 'zipf':
+            weights = [1.0 / (rank ** skew) for rank in range(1, len(self.pool) + 1)]
+        else:
+            weights = [1.0] * len(self.pool)
+        self.cum_weights = []
+        total = 0.0
+        for weight in weights:
+            total += weight
+            self.cum_weights.append(total)
+
+        # Bucket boundaries split the ranking into thirds by value frequency
+        third = max(1, len(self.pool) // 3)
+        self.bucket_bounds = [third, 2 * third]
+
+    def bucket(self, rank):
+        return BUCKETS[bisect.bisect_right(self.bucket_bounds, rank)]
+
+    def sample(self):
+        """Return (params, bucket) for one sampled value"""
+        rank = bisect.bisect_left(self.cum_weights, self.rng.random() * self.cum_weights[-1])
+        rank = min(rank, len(self.pool) - 1)
+        params = dict(self.pool[rank][0])
+        if self.source == 'date_window':
+            params = _date_window(params)
+        return params, self.bucket(rank)
+
+    def samples(self, n):
+        return [self.sample() for _ in range(n)]
+
+
+def load_param_pool(conn, source, pool_size=1000):
+    """Load the (params, weight) pool for a parameter source from PostgreSQL"""
+    if source not in PARAM_SOURCES:
+        raise KeyError(f"Unknown parameter source '{source}'. Available: {', '.join(PARAM_SOURCES)}")
+    spec = PARAM_SOURCES[source]
+    cursor = conn.cursor()
+    try:
+        sql = STRATIFIED_POOL_SQL.format(fields=', '.join(spec['fields']), sql=spec['sql'])
+        cursor.execute(sql, {'pool_size': pool_size})
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return [({field: _to_param(value) for field, value in zip(spec['fields'], row[:-1])}, row[-1] or 0)
+            for row in rows]
+
+
+def load_param_generator(conn, source, distribution='uniform', skew=1.0, seed=42, pool_size=1000):
+    return ParamGenerator(source, load_param_pool(conn, source, pool_size), distribution, skew, seed)
+
+
+def top_params(conn, source):
+    """Parameters for the most frequent value of a source, used to fill query defaults left as None"""
+    pool = load_param_pool(conn, source, pool_size=1)
+    if not pool:
+        return {}
+    params = dict(pool[0][0])
+    if source == 'date_window':
+        params = _date_window(params)
+    return params
@@ -0,0 +1,246 @@
+"""
+Post-load planner statistics for PostgreSQL.
+
+The statistics stage, run by reset_load_postgres.py after loading (or on its
+own with this script):
+
+1. raises the per-column statistics target of the hot filter, join and
+   grouping columns, so their most-common-value lists and histograms are
+   fine-grained enough for skewed values such as large cities
+2. creates extended statistics on correlated column groups (functional
+   dependencies, n-distinct and multi-column MCV lists), e.g. (city, state):
+   without them the planner multiplies the selectivities of
+   city = 'Philadelphia' AND state = 'PA' as if they were independent
+3. creates expression statistics on the JSONB attribute keys the queries
+   filter on (attributes->>'RestaurantsDelivery' = 'True', ...), which
+   otherwise get a fixed default selectivity
+4. runs ANALYZE on every table
+
+--compare shows what the stage changes: statistics are reset to plain
+ANALYZE defaults, the PostgreSQL queries are explained, the stage is applied
+and the queries are explained again, and the estimated vs actual rows of
+every plan node are reported before and after. The stage itself needs no
+part of the benchmark harness (the loader imports it), so --compare imports
+the queries and engines only when it runs.
+"""
+import argparse
+import time
+
+import functools
+print = functools.partial(print, flush=True)
+
+from tabulate import tabulate
+
+from db_pool import get_pg_connection, put_pg_connection
+from plan_model import parse_postgres_plan, node_label, ESTIMATE_ERROR_THRESHOLD
+
+TABLES = ('businesses', 'users', 'reviews', 'tips', 'checkins')
+DEFAULT_STATISTICS_TARGET = 1000
+
+# Filter, join and grouping columns whose statistics target is raised
+HOT_COLUMNS = {
+    'businesses': ['city', 'state', 'postal_code', 'stars', 'review_count', 'is_open'],
+    'reviews': ['business_id', 'user_id', 'stars', 'date'],
+    'tips': ['business_id', 'user_id', 'date'],
+    'users': ['review_count', 'yelping_since', 'fans'],
+    'checkins': ['business_id'],
+}
+
+# Extended statistics: correlated column groups and hot JSONB keys. `kinds` is
+# omitted for a single expression, which gets plain expression statistics.
+EXTENDED_STATISTICS = [
+    {'name': 'stx_businesses_city_state', 'table': 'businesses',
+     'kinds': ['dependencies', 'ndistinct', 'mcv'], 'columns': ['city', 'state']},
+    {'name': 'stx_businesses_postal_code_city_state', 'table': 'businesses',
+     'kinds': ['dependencies', 'ndistinct'], 'columns': ['postal_code', 'city', 'state']},
+    {'name': 'stx_businesses_open_stars', 'table': 'businesses',
+     'kinds': ['mcv'], 'columns': ['is_open', 'stars']},
+    {'name': 'stx_businesses_attr_dining', 'table': 'businesses',
+     'kinds': ['dependencies', 'mcv'],
+     'columns': ["(attributes->>'Alcohol')", "(attributes->>'GoodForDancing')",
+                 "(attributes->>'RestaurantsReservations')", "(attributes->>'RestaurantsGoodForGroups')"]},
+    {'name': 'stx_businesses_attr_delivery', 'table': 'businesses',
+     'kinds': ['dependencies', 'mcv'],
+     'columns': ["(attributes->>'RestaurantsDelivery')", "(attributes->>'RestaurantsTakeOut')"]},
+    {'name': 'stx_businesses_attr_dogs', 'table': 'businesses',
+     'columns': ["(attributes->>'DogsAllowed')"]},
+    {'name': 'stx_businesses_attr_parking', 'table': 'businesses',
+     'columns': ["(attributes->>'BusinessParking')"]},
+]
+
+
+def extended_statistics_sql(stat):
+    """Build the CREATE STATISTICS statement for an EXTENDED_STATISTICS entry"""
+    kinds = f" ({', '.join(stat['kinds'])})" if stat.get('kinds') else ""
+    return (f"CREATE STATISTICS IF NOT EXISTS {stat['name']}{kinds} "
+            f"ON {', '.join(stat['columns'])} FROM {stat['table']}")
+
+
+def set_statistics_targets(conn, target, columns=HOT_COLUMNS):
+    """Set the statistics target of every hot column (-1 restores default_statistics_target)"""
+    cur = conn.cursor()
+    for table, names in columns.items():
+        for name in names:
+            cur.execute(f"ALTER TABLE {table} ALTER COLUMN {name} SET STATISTICS {int(target)}")
+    conn.commit()
+    cur.close()
+
+
+def create_extended_statistics(conn, stats=EXTENDED_STATISTICS):
+    cur = conn.cursor()
+    for stat in stats:
+        try:
+            cur.execute(extended_statistics_sql(stat))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"  Warning: could not create {stat['name']}: {e}")
+    cur.close()
+
+
+def drop_extended_statistics(conn, stats=EXTENDED_STATISTICS):
+    cur = conn.cursor()
+    for stat in stats:
+        cur.execute(f"DROP STATISTICS IF EXISTS {stat['name']}")
+    conn.commit()
+    cur.close()
+
+
+def analyze_tables(conn, tables=TABLES):
+    """ANALYZE each table, returning the time each one took in seconds"""
+    cur = conn.cursor()
+    times = {}
+    for table in tables:
+        start = time.perf_counter()
+        cur.execute(f"ANALYZE {table}")
+        conn.commit()
+        times[table] = time.perf_counter() - start
+    cur.close()
+    return times
+
+
+def run_statistics_stage(conn, target=DEFAULT_STATISTICS_TARGET):
+    """Raise hot-column statistics targets, create extended statistics and ANALYZE"""
+    print(f"Setting statistics target {target} on {sum(len(names) for names in HOT_COLUMNS.values())} hot columns...")
+    set_statistics_targets(conn, target)
+    print(f"Creating {len(EXTENDED_STATISTICS)} extended statistics objects...")
+    create_extended_statistics(conn)
+    times = analyze_tables(conn)
+    print("ANALYZE: " + ", ".join(f"{table} {seconds:.1f}s" for table, seconds in times.items()))
+    return times
+
+
+def reset_statistics(conn):
+    """Drop the extended statistics, restore default targets and re-ANALYZE"""
+    drop_extended_statistics(conn)
+    set_statistics_targets(conn, -1)
+    return analyze_tables(conn)
+
+
+def explain_queries(conn, queries, resolve_params, run_explain):
+    """Parsed EXPLAIN ANALYZE plan of each PostgreSQL query in `queries` (name -> query info)"""
+    plans = {}
+    for query_name, query_info in queries.items():
+        if 'pg' not in query_info:
+            continue
+        print(f"  Explaining {query_name}...")
+        params = resolve_params(conn, query_info)
+        plans[query_name] = parse_postgres_plan(run_explain(conn, query_info['pg'], params))
+        conn.rollback()
+    return plans
+
+
+def _shape(plan):
+    return [(depth, node.operator, node.relation) for depth, node in plan.root.walk()] if plan.root else []
+
+
+def _fmt_estimate(node, threshold):
+    if node.estimate_error is None:
+        return "N/A"
+    flag = " !" if node.estimate_error >= threshold else ""
+    return f"{node.estimated_rows:.0f} / {node.actual_rows:.0f} ({node.estimate_error:.1f}x){flag}"
+
+
+def _fmt_ms(value):
+    return "N/A" if value is None else f"{value:.2f}ms"
+
+
+def print_node_comparison(query_name, before, after, threshold=ESTIMATE_ERROR_THRESHOLD):
+    """Estimated / actual rows per plan node, side by side when the plan shape did not change"""
+    if _shape(before) == _shape(after):
+        rows = [[node_label(depth, old), _fmt_estimate(old, threshold), _fmt_estimate(new, threshold)]
+                for (depth, old), (_, new) in zip(before.root.walk(), after.root.walk())]
+        print(f"\n=== Row estimates: {query_name} (same plan) ===")
+        print(tabulate(rows, headers=["Node", "Before: Est / Actual", "After: Est / Actual"], tablefmt="grid"))
+        return
+    for label, plan in (("before", before), ("after", after)):
+        rows = [[node_label(depth, node), _fmt_estimate(node, threshold)]
+                for depth, node in (plan.root.walk() if plan.root else [])]
+        print(f"\n=== Row estimates: {query_name} ({label}, plan changed) ===")
+        print(tabulate(rows, headers=["Node", "Est / Actual"], tablefmt="grid"))
+
+
+def print_estimate_comparison(before, after, details=True, threshold=ESTIMATE_ERROR_THRESHOLD):
+    rows = []
+    for query_name, old in before.items():
+        new = after.get(query_name)
+        if new is None or old.root is None or new.root is None:
+            continue
+        if details:
+            print_node_comparison(query_name, old, new, threshold)
+        old_stats, new_stats = old.estimate_summary(threshold), new.estimate_summary(threshold)
+        rows.append([
+            query_name,
+            "no" if _shape(old) == _shape(new) else "yes",
+            f"{old_stats['max_error'] or 1:.1f}x -> {new_stats['max_error'] or 1:.1f}x",
+            f"{old_stats['geomean_error'] or 1:.2f}x -> {new_stats['geomean_error'] or 1:.2f}x",
+            f"{old_stats['misestimated']} -> {new_stats['misestimated']}",
+            f"{_fmt_ms(old.execution_time_ms)} -> {_fmt_ms(new.execution_time_ms)}",
+        ])
+    print(f"\n=== Row estimate error before -> after the statistics stage (misestimated: {threshold:.0f}x or more) ===")
+    print(tabulate(rows, headers=["Query", "Plan Changed", "Max Error", "Geomean Error", "Misestimated",
+                                  "Execution Time"], tablefmt="grid"))
+
+
+def main():
+    # The benchmark harness is only needed by --compare, not by the loader importing this module
+    from benchmark import resolve_params, QUERIES, QUERY_CLASSES
+    from engines import run_postgres_explain
+
+    parser = argparse.ArgumentParser(description='Create planner statistics after loading PostgreSQL')
+    parser.add_argument('--target', type=int, default=DEFAULT_STATISTICS_TARGET,
+                        help='Statistics target for the hot columns (default: 1000)')
+    parser.add_argument('--reset', action='store_true',
+                        help='Drop the extended statistics, restore default targets and re-ANALYZE instead')
+    parser.add_argument('--compare', action='store_true',
+                        help='Report row estimate errors with default statistics and after the stage')
+    parser.add_argument('--queries', nargs='+', help='Queries explained by --compare (default: all)')
+    parser.add_argument('--classes', nargs='+', choices=list(QUERY_CLASSES), help='Only explain queries of these classes')
+    parser.add_argument('--summary-only', action='store_true', help='With --compare, skip the per-node tables')
+    args = parser.parse_args()
+
+    pg_conn = get_pg_connection()
+    try:
+        if args.reset:
+            reset_statistics(pg_conn)
+            print("Statistics reset to plain ANALYZE defaults")
+            return
+        if not args.compare:
+            run_statistics_stage(pg_conn, args.target)
+            return
+
+        query_names = [name for name in (args.queries or list(QUERIES)) if name in QUERIES]
+        if args.classes:
+            query_names = [name for name in query_names if QUERIES[name].get('class') in args.classes]
+        queries = {name: QUERIES[name] for name in query_names}
+        print("Resetting to default statistics...")
+        reset_statistics(pg_conn)
+        before = explain_queries(pg_conn, queries, resolve_params, run_postgres_explain)
+        run_statistics_stage(pg_conn, args.target)
+        after = explain_queries(pg_conn, queries, resolve_params, run_postgres_explain)
+        print_estimate_comparison(before, after, details=not args.summary_only)
+    finally:
+        put_pg_connection(pg_conn)
+
+if __name__ == "__main__":
+    main()
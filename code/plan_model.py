@@ -0,0 +1,399 @@
+"""
+Normalized plan-tree model for PostgreSQL, MongoDB, SQLite and columnar results.
+
+Both EXPLAIN (ANALYZE, FORMAT JSON) output and MongoDB explain() output (find
+and aggregate, classic and slot-based engines) are parsed into the same tree
+of PlanNode objects. SQLite has no EXPLAIN ANALYZE, so its plan is the
+EXPLAIN QUERY PLAN tree under a root carrying the measured time and row
+count; columnar runs are a single node. Row counts are totals across loops.
+Times are totals across the loops of one process: below a PostgreSQL Gather
+the loops are shared by the workers and the leader, which run concurrently,
+so a node's time is its loops' time divided by those processes. Self time
+excludes time spent in child nodes, and examined counts include every scan
+and pipeline stage, so summaries and profiles can treat both engines alike.
+"""
+import math
+from dataclasses import dataclass, field
+
+PG_SCAN_TYPES = ('Scan',)
+PG_GATHER_TYPES = ('Gather', 'Gather Merge')
+
+MONGO_CHILD_KEYS = ('inputStage', 'outerStage', 'innerStage', 'thenStage', 'elseStage')
+
+ESTIMATE_ERROR_THRESHOLD = 10.0
+
+
+@dataclass
+class PlanNode:
+    engine: str
+    operator: str
+    relation: str = None
+    actual_rows: float = None
+    estimated_rows: float = None
+    loops: int = 1
+    total_time_ms: float = None
+    self_time_ms: float = None
+    rows_examined: float = None
+    keys_examined: float = None
+    memory_kb: float = None
+    spilled: bool = False
+    spill_kb: float = None
+    workers_planned: int = None
+    workers_launched: int = None
+    details: dict = field(default_factory=dict)
+    children: list = field(default_factory=list)
+
+    def walk(self, depth=0):
+        """Yield (depth, node) for this node and all descendants"""
+        yield depth, self
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+    @property
+    def estimate_error(self):
+        """q-error between estimated and actual rows (>= 1), or None when there is no estimate"""
+        if self.estimated_rows is None or self.actual_rows is None:
+            return None
+        high, low = max(self.estimated_rows, self.actual_rows), min(self.estimated_rows, self.actual_rows)
+        return high / max(low, 1)
+
+    def to_dict(self):
+        return {
+            'operator': self.operator,
+            'relation': self.relation,
+            'actual_rows': self.actual_rows,
+            'estimated_rows': self.estimated_rows,
+            'loops': self.loops,
+            'total_time_ms': self.total_time_ms,
+            'self_time_ms': self.self_time_ms,
+            'rows_examined': self.rows_examined,
+            'keys_examined': self.keys_examined,
+            'memory_kb': self.memory_kb,
+            'spilled': self.spilled,
+            'spill_kb': self.spill_kb,
+            'workers_planned': self.workers_planned,
+            'workers_launched': self.workers_launched,
+            'details': self.details,
+            'children': [child.to_dict() for child in self.children],
+        }
+
+
+@dataclass
+class Plan:
+    engine: str
+    root: PlanNode = None
+    planning_time_ms: float = None
+    execution_time_ms: float = None
+    rows_returned: float = None
+    rows_examined: float = None
+    keys_examined: float = None
+    error: str = None
+
+    def nodes(self):
+        if self.root is None:
+            return []
+        return [node for _, node in self.root.walk()]
+
+    def hot_nodes(self, limit=5):
+        """Nodes ranked by self time, hottest first"""
+        timed = [node for node in self.nodes() if node.self_time_ms is not None]
+        return sorted(timed, key=lambda node: node.self_time_ms, reverse=True)[:limit]
+
+    def estimate_errors(self, threshold=ESTIMATE_ERROR_THRESHOLD):
+        """Nodes whose row estimate is off by at least `threshold` times"""
+        return [node for node in self.nodes() if node.estimate_error is not None and node.estimate_error >= threshold]
+
+    def estimate_summary(self, threshold=ESTIMATE_ERROR_THRESHOLD):
+        """Worst and geometric-mean q-error over the nodes with a row estimate, and how many reach `threshold`"""
+        errors = [node.estimate_error for node in self.nodes() if node.estimate_error is not None]
+        if not errors:
+            return {'nodes': 0, 'max_error': None, 'geomean_error': None, 'misestimated': 0}
+        return {
+            'nodes': len(errors),
+            'max_error': max(errors),
+            'geomean_error': math.exp(sum(math.log(error) for error in errors) / len(errors)),
+            'misestimated': sum(1 for error in errors if error >= threshold),
+        }
+
+    def parallel_workers(self):
+        """(planned, launched) parallel workers summed over the Gather nodes; (0, 0) for a serial plan"""
+        gathers = [node for node in self.nodes() if node.workers_planned is not None]
+        return (sum(node.workers_planned for node in gathers),
+                sum(node.workers_launched or 0 for node in gathers))
+
+    def to_dict(self):
+        return {
+            'engine': self.engine,
+            'planning_time_ms': self.planning_time_ms,
+            'execution_time_ms': self.execution_time_ms,
+            'rows_returned': self.rows_returned,
+            'rows_examined': self.rows_examined,
+            'keys_examined': self.keys_examined,
+            'error': self.error,
+            'root': self.root.to_dict() if self.root else None,
+        }
+
+
+def node_label(depth, node):
+    """Operator (and relation) indented by tree depth, for plan tables"""
+    return "  " * depth + node.operator + (f" on {node.relation}" if node.relation else "")
+
+
+def _set_self_times(node):
+    for child in node.children:
+        _set_self_times(child)
+    if node.total_time_ms is not None:
+        child_time = sum(child.total_time_ms or 0 for child in node.children)
+        node.self_time_ms = max(node.total_time_ms - child_time, 0.0)
+
+
+def _sum_examined(nodes, attribute):
+    values = [getattr(node, attribute) for node in nodes if getattr(node, attribute) is not None]
+    return sum(values) if values else None
+
+
+# --- PostgreSQL -------------------------------------------------------------
+
+PG_DETAIL_KEYS = ('Filter', 'Index Cond', 'Recheck Cond', 'Hash Cond', 'Merge Cond', 'Join Filter',
+                  'Sort Key', 'Group Key', 'Index Name', 'Join Type', 'Strategy', 'Parent Relationship')
+
+
+def _parse_pg_node(raw, processes=1):
+    """Parse one EXPLAIN node; `processes` is how many concurrent processes share its loops"""
+    loops = raw.get('Actual Loops', 1) or 1
+    actual = raw.get('Actual Rows')
+    # Per process, a node under a Gather ran its share of the loops (at least one)
+    process_loops = max(loops / processes, 1)
+    node = PlanNode(
+        engine='postgresql',
+        operator=raw.get('Node Type', 'Unknown'),
+        relation=raw.get('Relation Name') or raw.get('CTE Name') or raw.get('Alias'),
+        actual_rows=actual * loops if actual is not None else None,
+        estimated_rows=raw['Plan Rows'] * loops if 'Plan Rows' in raw else None,
+        loops=loops,
+        total_time_ms=raw['Actual Total Time'] * process_loops if 'Actual Total Time' in raw else None,
+        workers_planned=raw.get('Workers Planned'),
+        workers_launched=raw.get('Workers Launched'),
+        details={key: raw[key] for key in PG_DETAIL_KEYS if key in raw},
+    )
+
+    if any(scan in node.operator for scan in PG_SCAN_TYPES) and actual is not None:
+        removed = raw.get('Rows Removed by Filter', 0) + raw.get('Rows Removed by Index Recheck', 0)
+        node.rows_examined = (actual + removed) * loops
+
+    if 'Sort Space Used' in raw:
+        if raw.get('Sort Space Type') == 'Disk':
+            node.spilled = True
+            node.spill_kb = raw['Sort Space Used']
+        else:
+            node.memory_kb = raw['Sort Space Used']
+    if 'Peak Memory Usage' in raw:
+        node.memory_kb = raw['Peak Memory Usage']
+        if raw.get('Hash Batches', 1) > 1:
+            node.spilled = True
+    if raw.get('Disk Usage'):
+        node.spilled = True
+        node.spill_kb = raw['Disk Usage']
+    if raw.get('Temp Written Blocks'):
+        node.spilled = True
+        node.spill_kb = (node.spill_kb or 0) + raw['Temp Written Blocks'] * 8
+
+    if node.operator in PG_GATHER_TYPES:
+        # Workers plus the leader; the leader's participation is not reported, so it is assumed
+        launched = raw.get('Workers Launched', raw.get('Workers Planned', 0)) or 0
+        processes = launched + 1
+    node.children = [_parse_pg_node(child, processes) for child in raw.get('Plans', [])]
+    return node
+
+
+def parse_postgres_plan(explain):
+    """Parse EXPLAIN (ANALYZE, FORMAT JSON) output into a Plan"""
+    if isinstance(explain, dict) and 'error' in explain:
+        return Plan(engine='postgresql', error=explain['error'])
+    try:
+        top = explain[0]
+        raw_root = top['Plan']
+    except (KeyError, TypeError, IndexError):
+        return Plan(engine='postgresql', error='Unrecognized EXPLAIN output')
+
+    root = _parse_pg_node(raw_root)
+    _set_self_times(root)
+    nodes = [node for _, node in root.walk()]
+    return Plan(
+        engine='postgresql',
+        root=root,
+        planning_time_ms=top.get('Planning Time'),
+        execution_time_ms=top.get('Execution Time'),
+        rows_returned=root.actual_rows,
+        rows_examined=_sum_examined(nodes, 'rows_examined'),
+    )
+
+
+# --- MongoDB ----------------------------------------------------------------
+
+def _parse_mongo_stage(raw):
+    node = PlanNode(
+        engine='mongodb',
+        operator=raw.get('stage', 'UNKNOWN'),
+        relation=raw.get('indexName') or raw.get('keyPattern') and str(raw.get('keyPattern')),
+        actual_rows=raw.get('nReturned'),
+        total_time_ms=raw.get('executionTimeMillisEstimate'),
+        rows_examined=raw.get('docsExamined', raw.get('numReads')),
+        keys_examined=raw.get('keysExamined'),
+        details={key: raw[key] for key in ('filter', 'sortPattern', 'indexBounds', 'direction', 'works')
+                 if key in raw},
+    )
+    if 'memUsage' in raw:
+        node.memory_kb = raw['memUsage'] / 1024
+    if raw.get('usedDisk') or raw.get('spills'):
+        node.spilled = True
+        if raw.get('spilledDataStorageSize'):
+            node.spill_kb = raw['spilledDataStorageSize'] / 1024
+
+    children = [raw[key] for key in MONGO_CHILD_KEYS if isinstance(raw.get(key), dict)]
+    children += raw.get('inputStages', [])
+    node.children = [_parse_mongo_stage(child) for child in children]
+    return node
+
+
+def _parse_pipeline_stage(raw, child):
+    name = next((key for key in raw if key.startswith('$')), 'UNKNOWN')
+    spec = raw.get(name)
+    node = PlanNode(
+        engine='mongodb',
+        operator=name,
+        relation=spec.get('from') if isinstance(spec, dict) and name == '$lookup' else None,
+        actual_rows=raw.get('nReturned'),
+        total_time_ms=raw.get('executionTimeMillisEstimate'),
+        rows_examined=raw.get('totalDocsExamined'),
+        keys_examined=raw.get('totalKeysExamined'),
+        details={name: spec},
+    )
+    memory = raw.get('maxAccumulatorMemoryUsageBytes') or raw.get('totalDataSizeSortedBytesEstimate')
+    if isinstance(memory, dict):
+        memory = sum(memory.values())
+    if memory:
+        node.memory_kb = memory / 1024
+    if raw.get('usedDisk') or raw.get('spills'):
+        node.spilled = True
+        if raw.get('spilledDataStorageSize'):
+            node.spill_kb = raw['spilledDataStorageSize'] / 1024
+    if child is not None:
+        node.children = [child]
+    return node
+
+
+def _mongo_query_layer(explain):
+    """Return (executionStats, namespace) for the query layer of an explain"""
+    if 'executionStats' in explain:
+        return explain['executionStats'], explain.get('queryPlanner', {}).get('namespace')
+    for stage in explain.get('stages', []):
+        if '$cursor' in stage:
+            cursor = stage['$cursor']
+            return cursor.get('executionStats', {}), cursor.get('queryPlanner', {}).get('namespace')
+    return {}, None
+
+
+def parse_mongo_explain(explain):
+    """Parse MongoDB explain() output (verbosity executionStats) into a Plan"""
+    if not isinstance(explain, dict):
+        return Plan(engine='mongodb', error='Unrecognized explain output')
+    if 'error' in explain:
+        return Plan(engine='mongodb', error=explain['error'])
+
+    stats, namespace = _mongo_query_layer(explain)
+    root = None
+    if 'executionStages' in stats:
+        root = _parse_mongo_stage(stats['executionStages'])
+        if namespace and root.relation is None:
+            root.relation = namespace.split('.', 1)[-1]
+
+    for raw in explain.get('stages', []):
+        if '$cursor' not in raw:
+            root = _parse_pipeline_stage(raw, root)
+
+    if root is None:
+        return Plan(engine='mongodb', error='No execution stats in explain output')
+
+    _set_self_times(root)
+    nodes = [node for _, node in root.walk()]
+    pipeline_examined = sum(node.rows_examined or 0 for node in nodes if node.operator.startswith('$'))
+    pipeline_keys = sum(node.keys_examined or 0 for node in nodes if node.operator.startswith('$'))
+
+    execution_time = stats.get('executionTimeMillis')
+    if root.total_time_ms is not None:
+        execution_time = max(execution_time or 0, root.total_time_ms)
+
+    return Plan(
+        engine='mongodb',
+        root=root,
+        execution_time_ms=execution_time,
+        rows_returned=root.actual_rows if root.actual_rows is not None else stats.get('nReturned'),
+        rows_examined=stats.get('totalDocsExamined', 0) + pipeline_examined if stats or pipeline_examined else None,
+        keys_examined=stats.get('totalKeysExamined', 0) + pipeline_keys if stats or pipeline_keys else None,
+    )
+
+
+# --- SQLite -----------------------------------------------------------------
+
+SQLITE_SCAN_PREFIXES = ('SCAN ', 'SEARCH ')
+
+
+def parse_sqlite_plan(explain):
+    """Parse {'plan': EXPLAIN QUERY PLAN rows, 'execution_time_ms', 'rows_returned'} into a Plan"""
+    if not isinstance(explain, dict):
+        return Plan(engine='sqlite', error='Unrecognized explain output')
+    if 'error' in explain:
+        return Plan(engine='sqlite', error=explain['error'])
+
+    # SQLite does not time individual plan steps, so all of the time is the root's own
+    root = PlanNode(engine='sqlite', operator='QUERY', actual_rows=explain.get('rows_returned'),
+                    total_time_ms=explain.get('execution_time_ms'), self_time_ms=explain.get('execution_time_ms'))
+    nodes = {0: root}
+    for node_id, parent, _, detail in explain.get('plan', []):
+        relation = None
+        if detail.startswith(SQLITE_SCAN_PREFIXES):
+            relation = detail.split()[1]
+        node = PlanNode(engine='sqlite', operator=detail, relation=relation)
+        nodes[node_id] = node
+        nodes.get(parent, root).children.append(node)
+    return Plan(
+        engine='sqlite',
+        root=root,
+        execution_time_ms=explain.get('execution_time_ms'),
+        rows_returned=explain.get('rows_returned'),
+    )
+
+
+# --- Columnar ---------------------------------------------------------------
+
+def parse_columnar_result(explain):
+    """Parse a columnar_engine.run_vectorized() result into a single-node Plan"""
+    if not isinstance(explain, dict):
+        return Plan(engine='columnar', error='Unrecognized result')
+    if 'error' in explain:
+        return Plan(engine='columnar', error=explain['error'])
+    peak = explain.get('peak_memory_bytes')
+    root = PlanNode(engine='columnar', operator='Vectorized', actual_rows=explain.get('rows'),
+                    total_time_ms=explain.get('execution_time_ms'), self_time_ms=explain.get('execution_time_ms'),
+                    memory_kb=None if peak is None else peak / 1024)
+    return Plan(
+        engine='columnar',
+        root=root,
+        execution_time_ms=explain.get('execution_time_ms'),
+        rows_returned=explain.get('rows'),
+    )
+
+
+PLAN_PARSERS = {
+    'postgresql': parse_postgres_plan,
+    'mongodb': parse_mongo_explain,
+    'sqlite': parse_sqlite_plan,
+    'columnar': parse_columnar_result,
+}
+
+
+def parse_plan(engine, explain):
+    if engine not in PLAN_PARSERS:
+        raise ValueError(f"Unknown engine '{engine}'")
+    return PLAN_PARSERS[engine](explain)
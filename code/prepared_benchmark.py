@@ -0,0 +1,213 @@
+"""
+Prepared-statement and planning-cost benchmark.
+
+Compares three ways of running each query on PostgreSQL:
+
+- plain:   raw SQL text sent with every execution (how benchmark.py runs queries)
+- custom:  server-side PREPARE/EXECUTE with plan_cache_mode = force_custom_plan
+- generic: server-side PREPARE/EXECUTE with plan_cache_mode = force_generic_plan
+
+For each path it reports the planning and execution time from EXPLAIN ANALYZE
+and the client-observed latency of the query itself. For MongoDB it reports
+whether the query shape had an active plan cache entry before each run.
+"""
+import argparse
+import re
+import statistics
+import time
+
+import functools
+print = functools.partial(print, flush=True)
+
+from tabulate import tabulate
+
+from benchmark import (init_connections, close_connections, query_params, resolve_params, get_pg_planning_time,
+                       get_pg_execution_time, QUERIES)
+
+PATHS = [
+    ('plain', None),
+    ('custom', 'force_custom_plan'),
+    ('generic', 'force_generic_plan'),
+]
+
+NAMED_PARAM = re.compile(r"%\((\w+)\)s")
+
+
+def to_prepared_sql(sql):
+    """Convert %(name)s placeholders to $n, returning the SQL and the ordered parameter names"""
+    names = []
+
+    def replace(match):
+        if match.group(1) not in names:
+            names.append(match.group(1))
+        return f"${names.index(match.group(1)) + 1}"
+
+    prepared = NAMED_PARAM.sub(replace, sql).replace('%%', '%')
+    return prepared, names
+
+
+def _explain(cursor, sql, params):
+    cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+    return cursor.fetchone()[0]
+
+
+def _timed_execute(cursor, sql, params):
+    start = time.perf_counter()
+    cursor.execute(sql, params)
+    cursor.fetchall()
+    return (time.perf_counter() - start) * 1000
+
+
+def run_pg_path(conn, query_info, path, plan_cache_mode, iterations, warmup):
+    """Run one query through one execution path, returning per-iteration timings"""
+    params = query_params(query_info)
+    cursor = conn.cursor()
+    statement = f"bench_{path}"
+    samples = {'planning': [], 'execution': [], 'latency': []}
+
+    try:
+        if plan_cache_mode:
+            prepared_sql, names = to_prepared_sql(query_info['pg'])
+            cursor.execute(f"SET plan_cache_mode = {plan_cache_mode}")
+            cursor.execute(f"PREPARE {statement} AS {prepared_sql}")
+            placeholders = ', '.join(['%s'] * len(names))
+            sql = f"EXECUTE {statement}({placeholders})" if names else f"EXECUTE {statement}"
+            args = [params[name] for name in names]
+        else:
+            sql, args = query_info['pg'], params
+
+        for i in range(warmup + iterations):
+            explain = _explain(cursor, sql, args)
+            latency = _timed_execute(cursor, sql, args)
+            if i >= warmup:
+                samples['planning'].append(get_pg_planning_time(explain))
+                samples['execution'].append(get_pg_execution_time(explain))
+                samples['latency'].append(latency)
+    finally:
+        if plan_cache_mode:
+            cursor.execute(f"DEALLOCATE {statement}")
+            cursor.execute("RESET plan_cache_mode")
+        cursor.close()
+
+    return samples
+
+
+def mongo_plan_cache_entry(db, collection, plan_cache_key):
+    entries = list(db[collection].aggregate([
+        {'$planCacheStats': {}},
+        {'$match': {'planCacheKey': plan_cache_key}}
+    ]))
+    return entries[0] if entries else None
+
+
+def _mongo_plan_cache_key(explain):
+    if 'queryPlanner' in explain:
+        return explain['queryPlanner'].get('planCacheKey')
+    for stage in explain.get('stages', []):
+        if '$cursor' in stage:
+            return stage['$cursor'].get('queryPlanner', {}).get('planCacheKey')
+    return None
+
+
+def run_mongo_plan_cache(db, query_info, iterations, clear_cache):
+    """Run a MongoDB query repeatedly and record plan cache hits and misses"""
+    collection = query_info.get('mongo_collection')
+    if not collection or 'mongo' not in query_info:
+        return None
+
+    if clear_cache:
+        db.command('planCacheClear', collection)
+
+    plan_cache_key = _mongo_plan_cache_key(query_info['mongo_explain'](db, query_info.get('pg_params')))
+    if not plan_cache_key:
+        return {'plan_cache_key': None, 'hits': 0, 'misses': iterations, 'latency': []}
+
+    hits, misses, latency = 0, 0, []
+    for _ in range(iterations):
+        entry = mongo_plan_cache_entry(db, collection, plan_cache_key)
+        if entry and entry.get('isActive'):
+            hits += 1
+        else:
+            misses += 1
+        start = time.perf_counter()
+        query_info['mongo'](db, query_info.get('pg_params'))
+        latency.append((time.perf_counter() - start) * 1000)
+
+    entry = mongo_plan_cache_entry(db, collection, plan_cache_key)
+    return {
+        'plan_cache_key': plan_cache_key,
+        'hits': hits,
+        'misses': misses,
+        'active': bool(entry and entry.get('isActive')),
+        'works': entry.get('works') if entry else None,
+        'latency': latency,
+    }
+
+
+def _median(values):
+    values = [v for v in values if v is not None]
+    return statistics.median(values) if values else None
+
+
+def _fmt(value):
+    return "N/A" if value is None else f"{value:.3f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare plain, prepared (custom plan) and prepared (generic plan) execution')
+    parser.add_argument('--queries', nargs='+', help='Specific queries to run (default: all)')
+    parser.add_argument('--iterations', type=int, default=20, help='Measured runs per path (default: 20)')
+    parser.add_argument('--warmup', type=int, default=2, help='Unmeasured warmup runs per path (default: 2)')
+    parser.add_argument('--clear-plan-cache', action='store_true', help='Clear the MongoDB plan cache before each query')
+    args = parser.parse_args()
+
+    query_names = [name for name in (args.queries or list(QUERIES)) if name in QUERIES]
+
+    pg_conn, mongo_db, mongo_client = init_connections()
+    # PREPARE and SET run outside a transaction so a failed query does not abort cleanup
+    pg_conn.autocommit = True
+    try:
+        pg_rows, mongo_rows = [], []
+        for query_name in query_names:
+            query_info = dict(QUERIES[query_name], pg_params=resolve_params(pg_conn, QUERIES[query_name]))
+            print(f"\nRunning prepared-statement benchmark: {query_info['description']}")
+
+            for path, plan_cache_mode in PATHS:
+                print(f"  PostgreSQL path: {path}")
+                samples = run_pg_path(pg_conn, query_info, path, plan_cache_mode, args.iterations, args.warmup)
+                planning, execution = _median(samples['planning']), _median(samples['execution'])
+                pg_rows.append([
+                    query_name,
+                    path,
+                    _fmt(planning),
+                    _fmt(execution),
+                    _fmt(planning + execution if planning is not None and execution is not None else None),
+                    _fmt(_median(samples['latency']))
+                ])
+
+            print("  MongoDB plan cache")
+            cache = run_mongo_plan_cache(mongo_db, query_info, args.iterations, args.clear_plan_cache)
+            if cache:
+                mongo_rows.append([
+                    query_name,
+                    cache['plan_cache_key'] or "N/A",
+                    cache['hits'],
+                    cache['misses'],
+                    cache.get('active', False),
+                    _fmt(_median(cache['latency']))
+                ])
+
+        print("\n=== PostgreSQL Planning Cost by Execution Path ===")
+        print(tabulate(pg_rows, headers=["Query", "Path", "Planning", "Execution", "Planning + Execution", "Client Latency"],
+                       tablefmt="grid"))
+
+        if mongo_rows:
+            print("\n=== MongoDB Plan Cache ===")
+            print(tabulate(mongo_rows, headers=["Query", "Plan Cache Key", "Hits", "Misses", "Active After", "Client Latency"],
+                           tablefmt="grid"))
+    finally:
+        close_connections(pg_conn, mongo_client)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,15 @@ import json
 import os
 import sys
 import argparse
-import pymongo
 import hashlib
 
-from db_config import MONGO_PARAMS, get_mongo_uri, DEFAULT_DB_NAME
+from db_config import MONGO_PARAMS, DEFAULT_DB_NAME
+from db_pool import get_mongo_client
+from pymongo.errors import BulkWriteError
+from streaming import stream_mongo_find
+from dataset_input import DatasetInput, DEFAULT_INPUT
+from line_index import ScaleSample, DEFAULT_SEED
+from load_metrics import LoadMetrics, profile_load, DEFAULT_INTERVAL, DEFAULT_METRICS_PATH, DEFAULT_PROFILE_TOP
 
 parser = argparse.ArgumentParser(description='Load Yelp dataset into MongoDB')
 parser.add_argument('--collections', nargs='+', default=['all'], 
@@ -13,32 +18,61 @@ parser.add_argument('--collections', nargs='+', default=['all'],
                     help='Specify which collections to load (default: all)')
 parser.add_argument('--skip-validation', action='store_true',
                     help='Skip validation of user and business IDs (faster but may include invalid references)')
+parser.add_argument('--metrics-file', type=str, default=DEFAULT_METRICS_PATH,
+                    help='JSON-lines file that load metrics are appended to (default: results/load_metrics.jsonl)')
+parser.add_argument('--metrics-interval', type=float, default=DEFAULT_INTERVAL,
+                    help='Seconds between progress reports (default: 10)')
+parser.add_argument('--profile', action='store_true',
+                    help='Load each collection under cProfile and tracemalloc and print the top hotspots')
+parser.add_argument('--profile-top', type=int, default=DEFAULT_PROFILE_TOP,
+                    help='Number of functions and allocation sites shown per profile (default: 20)')
+parser.add_argument('--input', type=str, default=DEFAULT_INPUT,
+                    help='Dataset directory (plain, .gz or .zst JSON files) or yelp_dataset.tar/.tar.gz '
+                         '(default: ./data/yelp_dataset/)')
+parser.add_argument('--scale', type=float, default=None,
+                    help='Load a seeded sample of this fraction of the reviews and tips, with the businesses, '
+                         'users and checkins they reference (e.g. 0.01; needs plain .json input)')
+parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                    help='Random seed for --scale (default: 42)')
 args = parser.parse_args()
+if args.scale is not None and not 0 < args.scale <= 1:
+    parser.error('--scale must be in (0, 1]')
 
-data_dir = './data/yelp_dataset/'
+sample = ScaleSample(args.input, args.scale, args.seed) if args.scale is not None and args.scale < 1 else None
+dataset = DatasetInput(args.input, sample)
 
 print(f"Loading collections: {args.collections if 'all' not in args.collections else 'all'}")
 print(f"Skip validation: {args.skip_validation}")
+print(f"Input: {dataset.describe()}")
 
 print("Connecting to MongoDB...")
-client = pymongo.MongoClient(get_mongo_uri())
+client = get_mongo_client()
 
 mongo_db = client[DEFAULT_DB_NAME]
 
+def collection_metrics(collection, stream):
+    """Load metrics for one collection, with progress measured against the size of its input"""
+    return LoadMetrics('mongodb', collection, stream.total, args.metrics_file, args.metrics_interval)
+
 # Function to load documents in batches
-def load_mongo_batch(collection, documents, batch_size=1000):
+def load_mongo_batch(collection, documents, batch_size=1000, metrics=None):
     total_loaded = 0
     for i in range(0, len(documents), batch_size):
         batch = documents[i:i+batch_size]
         try:
             result = collection.insert_many(batch, ordered=False)
-            total_loaded += len(result.inserted_ids)
-            print(f"  Inserted {total_loaded} documents...")
-        except pymongo.errors.BulkWriteError as e:
+            inserted = len(result.inserted_ids)
+        except BulkWriteError as e:
             # Some documents may have been inserted before the error
             result = e.details
-            total_loaded += result.get('nInserted', 0)
-            print(f"  Warning: {len(result.get('writeErrors', []))} errors. Inserted {result.get('nInserted', 0)} documents.")
+            inserted = result.get('nInserted', 0)
+            if metrics:
+                metrics.error(len(result.get('writeErrors', [])))
+            print(f"  Warning: {len(result.get('writeErrors', []))} errors. Inserted {inserted} documents.")
+        total_loaded += inserted
+        if metrics:
+            metrics.lap('insert')
+            metrics.add_rows(inserted)
     return total_loaded
 
 def load_businesses():
@@ -51,23 +85,29 @@ def load_businesses():
         businesses_collection = mongo_db.businesses
         businesses = []
         total_businesses = 0
-
-        with open(os.path.join(data_dir, 'yelp_academic_dataset_business.json'), 'r', encoding='utf-8') as f:
-            for line in f:
+        with dataset.open('businesses') as stream:
+            metrics = collection_metrics('businesses', stream)
+            for line in metrics.lines(stream):
                 data = json.loads(line)
+                metrics.lap('parse')
                 data['_id'] = data.pop('business_id')
+                if data.get('latitude') is not None and data.get('longitude') is not None:
+                    # GeoJSON point (longitude first) for the 2dsphere index and geo queries
+                    data['coordinates'] = {'type': 'Point', 'coordinates': [data['longitude'], data['latitude']]}
                 businesses.append(data)
+                metrics.lap('transform')
                 
                 if len(businesses) >= 10000:
-                    loaded = load_mongo_batch(businesses_collection, businesses)
+                    loaded = load_mongo_batch(businesses_collection, businesses, metrics=metrics)
                     total_businesses += loaded
                     businesses = []
 
         # Load any remaining businesses
         if businesses:
-            loaded = load_mongo_batch(businesses_collection, businesses)
+            loaded = load_mongo_batch(businesses_collection, businesses, metrics=metrics)
             total_businesses += loaded
 
+        metrics.finish(stream.stats())
         print(f"Total businesses loaded: {total_businesses}")
         
         return businesses_collection
@@ -85,29 +125,32 @@ def load_users():
         users_collection = mongo_db.users
         users = []
         total_users = 0
-
-        with open(os.path.join(data_dir, 'yelp_academic_dataset_user.json'), 'r', encoding='utf-8') as f:
-            for line in f:
+        with dataset.open('users') as stream:
+            metrics = collection_metrics('users', stream)
+            for line in metrics.lines(stream):
                 try:
                     data = json.loads(line)
+                    metrics.lap('parse')
                     data['_id'] = data.pop('user_id')
                     users.append(data)
+                    metrics.lap('transform')
                     
                     if len(users) >= 10000:
-                        loaded = load_mongo_batch(users_collection, users)
+                        loaded = load_mongo_batch(users_collection, users, metrics=metrics)
                         total_users += loaded
                         users = []
-                        print(f"  Processed {total_users} users so far...")
                         
                 except Exception as e:
                     print(f"Error processing user: {e}")
+                    metrics.error()
                     continue
 
         # Load any remaining users
         if users:
-            loaded = load_mongo_batch(users_collection, users)
+            loaded = load_mongo_batch(users_collection, users, metrics=metrics)
             total_users += loaded
 
+        metrics.finish(stream.stats())
         print(f"Total users loaded: {total_users}")
         
         return users_collection
@@ -123,7 +166,7 @@ def collect_valid_ids(businesses_collection, users_collection):
     
     print("Collecting valid business IDs...")
     valid_business_ids = set()
-    for business in businesses_collection.find({}, {"_id": 1}):
+    for business in stream_mongo_find(businesses_collection, {}, {"_id": 1}, batch_size=50000):
         valid_business_ids.add(business["_id"])
     print(f"Collected {len(valid_business_ids)} valid business IDs")
 
@@ -131,10 +174,9 @@ def collect_valid_ids(businesses_collection, users_collection):
     print("Collecting valid user IDs in batches...")
     valid_user_ids = set()
     batch_size = 100000
-    user_cursor = users_collection.find({}, {"_id": 1})
     processed = 0
 
-    for user in user_cursor:
+    for user in stream_mongo_find(users_collection, {}, {"_id": 1}, batch_size=50000):
         valid_user_ids.add(user["_id"])
         processed += 1
         if processed % batch_size == 0:
@@ -154,33 +196,37 @@ def load_reviews(valid_business_ids, valid_user_ids):
         total_loaded = 0
         total_skipped = 0
         batch_size = 10000
-
-        with open(os.path.join(data_dir, 'yelp_academic_dataset_review.json'), 'r', encoding='utf-8') as f:
-            for line in f:
+        with dataset.open('reviews') as stream:
+            metrics = collection_metrics('reviews', stream)
+            for line in metrics.lines(stream):
                 try:
                     data = json.loads(line)
-                    if args.skip_validation or (data['user_id'] in valid_user_ids and data['business_id'] in valid_business_ids):
+                    metrics.lap('parse')
+                    valid = args.skip_validation or (data['user_id'] in valid_user_ids and data['business_id'] in valid_business_ids)
+                    metrics.lap('validate')
+                    if valid:
                         data['_id'] = data.pop('review_id')
                         reviews.append(data)
+                        metrics.lap('transform')
                         
                         if len(reviews) >= batch_size:
-                            loaded = load_mongo_batch(reviews_collection, reviews, batch_size=1000)
+                            loaded = load_mongo_batch(reviews_collection, reviews, batch_size=1000, metrics=metrics)
                             total_loaded += loaded
                             reviews = []
-                            print(f"  Loaded {total_loaded} reviews...")
                     else:
                         total_skipped += 1
-                        if total_skipped % 10000 == 0:
-                            print(f"  Skipped {total_skipped} reviews so far...")
+                        metrics.skip()
                 except Exception as e:
                     print(f"Error processing review: {e}")
                     total_skipped += 1
+                    metrics.error()
                     continue
 
         if reviews:
-            loaded = load_mongo_batch(reviews_collection, reviews, batch_size=1000)
+            loaded = load_mongo_batch(reviews_collection, reviews, batch_size=1000, metrics=metrics)
             total_loaded += loaded
 
+        metrics.finish(stream.stats())
         print(f"Total reviews loaded: {total_loaded}, skipped: {total_skipped}")
         
         return reviews_collection
@@ -202,43 +248,48 @@ def load_tips(valid_business_ids, valid_user_ids):
 
         # Track seen tip hashes to avoid duplicates
         seen_tips = set()
-
-        with open(os.path.join(data_dir, 'yelp_academic_dataset_tip.json'), 'r', encoding='utf-8') as f:
-            for line in f:
+        with dataset.open('tips') as stream:
+            metrics = collection_metrics('tips', stream)
+            for line in metrics.lines(stream):
                 try:
                     data = json.loads(line)
-                    if args.skip_validation or (data['user_id'] in valid_user_ids and data['business_id'] in valid_business_ids):
+                    metrics.lap('parse')
+                    valid = args.skip_validation or (data['user_id'] in valid_user_ids and data['business_id'] in valid_business_ids)
+                    metrics.lap('validate')
+                    if valid:
                         text_hash = hashlib.md5(data['text'].encode()).hexdigest()[:8]
                         unique_id = f"{data['user_id']}_{data['business_id']}_{data['date']}_{text_hash}"
                         
                         if unique_id in seen_tips:
                             total_skipped += 1
+                            metrics.skip()
                             continue
                             
                         seen_tips.add(unique_id)
                         data['_id'] = unique_id
                         tips.append(data)
+                        metrics.lap('transform')
                         
                         if len(tips) >= batch_size:
                             # Clear seen_tips set to save memory after each batch
                             seen_tips.clear()
-                            loaded = load_mongo_batch(tips_collection, tips, batch_size=1000)
+                            loaded = load_mongo_batch(tips_collection, tips, batch_size=1000, metrics=metrics)
                             total_loaded += loaded
                             tips = []
-                            print(f"  Loaded {total_loaded} tips...")
                     else:
                         total_skipped += 1
-                        if total_skipped % 10000 == 0:
-                            print(f"  Skipped {total_skipped} tips so far...")
+                        metrics.skip()
                 except Exception as e:
                     print(f"Error processing tip: {e}")
                     total_skipped += 1
+                    metrics.error()
                     continue
 
         if tips:
-            loaded = load_mongo_batch(tips_collection, tips, batch_size=1000)
+            loaded = load_mongo_batch(tips_collection, tips, batch_size=1000, metrics=metrics)
             total_loaded += loaded
 
+        metrics.finish(stream.stats())
         print(f"Total tips loaded: {total_loaded}, skipped: {total_skipped}")
         
         return tips_collection
@@ -257,34 +308,38 @@ def load_checkins(valid_business_ids):
         total_loaded = 0
         total_skipped = 0
         batch_size = 5000
-
-        with open(os.path.join(data_dir, 'yelp_academic_dataset_checkin.json'), 'r', encoding='utf-8') as f:
-            for line in f:
+        with dataset.open('checkins') as stream:
+            metrics = collection_metrics('checkins', stream)
+            for line in metrics.lines(stream):
                 try:
                     data = json.loads(line)
-                    if args.skip_validation or data['business_id'] in valid_business_ids:
+                    metrics.lap('parse')
+                    valid = args.skip_validation or data['business_id'] in valid_business_ids
+                    metrics.lap('validate')
+                    if valid:
                         data['_id'] = data['business_id']
                         checkins.append(data)
+                        metrics.lap('transform')
                         
                         if len(checkins) >= batch_size:
-                            loaded = load_mongo_batch(checkins_collection, checkins, batch_size=1000)
+                            loaded = load_mongo_batch(checkins_collection, checkins, batch_size=1000, metrics=metrics)
                             total_loaded += loaded
                             checkins = []
-                            print(f"  Loaded {total_loaded} checkins...")
                     else:
                         total_skipped += 1
-                        if total_skipped % 5000 == 0:
-                            print(f"  Skipped {total_skipped} checkins so far...")
+                        metrics.skip()
                 except Exception as e:
                     print(f"Error processing checkin: {e}")
                     total_skipped += 1
+                    metrics.error()
                     continue
 
         # Load any remaining checkins
         if checkins:
-            loaded = load_mongo_batch(checkins_collection, checkins, batch_size=1000)
+            loaded = load_mongo_batch(checkins_collection, checkins, batch_size=1000, metrics=metrics)
             total_loaded += loaded
 
+        metrics.finish(stream.stats())
         print(f"Total checkins loaded: {total_loaded}, skipped: {total_skipped}")
 
         return checkins_collection
@@ -292,10 +347,17 @@ def load_checkins(valid_business_ids):
         print("Skipping checkins collection...")
         return mongo_db.checkins
 
+def run_load(collection, load, *load_args):
+    """Run one collection's loader, under cProfile and tracemalloc with --profile"""
+    if args.profile:
+        output_dir = os.path.join(os.path.dirname(os.path.abspath(args.metrics_file)), 'profiles')
+        return profile_load(f"mongodb_{collection}", load, *load_args, top=args.profile_top, output_dir=output_dir)
+    return load(*load_args)
+
 def main():
     try:
-        businesses_collection = load_businesses()
-        users_collection = load_users()
+        businesses_collection = run_load('businesses', load_businesses)
+        users_collection = run_load('users', load_users)
         
         need_validation = not args.skip_validation and ('all' in args.collections or 
                                                       'reviews' in args.collections or 
@@ -304,9 +366,9 @@ def main():
         
         valid_business_ids, valid_user_ids = collect_valid_ids(businesses_collection, users_collection) if need_validation else (set(), set())
         
-        reviews_collection = load_reviews(valid_business_ids, valid_user_ids)
-        tips_collection = load_tips(valid_business_ids, valid_user_ids)
-        checkins_collection = load_checkins(valid_business_ids)
+        reviews_collection = run_load('reviews', load_reviews, valid_business_ids, valid_user_ids)
+        tips_collection = run_load('tips', load_tips, valid_business_ids, valid_user_ids)
+        checkins_collection = run_load('checkins', load_checkins, valid_business_ids)
         
         print("MongoDB data loading complete!")
     except Exception as e:
@@ -8,6 +8,11 @@ from datetime import datetime
 from pymongo import MongoClient
 
 from db_config import PG_PARAMS, DEFAULT_DB_NAME
+from streaming import stream_pg
+from dataset_input import DatasetInput, DEFAULT_INPUT
+from line_index import ScaleSample, DEFAULT_SEED
+from load_metrics import LoadMetrics, profile_load, DEFAULT_INTERVAL, DEFAULT_METRICS_PATH, DEFAULT_PROFILE_TOP
+from pg_statistics import run_statistics_stage, DEFAULT_STATISTICS_TARGET
 
 parser = argparse.ArgumentParser(description='Load Yelp dataset into PostgreSQL')
 parser.add_argument('--tables', nargs='+', default=['all'], 
@@ -17,30 +22,69 @@ parser.add_argument('--skip-validation', action='store_true',
                     help='Skip validation of user and business IDs (faster but may include invalid references)')
 parser.add_argument('--drop-db', action='store_true',
                     help='Drop and recreate the entire database (default: False)')
+parser.add_argument('--text-search', action='store_true',
+                    help='Add stored tsvector columns on reviews and tips, filled as rows are loaded (default: False)')
+parser.add_argument('--metrics-file', type=str, default=DEFAULT_METRICS_PATH,
+                    help='JSON-lines file that load metrics are appended to (default: results/load_metrics.jsonl)')
+parser.add_argument('--metrics-interval', type=float, default=DEFAULT_INTERVAL,
+                    help='Seconds between progress reports (default: 10)')
+parser.add_argument('--profile', action='store_true',
+                    help='Load each table under cProfile and tracemalloc and print the top hotspots')
+parser.add_argument('--profile-top', type=int, default=DEFAULT_PROFILE_TOP,
+                    help='Number of functions and allocation sites shown per profile (default: 20)')
+parser.add_argument('--input', type=str, default=DEFAULT_INPUT,
+                    help='Dataset directory (plain, .gz or .zst JSON files) or yelp_dataset.tar/.tar.gz '
+                         '(default: ./data/yelp_dataset/)')
+parser.add_argument('--scale', type=float, default=None,
+                    help='Load a seeded sample of this fraction of the reviews and tips, with the businesses, '
+                         'users and checkins they reference (e.g. 0.01; needs plain .json input)')
+parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                    help='Random seed for --scale (default: 42)')
+parser.add_argument('--skip-statistics', action='store_true',
+                    help='Skip the post-load statistics stage (raised statistics targets, extended statistics '
+                         'and ANALYZE; see pg_statistics.py)')
+parser.add_argument('--statistics-target', type=int, default=DEFAULT_STATISTICS_TARGET,
+                    help='Statistics target for the hot columns in the statistics stage (default: 1000)')
 args = parser.parse_args()
+if args.scale is not None and not 0 < args.scale <= 1:
+    parser.error('--scale must be in (0, 1]')
 
 initial_params = PG_PARAMS.copy()
 
 if 'dbname' in initial_params:
     initial_params['dbname'] = 'postgres'
 
-data_dir = './data/yelp_dataset/'
+sample = ScaleSample(args.input, args.scale, args.seed) if args.scale is not None and args.scale < 1 else None
+dataset = DatasetInput(args.input, sample)
 
 print(f"Loading tables: {args.tables if 'all' not in args.tables else 'all'}")
 print(f"Skip validation: {args.skip_validation}")
+print(f"Input: {dataset.describe()}")
 print(f"Drop database: {args.drop_db}")
+print(f"Text search columns: {args.text_search}")
+print(f"Statistics stage: {'skipped' if args.skip_statistics else f'target {args.statistics_target}'}")
 
-def batch_insert(cursor, conn, data_list, insert_query, batch_size=5000):
+def table_metrics(table, stream):
+    """Load metrics for one table, with progress measured against the size of its input"""
+    return LoadMetrics('postgresql', table, stream.total, args.metrics_file, args.metrics_interval)
+
+def batch_insert(cursor, conn, data_list, insert_query, batch_size=5000, metrics=None):
     total_processed = 0
     for i in range(0, len(data_list), batch_size):
         batch = data_list[i:i+batch_size]
         try:
             execute_values(cursor, insert_query, batch)
+            if metrics:
+                metrics.lap('insert')
             conn.commit()
+            if metrics:
+                metrics.lap('commit')
+                metrics.add_rows(len(batch))
             total_processed += len(batch)
-            print(f"  Inserted {total_processed} records...")
         except Exception as e:
             conn.rollback()
+            if metrics:
+                metrics.error(len(batch))
             print(f"Error in batch insert: {e}")
     return total_processed
 
@@ -112,6 +156,20 @@ def setup_database():
 
     return conn, cursor
 
+def add_text_search_columns(conn, cursor):
+    """Add the stored tsvector columns from text_search.sql"""
+    print("Adding stored tsvector columns to reviews and tips...")
+    with open('./queries/text_search.sql', 'r') as f:
+        cursor.execute(f.read())
+    conn.commit()
+
+def add_geo_columns(conn, cursor):
+    """Enable earthdistance and add the stored point column from geo.sql"""
+    print("Enabling earthdistance and adding the businesses coordinates column...")
+    with open('./queries/geo.sql', 'r') as f:
+        cursor.execute(f.read())
+    conn.commit()
+
 def load_businesses(conn, cursor):
     """Load businesses into PostgreSQL"""
     if 'all' in args.tables or 'businesses' in args.tables:
@@ -126,10 +184,11 @@ def load_businesses(conn, cursor):
             conn.commit()
         
         businesses = []
-
-        with open(os.path.join(data_dir, 'yelp_academic_dataset_business.json'), 'r', encoding='utf-8') as f:
-            for line in f:
+        with dataset.open('businesses') as stream:
+            metrics = table_metrics('businesses', stream)
+            for line in metrics.lines(stream):
                 data = json.loads(line)
+                metrics.lap('parse')
                 businesses.append((
                     data['business_id'],
                     data.get('name', ''),
@@ -146,6 +205,7 @@ def load_businesses(conn, cursor):
                     data.get('categories', ''),
                     json.dumps(data.get('hours', {}))
                 ))
+                metrics.lap('transform')
 
         business_query = """
         INSERT INTO businesses (
@@ -154,7 +214,8 @@ def load_businesses(conn, cursor):
             attributes, categories, hours
         ) VALUES %s
         """
-        total_businesses = batch_insert(cursor, conn, businesses, business_query)
+        total_businesses = batch_insert(cursor, conn, businesses, business_query, metrics=metrics)
+        metrics.finish(stream.stats())
         print(f"Loaded {total_businesses} businesses")
     else:
         print("Skipping businesses table...")
@@ -173,11 +234,12 @@ def load_users(conn, cursor):
         
         users = []
         total_users = 0
-
-        with open(os.path.join(data_dir, 'yelp_academic_dataset_user.json'), 'r', encoding='utf-8') as f:
-            for line in f:
+        with dataset.open('users') as stream:
+            metrics = table_metrics('users', stream)
+            for line in metrics.lines(stream):
                 try:
                     data = json.loads(line)
+                    metrics.lap('parse')
                     
                     # Parse friends list
                     friends_list = data.get('friends', '')
@@ -217,6 +279,7 @@ def load_users(conn, cursor):
                         data.get('compliment_writer', 0),
                         data.get('compliment_photos', 0)
                     ))
+                    metrics.lap('transform')
                     
                     if len(users) >= 10000:
                         user_query = """
@@ -228,13 +291,13 @@ def load_users(conn, cursor):
                             compliment_funny, compliment_writer, compliment_photos
                         ) VALUES %s
                         """
-                        batch_loaded = batch_insert(cursor, conn, users, user_query)
+                        batch_loaded = batch_insert(cursor, conn, users, user_query, metrics=metrics)
                         total_users += batch_loaded
                         users = []
-                        print(f"  Processed {total_users} users so far...")
                         
                 except Exception as e:
                     print(f"Error processing user: {e}")
+                    metrics.error()
                     continue
 
         if users:
@@ -247,10 +310,10 @@ def load_users(conn, cursor):
                 compliment_funny, compliment_writer, compliment_photos
             ) VALUES %s
             """
-            batch_loaded = batch_insert(cursor, conn, users, user_query)
+            batch_loaded = batch_insert(cursor, conn, users, user_query, metrics=metrics)
             total_users += batch_loaded
-            print(f"  Processed final batch of users")
 
+        metrics.finish(stream.stats())
         print(f"Total users loaded: {total_users}")
     else:
         print("Skipping users table...")
@@ -261,14 +324,14 @@ def collect_valid_ids(conn, cursor):
         print("Skipping ID validation as requested...")
         return set(), set()
 
+    # Stream the ids through server-side cursors so only the sets are held in memory
     print("Collecting valid business and user IDs...")
-    cursor.execute("SELECT business_id FROM businesses")
-    valid_business_ids = {row[0] for row in cursor.fetchall()}
+    valid_business_ids = {row[0] for row in stream_pg(conn, "SELECT business_id FROM businesses", itersize=50000)}
     print(f"Collected {len(valid_business_ids)} valid business IDs")
 
-    cursor.execute("SELECT user_id FROM users")
-    valid_user_ids = {row[0] for row in cursor.fetchall()}
+    valid_user_ids = {row[0] for row in stream_pg(conn, "SELECT user_id FROM users", itersize=50000)}
     print(f"Collected {len(valid_user_ids)} valid user IDs")
+    conn.commit()
     
     return valid_business_ids, valid_user_ids
 
@@ -288,12 +351,15 @@ def load_reviews(conn, cursor, valid_business_ids, valid_user_ids):
         batch_size = 10000
         total_loaded = 0
         total_skipped = 0
-
-        with open(os.path.join(data_dir, 'yelp_academic_dataset_review.json'), 'r', encoding='utf-8') as f:
-            for line in f:
+        with dataset.open('reviews') as stream:
+            metrics = table_metrics('reviews', stream)
+            for line in metrics.lines(stream):
                 try:
                     data = json.loads(line)
-                    if args.skip_validation or (data['user_id'] in valid_user_ids and data['business_id'] in valid_business_ids):
+                    metrics.lap('parse')
+                    valid = args.skip_validation or (data['user_id'] in valid_user_ids and data['business_id'] in valid_business_ids)
+                    metrics.lap('validate')
+                    if valid:
                         reviews.append((
                             data['review_id'],
                             data['user_id'],
@@ -305,6 +371,7 @@ def load_reviews(conn, cursor, valid_business_ids, valid_user_ids):
                             data.get('funny', 0),
                             data.get('cool', 0)
                         ))
+                        metrics.lap('transform')
                         
                         if len(reviews) >= batch_size:
                             query = """
@@ -313,17 +380,16 @@ def load_reviews(conn, cursor, valid_business_ids, valid_user_ids):
                                 date, text, useful, funny, cool
                             ) VALUES %s
                             """
-                            loaded = batch_insert(cursor, conn, reviews, query)
+                            loaded = batch_insert(cursor, conn, reviews, query, metrics=metrics)
                             total_loaded += loaded
                             reviews = []
-                            print(f"  Loaded {total_loaded} reviews...")
                     else:
                         total_skipped += 1
-                        if total_skipped % 10000 == 0:
-                            print(f"  Skipped {total_skipped} reviews so far...")
+                        metrics.skip()
                 except Exception as e:
                     print(f"Error processing review: {e}")
                     total_skipped += 1
+                    metrics.error()
                     continue
 
         if reviews:
@@ -333,9 +399,10 @@ def load_reviews(conn, cursor, valid_business_ids, valid_user_ids):
                 date, text, useful, funny, cool
             ) VALUES %s
             """
-            loaded = batch_insert(cursor, conn, reviews, query)
+            loaded = batch_insert(cursor, conn, reviews, query, metrics=metrics)
             total_loaded += loaded
 
+        metrics.finish(stream.stats())
         print(f"Total reviews loaded: {total_loaded}, skipped: {total_skipped}")
     else:
         print("Skipping reviews table...")
@@ -356,12 +423,15 @@ def load_tips(conn, cursor, valid_business_ids, valid_user_ids):
         batch_size = 10000
         total_loaded = 0
         total_skipped = 0
-
-        with open(os.path.join(data_dir, 'yelp_academic_dataset_tip.json'), 'r', encoding='utf-8') as f:
-            for line in f:
+        with dataset.open('tips') as stream:
+            metrics = table_metrics('tips', stream)
+            for line in metrics.lines(stream):
                 try:
                     data = json.loads(line)
-                    if args.skip_validation or (data['user_id'] in valid_user_ids and data['business_id'] in valid_business_ids):
+                    metrics.lap('parse')
+                    valid = args.skip_validation or (data['user_id'] in valid_user_ids and data['business_id'] in valid_business_ids)
+                    metrics.lap('validate')
+                    if valid:
                         tips.append((
                             data['user_id'],
                             data['business_id'],
@@ -369,6 +439,7 @@ def load_tips(conn, cursor, valid_business_ids, valid_user_ids):
                             safe_parse_date(data.get('date')),
                             data.get('compliment_count', 0)
                         ))
+                        metrics.lap('transform')
                         
                         if len(tips) >= batch_size:
                             query = """
@@ -376,17 +447,16 @@ def load_tips(conn, cursor, valid_business_ids, valid_user_ids):
                                 user_id, business_id, text, date, compliment_count
                             ) VALUES %s
                             """
-                            loaded = batch_insert(cursor, conn, tips, query)
+                            loaded = batch_insert(cursor, conn, tips, query, metrics=metrics)
                             total_loaded += loaded
                             tips = []
-                            print(f"  Loaded {total_loaded} tips...")
                     else:
                         total_skipped += 1
-                        if total_skipped % 10000 == 0:
-                            print(f"  Skipped {total_skipped} tips so far...")
+                        metrics.skip()
                 except Exception as e:
                     print(f"Error processing tip: {e}")
                     total_skipped += 1
+                    metrics.error()
                     continue
 
         if tips:
@@ -395,9 +465,10 @@ def load_tips(conn, cursor, valid_business_ids, valid_user_ids):
                 user_id, business_id, text, date, compliment_count
             ) VALUES %s
             """
-            loaded = batch_insert(cursor, conn, tips, query)
+            loaded = batch_insert(cursor, conn, tips, query, metrics=metrics)
             total_loaded += loaded
 
+        metrics.finish(stream.stats())
         print(f"Total tips loaded: {total_loaded}, skipped: {total_skipped}")
     else:
         print("Skipping tips table...")
@@ -418,17 +489,21 @@ def load_checkins(conn, cursor, valid_business_ids):
         batch_size = 5000
         total_loaded = 0
         total_skipped = 0
-
-        with open(os.path.join(data_dir, 'yelp_academic_dataset_checkin.json'), 'r', encoding='utf-8') as f:
-            for line in f:
+        with dataset.open('checkins') as stream:
+            metrics = table_metrics('checkins', stream)
+            for line in metrics.lines(stream):
                 try:
                     data = json.loads(line)
+                    metrics.lap('parse')
                     # Only add checkins where business_id exists in our database
-                    if args.skip_validation or data['business_id'] in valid_business_ids:
+                    valid = args.skip_validation or data['business_id'] in valid_business_ids
+                    metrics.lap('validate')
+                    if valid:
                         checkins.append((
                             data['business_id'],
                             data.get('date', '')
                         ))
+                        metrics.lap('transform')
                         
                         if len(checkins) >= batch_size:
                             query = """
@@ -436,17 +511,16 @@ def load_checkins(conn, cursor, valid_business_ids):
                                 business_id, date
                             ) VALUES %s
                             """
-                            loaded = batch_insert(cursor, conn, checkins, query)
+                            loaded = batch_insert(cursor, conn, checkins, query, metrics=metrics)
                             total_loaded += loaded
                             checkins = []
-                            print(f"  Loaded {total_loaded} checkins...")
                     else:
                         total_skipped += 1
-                        if total_skipped % 5000 == 0:
-                            print(f"  Skipped {total_skipped} checkins so far...")
+                        metrics.skip()
                 except Exception as e:
                     print(f"Error processing checkin: {e}")
                     total_skipped += 1
+                    metrics.error()
                     continue
 
         if checkins:
@@ -455,20 +529,32 @@ def load_checkins(conn, cursor, valid_business_ids):
                 business_id, date
             ) VALUES %s
             """
-            loaded = batch_insert(cursor, conn, checkins, query)
+            loaded = batch_insert(cursor, conn, checkins, query, metrics=metrics)
             total_loaded += loaded
 
+        metrics.finish(stream.stats())
         print(f"Total checkins loaded: {total_loaded}, skipped: {total_skipped}")
     else:
         print("Skipping checkins table...")
 
 
+def run_load(table, load, *load_args):
+    """Run one table's loader, under cProfile and tracemalloc with --profile"""
+    if args.profile:
+        output_dir = os.path.join(os.path.dirname(os.path.abspath(args.metrics_file)), 'profiles')
+        return profile_load(f"postgresql_{table}", load, *load_args, top=args.profile_top, output_dir=output_dir)
+    return load(*load_args)
+
 def main():
     try:
         conn, cursor = setup_database()
         
-        load_businesses(conn, cursor)
-        load_users(conn, cursor)
+        if args.text_search:
+            add_text_search_columns(conn, cursor)
+        add_geo_columns(conn, cursor)
+        
+        run_load('businesses', load_businesses, conn, cursor)
+        run_load('users', load_users, conn, cursor)
         
         need_validation = not args.skip_validation and ('all' in args.tables or 
                                                      'reviews' in args.tables or 
@@ -477,9 +563,12 @@ def main():
         
         valid_business_ids, valid_user_ids = collect_valid_ids(conn, cursor) if need_validation else (set(), set())
         
-        load_reviews(conn, cursor, valid_business_ids, valid_user_ids)
-        load_tips(conn, cursor, valid_business_ids, valid_user_ids)
-        load_checkins(conn, cursor, valid_business_ids)
+        run_load('reviews', load_reviews, conn, cursor, valid_business_ids, valid_user_ids)
+        run_load('tips', load_tips, conn, cursor, valid_business_ids, valid_user_ids)
+        run_load('checkins', load_checkins, conn, cursor, valid_business_ids)
+        
+        if not args.skip_statistics:
+            run_statistics_stage(conn, args.statistics_target)
         
         conn.close()
         print("PostgreSQL data loading complete!")
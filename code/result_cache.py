@@ -0,0 +1,163 @@
+"""
+In-process read-through result cache.
+
+Results are keyed by engine, query name and parameters, and tagged with the
+tables/collections the query reads. Entries are evicted least recently used
+first once either the entry count or the (pickled) size bound is exceeded,
+expire after a TTL, and are invalidated when one of their tables is written.
+"""
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+
+TABLES = ['businesses', 'users', 'reviews', 'tips', 'checkins']
+
+_TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)', re.IGNORECASE)
+
+
+def query_tables(query_info):
+    """Tables/collections a benchmark query reads: SQL FROM/JOIN targets, its collection and $lookup sources"""
+    tables = {name for name in _TABLE_PATTERN.findall(query_info.get('pg', '')) if name in TABLES}
+    if query_info.get('mongo_collection'):
+        tables.add(query_info['mongo_collection'])
+    pipeline = query_info.get('mongo_pipeline')
+    if pipeline:
+        try:
+            stages = pipeline(query_info.get('pg_params') if isinstance(query_info.get('pg_params'), dict) else {})
+        except Exception:
+            stages = []
+        tables.update(stage['$lookup']['from'] for stage in stages if '$lookup' in stage)
+    # Fall back to every table, so unknown reads are still invalidated by any write
+    return frozenset(tables) or frozenset(TABLES)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def cache_key(engine, query_name, params):
+    return (engine, query_name, _freeze(params))
+
+
+def result_size(value):
+    """Approximate size of a result in bytes"""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+class ResultCache:
+    """LRU + TTL result cache bounded by entry count and bytes, with per-table invalidation"""
+
+    def __init__(self, max_entries=10000, max_bytes=256 * 1024 * 1024, ttl=300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return (True, value) on a hit and (False, None) on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and entry['expires'] < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry['value']
+
+    def put(self, key, value, tables):
+        size = result_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                self.rejected += 1
+                return
+            self._entries[key] = {'value': value, 'size': size, 'tables': tables,
+                                  'expires': time.monotonic() + (self.ttl or 0)}
+            self.bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tables):
+        """Drop every entry that reads one of `tables`; return how many were dropped"""
+        with self._lock:
+            keys = set()
+            for table in tables:
+                keys.update(self._by_table.get(table, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self.bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry['size']
+        for table in entry['tables']:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+
+    @property
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hit_ratio,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'rejected': self.rejected,
+        }
+
+
+def read_through(cache, engine, query_name, query_info, params, run):
+    """Return (result, hit): the cached result, or `run()`'s result stored in the cache"""
+    if cache is None:
+        return run(), False
+    key = cache_key(engine, query_name, params)
+    hit, value = cache.get(key)
+    if hit:
+        return value, True
+    value = run()
+    cache.put(key, value, query_tables(query_info))
+    return value, False
@@ -0,0 +1,258 @@
+"""
+Append-only benchmark results store.
+
+Every benchmark.py run is recorded in a local SQLite database together with
+the git revision, index configuration and dataset scale it ran against, and
+the timing of every iteration of every query on every engine. Runs are never
+updated or deleted.
+
+    python results_store.py list
+    python results_store.py show 12
+    python results_store.py compare 11 12 --threshold 0.10 --alpha 0.05
+
+`compare` exits with status 1 when any query got slower than the threshold
+with a statistically significant difference (two-sided Mann-Whitney U test),
+so it can gate schema and index changes. A query with fewer than MIN_SAMPLES
+timings in either run is reported as "insufficient samples" rather than "ok":
+with the normal approximation, even fully separated samples that small can
+never reach significance.
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+
+from tabulate import tabulate
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "benchmark_history.sqlite")
+
+# Smallest sample size per side at which the Mann-Whitney test can reach
+# p < 0.05 (4 vs 4 fully separated gives p ~ 0.03, 3 vs 3 only p ~ 0.08)
+MIN_SAMPLES = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    git_revision TEXT,
+    index_config TEXT,
+    scale REAL,
+    label TEXT,
+    command TEXT
+);
+
+CREATE TABLE IF NOT EXISTS measurements (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    query_name TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    iteration INTEGER NOT NULL,
+    execution_ms REAL,
+    planning_ms REAL,
+    params TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_measurements_run ON measurements(run_id, query_name, engine);
+"""
+
+
+def get_git_revision():
+    """Current git revision, from GIT_REVISION or `git rev-parse`, with a -dirty suffix for local changes"""
+    if os.environ.get('GIT_REVISION'):
+        return os.environ['GIT_REVISION']
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_dir,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=repo_dir,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class ResultsStore:
+    """SQLite-backed, append-only history of benchmark runs"""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def start_run(self, index_config=None, scale=None, label=None, command=None):
+        cur = self.conn.execute(
+            "INSERT INTO runs (created_at, git_revision, index_config, scale, label, command) VALUES (?, ?, ?, ?, ?, ?)",
+            (datetime.datetime.now().isoformat(timespec='seconds'), get_git_revision(),
+             index_config, scale, label, command or ' '.join(sys.argv))
+        )
+        self.conn.commit()
+        return cur.lastrowid
+
+    def record(self, run_id, query_name, engine, iteration, execution_ms, planning_ms=None, params=None):
+        self.conn.execute(
+            "INSERT INTO measurements (run_id, query_name, engine, iteration, execution_ms, planning_ms, params) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (run_id, query_name, engine, iteration, execution_ms, planning_ms,
+             json.dumps(params, default=str) if params else None)
+        )
+        self.conn.commit()
+
+    def runs(self, limit=None):
+        sql = """
+            SELECT r.run_id, r.created_at, r.git_revision, r.index_config, r.scale, r.label,
+                   COUNT(m.run_id)
+            FROM runs r LEFT JOIN measurements m ON m.run_id = r.run_id
+            GROUP BY r.run_id
+            ORDER BY r.run_id DESC
+        """
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self.conn.execute(sql).fetchall()
+
+    def resolve_run(self, ref):
+        """Resolve a run id, 'latest' or 'latest~N' to a run id"""
+        if str(ref).startswith('latest'):
+            offset = int(ref.split('~', 1)[1]) if '~' in ref else 0
+            row = self.conn.execute("SELECT run_id FROM runs ORDER BY run_id DESC LIMIT 1 OFFSET ?", (offset,)).fetchone()
+        else:
+            row = self.conn.execute("SELECT run_id FROM runs WHERE run_id = ?", (int(ref),)).fetchone()
+        if row is None:
+            raise KeyError(f"No run matching '{ref}' in {self.path}")
+        return row[0]
+
+    def run_info(self, run_id):
+        return self.conn.execute(
+            "SELECT run_id, created_at, git_revision, index_config, scale, label, command FROM runs WHERE run_id = ?",
+            (run_id,)
+        ).fetchone()
+
+    def timings(self, run_id):
+        """Return {(query_name, engine): [execution_ms, ...]} for a run"""
+        timings = {}
+        for query_name, engine, execution_ms in self.conn.execute(
+                "SELECT query_name, engine, execution_ms FROM measurements "
+                "WHERE run_id = ? AND execution_ms IS NOT NULL ORDER BY iteration", (run_id,)):
+            timings.setdefault((query_name, engine), []).append(execution_ms)
+        return timings
+
+
+def mann_whitney_u(a, b):
+    """Two-sided Mann-Whitney U test (normal approximation with tie correction). Returns the p-value."""
+    n1, n2 = len(a), len(b)
+    if n1 == 0 or n2 == 0:
+        return None
+    combined = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    n = n1 + n2
+
+    ranks = [0.0] * n
+    tie_term = 0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+
+    rank_sum_a = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum_a - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))) if n > 1 else 0
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - mean) - 0.5) / math.sqrt(variance)
+    return math.erfc(max(z, 0) / math.sqrt(2))
+
+
+def compare_runs(store, base_id, candidate_id, threshold, alpha):
+    """Compare two runs, returning table rows and whether any regression was found"""
+    base, candidate = store.timings(base_id), store.timings(candidate_id)
+    rows = []
+    regressed = False
+    for key in sorted(set(base) & set(candidate)):
+        query_name, engine = key
+        base_median, candidate_median = statistics.median(base[key]), statistics.median(candidate[key])
+        change = candidate_median / base_median - 1 if base_median else 0.0
+        p_value = mann_whitney_u(base[key], candidate[key])
+        significant = p_value is not None and p_value < alpha
+        if min(len(base[key]), len(candidate[key])) < MIN_SAMPLES:
+            verdict = "insufficient samples"
+        elif change > threshold and significant:
+            verdict = "REGRESSION"
+            regressed = True
+        elif change < -threshold and significant:
+            verdict = "improvement"
+        else:
+            verdict = "ok"
+        rows.append([
+            query_name, engine, len(base[key]), len(candidate[key]),
+            f"{base_median:.2f}ms", f"{candidate_median:.2f}ms", f"{change:+.1%}",
+            "N/A" if p_value is None else f"{p_value:.4f}", verdict
+        ])
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and compare recorded benchmark runs')
+    parser.add_argument('--store', default=DEFAULT_STORE_PATH, help='Path of the results database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help='List recorded runs')
+    list_parser.add_argument('--limit', type=int, default=20)
+
+    show_parser = subparsers.add_parser('show', help='Show the median timings of a run')
+    show_parser.add_argument('run', help="Run id, 'latest' or 'latest~N'")
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two runs; exit 1 on significant regressions')
+    compare_parser.add_argument('base', help="Baseline run id, 'latest' or 'latest~N'")
+    compare_parser.add_argument('candidate', help="Candidate run id, 'latest' or 'latest~N'")
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help='Relative slowdown of the median counted as a regression (default: 0.10)')
+    compare_parser.add_argument('--alpha', type=float, default=0.05, help='Significance level (default: 0.05)')
+
+    args = parser.parse_args()
+    store = ResultsStore(args.store)
+    try:
+        if args.command == 'list':
+            print(tabulate(store.runs(args.limit),
+                           headers=["Run", "Created", "Git Revision", "Index Config", "Scale", "Label", "Measurements"],
+                           tablefmt="grid"))
+        elif args.command == 'show':
+            run_id = store.resolve_run(args.run)
+            info = store.run_info(run_id)
+            print(f"Run {info[0]} at {info[1]} (git {info[2]}, index config {info[3]}, scale {info[4]})")
+            rows = [[query_name, engine, len(values), f"{statistics.median(values):.2f}ms",
+                     f"{min(values):.2f}ms", f"{max(values):.2f}ms"]
+                    for (query_name, engine), values in sorted(store.timings(run_id).items())]
+            print(tabulate(rows, headers=["Query", "Engine", "Iterations", "Median", "Min", "Max"], tablefmt="grid"))
+        elif args.command == 'compare':
+            base_id, candidate_id = store.resolve_run(args.base), store.resolve_run(args.candidate)
+            rows, regressed = compare_runs(store, base_id, candidate_id, args.threshold, args.alpha)
+            print(f"Comparing run {base_id} (base) with run {candidate_id} (candidate)")
+            print(tabulate(rows, headers=["Query", "Engine", "Base N", "Candidate N", "Base Median",
+                                          "Candidate Median", "Change", "p-value", "Verdict"], tablefmt="grid"))
+            insufficient = sum(1 for row in rows if row[-1] == "insufficient samples")
+            if insufficient:
+                print(f"Warning: {insufficient} of {len(rows)} comparisons could not be gated; "
+                      f"record both runs with --iterations {MIN_SAMPLES} or more")
+            if regressed:
+                print(f"Regression detected: slowdown above {args.threshold:.0%} at alpha={args.alpha}")
+                return 1
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
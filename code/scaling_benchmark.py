@@ -0,0 +1,260 @@
+"""
+Intra-query parallelism and CPU scaling benchmark.
+
+PostgreSQL: max_parallel_workers_per_gather is SET to each value of the
+worker sweep (0..N) on the benchmark connection and the queries are timed
+with EXPLAIN ANALYZE. The plan's Gather nodes give the parallel workers
+planned and actually launched (launches are capped by max_parallel_workers
+and max_worker_processes, 8 by default).
+
+With --cpusets, the server containers are pinned to each CPU set in turn with
+`docker update --cpuset-cpus` (applied live, without a restart) and the sweep
+is repeated under each allotment. Each container's original CPU set is read
+with `docker inspect` first and restored afterwards. MongoDB runs a query on a
+single thread, so it is swept over the CPU allotments only.
+
+Speedup is relative to the engine's first point (the first worker count,
+normally 0, under the first CPU set). Parallel efficiency is speedup divided
+by the processes working on the query: PostgreSQL's launched workers plus the
+leader (capped by the CPUs in the set). A MongoDB query always runs on one
+thread, so its degree is 1 and its efficiency equals its speedup.
+"""
+import argparse
+import csv
+import os
+
+import functools
+print = functools.partial(print, flush=True)
+
+from tabulate import tabulate
+
+from benchmark import (init_connections, close_connections, create_adapters, resolve_params, get_timestamp_str,
+                       geometric_mean, GEOMEAN_FLOOR_MS, DEFAULT_ENGINES, QUERIES, QUERY_CLASSES)
+from db_config import PG_CONTAINER, MONGO_CONTAINER
+from engines import PostgresAdapter, MongoAdapter
+from index_matrix import median_or_none
+from server_config import set_container_cpuset, container_cpuset
+
+CONTAINERS = {
+    PostgresAdapter.name: PG_CONTAINER,
+    MongoAdapter.name: MONGO_CONTAINER,
+}
+# Planner costs that make PostgreSQL choose a parallel plan whenever workers are allowed
+EAGER_PARALLEL_SETTINGS = {
+    'parallel_setup_cost': '0',
+    'parallel_tuple_cost': '0',
+    'min_parallel_table_scan_size': '0',
+    'min_parallel_index_scan_size': '0',
+}
+
+
+def cpuset_size(cpus):
+    """Number of CPUs in a cpuset string such as '2-3,6'"""
+    if not cpus:
+        return None
+    count = 0
+    for part in cpus.split(','):
+        low, _, high = part.partition('-')
+        count += int(high or low) - int(low) + 1
+    return count
+
+
+def set_parallel_workers(conn, workers, eager=False):
+    cur = conn.cursor()
+    cur.execute("RESET ALL")
+    cur.execute("SET max_parallel_workers_per_gather = %s", (workers,))
+    if eager:
+        for name, value in EAGER_PARALLEL_SETTINGS.items():
+            cur.execute(f"SET {name} = %s", (value,))
+    conn.commit()
+    cur.close()
+
+
+def time_point(adapter, query_names, pg_conn, iterations, warmup):
+    """Median execution time and parallel workers of each query the engine supports"""
+    results = {}
+    for query_name in query_names:
+        query_info = QUERIES[query_name]
+        if not adapter.supports(query_info):
+            continue
+        print(f"  {adapter.title}: {query_name}")
+        params = resolve_params(pg_conn, query_info)
+        for _ in range(warmup):
+            adapter.explain(query_info, params)
+        times, planned, launched = [], 0, 0
+        for _ in range(iterations):
+            plan = adapter.parse(adapter.explain(query_info, params))
+            if plan.error:
+                break
+            times.append(plan.execution_time_ms)
+            planned, launched = plan.parallel_workers()
+        results[query_name] = {
+            'time_ms': median_or_none(times),
+            'workers_planned': planned,
+            'workers_launched': launched,
+        }
+    return results
+
+
+def degree_of_parallelism(engine, result, cpus):
+    """Processes working on one query: workers plus leader for PostgreSQL, a single thread for MongoDB"""
+    if engine == PostgresAdapter.name:
+        degree = result['workers_launched'] + 1
+        return min(degree, cpus) if cpus else degree
+    return 1
+
+
+def add_speedups(points):
+    """Speedup and efficiency of every query relative to its engine's first point"""
+    baselines = {}
+    for point in points:
+        for query_name, result in point['results'].items():
+            base = baselines.setdefault((point['engine'], query_name), result['time_ms'])
+            result['speedup'] = base / result['time_ms'] if base and result['time_ms'] else None
+            degree = degree_of_parallelism(point['engine'], result, point['cpus'])
+            result['degree'] = degree
+            result['efficiency'] = result['speedup'] / degree if result['speedup'] is not None else None
+
+
+def point_label(point):
+    cpus = "all CPUs" if point['cpuset'] is None else f"cpus {point['cpuset']}"
+    if point['workers'] is None:
+        return cpus
+    return f"{cpus}, {point['workers']} workers"
+
+
+def print_scaling(points, query_names, adapters):
+    for adapter in adapters:
+        engine_points = [point for point in points if point['engine'] == adapter.name]
+        if not engine_points:
+            continue
+        rows = []
+        for query_name in query_names:
+            for point in engine_points:
+                result = point['results'].get(query_name)
+                if result is None:
+                    continue
+                rows.append([
+                    query_name,
+                    point['cpuset'] or "all",
+                    "-" if point['workers'] is None else point['workers'],
+                    "-" if point['workers'] is None else f"{result['workers_launched']}/{result['workers_planned']}",
+                    "N/A" if result['time_ms'] is None else f"{result['time_ms']:.2f}ms",
+                    "N/A" if result['speedup'] is None else f"{result['speedup']:.2f}x",
+                    "N/A" if result['efficiency'] is None else f"{result['efficiency'] * 100:.0f}%",
+                ])
+        print(f"\n=== {adapter.title} scaling ===")
+        print(tabulate(rows, headers=["Query", "CPU Set", "Workers/Gather", "Launched/Planned", "Time", "Speedup",
+                                      "Efficiency"], tablefmt="grid"))
+
+        rows = []
+        for point in engine_points:
+            results = list(point['results'].values())
+            geomean = geometric_mean([r['time_ms'] for r in results], GEOMEAN_FLOOR_MS[adapter.name])
+            speedups = [r['speedup'] for r in results if r['speedup'] is not None]
+            efficiencies = [r['efficiency'] for r in results if r['efficiency'] is not None]
+            parallel = sum(1 for r in results if r['workers_launched'])
+            rows.append([
+                point_label(point),
+                "N/A" if geomean is None else f"{geomean:.2f}ms",
+                "N/A" if not speedups else f"{geometric_mean(speedups, 1e-9):.2f}x",
+                "N/A" if not efficiencies else f"{sum(efficiencies) / len(efficiencies) * 100:.0f}%",
+                f"{parallel}/{len(results)}" if adapter.name == PostgresAdapter.name else "-",
+            ])
+        print(f"\n=== {adapter.title} scaling summary ===")
+        print(tabulate(rows, headers=["Point", "Geomean Time", "Geomean Speedup", "Mean Efficiency",
+                                      "Parallel Plans"], tablefmt="grid"))
+
+
+def save_scaling_csv(points, results_dir):
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"scaling_benchmark_{get_timestamp_str()}.csv")
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Engine", "Query", "CPU Set", "CPUs", "Workers per Gather", "Workers Planned",
+                         "Workers Launched", "Execution Time (ms)", "Speedup", "Efficiency"])
+        for point in points:
+            for query_name, result in point['results'].items():
+                writer.writerow([point['engine'], query_name, point['cpuset'] or '', point['cpus'] or '',
+                                 '' if point['workers'] is None else point['workers'], result['workers_planned'],
+                                 result['workers_launched'], result['time_ms'], result['speedup'],
+                                 result['efficiency']])
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark intra-query parallelism and CPU scaling')
+    parser.add_argument('--queries', nargs='+', help='Specific queries to run (default: all)')
+    parser.add_argument('--classes', nargs='+', choices=list(QUERY_CLASSES), help='Only run queries of these classes')
+    parser.add_argument('--engines', nargs='+', default=DEFAULT_ENGINES, choices=DEFAULT_ENGINES,
+                        help='Engines to benchmark (default: postgresql mongodb)')
+    parser.add_argument('--max-workers', type=int, default=4,
+                        help='Sweep max_parallel_workers_per_gather from 0 to this value (default: 4)')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        help='Explicit max_parallel_workers_per_gather values (overrides --max-workers)')
+    parser.add_argument('--eager-parallel', action='store_true',
+                        help='Zero the parallel planner costs so parallel plans are chosen whenever allowed')
+    parser.add_argument('--cpusets', nargs='+',
+                        help="CPU sets to pin the server containers to in turn, e.g. 2 2-3 2-5 (needs the docker CLI)")
+    parser.add_argument('--restore-cpuset',
+                        help='CPU set the containers are given back when done (default: the set each had before)')
+    parser.add_argument('--iterations', type=int, default=3, help='Runs per query; the median is reported (default: 3)')
+    parser.add_argument('--warmup', type=int, default=1, help='Discarded runs per query at each point (default: 1)')
+    parser.add_argument('--results-dir', type=str, default=None, help='Directory to save results (default: ./results)')
+    args = parser.parse_args()
+
+    query_names = [name for name in (args.queries or list(QUERIES)) if name in QUERIES]
+    if args.classes:
+        query_names = [name for name in query_names if QUERIES[name].get('class') in args.classes]
+    if not query_names:
+        print("No benchmark queries to run")
+        return
+    worker_counts = args.workers or list(range(args.max_workers + 1))
+
+    pg_conn, mongo_db, mongo_client = init_connections()
+    adapters = create_adapters(args.engines, pg_conn, mongo_db)
+    points = []
+    original_cpusets = {}
+    try:
+        if args.cpusets:
+            original_cpusets = {adapter.name: container_cpuset(CONTAINERS[adapter.name]) for adapter in adapters}
+        for adapter in adapters:
+            adapter.connect()
+        for cpuset in args.cpusets or [None]:
+            if cpuset is not None:
+                print(f"\n=== Pinning {', '.join(CONTAINERS[a.name] for a in adapters)} to CPUs {cpuset} ===")
+                for adapter in adapters:
+                    set_container_cpuset(CONTAINERS[adapter.name], cpuset)
+            for adapter in adapters:
+                sweep = worker_counts if adapter.name == PostgresAdapter.name else [None]
+                for workers in sweep:
+                    if workers is not None:
+                        print(f"\n--- max_parallel_workers_per_gather = {workers} ---")
+                        set_parallel_workers(pg_conn, workers, args.eager_parallel)
+                    points.append({
+                        'engine': adapter.name,
+                        'cpuset': cpuset,
+                        'cpus': cpuset_size(cpuset),
+                        'workers': workers,
+                        'results': time_point(adapter, query_names, pg_conn, args.iterations, args.warmup),
+                    })
+
+        add_speedups(points)
+        print_scaling(points, query_names, adapters)
+        results_dir = args.results_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+        path = save_scaling_csv(points, results_dir)
+        print(f"\nScaling results saved to {path}")
+    finally:
+        for engine, cpuset in original_cpusets.items():
+            set_container_cpuset(CONTAINERS[engine], args.restore_cpuset or cpuset)
+        cur = pg_conn.cursor()
+        cur.execute("RESET ALL")
+        pg_conn.commit()
+        cur.close()
+        for adapter in adapters:
+            adapter.close()
+        close_connections(pg_conn, mongo_client)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Named server configuration profiles for PostgreSQL and MongoDB.
+
+Profiles are defined in server_configs.yaml. This module loads them and
+applies one to each engine:
+
+- PostgreSQL settings a session may change are SET on the benchmark
+  connection; the others are written with ALTER SYSTEM and picked up by a
+  configuration reload, or by restarting the PostgreSQL container when the
+  setting (e.g. shared_buffers) is only read at server start
+- MongoDB parameters are changed at runtime with setParameter; the WiredTiger
+  cache is resized through wiredTigerEngineRuntimeConfig
+
+Settings that another profile manages but the applied one leaves out are
+returned to their defaults, so profiles can be applied in any order.
+"""
+import os
+import shutil
+import subprocess
+import time
+
+import psycopg2
+import yaml
+
+from db_config import PG_PARAMS, PG_CONTAINER
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server_configs.yaml')
+
+DEFAULT_PROFILE = 'default'
+# pg_settings contexts that SET can change in a session (the benchmark user is a superuser)
+SESSION_CONTEXTS = ('user', 'superuser')
+# Seconds for the backend to process the reload signal before pending_restart is read
+RELOAD_WAIT_S = 0.5
+RESTART_TIMEOUT_S = 120
+MONGO_CACHE_SIZE = 'wiredTigerCacheSizeGB'
+
+
+def _resolve_profile(name, raw_profiles, seen=()):
+    if name not in raw_profiles:
+        raise KeyError(f"Unknown server profile '{name}'")
+    if name in seen:
+        raise ValueError(f"Server profile '{name}' extends itself")
+
+    raw = raw_profiles[name] or {}
+    postgres, mongo = {}, {}
+
+    parents = raw.get('extends') or []
+    if isinstance(parents, str):
+        parents = [parents]
+    for parent in parents:
+        resolved = _resolve_profile(parent, raw_profiles, seen + (name,))
+        postgres.update(resolved['postgres'])
+        mongo.update(resolved['mongo'])
+
+    postgres.update(raw.get('postgres') or {})
+    mongo.update(raw.get('mongo') or {})
+
+    return {
+        'name': name,
+        'description': raw.get('description', ''),
+        'postgres': postgres,
+        'mongo': mongo,
+    }
+
+
+def load_server_profiles(path=CONFIG_PATH):
+    """Load every named server profile, resolving `extends`"""
+    with open(path, 'r') as f:
+        raw_profiles = yaml.safe_load(f) or {}
+    return {name: _resolve_profile(name, raw_profiles) for name in raw_profiles}
+
+
+def list_server_profiles(path=CONFIG_PATH):
+    print("\nAvailable server profiles:")
+    for name, profile in load_server_profiles(path).items():
+        settings = [f"{key}={value}" for key, value in {**profile['postgres'], **profile['mongo']}.items()]
+        print(f"  - {name}: {profile['description']} ({', '.join(settings) or 'defaults'})")
+
+
+def managed_settings(profiles):
+    """Every setting any of `profiles` changes, keyed by engine"""
+    postgres, mongo = set(), set()
+    for profile in profiles.values():
+        postgres.update(profile['postgres'])
+        mongo.update(profile['mongo'])
+    return {'postgres': sorted(postgres), 'mongo': sorted(mongo)}
+
+
+# --- PostgreSQL -------------------------------------------------------------
+
+def postgres_value(value):
+    """A YAML value as a PostgreSQL setting (YAML reads a bare off/on as a boolean)"""
+    if isinstance(value, bool):
+        return 'on' if value else 'off'
+    return str(value)
+
+
+def postgres_setting_contexts(conn, names):
+    """The pg_settings context of each setting ('user', 'sighup', 'postmaster', ...)"""
+    if not names:
+        return {}
+    cur = conn.cursor()
+    cur.execute("SELECT name, context FROM pg_settings WHERE name = ANY(%s)", (list(names),))
+    contexts = dict(cur.fetchall())
+    cur.close()
+    conn.commit()
+    unknown = [name for name in names if name not in contexts]
+    if unknown:
+        raise ValueError(f"Unknown PostgreSQL setting(s): {', '.join(unknown)}")
+    return contexts
+
+
+def apply_postgres_profile(conn, profile, managed):
+    """Apply a profile's PostgreSQL settings, returning how each one was applied.
+
+    The result lists the settings SET in the session, those written with ALTER
+    SYSTEM, and the ones still waiting for a server restart.
+    """
+    settings = profile['postgres']
+    contexts = postgres_setting_contexts(conn, managed)
+    cur = conn.cursor()
+    cur.execute("RESET ALL")
+    session = {}
+    for name, value in settings.items():
+        if contexts[name] in SESSION_CONTEXTS:
+            cur.execute(f"SET {name} = %s", (postgres_value(value),))
+            session[name] = postgres_value(value)
+    conn.commit()
+
+    # ALTER SYSTEM cannot run inside a transaction block
+    system = {}
+    conn.autocommit = True
+    try:
+        for name in managed:
+            if contexts[name] in SESSION_CONTEXTS:
+                continue
+            if name in settings:
+                cur.execute(f"ALTER SYSTEM SET {name} = %s", (postgres_value(settings[name]),))
+                system[name] = postgres_value(settings[name])
+            else:
+                cur.execute(f"ALTER SYSTEM RESET {name}")
+        cur.execute("SELECT pg_reload_conf()")
+        time.sleep(RELOAD_WAIT_S)
+        cur.execute("SELECT name FROM pg_settings WHERE pending_restart")
+        pending = sorted(row[0] for row in cur.fetchall())
+    finally:
+        conn.autocommit = False
+        cur.close()
+    return {'session': session, 'system': system, 'pending_restart': pending}
+
+
+def docker(*args):
+    """Run a docker CLI command against the local docker-compose containers"""
+    if shutil.which('docker') is None:
+        raise RuntimeError(f"'docker {args[0]}' needs the docker CLI; run this script on the docker host "
+                           f"(with PG_HOST/MONGO_HOST=localhost)")
+    return subprocess.run(['docker', *args], check=True, capture_output=True, text=True).stdout
+
+
+def restart_container(name):
+    print(f"  Restarting container {name}...")
+    docker('restart', name)
+
+
+def set_container_cpuset(name, cpus):
+    """Pin a running container to the CPUs in `cpus` (e.g. '2-3'); takes effect without a restart"""
+    docker('update', '--cpuset-cpus', cpus, name)
+
+
+def container_cpuset(name):
+    """CPUs a container is pinned to; every CPU of the docker host when it is not pinned"""
+    cpus = docker('inspect', '-f', '{{.HostConfig.CpusetCpus}}', name).strip()
+    if cpus:
+        return cpus
+    return f"0-{int(docker('info', '-f', '{{.NCPU}}').strip()) - 1}"
+
+
+def wait_for_postgres(timeout=RESTART_TIMEOUT_S):
+    """Block until PostgreSQL accepts connections again"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            psycopg2.connect(**PG_PARAMS).close()
+            return
+        except psycopg2.OperationalError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(1)
+
+
+def restart_postgres(container=PG_CONTAINER):
+    start = time.perf_counter()
+    restart_container(container)
+    wait_for_postgres()
+    return time.perf_counter() - start
+
+
+# --- MongoDB ----------------------------------------------------------------
+
+def mongo_parameter_defaults(client, names):
+    """Current value of each MongoDB parameter, to restore after the profiles ran"""
+    defaults = {}
+    for name in names:
+        if name == MONGO_CACHE_SIZE:
+            cache = client.admin.command('serverStatus')['wiredTiger']['cache']
+            defaults[name] = cache['maximum bytes configured'] / (1024 ** 3)
+        else:
+            defaults[name] = client.admin.command({'getParameter': 1, name: 1})[name]
+    return defaults
+
+
+def set_mongo_parameter(client, name, value):
+    if name == MONGO_CACHE_SIZE:
+        client.admin.command({'setParameter': 1,
+                              'wiredTigerEngineRuntimeConfig': f"cache_size={int(float(value) * 1024)}M"})
+    else:
+        client.admin.command({'setParameter': 1, name: value})
+
+
+def apply_mongo_profile(client, profile, defaults):
+    """Apply a profile's MongoDB parameters, resetting the other managed ones to `defaults`"""
+    applied = {}
+    for name, default in defaults.items():
+        value = profile['mongo'].get(name, default)
+        set_mongo_parameter(client, name, value)
+        if name in profile['mongo']:
+            applied[name] = value
+    return applied
+
+
+def describe_applied(postgres, mongo):
+    """One line per engine describing how a profile was applied"""
+    lines = []
+    parts = []
+    if postgres['session']:
+        parts.append("SET " + ", ".join(f"{k}={v}" for k, v in postgres['session'].items()))
+    if postgres['system']:
+        parts.append("ALTER SYSTEM " + ", ".join(f"{k}={v}" for k, v in postgres['system'].items()))
+    lines.append(f"  PostgreSQL: {'; '.join(parts) or 'defaults'}")
+    lines.append(f"  MongoDB: {', '.join(f'{k}={v}' for k, v in mongo.items()) or 'defaults'}")
+    return "\n".join(lines)
@@ -0,0 +1,269 @@
+"""
+Server-side resource counters captured around each benchmark query.
+
+PostgreSQL: pg_stat_statements (shared/local/temp blocks, WAL, I/O timing),
+pg_stat_io and pg_stat_database. pg_stat_statements must be preloaded
+(see docker-compose.yml) and track_io_timing enabled for I/O times.
+
+MongoDB: serverStatus opcounters, document/query executor metrics, WiredTiger
+cache and block-manager reads, plus the yields of the running operation
+sampled from $currentOp and the yields reported by explain.
+
+Each snapshot is a flat dict of counters; deltas are taken between the
+snapshot before and after a query. The snapshots are themselves statements on
+the measured connection (and serverStatus commands), so their own share of
+the counters is measured once per connection with an empty probe
+(calibrate_pg / calibrate_mongo) and subtracted from every delta.
+
+Sampling $currentOp adds one aggregate command per interval to the server
+being measured; the interval defaults to 50 ms (DEFAULT_CURRENTOP_INTERVAL)
+and the samples are not counted in the opcounters deltas. Yields of queries
+shorter than the interval are only seen through explain.
+"""
+import threading
+
+PGSS_COLUMNS = [
+    'calls', 'rows',
+    'shared_blks_hit', 'shared_blks_read', 'shared_blks_dirtied', 'shared_blks_written',
+    'local_blks_hit', 'local_blks_read', 'local_blks_dirtied', 'local_blks_written',
+    'temp_blks_read', 'temp_blks_written',
+    'wal_records', 'wal_fpi', 'wal_bytes',
+    # PostgreSQL 17 names, then the pre-17 names
+    'shared_blk_read_time', 'shared_blk_write_time', 'temp_blk_read_time', 'temp_blk_write_time',
+    'blk_read_time', 'blk_write_time',
+]
+
+PG_STAT_IO_COLUMNS = ['reads', 'read_time', 'writes', 'write_time', 'extends', 'hits', 'evictions']
+
+PG_STAT_DATABASE_COLUMNS = ['blks_read', 'blks_hit', 'tup_returned', 'tup_fetched', 'temp_files',
+                            'temp_bytes', 'blk_read_time', 'blk_write_time']
+
+MONGO_WT_CACHE_COUNTERS = ['bytes read into cache', 'pages read into cache', 'bytes written from cache',
+                           'pages requested from the cache']
+MONGO_WT_BLOCK_COUNTERS = ['blocks read', 'bytes read', 'blocks written', 'bytes written']
+
+DEFAULT_CURRENTOP_INTERVAL = 0.05
+# Empty probes run to measure the snapshots' own share of the counters
+CALIBRATION_ROUNDS = 3
+
+
+# --- PostgreSQL -------------------------------------------------------------
+
+def ensure_pg_stat_statements(conn):
+    """Create the pg_stat_statements extension if the library is preloaded; return whether it is usable"""
+    cur = conn.cursor()
+    try:
+        cur.execute("SHOW shared_preload_libraries")
+        if 'pg_stat_statements' not in cur.fetchone()[0]:
+            return False
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_stat_statements")
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        return False
+    finally:
+        cur.close()
+
+
+def pg_snapshot(conn, use_pgss=True):
+    """Snapshot cumulative PostgreSQL counters for the current database"""
+    cur = conn.cursor()
+    snapshot = {}
+    try:
+        # End the benchmark transaction and force this backend to flush its pending
+        # statistics so the cumulative views include the query that just ran
+        conn.commit()
+        if conn.server_version >= 150000:
+            cur.execute("SELECT pg_stat_force_next_flush()")
+            conn.commit()
+        cur.execute("SELECT pg_stat_clear_snapshot()")
+
+        if use_pgss:
+            cur.execute("""
+                SELECT s.*
+                FROM pg_stat_statements s
+                WHERE s.dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+                AND s.query NOT ILIKE '%pg_stat%'
+            """)
+            names = [column[0] for column in cur.description]
+            for row in cur.fetchall():
+                values = dict(zip(names, row))
+                for column in PGSS_COLUMNS:
+                    if values.get(column) is not None:
+                        key = f"pg.statements.{column}"
+                        snapshot[key] = snapshot.get(key, 0) + float(values[column])
+
+        if conn.server_version >= 160000:
+            cur.execute(f"""
+                SELECT {', '.join(f'COALESCE(SUM({c}), 0)' for c in PG_STAT_IO_COLUMNS)}
+                FROM pg_stat_io
+                WHERE backend_type = 'client backend'
+            """)
+            for column, value in zip(PG_STAT_IO_COLUMNS, cur.fetchone()):
+                snapshot[f"pg.io.{column}"] = float(value)
+
+        cur.execute(f"""
+            SELECT {', '.join(PG_STAT_DATABASE_COLUMNS)}
+            FROM pg_stat_database
+            WHERE datname = current_database()
+        """)
+        for column, value in zip(PG_STAT_DATABASE_COLUMNS, cur.fetchone()):
+            snapshot[f"pg.database.{column}"] = float(value or 0)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"  Warning: could not snapshot PostgreSQL statistics: {e}")
+    finally:
+        cur.close()
+    return snapshot
+
+
+# --- MongoDB ----------------------------------------------------------------
+
+def mongo_snapshot(db):
+    """Snapshot cumulative MongoDB serverStatus counters"""
+    status = db.client.admin.command('serverStatus')
+    snapshot = {}
+    for name, value in status.get('opcounters', {}).items():
+        snapshot[f"mongo.opcounters.{name}"] = float(value)
+    for name, value in status.get('metrics', {}).get('document', {}).items():
+        snapshot[f"mongo.document.{name}"] = float(value)
+    for name, value in status.get('metrics', {}).get('queryExecutor', {}).items():
+        if isinstance(value, (int, float)):
+            snapshot[f"mongo.queryExecutor.{name}"] = float(value)
+    wired_tiger = status.get('wiredTiger', {})
+    for name in MONGO_WT_CACHE_COUNTERS:
+        if name in wired_tiger.get('cache', {}):
+            snapshot[f"mongo.wt.cache.{name}"] = float(wired_tiger['cache'][name])
+    for name in MONGO_WT_BLOCK_COUNTERS:
+        if name in wired_tiger.get('block-manager', {}):
+            snapshot[f"mongo.wt.block-manager.{name}"] = float(wired_tiger['block-manager'][name])
+    return snapshot
+
+
+def explain_yields(explain):
+    """Yields reported by explain (saveState of the root execution stage)"""
+    if not isinstance(explain, dict):
+        return None
+    stats = explain.get('executionStats')
+    if stats is None:
+        for stage in explain.get('stages', []):
+            if '$cursor' in stage:
+                stats = stage['$cursor'].get('executionStats')
+                break
+    if not stats:
+        return None
+    return stats.get('executionStages', {}).get('saveState')
+
+
+class CurrentOpSampler:
+    """Poll $currentOp in a background thread while a query runs and keep the max numYields per operation"""
+
+    def __init__(self, client, namespace, interval=DEFAULT_CURRENTOP_INTERVAL):
+        self.client = client
+        self.namespace = namespace
+        self.interval = interval
+        self.max_yields = {}
+        self.polls = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.polls += 1
+            try:
+                for op in self.client.admin.aggregate([
+                    {'$currentOp': {}},
+                    {'$match': {'ns': self.namespace, 'active': True}},
+                    {'$project': {'opid': 1, 'numYields': 1}}
+                ]):
+                    opid = str(op.get('opid'))
+                    self.max_yields[opid] = max(self.max_yields.get(opid, 0), op.get('numYields', 0))
+            except Exception:
+                pass
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    @property
+    def total_yields(self):
+        return sum(self.max_yields.values())
+
+
+# --- Deltas -----------------------------------------------------------------
+
+def snapshot_delta(before, after):
+    """Counter differences between two snapshots, skipping counters that did not change"""
+    delta = {}
+    for key, value in after.items():
+        change = value - before.get(key, 0)
+        if change:
+            delta[key] = change
+    return delta
+
+
+def subtract_overhead(delta, overhead):
+    """Remove the snapshots' own share of each counter from a delta, dropping counters left at zero"""
+    result = {}
+    for key, value in delta.items():
+        change = value - overhead.get(key, 0)
+        if change > 0:
+            result[key] = change
+    return result
+
+
+def _calibrate(measure):
+    """Smallest change of each counter over empty probes, i.e. the cost of the snapshots themselves"""
+    deltas = [measure(lambda: None)[1] for _ in range(CALIBRATION_ROUNDS)]
+    return {key: min(delta.get(key, 0) for delta in deltas) for key in set().union(*deltas)}
+
+
+def calibrate_pg(conn, use_pgss=True):
+    return _calibrate(lambda run: measure_pg(conn, run, use_pgss))
+
+
+def calibrate_mongo(db):
+    return _calibrate(lambda run: measure_mongo(db, None, run))
+
+
+def measure_pg(conn, run, use_pgss=True, overhead=None):
+    """Run `run()` and return (its result, PostgreSQL counter deltas less the snapshots' `overhead`)"""
+    before = pg_snapshot(conn, use_pgss)
+    result = run()
+    after = pg_snapshot(conn, use_pgss)
+    return result, subtract_overhead(snapshot_delta(before, after), overhead or {})
+
+
+def measure_mongo(db, collection, run, overhead=None, interval=DEFAULT_CURRENTOP_INTERVAL):
+    """Run `run()` and return (its result, MongoDB counter deltas including sampled yields).
+
+    The snapshots' `overhead` and the $currentOp samples taken every `interval` seconds are
+    not counted in the deltas.
+    """
+    before = mongo_snapshot(db)
+    namespace = f"{db.name}.{collection}" if collection else None
+    if namespace:
+        with CurrentOpSampler(db.client, namespace, interval) as sampler:
+            result = run()
+    else:
+        sampler, result = None, run()
+    after = mongo_snapshot(db)
+
+    delta = snapshot_delta(before, after)
+    if sampler is not None and 'mongo.opcounters.command' in delta:
+        delta['mongo.opcounters.command'] -= sampler.polls
+    delta = subtract_overhead(delta, overhead or {})
+    if sampler is not None:
+        delta['mongo.currentop.max_yields'] = sampler.total_yields
+    yields = explain_yields(result)
+    if yields is not None:
+        delta['mongo.explain.yields'] = yields
+    return result, delta
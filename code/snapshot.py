@@ -0,0 +1,408 @@
+"""
+Snapshot and restore loaded databases, to reset both engines to a known state
+without rerunning the JSON loaders.
+
+Two snapshot methods:
+
+- template (default): PostgreSQL copies the database into a template database
+  (CREATE DATABASE ... TEMPLATE ... STRATEGY FILE_COPY, a file-level copy that
+  keeps the planner statistics), and restores it the same way. MongoDB copies
+  every collection into a snapshot database with $out, one collection per
+  worker, and recreates its indexes. Snapshots live inside the servers and
+  need nothing but the database connections.
+- dump: parallel pg_dump -Fd -j N / pg_restore -j N and mongodump / mongorestore
+  --numParallelCollections N into data/snapshots/<name>/. The tools run inside
+  the server containers through `docker exec` (their versions match the
+  servers, and both containers mount ./data at /data), so this needs the docker
+  CLI. Dumps survive a `docker-compose down -v`; ANALYZE runs after a restore.
+
+Each snapshot has a manifest (data/snapshots/<name>.json) tagged with
+the index configuration it was taken under, the dataset scale and the row
+counts, so a snapshot can be picked by its tags. benchmark.py
+--restore-snapshot restores one before the run.
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import functools
+print = functools.partial(print, flush=True)
+
+import psycopg2
+from tabulate import tabulate
+
+from db_config import PG_PARAMS, DEFAULT_DB_NAME, PG_CONTAINER, MONGO_CONTAINER, MONGO_PARAMS
+from db_pool import get_mongo_client
+from index_registry import detect_index_config
+from server_config import docker
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'snapshots')
+# ./data as mounted in the postgres and mongodb containers
+CONTAINER_SNAPSHOT_DIR = '/data/snapshots'
+METHODS = ['template', 'dump']
+ENGINES = ['postgresql', 'mongodb']
+DEFAULT_JOBS = 4
+# Template databases (PostgreSQL) and snapshot databases (MongoDB) are named SNAPSHOT_PREFIX + name
+SNAPSHOT_PREFIX = 'yelp_snap_'
+NAME_PATTERN = re.compile(r'^[a-z0-9_]+$')
+TABLES = ('businesses', 'users', 'reviews', 'tips', 'checkins')
+
+
+def default_snapshot_name(index_config, scale):
+    """Snapshot name from its tags, e.g. full_s1 or baseline_s0_01"""
+    return re.sub(r'[^a-z0-9_]', '_', f"{index_config}_s{scale:g}".lower())
+
+
+def snapshot_database(name):
+    return SNAPSHOT_PREFIX + name
+
+
+def manifest_path(name):
+    # Kept beside the dump directory, which the server containers create and own
+    return os.path.join(SNAPSHOT_DIR, f"{name}.json")
+
+
+def save_manifest(manifest):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(manifest_path(manifest['name']), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_manifest(name):
+    path = manifest_path(name)
+    if not os.path.exists(path):
+        raise KeyError(f"Unknown snapshot '{name}'. Available: {', '.join(m['name'] for m in list_snapshots())}")
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def list_snapshots():
+    """Manifests of every snapshot, newest first"""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    manifests = [load_manifest(filename[:-len('.json')]) for filename in os.listdir(SNAPSHOT_DIR)
+                 if filename.endswith('.json')]
+    return sorted(manifests, key=lambda m: m['created_at'], reverse=True)
+
+
+def find_snapshot(index_config=None, scale=None):
+    """Newest snapshot matching the given tags, or None"""
+    for manifest in list_snapshots():
+        if index_config is not None and manifest['index_config'] != index_config:
+            continue
+        if scale is not None and manifest['scale'] != scale:
+            continue
+        return manifest
+    return None
+
+
+def _directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+# --- PostgreSQL -------------------------------------------------------------
+
+def admin_connection():
+    """Autocommit connection to the maintenance database, for CREATE/DROP DATABASE"""
+    conn = psycopg2.connect(**{**PG_PARAMS, 'dbname': 'postgres'})
+    conn.autocommit = True
+    return conn
+
+
+def terminate_sessions(cur, database):
+    """End other sessions on `database`; a template copy needs the source to itself"""
+    cur.execute("""
+        SELECT COUNT(pg_terminate_backend(pid)) FROM pg_stat_activity
+        WHERE datname = %s AND pid <> pg_backend_pid()
+    """, (database,))
+    terminated = cur.fetchone()[0]
+    if terminated:
+        print(f"  Terminated {terminated} session(s) on {database}")
+
+
+def postgres_row_counts(conn):
+    """Row count of each table, as estimated by the last ANALYZE"""
+    cur = conn.cursor()
+    cur.execute("SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(%s) AND relkind = 'r'",
+                (list(TABLES),))
+    counts = dict(cur.fetchall())
+    cur.close()
+    conn.rollback()
+    return counts
+
+
+def drop_postgres_template(cur, database):
+    cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (database,))
+    if cur.fetchone():
+        cur.execute(f"ALTER DATABASE {database} WITH IS_TEMPLATE false ALLOW_CONNECTIONS true")
+        cur.execute(f"DROP DATABASE {database} WITH (FORCE)")
+
+
+def create_postgres_template(name):
+    """Copy the benchmark database into the snapshot's template database, returning its size in bytes"""
+    source, target = PG_PARAMS['dbname'], snapshot_database(name)
+    conn = admin_connection()
+    cur = conn.cursor()
+    try:
+        drop_postgres_template(cur, target)
+        terminate_sessions(cur, source)
+        cur.execute(f"CREATE DATABASE {target} TEMPLATE {source} STRATEGY FILE_COPY")
+        # Protect the snapshot from sessions and from being dropped by mistake
+        cur.execute(f"ALTER DATABASE {target} WITH IS_TEMPLATE true ALLOW_CONNECTIONS false")
+        cur.execute("SELECT pg_database_size(%s)", (target,))
+        return cur.fetchone()[0]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def restore_postgres_template(name):
+    source, target = snapshot_database(name), PG_PARAMS['dbname']
+    conn = admin_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DROP DATABASE IF EXISTS {target} WITH (FORCE)")
+        cur.execute(f"CREATE DATABASE {target} TEMPLATE {source} STRATEGY FILE_COPY")
+    finally:
+        cur.close()
+        conn.close()
+
+
+def dump_postgres(name, jobs):
+    """pg_dump -Fd -j into data/snapshots/<name>/postgres, returning its size in bytes"""
+    path = f"{CONTAINER_SNAPSHOT_DIR}/{name}/postgres"
+    docker('exec', PG_CONTAINER, 'rm', '-rf', path)
+    docker('exec', PG_CONTAINER, 'mkdir', '-p', f"{CONTAINER_SNAPSHOT_DIR}/{name}")
+    docker('exec', '-e', f"PGPASSWORD={PG_PARAMS['password']}", PG_CONTAINER,
+           'pg_dump', '-U', PG_PARAMS['user'], '-Fd', '-j', str(jobs), '-f', path, PG_PARAMS['dbname'])
+    return _directory_size(os.path.join(SNAPSHOT_DIR, name, 'postgres'))
+
+
+def restore_postgres_dump(name, jobs):
+    """Recreate the benchmark database, pg_restore -j the dump into it and ANALYZE"""
+    conn = admin_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DROP DATABASE IF EXISTS {PG_PARAMS['dbname']} WITH (FORCE)")
+        cur.execute(f"CREATE DATABASE {PG_PARAMS['dbname']}")
+    finally:
+        cur.close()
+        conn.close()
+    docker('exec', '-e', f"PGPASSWORD={PG_PARAMS['password']}", PG_CONTAINER,
+           'pg_restore', '-U', PG_PARAMS['user'], '-j', str(jobs), '-d', PG_PARAMS['dbname'],
+           f"{CONTAINER_SNAPSHOT_DIR}/{name}/postgres")
+    # pg_dump does not carry planner statistics
+    conn = psycopg2.connect(**PG_PARAMS)
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        cur.execute("ANALYZE")
+    finally:
+        cur.close()
+        conn.close()
+
+
+# --- MongoDB ----------------------------------------------------------------
+
+def _copy_collection(client, source, target, collection):
+    client[source][collection].aggregate([{'$out': {'db': target, 'coll': collection}}])
+    # $out copies documents only
+    indexes = [{key: value for key, value in index.items() if key not in ('v', 'ns')}
+               for index in client[source][collection].list_indexes() if index['name'] != '_id_']
+    if indexes:
+        client[target].command({'createIndexes': collection, 'indexes': indexes})
+
+
+def copy_mongo_database(client, source, target, jobs):
+    """Replace database `target` with a copy of `source`, copying `jobs` collections at a time"""
+    client.drop_database(target)
+    collections = client[source].list_collection_names()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        list(pool.map(lambda collection: _copy_collection(client, source, target, collection), collections))
+
+
+def mongo_document_counts(db):
+    return {collection: db[collection].estimated_document_count() for collection in TABLES}
+
+
+def mongo_database_size(db):
+    stats = db.command('dbStats')
+    return int(stats.get('storageSize', 0) + stats.get('indexSize', 0))
+
+
+def _mongo_tool_auth():
+    return ['--username', MONGO_PARAMS['username'], '--password', MONGO_PARAMS['password'],
+            '--authenticationDatabase', 'admin']
+
+
+def dump_mongo(name, jobs):
+    """mongodump into data/snapshots/<name>/mongo, returning its size in bytes"""
+    path = f"{CONTAINER_SNAPSHOT_DIR}/{name}/mongo"
+    docker('exec', MONGO_CONTAINER, 'rm', '-rf', path)
+    docker('exec', MONGO_CONTAINER, 'mongodump', *_mongo_tool_auth(), '--db', DEFAULT_DB_NAME,
+           '--numParallelCollections', str(jobs), '--out', path)
+    return _directory_size(os.path.join(SNAPSHOT_DIR, name, 'mongo'))
+
+
+def restore_mongo_dump(name, jobs):
+    docker('exec', MONGO_CONTAINER, 'mongorestore', *_mongo_tool_auth(), '--drop',
+           '--numParallelCollections', str(jobs), '--numInsertionWorkersPerCollection', str(jobs),
+           '--nsInclude', f"{DEFAULT_DB_NAME}.*", f"{CONTAINER_SNAPSHOT_DIR}/{name}/mongo")
+
+
+# --- Snapshots --------------------------------------------------------------
+
+def create_snapshot(name, method='template', scale=1.0, engines=ENGINES, jobs=DEFAULT_JOBS, index_config=None):
+    """Snapshot the loaded databases of `engines` and write the manifest"""
+    client = get_mongo_client()
+    pg_conn = psycopg2.connect(**PG_PARAMS)
+    try:
+        index_config = index_config or detect_index_config(pg_conn, client[DEFAULT_DB_NAME])
+        name = name or default_snapshot_name(index_config, scale)
+        if not NAME_PATTERN.match(name):
+            raise ValueError(f"Snapshot names may only use a-z, 0-9 and _: '{name}'")
+        rows = postgres_row_counts(pg_conn) if 'postgresql' in engines else {}
+    finally:
+        # The template copy needs the source database without sessions
+        pg_conn.close()
+
+    manifest = {
+        'name': name,
+        'method': method,
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'index_config': index_config,
+        'scale': scale,
+        'engines': {},
+    }
+    print(f"Creating snapshot '{name}' ({method}, index config {index_config}, scale {scale:g})")
+    if 'postgresql' in engines:
+        start = time.perf_counter()
+        size = create_postgres_template(name) if method == 'template' else dump_postgres(name, jobs)
+        manifest['engines']['postgresql'] = {'rows': rows, 'size_bytes': size,
+                                             'create_s': time.perf_counter() - start}
+        print(f"  PostgreSQL: {size / (1024 ** 2):.0f}MB in {manifest['engines']['postgresql']['create_s']:.1f}s")
+    if 'mongodb' in engines:
+        start = time.perf_counter()
+        if method == 'template':
+            copy_mongo_database(client, DEFAULT_DB_NAME, snapshot_database(name), jobs)
+            size = mongo_database_size(client[snapshot_database(name)])
+        else:
+            size = dump_mongo(name, jobs)
+        manifest['engines']['mongodb'] = {'rows': mongo_document_counts(client[DEFAULT_DB_NAME]),
+                                          'size_bytes': size, 'create_s': time.perf_counter() - start}
+        print(f"  MongoDB: {size / (1024 ** 2):.0f}MB in {manifest['engines']['mongodb']['create_s']:.1f}s")
+    save_manifest(manifest)
+    return manifest
+
+
+def restore_snapshot(name, jobs=DEFAULT_JOBS):
+    """Restore every engine in a snapshot, returning its manifest and the restore time per engine"""
+    manifest = load_manifest(name)
+    print(f"Restoring snapshot '{name}' ({manifest['method']}, index config {manifest['index_config']}, "
+          f"scale {manifest['scale']:g}, taken {manifest['created_at']})")
+    times = {}
+    if 'postgresql' in manifest['engines']:
+        start = time.perf_counter()
+        if manifest['method'] == 'template':
+            restore_postgres_template(name)
+        else:
+            restore_postgres_dump(name, jobs)
+        times['postgresql'] = time.perf_counter() - start
+        print(f"  PostgreSQL restored in {times['postgresql']:.1f}s")
+    if 'mongodb' in manifest['engines']:
+        start = time.perf_counter()
+        if manifest['method'] == 'template':
+            copy_mongo_database(get_mongo_client(), snapshot_database(name), DEFAULT_DB_NAME, jobs)
+        else:
+            restore_mongo_dump(name, jobs)
+        times['mongodb'] = time.perf_counter() - start
+        print(f"  MongoDB restored in {times['mongodb']:.1f}s")
+    return manifest, times
+
+
+def delete_snapshot(name):
+    manifest = load_manifest(name)
+    if manifest['method'] == 'template':
+        if 'postgresql' in manifest['engines']:
+            conn = admin_connection()
+            try:
+                drop_postgres_template(conn.cursor(), snapshot_database(name))
+            finally:
+                conn.close()
+        if 'mongodb' in manifest['engines']:
+            get_mongo_client().drop_database(snapshot_database(name))
+    else:
+        container = PG_CONTAINER if 'postgresql' in manifest['engines'] else MONGO_CONTAINER
+        docker('exec', container, 'rm', '-rf', f"{CONTAINER_SNAPSHOT_DIR}/{name}")
+    os.remove(manifest_path(name))
+
+
+def print_snapshots(manifests):
+    rows = []
+    for manifest in manifests:
+        engines = manifest['engines']
+        rows.append([
+            manifest['name'],
+            manifest['method'],
+            manifest['index_config'],
+            f"{manifest['scale']:g}",
+            manifest['created_at'],
+            ", ".join(f"{engine} {info['size_bytes'] / (1024 ** 2):.0f}MB" for engine, info in engines.items()),
+            ", ".join(f"{engine} {info['rows'].get('reviews', 0):,}" for engine, info in engines.items()),
+        ])
+    print(tabulate(rows, headers=["Name", "Method", "Index Config", "Scale", "Created", "Size", "Reviews"],
+                   tablefmt="grid"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snapshot and restore the loaded benchmark databases')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    create_parser = subparsers.add_parser('create', help='Snapshot the loaded databases')
+    create_parser.add_argument('--name', help='Snapshot name (default: <index config>_s<scale>)')
+    create_parser.add_argument('--method', choices=METHODS, default='template',
+                               help='template databases/server-side copies, or pg_dump/mongodump (default: template)')
+    create_parser.add_argument('--scale', type=float, default=1.0,
+                               help='Dataset scale the databases were loaded at, recorded as a tag (default: 1.0)')
+    create_parser.add_argument('--index-config', help='Index configuration tag (default: detected)')
+    create_parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES,
+                               help='Engines to snapshot (default: postgresql mongodb)')
+    create_parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS,
+                               help='Parallel dump jobs / collections copied at a time (default: 4)')
+
+    restore_parser = subparsers.add_parser('restore', help='Restore a snapshot by name or by tags')
+    restore_parser.add_argument('name', nargs='?', help='Snapshot name (default: newest matching the tags)')
+    restore_parser.add_argument('--index-config', help='Restore the newest snapshot taken under this configuration')
+    restore_parser.add_argument('--scale', type=float, help='Restore the newest snapshot of this dataset scale')
+    restore_parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS,
+                                help='Parallel restore jobs / collections copied at a time (default: 4)')
+
+    subparsers.add_parser('list', help='List snapshots')
+
+    delete_parser = subparsers.add_parser('delete', help='Delete a snapshot')
+    delete_parser.add_argument('name')
+
+    args = parser.parse_args()
+    if args.command == 'create':
+        create_snapshot(args.name, args.method, args.scale, args.engines, args.jobs, args.index_config)
+    elif args.command == 'restore':
+        name = args.name
+        if name is None:
+            manifest = find_snapshot(args.index_config, args.scale)
+            if manifest is None:
+                parser.error("No snapshot matches the given tags")
+            name = manifest['name']
+        restore_snapshot(name, args.jobs)
+    elif args.command == 'list':
+        print_snapshots(list_snapshots())
+    elif args.command == 'delete':
+        delete_snapshot(args.name)
+        print(f"Deleted snapshot '{args.name}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Large result set benchmark: materialized vs streamed reads.
+
+Each large-scan query is read to the client on each engine, once fully
+materialized (cursor.fetchall() / list(aggregate(...))) and once streamed per
+fetch size (PostgreSQL named cursors with that itersize, MongoDB cursors with
+that batch_size; see streaming.py). Reported per run:
+
+- time to first row and total time to consume every row
+- peak client RSS during the run (VmHWM, reset before each run through
+  /proc/self/clear_refs) and its growth over the RSS before the run
+"""
+import argparse
+import gc
+import time
+import functools
+print = functools.partial(print, flush=True)
+
+from tabulate import tabulate
+
+from benchmark import init_connections, close_connections, resolve_params, QUERIES, QUERY_CLASSES
+from streaming import stream_query
+
+ENGINES = ['postgresql', 'mongodb']
+
+
+# --- Client memory ----------------------------------------------------------
+
+def _proc_status_kb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def current_rss_mb():
+    kb = _proc_status_kb('VmRSS')
+    return None if kb is None else kb / 1024
+
+
+def peak_rss_mb():
+    kb = _proc_status_kb('VmHWM')
+    return None if kb is None else kb / 1024
+
+
+def reset_peak_rss():
+    """Reset the process's peak RSS to its current RSS; return whether the kernel allowed it"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+# --- Runs -------------------------------------------------------------------
+
+def materialize(engine, query_info, conn_or_db, params):
+    if engine == 'postgresql':
+        cur = conn_or_db.cursor()
+        try:
+            cur.execute(query_info['pg'], params)
+            return cur.fetchall()
+        finally:
+            cur.close()
+    return query_info['mongo'](conn_or_db, params)
+
+
+def measure(engine, query_info, conn_or_db, params, fetch_size=None):
+    """Read every row of a query; `fetch_size` None materializes the whole result"""
+    gc.collect()
+    peak_resettable = reset_peak_rss()
+    baseline = current_rss_mb()
+    start = time.perf_counter()
+    first_row = None
+    rows = 0
+    if fetch_size is None:
+        result = materialize(engine, query_info, conn_or_db, params)
+        first_row = time.perf_counter() - start
+        rows = len(result)
+        del result
+    else:
+        for _ in stream_query(engine, query_info, conn_or_db, params, fetch_size):
+            if first_row is None:
+                first_row = time.perf_counter() - start
+            rows += 1
+    total = time.perf_counter() - start
+    if engine == 'postgresql':
+        conn_or_db.commit()
+
+    peak = peak_rss_mb()
+    return {
+        'rows': rows,
+        'first_row_ms': None if first_row is None else first_row * 1000,
+        'total_ms': total * 1000,
+        'peak_rss_mb': peak,
+        'rss_growth_mb': peak - baseline if peak_resettable and peak is not None and baseline is not None else None,
+    }
+
+
+# --- Reporting --------------------------------------------------------------
+
+def _fmt(value, unit):
+    return "N/A" if value is None else f"{value:.2f}{unit}"
+
+
+def print_results(results):
+    rows = [[r['engine'], r['query'], r['mode'], r['fetch_size'] or 'all', r['rows'],
+             _fmt(r['first_row_ms'], 'ms'), _fmt(r['total_ms'], 'ms'),
+             _fmt(r['peak_rss_mb'], 'MB'), _fmt(r['rss_growth_mb'], 'MB')] for r in results]
+    print("\n=== Large Result Sets ===")
+    print(tabulate(rows, headers=["Engine", "Query", "Mode", "Fetch Size", "Rows", "First Row", "Total",
+                                  "Peak RSS", "RSS Growth"], tablefmt="grid"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare materialized and streamed reads of large result sets')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES, help='Engines to benchmark (default: both)')
+    parser.add_argument('--queries', nargs='+', help='Queries to run (default: all queries of --classes)')
+    parser.add_argument('--classes', nargs='+', choices=list(QUERY_CLASSES), default=['large_scan'],
+                        help='Query classes to run (default: large_scan)')
+    parser.add_argument('--fetch-sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='PostgreSQL itersize / MongoDB batch_size values to stream with (default: 100 1000 10000)')
+    parser.add_argument('--no-materialize', action='store_true', help='Skip the fully materialized read')
+    args = parser.parse_args()
+
+    names = [name for name in (args.queries or list(QUERIES))
+             if name in QUERIES and (args.queries or QUERIES[name].get('class') in args.classes)]
+    if not names:
+        parser.error("No queries selected")
+
+    if not reset_peak_rss():
+        print("Warning: cannot reset peak RSS; RSS growth is not reported and peak RSS is the process maximum")
+
+    # Streaming runs first, so a materialized run's memory is not counted against them
+    fetch_sizes = sorted(args.fetch_sizes) + ([] if args.no_materialize else [None])
+    pg_conn, mongo_db, mongo_client = init_connections()
+    results = []
+    try:
+        for name in names:
+            query_info = QUERIES[name]
+            params = resolve_params(pg_conn, query_info)
+            for engine in args.engines:
+                if engine == 'mongodb' and 'mongo_pipeline' not in query_info:
+                    print(f"Skipping {name} on mongodb: no templated pipeline to stream")
+                    continue
+                target = pg_conn if engine == 'postgresql' else mongo_db
+                for fetch_size in fetch_sizes:
+                    mode = 'materialized' if fetch_size is None else 'streamed'
+                    print(f"Running {name} on {engine} ({mode}, fetch size {fetch_size or 'all'})...")
+                    try:
+                        result = measure(engine, query_info, target, params, fetch_size)
+                    except Exception as e:
+                        if engine == 'postgresql':
+                            pg_conn.rollback()
+                        print(f"  Error: {e}")
+                        continue
+                    results.append({'engine': engine, 'query': name, 'mode': mode, 'fetch_size': fetch_size, **result})
+    finally:
+        close_connections(pg_conn, mongo_client)
+
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
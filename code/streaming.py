@@ -0,0 +1,56 @@
+"""
+Streaming reads for large result sets.
+
+PostgreSQL rows come from a named (server-side) cursor, fetched `itersize`
+rows per round trip instead of the whole result at once. MongoDB documents
+come from a cursor fetching `batch_size` documents per getMore. Both are
+consumed as generators, so client memory is bounded by the fetch size.
+
+Named cursors live inside the caller's transaction (or are declared WITH
+HOLD on an autocommit connection); the caller commits or rolls back.
+"""
+import itertools
+
+DEFAULT_ITERSIZE = 2000
+DEFAULT_BATCH_SIZE = 2000
+
+_cursor_ids = itertools.count()
+
+
+def stream_pg(conn, sql, params=None, itersize=DEFAULT_ITERSIZE):
+    """Yield the rows of `sql` from a named server-side cursor"""
+    cur = conn.cursor(name=f"stream_{next(_cursor_ids)}", withhold=conn.autocommit)
+    cur.itersize = itersize
+    try:
+        cur.execute(sql, params)
+        yield from cur
+    finally:
+        cur.close()
+
+
+def stream_mongo_find(collection, filter=None, projection=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield the documents matching `filter`, `batch_size` documents per getMore"""
+    cursor = collection.find(filter or {}, projection).batch_size(batch_size)
+    try:
+        yield from cursor
+    finally:
+        cursor.close()
+
+
+def stream_mongo_aggregate(collection, pipeline, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield the results of an aggregation pipeline, `batch_size` documents per getMore"""
+    cursor = collection.aggregate(pipeline, batchSize=batch_size)
+    try:
+        yield from cursor
+    finally:
+        cursor.close()
+
+
+def stream_query(engine, query_info, conn_or_db, params=None, fetch_size=None):
+    """Stream a benchmark query (from queries/benchmark_queries.py) on one engine"""
+    if engine == 'postgresql':
+        return stream_pg(conn_or_db, query_info['pg'], params, fetch_size or DEFAULT_ITERSIZE)
+    if 'mongo_pipeline' not in query_info:
+        raise ValueError(f"Query '{query_info['description']}' has no templated MongoDB pipeline to stream")
+    return stream_mongo_aggregate(conn_or_db[query_info['mongo_collection']], query_info['mongo_pipeline'](params),
+                                  fetch_size or DEFAULT_BATCH_SIZE)
@@ -0,0 +1,449 @@
+"""
+Write-path benchmark for PostgreSQL and MongoDB.
+
+New reviews and tips are generated from the loaded data: businesses and users
+are sampled with param_generators, star ratings follow the rating distribution
+of existing reviews, and texts are sampled from existing reviews and tips.
+Three write modes are measured on both engines:
+
+- single: one row per statement, committed individually
+- batch:  --batch-size rows per statement (execute_values / insert_many)
+- txn:    a review insert plus the update of its business's review_count and
+          stars in one transaction
+
+PostgreSQL commits use the given synchronous_commit setting and MongoDB writes
+the given write concern. Running with several --index-configs shows the cost
+of index maintenance. MongoDB transactions need a replica set; on a standalone
+server the txn mode runs the same two writes without a transaction.
+
+Benchmark reviews (and MongoDB tips) get ids starting with 'bench'. Business
+aggregates and the PostgreSQL tip_id high-water mark are saved before writing
+so cleanup restores the data exactly, even after an interrupted run
+(--cleanup-only).
+"""
+import argparse
+import copy
+import csv
+import datetime
+import json
+import os
+import random
+import string
+import time
+
+import functools
+print = functools.partial(print, flush=True)
+
+from psycopg2.extras import execute_values
+from pymongo import UpdateOne
+from pymongo.write_concern import WriteConcern
+from tabulate import tabulate
+
+from benchmark import init_connections, close_connections, percentile, get_timestamp_str
+from index_registry import load_index_configs, apply_postgres_config, apply_mongo_config, detect_index_config
+from param_generators import DISTRIBUTIONS, ParamGenerator, load_param_generator
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SNAPSHOT_PATH = os.path.join(RESULTS_DIR, "write_benchmark_snapshot.json")
+
+BENCH_ID_PREFIX = 'bench'
+ID_LENGTH = 22
+ID_CHARS = string.ascii_letters + string.digits + '-_'
+
+ENGINES = ['postgresql', 'mongodb']
+MODES = ['single', 'batch', 'txn']
+TARGETS = ['reviews', 'tips']
+SYNCHRONOUS_COMMIT = ['on', 'off', 'local', 'remote_write', 'remote_apply']
+
+PG_INSERT = {
+    'reviews': "INSERT INTO reviews (review_id, user_id, business_id, stars, date, text, useful, funny, cool) VALUES %s",
+    'tips': "INSERT INTO tips (user_id, business_id, text, date, compliment_count) VALUES %s",
+}
+
+PG_UPDATE_AGGREGATE = """
+    UPDATE businesses
+    SET stars = (COALESCE(stars, 0) * COALESCE(review_count, 0) + %(stars)s) / (COALESCE(review_count, 0) + 1),
+        review_count = COALESCE(review_count, 0) + 1
+    WHERE business_id = %(business_id)s
+"""
+
+
+class WriteGenerator:
+    """Seeded generator of new reviews and tips following the loaded data"""
+
+    def __init__(self, pg_conn, distribution='zipf', skew=1.0, seed=42, pool_size=1000, text_samples=500):
+        self.rng = random.Random(seed)
+        self.businesses = load_param_generator(pg_conn, 'business_id', distribution, skew, seed, pool_size)
+        self.users = load_param_generator(pg_conn, 'user_id', distribution, skew, seed + 1, pool_size)
+
+        cur = pg_conn.cursor()
+        try:
+            cur.execute("SELECT stars, COUNT(*) FROM reviews WHERE stars IS NOT NULL GROUP BY stars")
+            self.stars, self.star_weights = zip(*cur.fetchall()) if cur.rowcount else ((5,), (1,))
+            self.texts = {}
+            for table in TARGETS:
+                cur.execute(f"SELECT text FROM {table} TABLESAMPLE SYSTEM (1) WHERE text IS NOT NULL LIMIT %s",
+                            (text_samples,))
+                self.texts[table] = [row[0] for row in cur.fetchall()] or ['']
+        finally:
+            cur.close()
+        pg_conn.commit()
+
+    def fork(self, seed):
+        """Copy sharing the sampled data but with its own random state, for use in another thread"""
+        other = copy.copy(self)
+        other.rng = random.Random(seed)
+        other.businesses = ParamGenerator(self.businesses.source, self.businesses.pool,
+                                          self.businesses.distribution, self.businesses.skew, seed)
+        other.users = ParamGenerator(self.users.source, self.users.pool, self.users.distribution, self.users.skew, seed + 1)
+        return other
+
+    def business_ids(self):
+        return [params['business_id'] for params, _ in self.businesses.pool]
+
+    def new_id(self):
+        return BENCH_ID_PREFIX + ''.join(self.rng.choice(ID_CHARS) for _ in range(ID_LENGTH - len(BENCH_ID_PREFIX)))
+
+    def review(self):
+        return {
+            'review_id': self.new_id(),
+            'user_id': self.users.sample()[0]['user_id'],
+            'business_id': self.businesses.sample()[0]['business_id'],
+            'stars': self.rng.choices(self.stars, self.star_weights)[0],
+            'date': datetime.datetime.now().replace(microsecond=0),
+            'text': self.rng.choice(self.texts['reviews']),
+        }
+
+    def tip(self):
+        return {
+            'tip_id': self.new_id(),
+            'user_id': self.users.sample()[0]['user_id'],
+            'business_id': self.businesses.sample()[0]['business_id'],
+            'date': datetime.datetime.now().replace(microsecond=0),
+            'text': self.rng.choice(self.texts['tips']),
+        }
+
+    def rows(self, target, count):
+        make = self.review if target == 'reviews' else self.tip
+        return [make() for _ in range(count)]
+
+
+# --- PostgreSQL -------------------------------------------------------------
+
+def pg_values(target, row):
+    if target == 'reviews':
+        return (row['review_id'], row['user_id'], row['business_id'], row['stars'], row['date'], row['text'], 0, 0, 0)
+    return (row['user_id'], row['business_id'], row['text'], row['date'], 0)
+
+
+def run_pg(conn, generator, mode, target, operations, batch_size, synchronous_commit):
+    """Run one write mode on PostgreSQL, returning per-operation latencies in ms"""
+    cur = conn.cursor()
+    cur.execute("SET synchronous_commit = %s", (synchronous_commit,))
+    conn.commit()
+    latencies, rows = [], 0
+    try:
+        for _ in range(operations):
+            batch = generator.rows(target, batch_size if mode == 'batch' else 1)
+            start = time.perf_counter()
+            try:
+                execute_values(cur, PG_INSERT[target], [pg_values(target, row) for row in batch])
+                if mode == 'txn':
+                    cur.execute(PG_UPDATE_AGGREGATE, batch[0])
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"    Write failed: {e}")
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            rows += len(batch)
+    finally:
+        cur.execute("RESET synchronous_commit")
+        conn.commit()
+        cur.close()
+    return {'latencies': latencies, 'rows': rows, 'note': ''}
+
+
+def pg_snapshot(conn, business_ids):
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(tip_id), 0) FROM tips")
+    tip_watermark = cur.fetchone()[0]
+    cur.execute("SELECT business_id, review_count, stars FROM businesses WHERE business_id = ANY(%s)", (business_ids,))
+    businesses = [list(row) for row in cur.fetchall()]
+    cur.close()
+    conn.commit()
+    return {'tip_watermark': tip_watermark, 'businesses': businesses}
+
+
+def pg_cleanup(conn, snapshot):
+    """Delete benchmark rows and restore business aggregates on PostgreSQL"""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM reviews WHERE review_id LIKE %s", (BENCH_ID_PREFIX + '%',))
+    reviews = cur.rowcount
+    cur.execute("DELETE FROM tips WHERE tip_id > %s", (snapshot['tip_watermark'],))
+    tips = cur.rowcount
+    if snapshot['businesses']:
+        execute_values(cur, """
+            UPDATE businesses b
+            SET review_count = v.review_count, stars = v.stars
+            FROM (VALUES %s) AS v(business_id, review_count, stars)
+            WHERE b.business_id = v.business_id
+        """, snapshot['businesses'], template="(%s, %s::integer, %s::float)")
+    conn.commit()
+    cur.close()
+    return reviews, tips
+
+
+# --- MongoDB ----------------------------------------------------------------
+
+def parse_write_concern(w, journal):
+    return WriteConcern(w=int(w) if str(w).isdigit() else w, j=journal)
+
+
+def transactions_supported(client):
+    """MongoDB transactions need a replica set or a sharded cluster"""
+    hello = client.admin.command('hello')
+    return bool(hello.get('setName')) or hello.get('msg') == 'isdbgrid'
+
+
+def mongo_document(target, row):
+    date = row['date'].strftime('%Y-%m-%d %H:%M:%S')
+    if target == 'reviews':
+        return {'_id': row['review_id'], 'user_id': row['user_id'], 'business_id': row['business_id'],
+                'stars': float(row['stars']), 'useful': 0, 'funny': 0, 'cool': 0, 'text': row['text'], 'date': date}
+    return {'_id': row['tip_id'], 'user_id': row['user_id'], 'business_id': row['business_id'],
+            'text': row['text'], 'date': date, 'compliment_count': 0}
+
+
+def mongo_aggregate_update(row):
+    """Filter and pipeline update adding one rating to a business's review_count and stars"""
+    stars = float(row['stars'])
+    review_count = {'$ifNull': ['$review_count', 0]}
+    return {'_id': row['business_id']}, [{'$set': {
+        'stars': {'$divide': [
+            {'$add': [{'$multiply': [{'$ifNull': ['$stars', 0]}, review_count]}, stars]},
+            {'$add': [review_count, 1]}
+        ]},
+        'review_count': {'$add': [review_count, 1]}
+    }}]
+
+
+def run_mongo(db, generator, mode, target, operations, batch_size, write_concern, use_transactions):
+    """Run one write mode on MongoDB, returning per-operation latencies in ms"""
+    collection = db.get_collection(target, write_concern=write_concern)
+    businesses = db.get_collection('businesses', write_concern=write_concern)
+    latencies, rows = [], 0
+    note = ''
+    if mode == 'txn' and not use_transactions:
+        note = 'no transaction (standalone server)'
+
+    def transaction(session, document, update):
+        # Writes inside a transaction use the transaction's write concern
+        db[target].insert_one(document, session=session)
+        db['businesses'].update_one(*update, session=session)
+
+    for _ in range(operations):
+        batch = generator.rows(target, batch_size if mode == 'batch' else 1)
+        documents = [mongo_document(target, row) for row in batch]
+        start = time.perf_counter()
+        try:
+            if mode == 'batch':
+                collection.insert_many(documents, ordered=False)
+            elif mode == 'txn' and use_transactions:
+                with db.client.start_session() as session:
+                    session.with_transaction(
+                        lambda s: transaction(s, documents[0], mongo_aggregate_update(batch[0])),
+                        write_concern=write_concern)
+            else:
+                collection.insert_one(documents[0])
+                if mode == 'txn':
+                    businesses.update_one(*mongo_aggregate_update(batch[0]))
+        except Exception as e:
+            print(f"    Write failed: {e}")
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+        rows += len(batch)
+    return {'latencies': latencies, 'rows': rows, 'note': note}
+
+
+def mongo_snapshot(db, business_ids):
+    return {'businesses': [[doc['_id'], doc.get('review_count'), doc.get('stars')] for doc in
+                           db.businesses.find({'_id': {'$in': business_ids}}, {'review_count': 1, 'stars': 1})]}
+
+
+def mongo_cleanup(db, snapshot):
+    """Delete benchmark documents and restore business aggregates on MongoDB"""
+    bench = {'_id': {'$regex': f'^{BENCH_ID_PREFIX}'}}
+    reviews = db.reviews.delete_many(bench).deleted_count
+    tips = db.tips.delete_many(bench).deleted_count
+    if snapshot['businesses']:
+        db.businesses.bulk_write([
+            UpdateOne({'_id': business_id}, {'$set': {'review_count': review_count, 'stars': stars}})
+            for business_id, review_count, stars in snapshot['businesses']
+        ], ordered=False)
+    return reviews, tips
+
+
+# --- Snapshot and cleanup ---------------------------------------------------
+
+def save_snapshot(pg_conn, mongo_db, business_ids, path=SNAPSHOT_PATH):
+    snapshot = {'postgresql': pg_snapshot(pg_conn, business_ids), 'mongodb': mongo_snapshot(mongo_db, business_ids)}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(snapshot, f)
+    return snapshot
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def cleanup(pg_conn, mongo_db, snapshot):
+    pg_reviews, pg_tips = pg_cleanup(pg_conn, snapshot['postgresql'])
+    mongo_reviews, mongo_tips = mongo_cleanup(mongo_db, snapshot['mongodb'])
+    print(f"  Removed {pg_reviews} reviews and {pg_tips} tips from PostgreSQL, "
+          f"{mongo_reviews} reviews and {mongo_tips} tips from MongoDB; business aggregates restored")
+
+
+# --- Reporting --------------------------------------------------------------
+
+def index_count(pg_conn, mongo_db, engine, target):
+    if engine == 'postgresql':
+        cur = pg_conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM pg_indexes WHERE schemaname = 'public' AND tablename = %s", (target,))
+        count = cur.fetchone()[0]
+        cur.close()
+        pg_conn.commit()
+        return count
+    return len(mongo_db[target].index_information())
+
+
+def summary_row(config, engine, mode, target, indexes, run):
+    latencies = run['latencies']
+    total_s = sum(latencies) / 1000
+    return [
+        config, engine, mode, target, indexes, len(latencies), run['rows'],
+        f"{run['rows'] / total_s:.0f}" if total_s else "N/A",
+        f"{len(latencies) / total_s:.0f}" if total_s else "N/A",
+        *("N/A" if value is None else f"{value:.2f}ms" for value in
+          (percentile(latencies, 50), percentile(latencies, 95), percentile(latencies, 99))),
+        run['note'],
+    ]
+
+
+HEADERS = ["Config", "Engine", "Mode", "Target", "Indexes", "Operations", "Rows", "Rows/s", "Ops/s",
+           "p50", "p95", "p99", "Note"]
+
+
+def save_csv(rows, results_dir):
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"write_benchmark_{get_timestamp_str()}.csv")
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        writer.writerows(rows)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark single, batched and transactional writes on both engines')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES, help='Engines to benchmark (default: both)')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES, help='Write modes to run (default: all)')
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=TARGETS,
+                        help='Tables/collections to write (default: reviews tips; txn always writes reviews)')
+    parser.add_argument('--operations', type=int, default=1000, help='Operations per mode and target (default: 1000)')
+    parser.add_argument('--batch-size', type=int, default=100, help='Rows per operation in batch mode (default: 100)')
+    parser.add_argument('--synchronous-commit', choices=SYNCHRONOUS_COMMIT, default='on',
+                        help='PostgreSQL synchronous_commit for the benchmark session (default: on)')
+    parser.add_argument('--write-concern', default='1', help="MongoDB write concern w, e.g. 0, 1 or majority (default: 1)")
+    parser.add_argument('--journal', action=argparse.BooleanOptionalAction, default=True,
+                        help='Request MongoDB journal acknowledgement (default: --journal)')
+    parser.add_argument('--index-configs', nargs='+', default=None,
+                        help='Index configurations to benchmark under, applied in turn (default: current indexes)')
+    parser.add_argument('--final-config', default=None, help='Index configuration to leave applied when done')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='zipf',
+                        help='Distribution of written businesses and users over their popularity (default: zipf)')
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent (default: 1.0)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    parser.add_argument('--pool-size', type=int, default=1000, help='Businesses and users sampled from (default: 1000)')
+    parser.add_argument('--keep', action='store_true', help='Keep the written rows instead of cleaning up')
+    parser.add_argument('--cleanup-only', action='store_true', help='Only remove rows left by an interrupted run')
+    parser.add_argument('--results-dir', type=str, default=RESULTS_DIR, help='Directory to save results (default: ./results)')
+    args = parser.parse_args()
+
+    configs = load_index_configs()
+    unknown = [name for name in (args.index_configs or []) + ([args.final_config] if args.final_config else [])
+               if name not in configs]
+    if unknown:
+        parser.error(f"Unknown index configuration(s): {', '.join(unknown)}")
+
+    pg_conn, mongo_db, mongo_client = init_connections()
+    try:
+        leftover = load_snapshot()
+        if leftover:
+            print("Cleaning up rows left by a previous run...")
+            cleanup(pg_conn, mongo_db, leftover)
+            os.remove(SNAPSHOT_PATH)
+        if args.cleanup_only:
+            if not leftover:
+                print("Nothing to clean up")
+            return
+
+        write_concern = parse_write_concern(args.write_concern, args.journal)
+        use_transactions = 'mongodb' in args.engines and transactions_supported(mongo_client)
+        if 'mongodb' in args.engines and 'txn' in args.modes and not use_transactions:
+            print("MongoDB is not a replica set; txn mode runs its writes without a transaction")
+
+        print("Sampling businesses, users, ratings and texts...")
+        generator = WriteGenerator(pg_conn, args.distribution, args.skew, args.seed, args.pool_size)
+        snapshot = save_snapshot(pg_conn, mongo_db, generator.business_ids())
+
+        rows = []
+        try:
+            for i, config_name in enumerate(args.index_configs or [None]):
+                if i and not args.keep:
+                    # Start every configuration from the same data
+                    cleanup(pg_conn, mongo_db, snapshot)
+                if config_name:
+                    print(f"\n=== Index configuration: {config_name} ===")
+                    apply_postgres_config(pg_conn, configs[config_name])
+                    apply_mongo_config(mongo_db, configs[config_name])
+                label = config_name or detect_index_config(pg_conn, mongo_db)
+
+                for engine in args.engines:
+                    for mode in args.modes:
+                        for target in (['reviews'] if mode == 'txn' else args.targets):
+                            print(f"  {engine}: {mode} writes to {target}...")
+                            if engine == 'postgresql':
+                                run = run_pg(pg_conn, generator, mode, target, args.operations, args.batch_size,
+                                             args.synchronous_commit)
+                            else:
+                                run = run_mongo(mongo_db, generator, mode, target, args.operations, args.batch_size,
+                                                write_concern, use_transactions)
+                            indexes = index_count(pg_conn, mongo_db, engine, target)
+                            rows.append(summary_row(label, engine, mode, target, indexes, run))
+        finally:
+            if not args.keep:
+                cleanup(pg_conn, mongo_db, snapshot)
+                os.remove(SNAPSHOT_PATH)
+            else:
+                print(f"Benchmark rows kept; run with --cleanup-only to remove them ({SNAPSHOT_PATH})")
+
+        print(f"\n=== Write Throughput and Latency (synchronous_commit={args.synchronous_commit}, "
+              f"w={args.write_concern}, j={args.journal}) ===")
+        print(tabulate(rows, headers=HEADERS, tablefmt="grid"))
+        print(f"\nResults saved to {save_csv(rows, args.results_dir)}")
+
+        if args.final_config:
+            print(f"\nRestoring index configuration '{args.final_config}'...")
+            apply_postgres_config(pg_conn, configs[args.final_config])
+            apply_mongo_config(mongo_db, configs[args.final_config])
+    finally:
+        close_connections(pg_conn, mongo_client)
+
+
+if __name__ == "__main__":
+    main()
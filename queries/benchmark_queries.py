@@ -2,19 +2,611 @@
 Benchmark queries for PostgreSQL and MongoDB
 Each query should have:
 1. description - Text description of what the query does
-2. pg - SQL query string for PostgreSQL 
-3. pg_params - Parameters for the PostgreSQL query (if needed)
-4. mongo - A function that takes a MongoDB database connection and returns query results
-5. mongo_explain - A function that takes a MongoDB database connection and returns explain output
+2. class - Workload class of the query (one of QUERY_CLASSES)
+3. pg - SQL query string for PostgreSQL, with %(name)s placeholders for parameters
+4. pg_params - Default parameters for the query (shared by both engines). Defaults left as None
+   are filled at run time with the most frequent value of the query's param_source
+5. mongo - A function that takes a MongoDB database connection (and optional parameters) and returns query results
+6. mongo_explain - A function that takes a MongoDB database connection (and optional parameters) and returns explain output
+7. param_source - Optional parameter source from code/param_generators.py used to sample realistic parameters
+8. mongo_collection - Collection the MongoDB query runs against (set by aggregate_query)
+9. mongo_pipeline - A function that takes parameters and returns the aggregation pipeline (set by aggregate_query)
+10. vectorized - Optional function taking a code/columnar_engine.py ColumnarStore and parameters and
+    returning result rows, run by benchmark.py --columnar
+11. pagination - Optional paging strategy of a listing query: {'listing', 'strategy': 'offset' | 'keyset'};
+    keyset queries also map each cursor parameter to its (PostgreSQL column, MongoDB field)
+12. sqlite - Optional SQLite SQL with :name placeholders, for queries whose pg SQL uses PostgreSQL-only
+    syntax (JSONB operators, EXTRACT, ILIKE, ...); see code/engines/sqlite.py
 """
+import numpy as np
 
-QUERIES = {    
+QUERY_CLASSES = {
+    'point_lookup': 'Point lookups by primary key',
+    'range_scan': 'Range scans on review, tip and user dates',
+    'join': 'Multi-table joins across reviews, users and businesses',
+    'aggregation': 'Group-by aggregations',
+    'top_n': 'Top-N ordered queries',
+    'attribute_filter': 'JSONB / embedded attribute filtering',
+    'text_search': 'Category full-text search and per-business substring search',
+    'window': 'Window-style analytics',
+    'review_search': 'Keyword, phrase, ranked, prefix and substring search over review and tip text',
+    'large_scan': 'Large result sets returned to the client',
+    'pagination': 'Listing pages fetched with OFFSET/$skip or keyset (seek) pagination',
+    'geo': 'Nearest-neighbour, radius and bounding-box searches around business locations',
+}
+
+CITY = {'city': 'Philadelphia', 'state': 'PA'}
+BUSINESS = {'business_id': None}
+USER = {'user_id': None}
+DATE_WINDOW = {'start_date': None, 'end_date': None}
+SEARCH = {'term': 'delicious', 'phrase': 'great service', 'prefix': 'deli'}
+YEAR_WINDOW = {'start_date': '2019-01-01', 'end_date': '2020-01-01'}
+# Keyset cursors default to a position before the first row of the listing
+CITY_PAGE = {**CITY, 'page_size': 20, 'offset': 0}
+CITY_KEYSET = {**CITY, 'page_size': 20, 'after_stars': 6, 'after_review_count': 0, 'after_business_id': ''}
+BUSINESS_PAGE = {**BUSINESS, 'page_size': 20, 'offset': 0}
+BUSINESS_KEYSET = {**BUSINESS, 'page_size': 20, 'after_date': '9999-12-31 23:59:59', 'after_review_id': ''}
+LOCATION = {'latitude': None, 'longitude': None}
+NEAREST = {**LOCATION, 'k': 10}
+OPEN_NEARBY = {**LOCATION, 'radius_km': 2, 'day': 'Friday', 'time': '19:00'}
+LOCATION_BOX = {**LOCATION, 'half_box_deg': 0.05}
+
+def aggregate_query(collection, pipeline, defaults=None):
+    """Build the 'mongo' and 'mongo_explain' functions for a templated aggregation.
+
+    `pipeline` takes a dict of parameters and returns the aggregation pipeline.
+    Parameters passed at call time override `defaults`.
+    """
+    def resolve(params):
+        return pipeline({**(defaults or {}), **(params or {})})
+
+    return {
+        'mongo_collection': collection,
+        'mongo_pipeline': resolve,
+        'mongo': lambda db, params=None: list(db[collection].aggregate(resolve(params))),
+        'mongo_explain': lambda db, params=None: db.command(
+            'explain',
+            {
+                'aggregate': collection,
+                'pipeline': resolve(params),
+                'cursor': {}
+            },
+            verbosity='executionStats'
+        )
+    }
+
+def dancing_restaurants_pipeline(p):
+    return [
+        {'$match': {
+            'attributes.Alcohol': {'$exists': True, '$nin': ["u'none'", 'None']},
+            "attributes.RestaurantsReservations": "True",
+            "attributes.GoodForDancing": "True",
+            "attributes.RestaurantsGoodForGroups": "True",
+            'hours.Friday': {'$exists': True},
+            'review_count': {'$gte': 5},
+            'city': p['city'],
+            'state': p['state'],
+            '$or': [
+                {'categories': {'$regex': 'Bar', '$options': 'i'}},
+                {'categories': {'$regex': 'Lounge', '$options': 'i'}}
+            ]
+        }},
+        {'$addFields': {
+            'open_hour': {'$toInt': {'$arrayElemAt':
+            [{'$split': [{'$arrayElemAt':
+            [{'$split': ['$hours.Friday', '-']}, 0]},':']}, 0]}}
+        }},
+        {'$match': {'open_hour': {'$lte': 20}}},
+        {'$sort': {'stars': -1, 'review_count': -1}},
+        {'$project': {
+            'business_id': 1,
+            'name': 1,
+            'stars': 1
+        }},
+        {'$limit': 10}
+    ]
+
+def geo_point(p):
+    """GeoJSON point (longitude first) of a location parameter set"""
+    return {'type': 'Point', 'coordinates': [p['longitude'], p['latitude']]}
+
+def hours_minutes(expr):
+    """Minutes after midnight of a Yelp 'H:M' opening or closing time"""
+    return {'$let': {'vars': {'hm': {'$split': [expr, ':']}}, 'in': {'$add': [
+        {'$multiply': [{'$toInt': {'$arrayElemAt': ['$$hm', 0]}}, 60]},
+        {'$toInt': {'$arrayElemAt': ['$$hm', 1]}}
+    ]}}}
+
+def open_now_nearby_pipeline(p):
+    hours = {'$split': [f"$hours.{p['day']}", '-']}
+    hour, minute = p['time'].split(':')
+    now = int(hour) * 60 + int(minute)
+    return [
+        {'$geoNear': {
+            'near': geo_point(p),
+            'key': 'coordinates',
+            'distanceField': 'distance_m',
+            'maxDistance': p['radius_km'] * 1000,
+            'spherical': True,
+            'query': {'is_open': 1, f"hours.{p['day']}": {'$exists': True}}
+        }},
+        {'$addFields': {
+            'opens': hours_minutes({'$arrayElemAt': [hours, 0]}),
+            'closes': hours_minutes({'$arrayElemAt': [hours, 1]})
+        }},
+        # Hours that close at or before they open run past midnight ('0:0-0:0' is all day)
+        {'$match': {'$expr': {'$cond': [
+            {'$gt': ['$closes', '$opens']},
+            {'$and': [{'$gte': [now, '$opens']}, {'$lt': [now, '$closes']}]},
+            {'$or': [{'$gte': [now, '$opens']}, {'$lt': [now, '$closes']}]}
+        ]}}},
+        {'$project': {'name': 1, 'stars': 1, 'distance_m': 1}}
+    ]
+
+# MongoDB stores review, tip and user dates as 'YYYY-MM-DD HH:MM:SS' strings
+YEAR = {'$substrBytes': ['$date', 0, 4]}
+
+# --- Vectorized implementations over a ColumnarStore (code/columnar_engine.py) ---
+# They follow the PostgreSQL query of the same entry and return rows as tuples
+
+def _rows(*columns):
+    return list(zip(*(np.asarray(column).tolist() for column in columns)))
+
+def _business_rows(store, rows, *names):
+    b = store.businesses
+    return _rows(*(b[name].decode(rows) if hasattr(b[name], 'decode') else b[name][rows] for name in names))
+
+def _group_mean(codes, values, size):
+    """Per-code count of rows and mean of non-NaN values"""
+    counts = np.bincount(codes, minlength=size)
+    present = ~np.isnan(values)
+    sums = np.bincount(codes[present], weights=values[present], minlength=size)
+    totals = np.bincount(codes[present], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return counts, np.where(totals > 0, sums / totals, np.nan)
+
+def _top(rows, *keys, limit=None):
+    """Rows ordered by the keys, each descending, first key most significant"""
+    order = rows[np.lexsort(tuple(-key[rows] for key in reversed(keys)))]
+    return order if limit is None else order[:limit]
+
+def vectorized_business_by_id(store, p):
+    row = store.business_row(p['business_id'])
+    rows = np.array([] if row is None else [row], dtype=np.int64)
+    return _business_rows(store, rows, 'business_id', 'name', 'city', 'state', 'stars', 'review_count')
+
+def vectorized_user_by_id(store, p):
+    row = store.user_index.get(p['user_id'])
+    rows = np.array([] if row is None else [row], dtype=np.int64)
+    u = store.users
+    return _rows(u['user_id'][rows], u['name'][rows], u['review_count'][rows], u['fans'][rows],
+                 u['average_stars'][rows])
+
+def vectorized_reviews_in_month(store, p):
+    dates = store.reviews['date']
+    mask = (dates >= np.datetime64(str(p['start_date']), 's')) & (dates < np.datetime64(str(p['end_date']), 's'))
+    count = int(np.count_nonzero(mask))
+    return [(count, float(store.reviews['stars'][mask].mean()) if count else None)]
+
+def vectorized_business_stats_by_state(store, p):
+    state = store.businesses['state']
+    valid = state.codes >= 0
+    counts, means = _group_mean(state.codes[valid], store.businesses['stars'][valid].astype(np.float64),
+                                len(state.dictionary))
+    order = np.argsort(-counts, kind='stable')
+    order = order[counts[order] > 0]
+    return _rows(state.dictionary[order], counts[order], means[order])
+
+def vectorized_category_counts_in_city(store, p):
+    categories = store.businesses['categories']
+    selected = store.city_mask(p['city'], p['state'])[categories.rows]
+    counts = np.bincount(categories.codes[selected], minlength=len(categories.dictionary))
+    order = np.argsort(-counts, kind='stable')[:20]
+    order = order[counts[order] > 0]
+    return _rows(categories.dictionary[order], counts[order])
+
+def _review_years(store, p):
+    reviews = store.business_reviews(p['business_id'])
+    years = store.reviews['date'][reviews].astype('datetime64[Y]').astype(np.int64) + 1970
+    return np.unique(years, return_inverse=True), store.reviews['stars'][reviews]
+
+def vectorized_yearly_rating_for_business(store, p):
+    (years, inverse), stars = _review_years(store, p)
+    counts, means = _group_mean(inverse, stars.astype(np.float64), len(years))
+    return _rows(years, counts, means)
+
+def vectorized_cumulative_reviews_for_business(store, p):
+    (years, inverse), _ = _review_years(store, p)
+    counts = np.bincount(inverse, minlength=len(years))
+    return _rows(years, counts, np.cumsum(counts))
+
+def vectorized_top_rated_in_city(store, p):
+    b = store.businesses
+    rows = np.flatnonzero(store.city_mask(p['city'], p['state']) & (b['review_count'] >= 50))
+    rows = _top(rows, b['stars'], b['review_count'], limit=10)
+    return _business_rows(store, rows, 'business_id', 'name', 'stars', 'review_count')
+
+def vectorized_most_useful_reviews_for_business(store, p):
+    r = store.reviews
+    reviews = store.business_reviews(p['business_id'])
+    rows = np.arange(reviews.start, reviews.stop)
+    rows = rows[np.argsort(-r['useful'][rows], kind='stable')[:10]]
+    users = r['user'][rows]
+    user_ids = np.where(users >= 0, store.users['user_id'][np.maximum(users, 0)], None)
+    return _rows(np.char.decode(r['review_id'][rows]), user_ids, r['stars'][rows], r['useful'][rows])
+
+def vectorized_top_users_by_fans(store, p):
+    u = store.users
+    fans = u['fans']
+    candidates = np.argpartition(-fans, 20)[:20] if len(fans) > 20 else np.arange(len(fans))
+    rows = candidates[np.argsort(-fans[candidates], kind='stable')]
+    return _rows(u['user_id'][rows], u['name'][rows], fans[rows], u['review_count'][rows])
+
+def vectorized_dancing_restaurants(store, p):
+    b = store.businesses
+    open_hour = b['friday_open_hour']
+    mask = (store.city_mask(p['city'], p['state'])
+            & store.attribute_matching('Alcohol', lambda value: value not in ("u'none'", 'None'))
+            & store.attribute_true('GoodForDancing')
+            & store.attribute_true('RestaurantsReservations')
+            & store.attribute_true('RestaurantsGoodForGroups')
+            & (open_hour >= 0) & (open_hour <= 20))
+    rows = _top(np.flatnonzero(mask), b['stars'], b['review_count'], limit=10)
+    return _business_rows(store, rows, 'business_id', 'name', 'city', 'state')
+
+def vectorized_delivery_and_takeout_in_city(store, p):
+    mask = (store.city_mask(p['city'], p['state']) & store.attribute_true('RestaurantsDelivery')
+            & store.attribute_true('RestaurantsTakeOut'))
+    return _business_rows(store, np.flatnonzero(mask), 'business_id', 'name', 'stars')
+
+def vectorized_dog_friendly_by_state(store, p):
+    state = store.businesses['state']
+    codes = state.codes[store.attribute_true('DogsAllowed') & (state.codes >= 0)]
+    counts = np.bincount(codes, minlength=len(state.dictionary))
+    order = np.argsort(-counts, kind='stable')
+    order = order[counts[order] > 0]
+    return _rows(state.dictionary[order], counts[order])
+
+def vectorized_garage_parking_in_city(store, p):
+    mask = (store.city_mask(p['city'], p['state'])
+            & store.attribute_matching('BusinessParking', lambda value: "'garage': True" in value))
+    return _business_rows(store, np.flatnonzero(mask), 'business_id', 'name')
+
+def vectorized_top_businesses_per_city(store, p):
+    b = store.businesses
+    city = b['city']
+    rows = np.flatnonzero(store.businesses['state'].eq(p['state']))
+    cities = city.codes[rows]
+    rows = rows[np.lexsort((-b['review_count'][rows], -b['stars'][rows], cities))]
+    cities = city.codes[rows]
+    starts = np.r_[0, np.flatnonzero(np.diff(cities)) + 1]
+    rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)])) + 1
+    keep = rank <= 3
+    rows, rank = rows[keep], rank[keep]
+    names = np.array([str(value) for value in city.decode(rows)])
+    order = np.lexsort((rank, names))
+    rows, rank = rows[order], rank[order]
+    return [row + (r,) for row, r in zip(_business_rows(store, rows, 'business_id', 'name', 'city', 'stars'),
+                                         rank.tolist())]
+
+QUERIES = {
+    # --- Point lookups ------------------------------------------------------
+    'business_by_id': {
+        'description': 'Fetch one business by id',
+        'class': 'point_lookup',
+        'pg': """
+            SELECT business_id, name, city, state, stars, review_count
+            FROM businesses
+            WHERE business_id = %(business_id)s
+        """,
+        'pg_params': BUSINESS,
+        'param_source': 'business_id',
+        'vectorized': vectorized_business_by_id,
+        **aggregate_query('businesses', lambda p: [
+            {'$match': {'_id': p['business_id']}},
+            {'$project': {'name': 1, 'city': 1, 'state': 1, 'stars': 1, 'review_count': 1}}
+        ], BUSINESS)
+    },
+    'user_by_id': {
+        'description': 'Fetch one user by id',
+        'class': 'point_lookup',
+        'pg': """
+            SELECT user_id, name, review_count, fans, average_stars
+            FROM users
+            WHERE user_id = %(user_id)s
+        """,
+        'pg_params': USER,
+        'param_source': 'user_id',
+        'vectorized': vectorized_user_by_id,
+        **aggregate_query('users', lambda p: [
+            {'$match': {'_id': p['user_id']}},
+            {'$project': {'name': 1, 'review_count': 1, 'fans': 1, 'average_stars': 1}}
+        ], USER)
+    },
+    'checkins_for_business': {
+        'description': 'Fetch the check-in dates of one business',
+        'class': 'point_lookup',
+        'pg': """
+            SELECT business_id, date
+            FROM checkins
+            WHERE business_id = %(business_id)s
+        """,
+        'pg_params': BUSINESS,
+        'param_source': 'business_id',
+        **aggregate_query('checkins', lambda p: [
+            {'$match': {'business_id': p['business_id']}},
+            {'$project': {'business_id': 1, 'date': 1}}
+        ], BUSINESS)
+    },
+
+    # --- Range scans --------------------------------------------------------
+    'reviews_in_month': {
+        'description': 'Count and average rating of all reviews written in a month',
+        'class': 'range_scan',
+        'pg': """
+            SELECT COUNT(*) AS reviews, AVG(stars) AS avg_stars
+            FROM reviews
+            WHERE date >= %(start_date)s AND date < %(end_date)s
+        """,
+        'pg_params': DATE_WINDOW,
+        'param_source': 'date_window',
+        'vectorized': vectorized_reviews_in_month,
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'date': {'$gte': p['start_date'], '$lt': p['end_date']}}},
+            {'$group': {'_id': None, 'reviews': {'$sum': 1}, 'avg_stars': {'$avg': '$stars'}}}
+        ], DATE_WINDOW)
+    },
+    'latest_reviews_in_month': {
+        'description': 'The 100 most recent reviews written in a month',
+        'class': 'range_scan',
+        'pg': """
+            SELECT review_id, business_id, stars, date
+            FROM reviews
+            WHERE date >= %(start_date)s AND date < %(end_date)s
+            ORDER BY date DESC
+            LIMIT 100
+        """,
+        'pg_params': DATE_WINDOW,
+        'param_source': 'date_window',
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'date': {'$gte': p['start_date'], '$lt': p['end_date']}}},
+            {'$sort': {'date': -1}},
+            {'$limit': 100},
+            {'$project': {'business_id': 1, 'stars': 1, 'date': 1}}
+        ], DATE_WINDOW)
+    },
+    'tips_in_month': {
+        'description': 'Tips written in a month with their compliment counts',
+        'class': 'range_scan',
+        'pg': """
+            SELECT business_id, date, compliment_count
+            FROM tips
+            WHERE date >= %(start_date)s AND date < %(end_date)s
+        """,
+        'pg_params': DATE_WINDOW,
+        'param_source': 'date_window',
+        **aggregate_query('tips', lambda p: [
+            {'$match': {'date': {'$gte': p['start_date'], '$lt': p['end_date']}}},
+            {'$project': {'business_id': 1, 'date': 1, 'compliment_count': 1}}
+        ], DATE_WINDOW)
+    },
+
+    # --- Joins --------------------------------------------------------------
+    'user_reviews_with_business': {
+        'description': 'A user\'s 50 latest reviews with the reviewed business',
+        'class': 'join',
+        'pg': """
+            SELECT r.review_id, r.stars, r.date, b.name, b.city, b.state
+            FROM reviews r
+            JOIN businesses b ON b.business_id = r.business_id
+            WHERE r.user_id = %(user_id)s
+            ORDER BY r.date DESC
+            LIMIT 50
+        """,
+        'pg_params': USER,
+        'param_source': 'user_id',
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'user_id': p['user_id']}},
+            {'$sort': {'date': -1}},
+            {'$limit': 50},
+            {'$lookup': {'from': 'businesses', 'localField': 'business_id', 'foreignField': '_id', 'as': 'business'}},
+            {'$unwind': '$business'},
+            {'$project': {'stars': 1, 'date': 1, 'business.name': 1, 'business.city': 1, 'business.state': 1}}
+        ], USER)
+    },
+    'business_top_reviewers': {
+        'description': 'The 10 reviewers of a business with the most fans',
+        'class': 'join',
+        'pg': """
+            SELECT u.user_id, u.name, u.fans, r.stars
+            FROM reviews r
+            JOIN users u ON u.user_id = r.user_id
+            WHERE r.business_id = %(business_id)s
+            ORDER BY u.fans DESC
+            LIMIT 10
+        """,
+        'pg_params': BUSINESS,
+        'param_source': 'business_id',
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'business_id': p['business_id']}},
+            {'$lookup': {'from': 'users', 'localField': 'user_id', 'foreignField': '_id', 'as': 'user'}},
+            {'$unwind': '$user'},
+            {'$sort': {'user.fans': -1}},
+            {'$limit': 10},
+            {'$project': {'user._id': 1, 'user.name': 1, 'user.fans': 1, 'stars': 1}}
+        ], BUSINESS)
+    },
+    'popular_reviewers_by_business_in_city': {
+        'description': 'Businesses in a city most reviewed by users with 100+ fans',
+        'class': 'join',
+        'pg': """
+            SELECT b.business_id, b.name, COUNT(*) AS reviews
+            FROM reviews r
+            JOIN users u ON u.user_id = r.user_id
+            JOIN businesses b ON b.business_id = r.business_id
+            WHERE b.city = %(city)s AND b.state = %(state)s
+            AND u.fans >= 100
+            GROUP BY b.business_id, b.name
+            ORDER BY reviews DESC
+            LIMIT 10
+        """,
+        'pg_params': CITY,
+        'param_source': 'city_state',
+        **aggregate_query('businesses', lambda p: [
+            {'$match': {'city': p['city'], 'state': p['state']}},
+            {'$lookup': {'from': 'reviews', 'localField': '_id', 'foreignField': 'business_id', 'as': 'review'}},
+            {'$unwind': '$review'},
+            {'$lookup': {'from': 'users', 'localField': 'review.user_id', 'foreignField': '_id', 'as': 'user'}},
+            {'$unwind': '$user'},
+            {'$match': {'user.fans': {'$gte': 100}}},
+            {'$group': {'_id': '$_id', 'name': {'$first': '$name'}, 'reviews': {'$sum': 1}}},
+            {'$sort': {'reviews': -1}},
+            {'$limit': 10}
+        ], CITY)
+    },
+
+    # --- Aggregations -------------------------------------------------------
+    'business_stats_by_state': {
+        'description': 'Number of businesses and average rating per state',
+        'class': 'aggregation',
+        'pg': """
+            SELECT state, COUNT(*) AS businesses, AVG(stars) AS avg_stars
+            FROM businesses
+            GROUP BY state
+            ORDER BY businesses DESC
+        """,
+        'pg_params': {},
+        'vectorized': vectorized_business_stats_by_state,
+        **aggregate_query('businesses', lambda p: [
+            {'$group': {'_id': '$state', 'businesses': {'$sum': 1}, 'avg_stars': {'$avg': '$stars'}}},
+            {'$sort': {'businesses': -1}}
+        ])
+    },
+    'category_counts_in_city': {
+        'description': 'The 20 most common business categories in a city',
+        'class': 'aggregation',
+        'pg': """
+            SELECT TRIM(category) AS category, COUNT(*) AS businesses
+            FROM businesses, UNNEST(STRING_TO_ARRAY(categories, ',')) AS category
+            WHERE city = %(city)s AND state = %(state)s
+            GROUP BY 1
+            ORDER BY businesses DESC
+            LIMIT 20
+        """,
+        'sqlite': """
+            SELECT TRIM(category.value) AS category, COUNT(*) AS businesses
+            FROM businesses, json_each('["' || REPLACE(categories, ',', '","') || '"]') AS category
+            WHERE city = :city AND state = :state
+            GROUP BY 1
+            ORDER BY businesses DESC
+            LIMIT 20
+        """,
+        'pg_params': CITY,
+        'param_source': 'city_state',
+        'vectorized': vectorized_category_counts_in_city,
+        **aggregate_query('businesses', lambda p: [
+            {'$match': {'city': p['city'], 'state': p['state']}},
+            {'$project': {'category': {'$split': ['$categories', ',']}}},
+            {'$unwind': '$category'},
+            {'$group': {'_id': {'$trim': {'input': '$category'}}, 'businesses': {'$sum': 1}}},
+            {'$sort': {'businesses': -1}},
+            {'$limit': 20}
+        ], CITY)
+    },
+    'yearly_rating_for_business': {
+        'description': 'Review count and average rating per year for a business',
+        'class': 'aggregation',
+        'pg': """
+            SELECT EXTRACT(YEAR FROM date) AS year, COUNT(*) AS reviews, AVG(stars) AS avg_stars
+            FROM reviews
+            WHERE business_id = %(business_id)s
+            GROUP BY 1
+            ORDER BY 1
+        """,
+        'sqlite': """
+            SELECT CAST(strftime('%Y', date) AS INTEGER) AS year, COUNT(*) AS reviews, AVG(stars) AS avg_stars
+            FROM reviews
+            WHERE business_id = :business_id
+            GROUP BY 1
+            ORDER BY 1
+        """,
+        'pg_params': BUSINESS,
+        'param_source': 'business_id',
+        'vectorized': vectorized_yearly_rating_for_business,
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'business_id': p['business_id']}},
+            {'$group': {'_id': YEAR, 'reviews': {'$sum': 1}, 'avg_stars': {'$avg': '$stars'}}},
+            {'$sort': {'_id': 1}}
+        ], BUSINESS)
+    },
+
+    # --- Top-N --------------------------------------------------------------
+    'top_rated_in_city': {
+        'description': 'The 10 best rated businesses in a city with at least 50 reviews',
+        'class': 'top_n',
+        'pg': """
+            SELECT business_id, name, stars, review_count
+            FROM businesses
+            WHERE city = %(city)s AND state = %(state)s AND review_count >= 50
+            ORDER BY stars DESC, review_count DESC
+            LIMIT 10
+        """,
+        'pg_params': CITY,
+        'param_source': 'city_state',
+        'vectorized': vectorized_top_rated_in_city,
+        **aggregate_query('businesses', lambda p: [
+            {'$match': {'city': p['city'], 'state': p['state'], 'review_count': {'$gte': 50}}},
+            {'$sort': {'stars': -1, 'review_count': -1}},
+            {'$limit': 10},
+            {'$project': {'name': 1, 'stars': 1, 'review_count': 1}}
+        ], CITY)
+    },
+    'most_useful_reviews_for_business': {
+        'description': 'The 10 reviews of a business voted most useful',
+        'class': 'top_n',
+        'pg': """
+            SELECT review_id, user_id, stars, useful
+            FROM reviews
+            WHERE business_id = %(business_id)s
+            ORDER BY useful DESC
+            LIMIT 10
+        """,
+        'pg_params': BUSINESS,
+        'param_source': 'business_id',
+        'vectorized': vectorized_most_useful_reviews_for_business,
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'business_id': p['business_id']}},
+            {'$sort': {'useful': -1}},
+            {'$limit': 10},
+            {'$project': {'user_id': 1, 'stars': 1, 'useful': 1}}
+        ], BUSINESS)
+    },
+    'top_users_by_fans': {
+        'description': 'The 20 users with the most fans',
+        'class': 'top_n',
+        'pg': """
+            SELECT user_id, name, fans, review_count
+            FROM users
+            ORDER BY fans DESC
+            LIMIT 20
+        """,
+        'pg_params': {},
+        'vectorized': vectorized_top_users_by_fans,
+        **aggregate_query('users', lambda p: [
+            {'$sort': {'fans': -1}},
+            {'$limit': 20},
+            {'$project': {'name': 1, 'fans': 1, 'review_count': 1}}
+        ])
+    },
+
+    # --- Attribute filtering ------------------------------------------------
     'dancing_restaurants_philly': {
         'description': 'Find restaurants with dancing, reservations and alcohol in Philadelphia',
+        'class': 'attribute_filter',
         'pg': """
             SELECT business_id, name, city, state
             FROM businesses
-            WHERE 
+            WHERE
             attributes->>'Alcohol' IS NOT NULL
             AND attributes->>'Alcohol' NOT IN ('u''none''', 'None')
             AND attributes->>'GoodForDancing' = 'True'
@@ -22,70 +614,587 @@ QUERIES = {
             AND attributes->>'RestaurantsGoodForGroups' = 'True'
             AND hours->>'Friday' IS NOT NULL
             AND CAST(SPLIT_PART(SPLIT_PART(hours->>'Friday', '-', 1), ':', 1) AS INTEGER) <= 20
-            AND city = 'Philadelphia'
-            AND state = 'PA'
+            AND city = %(city)s
+            AND state = %(state)s
             ORDER BY stars DESC, review_count DESC
             LIMIT 10
         """,
-        'mongo': lambda db: list(db.businesses.aggregate([
-            {'$match': {'attributes.Alcohol': {'$exists': True, '$nin': ["u'none'", 'None']},
-            "attributes.RestaurantsReservations": "True",
-            "attributes.GoodForDancing": "True",
-            "attributes.RestaurantsGoodForGroups": "True",
-            'hours.Friday': {'$exists': True},
-            'review_count': {'$gte': 5},
-            'city': 'Philadelphia',
-            'state': 'PA',
-            '$or': [{'categories': {'$regex': 'Bar', '$options': 'i'}}, 
-                   {'categories': {'$regex': 'Lounge', '$options': 'i'}}]}}, 
-            {'$addFields': {'open_hour': {'$toInt': {'$arrayElemAt': 
-            [{'$split': [{'$arrayElemAt': 
-            [{'$split': ['$hours.Friday', '-']}, 0]},':']}, 0]}}}},
-            {'$match': {'open_hour': {'$lte': 20}}},
-            {'$sort': {'stars': -1, 'review_count': -1}},
-            {'$project': {'business_id': 1, 
-            'name': 1,
-            'stars': 1}},
-            {'$limit': 10}
-        ])),
-        'mongo_explain': lambda db: db.command(
-            'explain',
-            {
-                'aggregate': 'businesses',
-                'pipeline': [
-                    {'$match': {
-                        'attributes.Alcohol': {'$exists': True, '$nin': ["u'none'", 'None']},
-                        "attributes.RestaurantsReservations": "True",
-                        "attributes.GoodForDancing": "True",
-                        "attributes.RestaurantsGoodForGroups": "True",
-                        'hours.Friday': {'$exists': True},
-                        'review_count': {'$gte': 5},
-                        'city': 'Philadelphia',
-                        'state': 'PA',
-                        '$or': [
-                            {'categories': {'$regex': 'Bar', '$options': 'i'}}, 
-                            {'categories': {'$regex': 'Lounge', '$options': 'i'}}
-                        ]
-                    }}, 
-                    {'$addFields': {
-                        'open_hour': {'$toInt': {'$arrayElemAt': 
-                        [{'$split': [{'$arrayElemAt': 
-                        [{'$split': ['$hours.Friday', '-']}, 0]},':']}, 0]}}
-                    }},
-                    {'$match': {'open_hour': {'$lte': 20}}},
-                    {'$sort': {'stars': -1, 'review_count': -1}},
-                    {'$project': {
-                        'business_id': 1, 
-                        'name': 1,
-                        'stars': 1
-                    }},
-                    {'$limit': 10}
-                ],
-                'cursor': {}
+        'sqlite': """
+            SELECT business_id, name, city, state
+            FROM businesses
+            WHERE
+            json_extract(attributes, '$.Alcohol') IS NOT NULL
+            AND json_extract(attributes, '$.Alcohol') NOT IN ('u''none''', 'None')
+            AND json_extract(attributes, '$.GoodForDancing') = 'True'
+            AND json_extract(attributes, '$.RestaurantsReservations') = 'True'
+            AND json_extract(attributes, '$.RestaurantsGoodForGroups') = 'True'
+            AND json_extract(hours, '$.Friday') IS NOT NULL
+            AND CAST(substr(json_extract(hours, '$.Friday'), 1, instr(json_extract(hours, '$.Friday'), ':') - 1)
+                     AS INTEGER) <= 20
+            AND city = :city
+            AND state = :state
+            ORDER BY stars DESC, review_count DESC
+            LIMIT 10
+        """,
+        'pg_params': CITY,
+        'param_source': 'city_state',
+        'vectorized': vectorized_dancing_restaurants,
+        **aggregate_query('businesses', dancing_restaurants_pipeline, CITY)
+    },
+    'delivery_and_takeout_in_city': {
+        'description': 'Businesses in a city offering both delivery and take-out',
+        'class': 'attribute_filter',
+        'pg': """
+            SELECT business_id, name, stars
+            FROM businesses
+            WHERE city = %(city)s AND state = %(state)s
+            AND attributes->>'RestaurantsDelivery' = 'True'
+            AND attributes->>'RestaurantsTakeOut' = 'True'
+        """,
+        'sqlite': """
+            SELECT business_id, name, stars
+            FROM businesses
+            WHERE city = :city AND state = :state
+            AND json_extract(attributes, '$.RestaurantsDelivery') = 'True'
+            AND json_extract(attributes, '$.RestaurantsTakeOut') = 'True'
+        """,
+        'pg_params': CITY,
+        'param_source': 'city_state',
+        'vectorized': vectorized_delivery_and_takeout_in_city,
+        **aggregate_query('businesses', lambda p: [
+            {'$match': {
+                'city': p['city'],
+                'state': p['state'],
+                'attributes.RestaurantsDelivery': 'True',
+                'attributes.RestaurantsTakeOut': 'True'
+            }},
+            {'$project': {'name': 1, 'stars': 1}}
+        ], CITY)
+    },
+    'dog_friendly_by_state': {
+        'description': 'Number of dog-friendly businesses per state',
+        'class': 'attribute_filter',
+        'pg': """
+            SELECT state, COUNT(*) AS businesses
+            FROM businesses
+            WHERE attributes->>'DogsAllowed' = 'True'
+            GROUP BY state
+            ORDER BY businesses DESC
+        """,
+        'sqlite': """
+            SELECT state, COUNT(*) AS businesses
+            FROM businesses
+            WHERE json_extract(attributes, '$.DogsAllowed') = 'True'
+            GROUP BY state
+            ORDER BY businesses DESC
+        """,
+        'pg_params': {},
+        'vectorized': vectorized_dog_friendly_by_state,
+        **aggregate_query('businesses', lambda p: [
+            {'$match': {'attributes.DogsAllowed': 'True'}},
+            {'$group': {'_id': '$state', 'businesses': {'$sum': 1}}},
+            {'$sort': {'businesses': -1}}
+        ])
+    },
+    'garage_parking_in_city': {
+        'description': 'Businesses in a city with garage parking (nested attribute string)',
+        'class': 'attribute_filter',
+        'pg': """
+            SELECT business_id, name
+            FROM businesses
+            WHERE city = %(city)s AND state = %(state)s
+            AND attributes->>'BusinessParking' ~ '''garage'': True'
+        """,
+        'sqlite': """
+            SELECT business_id, name
+            FROM businesses
+            WHERE city = :city AND state = :state
+            AND instr(json_extract(attributes, '$.BusinessParking'), '''garage'': True') > 0
+        """,
+        'pg_params': CITY,
+        'param_source': 'city_state',
+        'vectorized': vectorized_garage_parking_in_city,
+        **aggregate_query('businesses', lambda p: [
+            {'$match': {
+                'city': p['city'],
+                'state': p['state'],
+                'attributes.BusinessParking': {'$regex': "'garage': True"}
+            }},
+            {'$project': {'name': 1}}
+        ], CITY)
+    },
+
+    # --- Text search --------------------------------------------------------
+    'category_search_in_city': {
+        'description': 'Businesses in a city whose categories match a search term',
+        'class': 'text_search',
+        'pg': """
+            SELECT business_id, name, categories
+            FROM businesses
+            WHERE to_tsvector('english', COALESCE(categories, '')) @@ plainto_tsquery('english', %(term)s)
+            AND city = %(city)s AND state = %(state)s
+        """,
+        'pg_params': {**CITY, 'term': 'sushi'},
+        'param_source': 'city_state',
+        **aggregate_query('businesses', lambda p: [
+            {'$match': {'$text': {'$search': p['term']}, 'city': p['city'], 'state': p['state']}},
+            {'$project': {'name': 1, 'categories': 1}}
+        ], {**CITY, 'term': 'sushi'})
+    },
+    'review_mentions_for_business': {
+        'description': 'Reviews of a business mentioning a word (case-insensitive substring)',
+        'class': 'text_search',
+        'pg': """
+            SELECT review_id, stars, date
+            FROM reviews
+            WHERE business_id = %(business_id)s
+            AND text ILIKE '%%' || %(term)s || '%%'
+        """,
+        'sqlite': """
+            SELECT review_id, stars, date
+            FROM reviews
+            WHERE business_id = :business_id
+            AND text LIKE '%' || :term || '%'
+        """,
+        'pg_params': {**BUSINESS, 'term': 'service'},
+        'param_source': 'business_id',
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'business_id': p['business_id'], 'text': {'$regex': p['term'], '$options': 'i'}}},
+            {'$project': {'stars': 1, 'date': 1}}
+        ], {**BUSINESS, 'term': 'service'})
+    },
+
+    # --- Window analytics ---------------------------------------------------
+    'top_businesses_per_city': {
+        'description': 'The 3 best rated businesses of every city in a state',
+        'class': 'window',
+        'pg': """
+            WITH ranked AS (
+                SELECT business_id, name, city, stars, review_count,
+                       ROW_NUMBER() OVER (PARTITION BY city ORDER BY stars DESC, review_count DESC) AS rank
+                FROM businesses
+                WHERE state = %(state)s
+            )
+            SELECT business_id, name, city, stars, rank
+            FROM ranked
+            WHERE rank <= 3
+            ORDER BY city, rank
+        """,
+        'pg_params': CITY,
+        'param_source': 'city_state',
+        'vectorized': vectorized_top_businesses_per_city,
+        **aggregate_query('businesses', lambda p: [
+            {'$match': {'state': p['state']}},
+            {'$setWindowFields': {
+                'partitionBy': '$city',
+                'sortBy': {'stars': -1, 'review_count': -1},
+                'output': {'rank': {'$documentNumber': {}}}
+            }},
+            {'$match': {'rank': {'$lte': 3}}},
+            {'$sort': {'city': 1, 'rank': 1}},
+            {'$project': {'name': 1, 'city': 1, 'stars': 1, 'rank': 1}}
+        ], CITY)
+    },
+    'cumulative_reviews_for_business': {
+        'description': 'Running total of reviews per year for a business',
+        'class': 'window',
+        'pg': """
+            SELECT year, reviews, SUM(reviews) OVER (ORDER BY year) AS total_reviews
+            FROM (
+                SELECT EXTRACT(YEAR FROM date) AS year, COUNT(*) AS reviews
+                FROM reviews
+                WHERE business_id = %(business_id)s
+                GROUP BY 1
+            ) yearly
+            ORDER BY year
+        """,
+        'sqlite': """
+            SELECT year, reviews, SUM(reviews) OVER (ORDER BY year) AS total_reviews
+            FROM (
+                SELECT CAST(strftime('%Y', date) AS INTEGER) AS year, COUNT(*) AS reviews
+                FROM reviews
+                WHERE business_id = :business_id
+                GROUP BY 1
+            ) yearly
+            ORDER BY year
+        """,
+        'pg_params': BUSINESS,
+        'param_source': 'business_id',
+        'vectorized': vectorized_cumulative_reviews_for_business,
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'business_id': p['business_id']}},
+            {'$group': {'_id': YEAR, 'reviews': {'$sum': 1}}},
+            {'$setWindowFields': {
+                'sortBy': {'_id': 1},
+                'output': {'total_reviews': {'$sum': '$reviews', 'window': {'documents': ['unbounded', 'current']}}}
+            }}
+        ], BUSINESS)
+    },
+    'moving_average_rating_for_business': {
+        'description': 'Moving average of the last 10 review ratings for a business',
+        'class': 'window',
+        'pg': """
+            SELECT review_id, date, stars,
+                   AVG(stars) OVER (ORDER BY date ROWS BETWEEN 9 PRECEDING AND CURRENT ROW) AS moving_avg
+            FROM reviews
+            WHERE business_id = %(business_id)s
+            ORDER BY date
+        """,
+        'pg_params': BUSINESS,
+        'param_source': 'business_id',
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'business_id': p['business_id']}},
+            {'$setWindowFields': {
+                'sortBy': {'date': 1},
+                'output': {'moving_avg': {'$avg': '$stars', 'window': {'documents': [-9, 0]}}}
+            }},
+            {'$project': {'date': 1, 'stars': 1, 'moving_avg': 1}}
+        ], BUSINESS)
+    },
+
+    # --- Review and tip search ----------------------------------------------
+    # PostgreSQL queries use the stored text_tsv columns (reset_load_postgres.py --text-search)
+    # and MongoDB queries the text indexes of the text_search index configuration
+    'review_keyword_search': {
+        'description': 'Number of reviews matching a keyword',
+        'class': 'review_search',
+        'pg': """
+            SELECT COUNT(*)
+            FROM reviews
+            WHERE text_tsv @@ plainto_tsquery('english', %(term)s)
+        """,
+        'pg_params': SEARCH,
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'$text': {'$search': p['term']}}},
+            {'$count': 'reviews'}
+        ], SEARCH)
+    },
+    'review_phrase_search': {
+        'description': 'Number of reviews containing a phrase',
+        'class': 'review_search',
+        'pg': """
+            SELECT COUNT(*)
+            FROM reviews
+            WHERE text_tsv @@ phraseto_tsquery('english', %(phrase)s)
+        """,
+        'pg_params': SEARCH,
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'$text': {'$search': f'"{p["phrase"]}"'}}},
+            {'$count': 'reviews'}
+        ], SEARCH)
+    },
+    'review_ranked_search': {
+        'description': 'The 10 reviews ranked most relevant to a keyword',
+        'class': 'review_search',
+        'pg': """
+            SELECT review_id, business_id, ts_rank(text_tsv, query) AS rank
+            FROM reviews, plainto_tsquery('english', %(term)s) AS query
+            WHERE text_tsv @@ query
+            ORDER BY rank DESC
+            LIMIT 10
+        """,
+        'pg_params': SEARCH,
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'$text': {'$search': p['term']}}},
+            {'$sort': {'score': {'$meta': 'textScore'}}},
+            {'$limit': 10},
+            {'$project': {'business_id': 1, 'score': {'$meta': 'textScore'}}}
+        ], SEARCH)
+    },
+    'review_prefix_search': {
+        'description': 'Number of reviews with a word starting with a prefix',
+        'class': 'review_search',
+        'pg': """
+            SELECT COUNT(*)
+            FROM reviews
+            WHERE text_tsv @@ to_tsquery('english', %(prefix)s || ':*')
+        """,
+        'pg_params': SEARCH,
+        # MongoDB text indexes do not match prefixes, so this is a word-boundary regex scan
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'text': {'$regex': f"\\b{p['prefix']}", '$options': 'i'}}},
+            {'$count': 'reviews'}
+        ], SEARCH)
+    },
+    'review_substring_search': {
+        'description': 'Number of reviews containing a substring (trigram index on PostgreSQL)',
+        'class': 'review_search',
+        'pg': """
+            SELECT COUNT(*)
+            FROM reviews
+            WHERE text ILIKE '%%' || %(phrase)s || '%%'
+        """,
+        'sqlite': """
+            SELECT COUNT(*)
+            FROM reviews
+            WHERE text LIKE '%' || :phrase || '%'
+        """,
+        'pg_params': SEARCH,
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'text': {'$regex': p['phrase'], '$options': 'i'}}},
+            {'$count': 'reviews'}
+        ], SEARCH)
+    },
+    'tip_keyword_search': {
+        'description': 'Number of tips matching a keyword',
+        'class': 'review_search',
+        'pg': """
+            SELECT COUNT(*)
+            FROM tips
+            WHERE text_tsv @@ plainto_tsquery('english', %(term)s)
+        """,
+        'pg_params': SEARCH,
+        **aggregate_query('tips', lambda p: [
+            {'$match': {'$text': {'$search': p['term']}}},
+            {'$count': 'tips'}
+        ], SEARCH)
+    },
+
+    # --- Large scans --------------------------------------------------------
+    # Results are large enough that materializing them on the client dominates;
+    # code/stream_benchmark.py streams them with different fetch sizes
+    'reviews_in_year': {
+        'description': 'Every review written in a year',
+        'class': 'large_scan',
+        'pg': """
+            SELECT review_id, user_id, business_id, stars, date
+            FROM reviews
+            WHERE date >= %(start_date)s AND date < %(end_date)s
+        """,
+        'pg_params': YEAR_WINDOW,
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'date': {'$gte': p['start_date'], '$lt': p['end_date']}}},
+            {'$project': {'user_id': 1, 'business_id': 1, 'stars': 1, 'date': 1}}
+        ], YEAR_WINDOW)
+    },
+    'business_catalog': {
+        'description': 'Name, location, rating and categories of every open business',
+        'class': 'large_scan',
+        'pg': """
+            SELECT business_id, name, city, state, stars, review_count, categories
+            FROM businesses
+            WHERE is_open = 1
+        """,
+        'pg_params': {},
+        **aggregate_query('businesses', lambda p: [
+            {'$match': {'is_open': 1}},
+            {'$project': {'name': 1, 'city': 1, 'state': 1, 'stars': 1, 'review_count': 1, 'categories': 1}}
+        ])
+    },
+    'user_directory': {
+        'description': 'Name, review count and join date of every user',
+        'class': 'large_scan',
+        'pg': """
+            SELECT user_id, name, review_count, yelping_since
+            FROM users
+        """,
+        'pg_params': {},
+        **aggregate_query('users', lambda p: [
+            {'$project': {'name': 1, 'review_count': 1, 'yelping_since': 1}}
+        ])
+    },
+
+    # --- Pagination ---------------------------------------------------------
+    # Each listing is paged two ways; code/pagination_benchmark.py compares them by page depth.
+    # Keyset queries seek past the last row of the previous page on the full sort key
+    # (see the pagination index configuration)
+    'city_businesses_offset_page': {
+        'description': 'A page of businesses in a city by rating, skipping earlier pages with OFFSET/$skip',
+        'class': 'pagination',
+        'pg': """
+            SELECT business_id, name, stars, review_count
+            FROM businesses
+            WHERE city = %(city)s AND state = %(state)s
+            ORDER BY stars DESC, review_count DESC, business_id DESC
+            OFFSET %(offset)s
+            LIMIT %(page_size)s
+        """,
+        'sqlite': """
+            SELECT business_id, name, stars, review_count
+            FROM businesses
+            WHERE city = :city AND state = :state
+            ORDER BY stars DESC, review_count DESC, business_id DESC
+            LIMIT :page_size OFFSET :offset
+        """,
+        'pg_params': CITY_PAGE,
+        'param_source': 'city_state',
+        'pagination': {'listing': 'city_businesses', 'strategy': 'offset'},
+        **aggregate_query('businesses', lambda p: [
+            {'$match': {'city': p['city'], 'state': p['state']}},
+            {'$sort': {'stars': -1, 'review_count': -1, '_id': -1}},
+            {'$skip': p['offset']},
+            {'$limit': p['page_size']},
+            {'$project': {'name': 1, 'stars': 1, 'review_count': 1}}
+        ], CITY_PAGE)
+    },
+    'city_businesses_keyset_page': {
+        'description': 'A page of businesses in a city by rating, seeking past the previous page\'s last row',
+        'class': 'pagination',
+        'pg': """
+            SELECT business_id, name, stars, review_count
+            FROM businesses
+            WHERE city = %(city)s AND state = %(state)s
+            AND (stars, review_count, business_id) < (%(after_stars)s, %(after_review_count)s, %(after_business_id)s)
+            ORDER BY stars DESC, review_count DESC, business_id DESC
+            LIMIT %(page_size)s
+        """,
+        'pg_params': CITY_KEYSET,
+        'param_source': 'city_state',
+        'pagination': {
+            'listing': 'city_businesses',
+            'strategy': 'keyset',
+            'cursor': {
+                'after_stars': ('stars', 'stars'),
+                'after_review_count': ('review_count', 'review_count'),
+                'after_business_id': ('business_id', '_id'),
             },
-            verbosity='executionStats'  
-        )
-    }
+        },
+        **aggregate_query('businesses', lambda p: [
+            {'$match': {'city': p['city'], 'state': p['state'], '$or': [
+                {'stars': {'$lt': p['after_stars']}},
+                {'stars': p['after_stars'], 'review_count': {'$lt': p['after_review_count']}},
+                {'stars': p['after_stars'], 'review_count': p['after_review_count'],
+                 '_id': {'$lt': p['after_business_id']}},
+            ]}},
+            {'$sort': {'stars': -1, 'review_count': -1, '_id': -1}},
+            {'$limit': p['page_size']},
+            {'$project': {'name': 1, 'stars': 1, 'review_count': 1}}
+        ], CITY_KEYSET)
+    },
+    'business_reviews_offset_page': {
+        'description': 'A page of a business\'s reviews, newest first, skipping earlier pages with OFFSET/$skip',
+        'class': 'pagination',
+        'pg': """
+            SELECT review_id, user_id, stars, date
+            FROM reviews
+            WHERE business_id = %(business_id)s
+            ORDER BY date DESC, review_id DESC
+            OFFSET %(offset)s
+            LIMIT %(page_size)s
+        """,
+        'sqlite': """
+            SELECT review_id, user_id, stars, date
+            FROM reviews
+            WHERE business_id = :business_id
+            ORDER BY date DESC, review_id DESC
+            LIMIT :page_size OFFSET :offset
+        """,
+        'pg_params': BUSINESS_PAGE,
+        'param_source': 'business_id',
+        'pagination': {'listing': 'business_reviews', 'strategy': 'offset'},
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'business_id': p['business_id']}},
+            {'$sort': {'date': -1, '_id': -1}},
+            {'$skip': p['offset']},
+            {'$limit': p['page_size']},
+            {'$project': {'user_id': 1, 'stars': 1, 'date': 1}}
+        ], BUSINESS_PAGE)
+    },
+    'business_reviews_keyset_page': {
+        'description': 'A page of a business\'s reviews, newest first, seeking past the previous page\'s last row',
+        'class': 'pagination',
+        'pg': """
+            SELECT review_id, user_id, stars, date
+            FROM reviews
+            WHERE business_id = %(business_id)s
+            AND (date, review_id) < (%(after_date)s, %(after_review_id)s)
+            ORDER BY date DESC, review_id DESC
+            LIMIT %(page_size)s
+        """,
+        'pg_params': BUSINESS_KEYSET,
+        'param_source': 'business_id',
+        'pagination': {
+            'listing': 'business_reviews',
+            'strategy': 'keyset',
+            'cursor': {
+                'after_date': ('date', 'date'),
+                'after_review_id': ('review_id', '_id'),
+            },
+        },
+        **aggregate_query('reviews', lambda p: [
+            {'$match': {'business_id': p['business_id'], '$or': [
+                {'date': {'$lt': p['after_date']}},
+                {'date': p['after_date'], '_id': {'$lt': p['after_review_id']}},
+            ]}},
+            {'$sort': {'date': -1, '_id': -1}},
+            {'$limit': p['page_size']},
+            {'$project': {'user_id': 1, 'stars': 1, 'date': 1}}
+        ], BUSINESS_KEYSET)
+    },
+
+    # --- Geo ----------------------------------------------------------------
+    # Locations are sampled from real businesses. PostgreSQL measures distances with earthdistance
+    # (GiST on ll_to_earth) and boxes on the stored point column (queries/geo.sql); MongoDB uses
+    # the GeoJSON coordinates field, and $geoNear needs its 2dsphere index (the geo configuration)
+    'nearest_businesses': {
+        'description': 'The k businesses nearest to a location',
+        'class': 'geo',
+        'pg': """
+            SELECT business_id, name, stars,
+                   earth_distance(ll_to_earth(latitude, longitude), ll_to_earth(%(latitude)s, %(longitude)s)) AS distance_m
+            FROM businesses
+            ORDER BY ll_to_earth(latitude, longitude) <-> ll_to_earth(%(latitude)s, %(longitude)s)
+            LIMIT %(k)s
+        """,
+        'pg_params': NEAREST,
+        'param_source': 'business_location',
+        **aggregate_query('businesses', lambda p: [
+            {'$geoNear': {'near': geo_point(p), 'key': 'coordinates', 'distanceField': 'distance_m',
+                          'spherical': True}},
+            {'$limit': p['k']},
+            {'$project': {'name': 1, 'stars': 1, 'distance_m': 1}}
+        ], NEAREST)
+    },
+    'open_now_nearby': {
+        'description': 'Open businesses within a radius of a location whose hours cover a day and time',
+        'class': 'geo',
+        'pg': """
+            WITH nearby AS (
+                SELECT business_id, name, stars,
+                       split_part(hours->>%(day)s, '-', 1)::time AS opens,
+                       split_part(hours->>%(day)s, '-', 2)::time AS closes,
+                       earth_distance(ll_to_earth(latitude, longitude),
+                                      ll_to_earth(%(latitude)s, %(longitude)s)) AS distance_m
+                FROM businesses
+                WHERE earth_box(ll_to_earth(%(latitude)s, %(longitude)s), %(radius_km)s * 1000)
+                      @> ll_to_earth(latitude, longitude)
+                AND is_open = 1 AND hours ? %(day)s
+            )
+            SELECT business_id, name, stars, distance_m
+            FROM nearby
+            WHERE distance_m < %(radius_km)s * 1000
+            AND CASE WHEN closes > opens THEN %(time)s::time >= opens AND %(time)s::time < closes
+                     ELSE %(time)s::time >= opens OR %(time)s::time < closes END
+            ORDER BY distance_m
+        """,
+        'pg_params': OPEN_NEARBY,
+        'param_source': 'business_location',
+        **aggregate_query('businesses', open_now_nearby_pipeline, OPEN_NEARBY)
+    },
+    'businesses_in_box': {
+        'description': 'Number and average rating of businesses in a bounding box around a location',
+        'class': 'geo',
+        'pg': """
+            SELECT COUNT(*) AS businesses, AVG(stars) AS avg_stars
+            FROM businesses
+            WHERE coordinates <@ box(point(%(longitude)s - %(half_box_deg)s, %(latitude)s - %(half_box_deg)s),
+                                     point(%(longitude)s + %(half_box_deg)s, %(latitude)s + %(half_box_deg)s))
+        """,
+        'pg_params': LOCATION_BOX,
+        'param_source': 'business_location',
+        # The 2dsphere index serves $geometry polygons (with geodesic edges, so counts can differ
+        # slightly from PostgreSQL's planar box at the edges)
+        **aggregate_query('businesses', lambda p: [
+            {'$match': {'coordinates': {'$geoWithin': {'$geometry': {'type': 'Polygon', 'coordinates': [[
+                [p['longitude'] - p['half_box_deg'], p['latitude'] - p['half_box_deg']],
+                [p['longitude'] + p['half_box_deg'], p['latitude'] - p['half_box_deg']],
+                [p['longitude'] + p['half_box_deg'], p['latitude'] + p['half_box_deg']],
+                [p['longitude'] - p['half_box_deg'], p['latitude'] + p['half_box_deg']],
+                [p['longitude'] - p['half_box_deg'], p['latitude'] - p['half_box_deg']],
+            ]]}}}}},
+            {'$group': {'_id': None, 'businesses': {'$sum': 1}, 'avg_stars': {'$avg': '$stars'}}}
+        ], LOCATION_BOX)
+    },
 }
 
 def get_query(query_name):
@@ -94,7 +1203,15 @@ def get_query(query_name):
 def get_all_queries():
     return QUERIES
 
+def get_queries_by_class(query_class):
+    return {name: info for name, info in QUERIES.items() if info.get('class') == query_class}
+
 def list_queries():
     print("\nAvailable benchmark queries:")
-    for name, info in QUERIES.items():
-        print(f"  - {name}: {info['description']}") 
\ No newline at end of file
+    for query_class, description in QUERY_CLASSES.items():
+        names = [name for name, info in QUERIES.items() if info.get('class') == query_class]
+        if not names:
+            continue
+        print(f"\n  {query_class}: {description}")
+        for name in names:
+            print(f"    - {name}: {QUERIES[name]['description']}")
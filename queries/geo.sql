@@ -0,0 +1,11 @@
+-- Spatial support for business locations.
+-- earthdistance (on top of cube) maps latitude/longitude to points on the earth's surface:
+-- ll_to_earth() values can be GiST-indexed for radius (earth_box) and nearest-neighbour (<->)
+-- searches. The stored point column (longitude, latitude) serves bounding-box searches
+-- (<@ box) through a GiST index. Generated columns are filled as rows are inserted; on a
+-- populated table adding one rewrites it.
+CREATE EXTENSION IF NOT EXISTS cube;
+CREATE EXTENSION IF NOT EXISTS earthdistance;
+
+ALTER TABLE businesses ADD COLUMN IF NOT EXISTS coordinates point
+    GENERATED ALWAYS AS (point(longitude, latitude)) STORED;
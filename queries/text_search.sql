@@ -0,0 +1,8 @@
+-- Stored tsvector columns for full-text search over review and tip text.
+-- Generated columns are filled as rows are inserted, so run this before loading
+-- (reset_load_postgres.py --text-search does); on populated tables it rewrites them.
+ALTER TABLE reviews ADD COLUMN IF NOT EXISTS text_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', COALESCE(text, ''))) STORED;
+
+ALTER TABLE tips ADD COLUMN IF NOT EXISTS text_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', COALESCE(text, ''))) STORED;
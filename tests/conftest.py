@@ -0,0 +1,18 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "code"))
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+@pytest.fixture
+def load_fixture():
+    """Load a JSON file from tests/fixtures"""
+    def load(name):
+        with open(os.path.join(FIXTURES_DIR, name)) as f:
+            return json.load(f)
+    return load
@@ -0,0 +1,77 @@
+import pytest
+
+from index_registry import _resolve_config, load_index_configs
+from server_config import _resolve_profile, load_server_profiles
+
+
+RAW_INDEX_CONFIGS = {
+    'base': {'postgres': [{'name': 'idx_a', 'table': 'businesses', 'columns': ['city']}],
+             'mongo': [{'collection': 'businesses', 'keys': [['city', 1]]}]},
+    'extra': {'postgres': [{'name': 'idx_b', 'table': 'reviews', 'columns': ['date']}],
+              'mongo': [{'collection': 'reviews', 'keys': [['date', -1]], 'name': 'by_date'}]},
+    'both': {'extends': ['base', 'extra'],
+             'postgres': [{'name': 'idx_a', 'table': 'businesses', 'columns': ['city']}]},
+    'single': {'extends': 'base'},
+    'loop': {'extends': ['loop']},
+}
+
+
+def test_index_config_inherits_every_parent_once():
+    config = _resolve_config('both', RAW_INDEX_CONFIGS)
+    assert [index['name'] for index in config['postgres']] == ['idx_a', 'idx_b']
+    assert [index['name'] for index in config['mongo']] == ['city_1', 'by_date']
+
+
+def test_index_config_extends_may_be_a_single_name():
+    assert _resolve_config('single', RAW_INDEX_CONFIGS)['postgres'] == RAW_INDEX_CONFIGS['base']['postgres']
+
+
+def test_index_config_errors():
+    with pytest.raises(KeyError):
+        _resolve_config('missing', RAW_INDEX_CONFIGS)
+    with pytest.raises(ValueError):
+        _resolve_config('loop', RAW_INDEX_CONFIGS)
+
+
+def test_shipped_index_configs_resolve():
+    configs = load_index_configs()
+    baseline = {index['name'] for index in configs['baseline']['postgres']}
+    geo = {index['name'] for index in configs['geo']['postgres']}
+    assert baseline < geo
+    assert not any('earth' in name or 'coordinates' in name for name in baseline)
+
+
+RAW_PROFILES = {
+    'default': {'postgres': {}, 'mongo': {}},
+    'memory': {'postgres': {'shared_buffers': '2GB', 'work_mem': '64MB'}, 'mongo': {'wiredTigerCacheSizeGB': 6}},
+    'ssd': {'postgres': {'random_page_cost': 1.1, 'work_mem': '16MB'}},
+    'combined': {'extends': ['memory', 'ssd'], 'postgres': {'jit': 'off'}},
+    'override': {'extends': 'combined', 'postgres': {'work_mem': '4MB'}},
+    'cycle_a': {'extends': 'cycle_b'},
+    'cycle_b': {'extends': 'cycle_a'},
+}
+
+
+def test_server_profile_later_parents_and_own_settings_win():
+    profile = _resolve_profile('combined', RAW_PROFILES)
+    assert profile['postgres'] == {'shared_buffers': '2GB', 'work_mem': '16MB', 'random_page_cost': 1.1,
+                                   'jit': 'off'}
+    assert profile['mongo'] == {'wiredTigerCacheSizeGB': 6}
+    assert _resolve_profile('override', RAW_PROFILES)['postgres']['work_mem'] == '4MB'
+
+
+def test_server_profile_does_not_modify_its_parents():
+    _resolve_profile('override', RAW_PROFILES)
+    assert _resolve_profile('ssd', RAW_PROFILES)['postgres']['work_mem'] == '16MB'
+
+
+def test_server_profile_errors():
+    with pytest.raises(KeyError):
+        _resolve_profile('missing', RAW_PROFILES)
+    with pytest.raises(ValueError):
+        _resolve_profile('cycle_a', RAW_PROFILES)
+
+
+def test_shipped_server_profiles_resolve():
+    profiles = load_server_profiles()
+    assert profiles['default']['postgres'] == {} and profiles['default']['mongo'] == {}
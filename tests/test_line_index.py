@@ -0,0 +1,102 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import line_index
+from dataset_input import DATASET_FILES
+from line_index import LineIndex, ScaleSample, index_path
+
+
+def write_lines(path, records, trailing_newline=True):
+    text = "\n".join(json.dumps(record) for record in records) + ("\n" if trailing_newline else "")
+    with open(path, 'w') as f:
+        f.write(text)
+    return text.encode()
+
+
+@pytest.fixture(params=[7, 1 << 20], ids=['small-chunks', 'one-chunk'])
+def chunk_size(request, monkeypatch):
+    # Small chunks split lines across reads, exercising the carried-over partial line
+    monkeypatch.setattr(line_index, 'CHUNK_SIZE', request.param)
+    return request.param
+
+
+@pytest.mark.parametrize('trailing_newline', [True, False])
+def test_build_records_line_offsets_and_keys(tmp_path, chunk_size, trailing_newline):
+    records = [{'business_id': f"b{i}", 'name': "x" * i} for i in range(10)]
+    path = str(tmp_path / "businesses.json")
+    data = write_lines(path, records, trailing_newline)
+
+    index = LineIndex.build(path, key='business_id')
+    assert len(index) == 10
+    assert index.size == len(data)
+    assert index.keys.tolist() == [f"b{i}".encode() for i in range(10)]
+    for line, record in zip(range(10), records):
+        start, end = int(index.offsets[line]), int(index.offsets[line + 1])
+        assert json.loads(data[start:end]) == record
+
+
+def test_find_read_and_total_bytes(tmp_path):
+    records = [{'user_id': f"u{i}", 'review_count': i} for i in range(6)]
+    path = str(tmp_path / "users.json")
+    write_lines(path, records)
+    index = LineIndex.build(path, key='user_id')
+
+    lines = index.find({'u4', 'u1', 'missing'})
+    assert lines.tolist() == [1, 4]
+    assert [json.loads(line) for line in index.read(lines)] == [records[1], records[4]]
+    assert index.total_bytes(lines) == sum(len(json.dumps(records[i])) + 1 for i in (1, 4))
+
+
+def test_saved_index_is_reused_until_the_file_changes(tmp_path, capsys):
+    path = str(tmp_path / "reviews.json")
+    write_lines(path, [{'review_id': i} for i in range(3)])
+    LineIndex.load(path)
+    assert os.path.exists(index_path(path))
+    assert "Building line index" in capsys.readouterr().out
+
+    assert len(LineIndex.load(path)) == 3
+    assert "Building line index" not in capsys.readouterr().out
+
+    write_lines(path, [{'review_id': i} for i in range(5)])
+    with pytest.raises(FileNotFoundError):
+        LineIndex.load(path, build=False)
+    assert len(LineIndex.load(path)) == 5
+
+
+def test_scale_sample_is_a_consistent_reproducible_subset(tmp_path):
+    businesses = [{'business_id': f"b{i}"} for i in range(20)]
+    users = [{'user_id': f"u{i}"} for i in range(30)]
+    reviews = [{'review_id': f"r{i}", 'business_id': f"b{i % 20}", 'user_id': f"u{(i * 7) % 30}"}
+               for i in range(200)]
+    tips = [{'business_id': f"b{(i * 3) % 20}", 'user_id': f"u{i % 30}"} for i in range(50)]
+    checkins = [{'business_id': f"b{i}"} for i in range(0, 20, 2)]
+    for table, records in (('businesses', businesses), ('users', users), ('reviews', reviews),
+                           ('tips', tips), ('checkins', checkins)):
+        write_lines(str(tmp_path / DATASET_FILES[table]), records)
+
+    sample = ScaleSample(str(tmp_path), 0.1, seed=5)
+    assert len(sample.lines['reviews']) == 20
+    assert len(sample.lines['tips']) == 5
+
+    def read(table):
+        reader = sample.reader(table)
+        try:
+            return [json.loads(line) for line in reader.read().splitlines()]
+        finally:
+            reader.close()
+
+    sampled = {table: read(table) for table in DATASET_FILES}
+    business_ids = {record['business_id'] for record in sampled['businesses']}
+    user_ids = {record['user_id'] for record in sampled['users']}
+    for record in sampled['reviews'] + sampled['tips']:
+        assert record['business_id'] in business_ids
+        assert record['user_id'] in user_ids
+    assert business_ids == {record['business_id'] for record in sampled['reviews'] + sampled['tips']}
+    assert {record['business_id'] for record in sampled['checkins']} == \
+        {business_id for business_id in business_ids if int(business_id[1:]) % 2 == 0}
+
+    again = ScaleSample(str(tmp_path), 0.1, seed=5)
+    assert all(np.array_equal(sample.lines[table], again.lines[table]) for table in DATASET_FILES)
@@ -0,0 +1,107 @@
+import datetime
+
+import pytest
+
+from param_generators import ParamGenerator, BUCKETS, load_param_pool, top_params
+
+
+def make_pool(n):
+    """Pool of n keys where key i matches n - i rows, shuffled so the generator has to rank it"""
+    pool = [({'business_id': f"b{i}"}, n - i) for i in range(n)]
+    return pool[1::2] + pool[::2]
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cur = FakeCursor(rows)
+
+    def cursor(self):
+        return self.cur
+
+
+def test_pool_is_ranked_by_weight():
+    generator = ParamGenerator('business_id', make_pool(9))
+    assert [weight for _, weight in generator.pool] == list(range(9, 0, -1))
+
+
+def test_buckets_split_the_ranking_into_thirds():
+    generator = ParamGenerator('business_id', make_pool(9))
+    assert [generator.bucket(rank) for rank in range(9)] == ['high'] * 3 + ['mid'] * 3 + ['low'] * 3
+
+
+def test_uniform_sampling_reaches_every_bucket():
+    generator = ParamGenerator('business_id', make_pool(30), seed=1)
+    buckets = [bucket for _, bucket in generator.samples(600)]
+    assert set(buckets) == set(BUCKETS)
+    assert all(150 < buckets.count(bucket) < 250 for bucket in BUCKETS)
+
+
+def test_low_bucket_holds_the_least_frequent_keys():
+    generator = ParamGenerator('business_id', make_pool(30), seed=3)
+    low = {params['business_id'] for params, bucket in generator.samples(500) if bucket == 'low'}
+    high = {params['business_id'] for params, bucket in generator.samples(500) if bucket == 'high'}
+    weight = {params['business_id']: weight for params, weight in make_pool(30)}
+    assert max(weight[key] for key in low) < min(weight[key] for key in high)
+
+
+def test_zipf_sampling_favours_frequent_keys():
+    generator = ParamGenerator('business_id', make_pool(30), distribution='zipf', skew=1.5, seed=7)
+    buckets = [bucket for _, bucket in generator.samples(1000)]
+    assert buckets.count('high') > buckets.count('mid') > buckets.count('low')
+
+
+def test_sampling_is_reproducible_for_a_seed():
+    first = ParamGenerator('business_id', make_pool(30), distribution='zipf', seed=11).samples(50)
+    second = ParamGenerator('business_id', make_pool(30), distribution='zipf', seed=11).samples(50)
+    assert first == second
+
+
+def test_date_window_samples_get_an_end_date():
+    generator = ParamGenerator('date_window', [({'start_date': '2019-01-01'}, 10)])
+    params, bucket = generator.sample()
+    assert params == {'start_date': '2019-01-01', 'end_date': '2019-02-01'}
+    assert bucket == 'high'
+
+
+def test_invalid_generators_are_rejected():
+    with pytest.raises(ValueError):
+        ParamGenerator('business_id', make_pool(3), distribution='normal')
+    with pytest.raises(ValueError):
+        ParamGenerator('business_id', [])
+
+
+def test_pool_query_takes_one_key_per_rank_stratum():
+    conn = FakeConnection([('Philadelphia', 'PA', 120), ('Reno', 'NV', 3)])
+    pool = load_param_pool(conn, 'city_state', pool_size=50)
+    sql, params = conn.cur.executed[0]
+    assert params == {'pool_size': 50}
+    assert 'NTILE(%(pool_size)s) OVER (ORDER BY weight DESC NULLS LAST, city, state)' in sql
+    assert 'DISTINCT ON (stratum) city, state, weight' in sql
+    assert 'LIMIT' not in sql
+    assert pool == [({'city': 'Philadelphia', 'state': 'PA'}, 120), ({'city': 'Reno', 'state': 'NV'}, 3)]
+
+
+def test_top_params_uses_a_single_stratum():
+    conn = FakeConnection([(datetime.date(2019, 3, 1), 900)])
+    assert top_params(conn, 'date_window') == {'start_date': '2019-03-01', 'end_date': '2019-04-01'}
+    assert conn.cur.executed[0][1] == {'pool_size': 1}
+
+
+def test_unknown_source_is_rejected():
+    with pytest.raises(KeyError):
+        load_param_pool(FakeConnection([]), 'no_such_source')
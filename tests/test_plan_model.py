@@ -0,0 +1,89 @@
+import pytest
+
+from plan_model import parse_plan, parse_postgres_plan
+
+
+def pg_node(node_type, time_ms, rows, loops=1, children=(), **extra):
+    return {'Node Type': node_type, 'Actual Total Time': time_ms, 'Actual Rows': rows, 'Actual Loops': loops,
+            'Plan Rows': rows, 'Plans': list(children), **extra}
+
+
+def test_parallel_plan_parent_time_covers_children(load_fixture):
+    plan = parse_postgres_plan(load_fixture('pg_parallel_plan.json'))
+    for _, node in plan.root.walk():
+        for child in node.children:
+            assert node.total_time_ms >= child.total_time_ms, (node.operator, child.operator)
+    assert all(node.self_time_ms > 0 for node in plan.nodes())
+
+
+def test_parallel_plan_times_are_per_process(load_fixture):
+    plan = parse_postgres_plan(load_fixture('pg_parallel_plan.json'))
+    nodes = {node.operator: node for node in plan.nodes()}
+    assert nodes['Gather Merge'].workers_launched == 2
+    # Three processes share the loops: the parallel scan ran once in each of them
+    assert nodes['Seq Scan'].total_time_ms == pytest.approx(50.277)
+    assert nodes['Index Scan'].total_time_ms == pytest.approx(0.008 * 30000 / 3)
+    # Row counts are still totals across every loop
+    assert nodes['Seq Scan'].actual_rows == 30000
+    assert nodes['Seq Scan'].rows_examined == (10000 + 2100) * 3
+    assert plan.hot_nodes(1)[0].operator == 'Index Scan'
+
+
+def test_serial_plan_times_are_totals_across_loops():
+    inner = pg_node('Index Scan', 0.01, 2, loops=1000, **{'Relation Name': 'reviews'})
+    outer = pg_node('Seq Scan', 5.0, 1000, **{'Relation Name': 'businesses'})
+    plan = parse_postgres_plan([{'Plan': pg_node('Nested Loop', 20.0, 2000, children=[outer, inner]),
+                                 'Execution Time': 20.5}])
+    scan = plan.root.children[1]
+    assert scan.total_time_ms == pytest.approx(10.0)
+    assert scan.actual_rows == 2000
+    assert plan.root.self_time_ms == pytest.approx(5.0)
+
+
+def test_unparseable_explain_is_an_error():
+    assert parse_postgres_plan({'error': 'boom'}).error == 'boom'
+    assert parse_postgres_plan([]).error == 'Unrecognized EXPLAIN output'
+
+
+def test_mongo_aggregate_explain(load_fixture):
+    plan = parse_plan('mongodb', load_fixture('mongo_aggregate_explain.json'))
+    assert [(depth, node.operator) for depth, node in plan.root.walk()] == [
+        (0, '$sort'), (1, '$group'), (2, 'PROJECTION_SIMPLE'), (3, 'FETCH'), (4, 'IXSCAN')]
+    nodes = {node.operator: node for node in plan.nodes()}
+    assert nodes['PROJECTION_SIMPLE'].relation == 'reviews'
+    assert nodes['IXSCAN'].relation == 'business_id_1'
+    assert nodes['$group'].memory_kb == 2
+    assert nodes['$group'].self_time_ms == 8
+    assert nodes['FETCH'].self_time_ms == 22
+    assert plan.rows_returned == 5
+    assert plan.rows_examined == 5200
+    assert plan.keys_examined == 5200
+    assert plan.execution_time_ms == 41
+
+
+def test_estimate_summary_and_parallel_workers(load_fixture):
+    assert parse_postgres_plan(load_fixture('pg_parallel_plan.json')).parallel_workers() == (2, 2)
+
+    scan = pg_node('Seq Scan', 5.0, 2000, **{'Relation Name': 'businesses', 'Plan Rows': 20})
+    plan = parse_postgres_plan([{'Plan': pg_node('Sort', 6.0, 2000, children=[scan], **{'Plan Rows': 1000})}])
+    assert plan.parallel_workers() == (0, 0)
+    assert [node.operator for node in plan.estimate_errors(threshold=10.0)] == ['Seq Scan']
+    summary = plan.estimate_summary(threshold=10.0)
+    assert summary['nodes'] == 2
+    assert summary['max_error'] == pytest.approx(100.0)
+    assert summary['geomean_error'] == pytest.approx((2.0 * 100.0) ** 0.5)
+    assert summary['misestimated'] == 1
+
+
+def test_sqlite_and_columnar_plans():
+    plan = parse_plan('sqlite', {'plan': [(2, 0, 0, 'SCAN reviews'), (3, 2, 0, 'USE TEMP B-TREE FOR ORDER BY')],
+                                 'execution_time_ms': 4.0, 'rows_returned': 10})
+    assert [(depth, node.operator) for depth, node in plan.root.walk()] == [
+        (0, 'QUERY'), (1, 'SCAN reviews'), (2, 'USE TEMP B-TREE FOR ORDER BY')]
+    assert plan.root.children[0].relation == 'reviews'
+
+    plan = parse_plan('columnar', {'execution_time_ms': 1.5, 'rows': 3, 'peak_memory_bytes': 4096})
+    assert (plan.execution_time_ms, plan.rows_returned, plan.root.memory_kb) == (1.5, 3, 4)
+    assert parse_plan('columnar', {'error': 'no vectorized implementation'}).error
+    with pytest.raises(ValueError):
+        parse_plan('oracle', {})
@@ -0,0 +1,23 @@
+from prepared_benchmark import to_prepared_sql
+
+
+def test_named_placeholders_become_positional():
+    sql, names = to_prepared_sql("SELECT * FROM businesses WHERE city = %(city)s AND state = %(state)s")
+    assert sql == "SELECT * FROM businesses WHERE city = $1 AND state = $2"
+    assert names == ['city', 'state']
+
+
+def test_repeated_placeholder_reuses_its_position():
+    sql, names = to_prepared_sql("SELECT %(a)s, %(b)s, %(a)s")
+    assert sql == "SELECT $1, $2, $1"
+    assert names == ['a', 'b']
+
+
+def test_escaped_percent_is_unescaped():
+    sql, names = to_prepared_sql("SELECT name FROM businesses WHERE name ILIKE '%%pizza%%' AND stars >= %(stars)s")
+    assert sql == "SELECT name FROM businesses WHERE name ILIKE '%pizza%' AND stars >= $1"
+    assert names == ['stars']
+
+
+def test_sql_without_parameters_is_unchanged():
+    assert to_prepared_sql("SELECT COUNT(*) FROM reviews") == ("SELECT COUNT(*) FROM reviews", [])
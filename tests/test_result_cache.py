@@ -0,0 +1,95 @@
+from result_cache import ResultCache, cache_key, query_tables, read_through, TABLES
+
+
+def test_cache_key_ignores_parameter_order():
+    assert cache_key('postgresql', 'q', {'a': 1, 'b': [1, 2]}) == cache_key('postgresql', 'q', {'b': [1, 2], 'a': 1})
+    assert cache_key('postgresql', 'q', {'a': 1}) != cache_key('mongodb', 'q', {'a': 1})
+
+
+def test_query_tables_from_sql_collection_and_lookups():
+    query_info = {
+        'pg': "SELECT * FROM reviews r JOIN businesses b ON b.business_id = r.business_id",
+        'mongo_collection': 'reviews',
+        'mongo_pipeline': lambda params: [{'$match': {}}, {'$lookup': {'from': 'users'}}],
+    }
+    assert query_tables(query_info) == frozenset({'reviews', 'businesses', 'users'})
+
+
+def test_unknown_reads_depend_on_every_table():
+    assert query_tables({'pg': "SELECT 1"}) == frozenset(TABLES)
+
+
+def test_hit_and_miss():
+    cache = ResultCache()
+    assert cache.get('k') == (False, None)
+    cache.put('k', [1, 2], {'reviews'})
+    assert cache.get('k') == (True, [1, 2])
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_ratio == 0.5
+
+
+def test_invalidation_drops_only_entries_reading_the_table():
+    cache = ResultCache()
+    cache.put('reviews', 1, {'reviews'})
+    cache.put('join', 2, {'reviews', 'businesses'})
+    cache.put('users', 3, {'users'})
+    assert cache.invalidate({'reviews'}) == 2
+    assert cache.get('reviews') == (False, None)
+    assert cache.get('join') == (False, None)
+    assert cache.get('users') == (True, 3)
+    assert cache.invalidations == 2
+    # The dropped entries no longer count towards the size bound
+    assert cache.bytes == cache._entries['users']['size']
+    assert cache.invalidate({'businesses'}) == 0
+
+
+def test_replaced_entry_is_not_invalidated_by_its_old_tables():
+    cache = ResultCache()
+    cache.put('k', 1, {'reviews'})
+    cache.put('k', 2, {'users'})
+    assert cache.invalidate({'reviews'}) == 0
+    assert cache.get('k') == (True, 2)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', 1, {'reviews'})
+    cache.put('b', 2, {'reviews'})
+    cache.get('a')
+    cache.put('c', 3, {'reviews'})
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.evictions == 1
+
+
+def test_byte_bound_rejects_oversized_results():
+    cache = ResultCache(max_bytes=100)
+    cache.put('big', 'x' * 1000, {'reviews'})
+    assert cache.rejected == 1
+    assert len(cache) == 0
+
+
+def test_expired_entries_miss(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('result_cache.time.monotonic', lambda: now[0])
+    cache = ResultCache(ttl=10)
+    cache.put('k', 1, {'reviews'})
+    now[0] += 11
+    assert cache.get('k') == (False, None)
+    assert cache.expirations == 1
+
+
+def test_read_through_runs_once_until_invalidated():
+    cache = ResultCache()
+    calls = []
+    query_info = {'pg': "SELECT * FROM tips"}
+
+    def run():
+        calls.append(1)
+        return len(calls)
+
+    assert read_through(cache, 'postgresql', 'q', query_info, {'id': 1}, run) == (1, False)
+    assert read_through(cache, 'postgresql', 'q', query_info, {'id': 1}, run) == (1, True)
+    cache.invalidate({'tips'})
+    assert read_through(cache, 'postgresql', 'q', query_info, {'id': 1}, run) == (2, False)
+    assert read_through(None, 'postgresql', 'q', query_info, {'id': 1}, run) == (3, False)
@@ -0,0 +1,86 @@
+import pytest
+
+from results_store import ResultsStore, compare_runs, mann_whitney_u, MIN_SAMPLES
+
+
+def test_mann_whitney_needs_both_samples():
+    assert mann_whitney_u([], [1.0, 2.0]) is None
+    assert mann_whitney_u([1.0], []) is None
+
+
+def test_mann_whitney_identical_samples_are_not_significant():
+    assert mann_whitney_u([5.0] * 6, [5.0] * 6) == 1.0
+    assert mann_whitney_u([1.0, 2.0, 3.0, 4.0], [1.0, 2.0, 3.0, 4.0]) == pytest.approx(1.0)
+
+
+def test_mann_whitney_is_symmetric():
+    a, b = [1.0, 3.0, 4.0, 7.0, 9.0], [2.0, 5.0, 6.0, 8.0, 10.0, 11.0]
+    assert mann_whitney_u(a, b) == pytest.approx(mann_whitney_u(b, a))
+
+
+def test_mann_whitney_separated_samples():
+    # Fully separated samples reach p < 0.05 from MIN_SAMPLES per side, but not below it
+    low, high = list(range(MIN_SAMPLES)), list(range(100, 100 + MIN_SAMPLES))
+    assert mann_whitney_u(low, high) < 0.05
+    assert mann_whitney_u(low[1:], high[1:]) > 0.05
+    assert mann_whitney_u([1, 2, 3, 4], [5, 6, 7, 8]) == pytest.approx(0.0304, abs=1e-4)
+    assert mann_whitney_u(list(range(20)), list(range(100, 120))) < 1e-6
+
+
+def test_mann_whitney_handles_ties():
+    p = mann_whitney_u([1.0, 1.0, 2.0, 2.0, 3.0], [2.0, 3.0, 3.0, 4.0, 4.0])
+    assert 0.0 < p < 1.0
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv('GIT_REVISION', 'test')
+    store = ResultsStore(str(tmp_path / "history.sqlite"))
+    yield store
+    store.close()
+
+
+def record_run(store, timings):
+    run_id = store.start_run('baseline', 1.0, command='test')
+    for (query_name, engine), values in timings.items():
+        for iteration, value in enumerate(values):
+            store.record(run_id, query_name, engine, iteration, value)
+    return run_id
+
+
+def test_compare_runs_verdicts(store):
+    base = record_run(store, {
+        ('slower', 'postgresql'): [10, 11, 10, 12, 11],
+        ('faster', 'postgresql'): [50, 52, 51, 53, 50],
+        ('same', 'mongodb'): [5, 6, 5, 6, 5],
+        ('few', 'mongodb'): [1, 1, 1],
+    })
+    candidate = record_run(store, {
+        ('slower', 'postgresql'): [20, 21, 22, 20, 21],
+        ('faster', 'postgresql'): [20, 21, 20, 22, 21],
+        ('same', 'mongodb'): [6, 5, 5, 6, 5],
+        ('few', 'mongodb'): [9, 9, 9],
+    })
+    rows, regressed = compare_runs(store, base, candidate, threshold=0.10, alpha=0.05)
+    verdicts = {row[0]: row[-1] for row in rows}
+    assert verdicts == {'slower': 'REGRESSION', 'faster': 'improvement', 'same': 'ok',
+                        'few': 'insufficient samples'}
+    assert regressed
+
+
+def test_compare_runs_only_gates_measured_slowdowns(store):
+    base = record_run(store, {('q', 'postgresql'): [10, 11, 10, 12]})
+    candidate = record_run(store, {('q', 'postgresql'): [10.5, 11, 10.5, 12]})
+    rows, regressed = compare_runs(store, base, candidate, threshold=0.10, alpha=0.05)
+    assert rows[0][-1] == 'ok'
+    assert not regressed
+
+
+def test_resolve_run(store):
+    first = record_run(store, {})
+    second = record_run(store, {})
+    assert store.resolve_run('latest') == second
+    assert store.resolve_run('latest~1') == first
+    assert store.resolve_run(str(first)) == first
+    with pytest.raises(KeyError):
+        store.resolve_run('latest~5')